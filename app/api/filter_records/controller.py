@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Body, Security, status
+from fastapi import APIRouter, Body, Response, Security, status
 
-from app.api.filter_records.models import FilterRequestModel, FilterResponseModel
+from app.api.filter_records.models import (
+    FederatedFilterResponseModel,
+    FilterRequestModel,
+    FilterResponseModel,
+)
 from app.api.filter_records.services import (
+    filter_record_from_all,
     filter_record_from_json,
     filter_record_from_mongo,
+    filter_record_from_parquet,
     filter_record_from_sql,
+    filter_record_from_sqlite,
+    render_filter_response,
+    run_filter_record,
+    run_in_bulkhead,
 )
+from app.core.constants import BACKEND_STATUS_SUCCESS
 from app.utils.api_token_helper import get_api_key
 
 record_filter_router = APIRouter()
@@ -26,18 +37,19 @@ record_filter_router = APIRouter()
         422: {"description": "Unprocessable entity in request"},
         500: {"description": "Runtime error"},
         401: {"description": "Unauthorized"},
+        503: {"description": "Backend overloaded, retry after Retry-After seconds"},
     },
 )
-def json_record_filter(
+async def json_record_filter(
     filter_request: FilterRequestModel = Body(
         title="Filter Request for JSON filter",
         description="Request body to filter the records from JSON. "
         "Make sure to include date range as it is mandatory",
     ),
     api_key: str = Security(get_api_key),
-) -> FilterResponseModel:
+) -> Response:
     """Controller of JSON record filter"""
-    return filter_record_from_json(filter_request)
+    return await run_filter_record("json", filter_record_from_json, filter_request)
 
 
 # pylint: disable=unused-argument
@@ -55,18 +67,22 @@ def json_record_filter(
         422: {"description": "Unprocessable entity in request"},
         500: {"description": "Runtime error"},
         401: {"description": "Unauthorized"},
+        503: {
+            "description": "Backend overloaded or unavailable, retry after "
+            "Retry-After seconds"
+        },
     },
 )
-def mongo_db_record_filter(
+async def mongo_db_record_filter(
     filter_request: FilterRequestModel = Body(
         title="Filter Request for MongoDB filter",
         description="Request body to filter the records from MongoDB. "
         "Make sure to include date range as it is mandatory",
     ),
     api_key: str = Security(get_api_key),
-) -> FilterResponseModel:
+) -> Response:
     """Controller of MongoDB record filter"""
-    return filter_record_from_mongo(filter_request)
+    return await run_filter_record("mongodb", filter_record_from_mongo, filter_request)
 
 
 # pylint: disable=unused-argument
@@ -84,15 +100,126 @@ def mongo_db_record_filter(
         422: {"description": "Unprocessable entity in request"},
         500: {"description": "Runtime error"},
         401: {"description": "Unauthorized"},
+        503: {
+            "description": "Backend overloaded or unavailable, retry after "
+            "Retry-After seconds"
+        },
     },
 )
-def my_sql_db_record_filter(
+async def my_sql_db_record_filter(
     filter_request: FilterRequestModel = Body(
         title="Filter Request for MySQL DB",
         description="Request body to filter the records from MySQL. "
         "Make sure to include date range as it is mandatory",
     ),
     api_key: str = Security(get_api_key),
-) -> FilterResponseModel:
+) -> Response:
     """Controller of MySQL DB record filter"""
-    return filter_record_from_sql(filter_request)
+    return await run_filter_record("sql", filter_record_from_sql, filter_request)
+
+
+# pylint: disable=unused-argument
+@record_filter_router.post(
+    path="/fromSQLite",
+    status_code=status.HTTP_200_OK,
+    response_model=FilterResponseModel,
+    description="Filter Record from SQLite using required body",
+    responses={
+        200: {
+            "description": "Request for filtering records from SQLite is completed",
+            "model": FilterResponseModel,
+        },
+        400: {"description": "Bad Request"},
+        422: {"description": "Unprocessable entity in request"},
+        500: {"description": "Runtime error"},
+        401: {"description": "Unauthorized"},
+        503: {"description": "Backend overloaded, retry after Retry-After seconds"},
+    },
+)
+async def sqlite_record_filter(
+    filter_request: FilterRequestModel = Body(
+        title="Filter Request for SQLite filter",
+        description="Request body to filter the records from SQLite. "
+        "Make sure to include date range as it is mandatory",
+    ),
+    api_key: str = Security(get_api_key),
+) -> Response:
+    """Controller of SQLite record filter"""
+    return await run_filter_record("sqlite", filter_record_from_sqlite, filter_request)
+
+
+# pylint: disable=unused-argument
+@record_filter_router.post(
+    path="/fromParquet",
+    status_code=status.HTTP_200_OK,
+    response_model=FilterResponseModel,
+    description="Filter Record from Parquet using required body",
+    responses={
+        200: {
+            "description": "Request for filtering records from Parquet is completed",
+            "model": FilterResponseModel,
+        },
+        400: {"description": "Bad Request"},
+        422: {"description": "Unprocessable entity in request"},
+        500: {"description": "Runtime error"},
+        401: {"description": "Unauthorized"},
+        503: {"description": "Backend overloaded, retry after Retry-After seconds"},
+    },
+)
+async def parquet_record_filter(
+    filter_request: FilterRequestModel = Body(
+        title="Filter Request for Parquet filter",
+        description="Request body to filter the records from Parquet. "
+        "Make sure to include date range as it is mandatory",
+    ),
+    api_key: str = Security(get_api_key),
+) -> Response:
+    """Controller of Parquet record filter"""
+    return await run_filter_record(
+        "parquet", filter_record_from_parquet, filter_request
+    )
+
+
+# pylint: disable=unused-argument
+@record_filter_router.post(
+    path="/fromAll",
+    status_code=status.HTTP_200_OK,
+    response_model=FederatedFilterResponseModel,
+    description="Filter Record from JSON, MongoDB and MySQL at the same time "
+    "using required body",
+    responses={
+        200: {
+            "description": "Request for filtering records from all the backends "
+            "is completed, partial when some backend failed or timed out",
+            "model": FederatedFilterResponseModel,
+        },
+        400: {"description": "Bad Request"},
+        422: {"description": "Unprocessable entity in request"},
+        500: {"description": "Runtime error"},
+        401: {"description": "Unauthorized"},
+        503: {
+            "description": "None of the backends answered, or the federated "
+            "filter is overloaded",
+            "model": FederatedFilterResponseModel,
+        },
+    },
+)
+async def federated_record_filter(
+    filter_request: FilterRequestModel = Body(
+        title="Filter Request for federated filter",
+        description="Request body to filter the records from all the backends. "
+        "Make sure to include date range as it is mandatory",
+    ),
+    api_key: str = Security(get_api_key),
+) -> Response:
+    """Controller of federated record filter"""
+    federated_response = await run_in_bulkhead(
+        "federated", filter_record_from_all, filter_request
+    )
+    response = render_filter_response(federated_response, "federated")
+    if not any(
+        backend.status == BACKEND_STATUS_SUCCESS
+        for backend in federated_response.backends
+    ):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return response
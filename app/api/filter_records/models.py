@@ -1,8 +1,9 @@
 from datetime import datetime
-from typing import List, Union
+from typing import List, Optional, Union
 
 from pydantic import Field, computed_field, field_validator
 
+from app.core.constants import BACKEND_STATUS_SUCCESS
 from app.utils.model_helper import CamelModel
 
 
@@ -76,6 +77,8 @@ class FilterResponseModel(CamelModel):
     """
 
     result: List[RecordModel]
+    # source and generation of the records, sent in a header instead of the body
+    dataset_version: Optional[str] = Field(default=None, exclude=True)
 
     def __init__(self, **data):
         super().__init__(**data)
@@ -87,3 +90,32 @@ class FilterResponseModel(CamelModel):
     def number_of_filtered_records(self) -> int:
         """calculated property for number of filtered records"""
         return len(self.result)
+
+
+class BackendStatusModel(CamelModel):
+    """
+    Outcome of one backend of a federated filter request
+    """
+
+    backend: str
+    status: str
+    latency_ms: float
+    number_of_filtered_records: int = 0
+    dataset_version: Optional[str] = None
+    error: Optional[str] = None
+
+
+class FederatedFilterResponseModel(FilterResponseModel):
+    """
+    Federated Filter Response, the records of all the backends merged by id
+    """
+
+    backends: List[BackendStatusModel]
+
+    @computed_field
+    @property
+    def partial(self) -> bool:
+        """calculated property telling if some backend did not answer"""
+        return any(
+            backend.status != BACKEND_STATUS_SUCCESS for backend in self.backends
+        )
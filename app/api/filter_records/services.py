@@ -1,44 +1,691 @@
-from app.api.filter_records.models import FilterRequestModel, FilterResponseModel
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import Future, wait
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Response
+
+from app.api.filter_records.models import (
+    BackendStatusModel,
+    FederatedFilterResponseModel,
+    FilterRequestModel,
+    FilterResponseModel,
+    RecordModel,
+)
 from app.core.config import settings
-from app.core.constants import MONGO_DB_COLLECTION, MONGO_DB_NAME, SQL_DB_NAME
-from app.workers.filter_records.filter_from_json import FilterRecordFromJSON
-from app.workers.filter_records.filter_from_mongo import FilterRecordFromMongo
-from app.workers.filter_records.filter_from_mysql import FilterRecordFromSQL
+from app.core.constants import (
+    BACKEND_STATUS_ERROR,
+    BACKEND_STATUS_SUCCESS,
+    BACKEND_STATUS_TIMEOUT,
+    CIRCUIT_STATE_CLOSED,
+    DATASET_VERSION_HEADER,
+    DATASET_VERSION_LIVE,
+    FEDERATED_BACKENDS,
+    FILTER_BACKEND_DATASET_FILES,
+    HEDGE_DEFAULT_DELAY_SECONDS,
+    HEDGE_LATENCY_QUANTILE,
+    HEDGE_MAX_DELAY_SECONDS,
+    HEDGE_MIN_OBSERVATIONS,
+    MICRO_BATCH_MAX_SIZE,
+    MONGO_DB_COLLECTION,
+    MONGO_DB_NAME,
+    RECORD_PARQUET_FILE_NAME,
+    RECORD_SQLITE_FILE_NAME,
+    RECORD_STORAGE_DIR,
+    SQL_DB_NAME,
+)
+from app.custom_exceptions.backend_registry_exceptions import BackendNotEnabledError
+from app.custom_exceptions.bulkhead_exceptions import BackendOverloadedError
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.custom_exceptions.filter_from_mongo_exception import (
+    MongoDBConnectionError,
+    MongoDBOperationError,
+)
+from app.custom_exceptions.filter_from_sql_exception import (
+    SQLConnectionError,
+    SQLOperationError,
+)
+from app.utils.bulkhead_helper import Bulkhead
+from app.utils.circuit_breaker_helper import CircuitBreaker
+from app.utils.deadline_helper import (
+    check_deadline,
+    remaining_ms,
+    remaining_seconds,
+)
+from app.utils.health_monitor_helper import HealthMonitor
+from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import (
+    FEDERATED_BACKEND_OUTCOMES,
+    FILTER_COALESCING_RATIO,
+    FILTER_HEDGED_REQUESTS,
+    FILTER_MICRO_BATCH_SIZE,
+    FILTER_REQUEST_DURATION,
+    FILTER_SINGLE_FLIGHT_REQUESTS,
+    current_stage_timings_ctx,
+    filter_request_timer,
+    stage_timer,
+)
+from app.utils.micro_batch_helper import MicroBatcher
+from app.utils.single_flight_helper import SingleFlight
+from app.workers.filter_records.registry import enabled_backends, get_worker_class
+
+# identical filter requests in flight, executed once
+filter_single_flight = SingleFlight()
+
+# cleared by the work that has to run on its own thread, like the warm-up
+# opening the connection of every thread of a backend
+micro_batching_ctx = contextvars.ContextVar("micro_batching", default=True)
+
+
+def micro_batched(backend: str) -> bool:
+    """
+    Whether the requests of the backend are run in micro batches
+    """
+    return backend in settings.micro_batch_backends and micro_batching_ctx.get()
 
 
 def filter_record_from_json(request: FilterRequestModel) -> FilterResponseModel:
     """
     Filter records from JSON
     """
-    filter_from_json_worker = FilterRecordFromJSON(request)
-    return filter_from_json_worker.filter_records_from_json()
+    with filter_request_timer("json"):
+        if micro_batched("json"):
+            return micro_batchers["json"].submit(request)
+        filter_from_json_worker = get_worker_class("json")(request)
+        return filter_from_json_worker.filter_records_from_json()
 
 
 def filter_record_from_mongo(request: FilterRequestModel) -> FilterResponseModel:
     """
     Filter records from MongoDB
     """
+    with circuit_breakers["mongodb"].guard(), filter_request_timer("mongodb"):
+        if micro_batched("mongodb"):
+            return micro_batchers["mongodb"].submit(request)
+        filter_from_mongo_worker = get_worker_class("mongodb")(
+            mongo_host=settings.MONGO_DB_HOST,
+            mongo_port=settings.MONGO_DB_PORT,
+            mongo_db_name=MONGO_DB_NAME,
+            mongo_collection_name=MONGO_DB_COLLECTION,
+            request=request,
+            max_time_ms=remaining_ms(),
+            server_selection_timeout_ms=settings.MONGO_DB_SERVER_SELECTION_TIMEOUT_MS,
+        )
+        return filter_from_mongo_worker.filter_records_from_mongo()
+
+
+def filter_record_from_sql(request: FilterRequestModel) -> FilterResponseModel:
+    """
+    Filter records from MySQL
+    """
+    with circuit_breakers["sql"].guard(), filter_request_timer("sql"):
+        if micro_batched("sql"):
+            return micro_batchers["sql"].submit(request)
+        filter_from_sql_worker = get_worker_class("sql")(
+            mysql_host=settings.SQL_DB_HOST,
+            mysql_user=settings.SQL_DB_USERNAME,
+            mysql_password=settings.SQL_DB_PASSWORD,
+            mysql_db_name=SQL_DB_NAME,
+            request=request,
+            use_union=settings.SQL_USE_UNION_REWRITE,
+            max_execution_ms=remaining_ms(),
+            connection_timeout=settings.SQL_DB_CONNECT_TIMEOUT_SECONDS,
+        )
+        return filter_from_sql_worker.filter_records_from_sql()
+
+
+def filter_record_from_sqlite(request: FilterRequestModel) -> FilterResponseModel:
+    """
+    Filter records from SQLite
+    """
+    with filter_request_timer("sqlite"):
+        filter_from_sqlite_worker = get_worker_class("sqlite")(
+            sqlite_path=f"{RECORD_STORAGE_DIR}/{RECORD_SQLITE_FILE_NAME}",
+            request=request,
+        )
+        return filter_from_sqlite_worker.filter_records_from_sqlite()
 
-    filter_from_mongo_worker = FilterRecordFromMongo(
+
+def filter_record_from_parquet(request: FilterRequestModel) -> FilterResponseModel:
+    """
+    Filter records from Parquet
+    """
+    with filter_request_timer("parquet"):
+        filter_from_parquet_worker = get_worker_class("parquet")(
+            parquet_path=f"{RECORD_STORAGE_DIR}/{RECORD_PARQUET_FILE_NAME}",
+            request=request,
+        )
+        return filter_from_parquet_worker.filter_records_from_parquet()
+
+
+def run_json_batch(requests: List[FilterRequestModel]) -> List[FilterResponseModel]:
+    """
+    Filter records from JSON for a batch of requests
+    """
+    filter_from_json_worker = get_worker_class("json")(requests[0])
+    return filter_from_json_worker.filter_records_batch_from_json(requests)
+
+
+def run_mongo_batch(requests: List[FilterRequestModel]) -> List[FilterResponseModel]:
+    """
+    Filter records from MongoDB for a batch of requests
+    """
+    filter_from_mongo_worker = get_worker_class("mongodb")(
         mongo_host=settings.MONGO_DB_HOST,
         mongo_port=settings.MONGO_DB_PORT,
         mongo_db_name=MONGO_DB_NAME,
         mongo_collection_name=MONGO_DB_COLLECTION,
-        request=request,
+        request=requests[0],
+        max_time_ms=remaining_ms(),
+        server_selection_timeout_ms=settings.MONGO_DB_SERVER_SELECTION_TIMEOUT_MS,
     )
-    return filter_from_mongo_worker.filter_records_from_mongo()
+    return filter_from_mongo_worker.filter_records_batch_from_mongo(requests)
 
 
-def filter_record_from_sql(request: FilterRequestModel) -> FilterResponseModel:
+def run_sql_batch(requests: List[FilterRequestModel]) -> List[FilterResponseModel]:
     """
-    Filter records from MySQL
+    Filter records from MySQL for a batch of requests
+    """
+    filter_from_sql_worker = get_worker_class("sql")(
+        mysql_host=settings.SQL_DB_HOST,
+        mysql_user=settings.SQL_DB_USERNAME,
+        mysql_password=settings.SQL_DB_PASSWORD,
+        mysql_db_name=SQL_DB_NAME,
+        request=requests[0],
+        use_union=settings.SQL_USE_UNION_REWRITE,
+        max_execution_ms=remaining_ms(),
+        connection_timeout=settings.SQL_DB_CONNECT_TIMEOUT_SECONDS,
+    )
+    return filter_from_sql_worker.filter_records_batch_from_sql(requests)
+
+
+# concurrent requests of the backends listed in MICRO_BATCH_BACKENDS are
+# collected for the window and run as one query, within the latest deadline of
+# the requests of the batch rather than the deadline of the one opening it
+micro_batchers = {
+    backend: MicroBatcher(
+        run_batch,
+        window_seconds=settings.MICRO_BATCH_WINDOW_MS / 1000,
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        on_batch=partial(FILTER_MICRO_BATCH_SIZE.observe, backend=backend),
+    )
+    for backend, run_batch in (
+        ("json", run_json_batch),
+        ("mongodb", run_mongo_batch),
+        ("sql", run_sql_batch),
+    )
+}
+
+FILTER_SERVICES = {
+    "json": filter_record_from_json,
+    "mongodb": filter_record_from_mongo,
+    "sql": filter_record_from_sql,
+    "sqlite": filter_record_from_sqlite,
+    "parquet": filter_record_from_parquet,
+}
+
+# dedicated thread pool of every backend, and of the federated filter; a
+# federated backend missing the deadline keeps its thread until it returns,
+# its result is then dropped
+bulkheads = {
+    backend: Bulkhead(
+        backend,
+        *settings.bulkhead_limits(backend),
+        retry_after=settings.BULKHEAD_RETRY_AFTER_SECONDS,
+    )
+    for backend in [*FILTER_SERVICES, "federated"]
+}
+
+
+def probe_mongo() -> None:
+    """
+    Health probe of MongoDB
     """
+    get_worker_class("mongodb").ping(
+        mongo_host=settings.MONGO_DB_HOST,
+        mongo_port=settings.MONGO_DB_PORT,
+        server_selection_timeout_ms=settings.MONGO_DB_SERVER_SELECTION_TIMEOUT_MS,
+    )
 
-    filter_from_sql_worker = FilterRecordFromSQL(
+
+def probe_sql() -> None:
+    """
+    Health probe of MySQL
+    """
+    get_worker_class("sql").ping(
         mysql_host=settings.SQL_DB_HOST,
         mysql_user=settings.SQL_DB_USERNAME,
         mysql_password=settings.SQL_DB_PASSWORD,
         mysql_db_name=SQL_DB_NAME,
-        request=request,
+        connection_timeout=settings.SQL_DB_CONNECT_TIMEOUT_SECONDS,
+    )
+
+
+# circuit breaker of the database backends, counting only the errors of the
+# database itself, so a request running out of time never opens the circuit
+circuit_breakers = {
+    backend: CircuitBreaker(
+        backend,
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS,
+        failure_exceptions=failure_exceptions,
+    )
+    for backend, failure_exceptions in (
+        ("mongodb", (MongoDBConnectionError, MongoDBOperationError)),
+        ("sql", (SQLConnectionError, SQLOperationError)),
+    )
+}
+# probes of the enabled database backends, run in the background while the
+# app is up
+health_monitor = HealthMonitor(
+    probes={
+        backend: probe
+        for backend, probe in (("mongodb", probe_mongo), ("sql", probe_sql))
+        if backend in enabled_backends()
+    },
+    breakers=circuit_breakers,
+    interval=settings.HEALTH_PROBE_INTERVAL_SECONDS,
+)
+
+
+def backend_circuit_states() -> Dict[str, str]:
+    """
+    Circuit state of every enabled backend, the backends without a circuit
+    breaker always closed
+    """
+    return {
+        backend: (
+            circuit_breakers[backend].state
+            if backend in circuit_breakers
+            else CIRCUIT_STATE_CLOSED
+        )
+        for backend in enabled_backends()
+    }
+
+
+async def run_in_bulkhead(backend: str, call: Callable, *args):
+    """
+    Run the call on the thread pool of the backend, raising a
+    BackendOverloadedError right away when the backend is at its limits
+    """
+    return await asyncio.wrap_future(bulkheads[backend].submit(call, *args))
+
+
+def run_filter_service(
+    filter_service: Callable[[FilterRequestModel], FilterResponseModel],
+    request: FilterRequestModel,
+) -> Tuple[Optional[FilterResponseModel], Optional[Exception], dict, float]:
+    """
+    Filter records from one backend of a federated or hedged request, returning
+    the error instead of raising it. The backend keeps its own stage timings, so
+    one answering after the request is over never touches the ones of the
+    request.
+    """
+    # pylint: disable=broad-exception-caught
+    stage_timings = {}
+    current_stage_timings_ctx.set(stage_timings)
+    started_at = time.perf_counter()
+    try:
+        response, error = filter_service(request), None
+    except Exception as exc:
+        response, error = None, exc
+    return response, error, stage_timings, time.perf_counter() - started_at
+
+
+def submit_federated_backend(backend: str, request: FilterRequestModel) -> Future:
+    """
+    Filter records from one backend of a federated request on the thread pool of
+    the backend, in a copy of the request context keeping its request id in the
+    logs. A backend at its limits is reported failed right away.
+    """
+    try:
+        return bulkheads[backend].submit(
+            run_filter_service, FILTER_SERVICES[backend], request
+        )
+    except BackendOverloadedError as exc:
+        future = Future()
+        future.set_result((None, exc, {}, 0.0))
+        return future
+
+
+def federated_backend_status(
+    backend: str, future: Future, timeout: float, request_stage_timings: dict
+) -> Tuple[BackendStatusModel, List[RecordModel]]:
+    """
+    Status and records of one backend of a federated request once the deadline
+    is over, adding the stage timings of the backends that answered to the ones
+    of the request
+    """
+    if not future.done():
+        future.cancel()
+        app_logger.warning(
+            "Federated filter backend %s missed the %ss deadline", backend, timeout
+        )
+        return (
+            BackendStatusModel(
+                backend=backend,
+                status=BACKEND_STATUS_TIMEOUT,
+                latencyMs=round(timeout * 1000, 3),
+                error=f"No answer within {timeout}s",
+            ),
+            [],
+        )
+
+    response, error, stage_timings, duration = future.result()
+    if error is not None:
+        app_logger.error("Federated filter backend %s failed: %s", backend, error)
+        return (
+            BackendStatusModel(
+                backend=backend,
+                status=BACKEND_STATUS_ERROR,
+                latencyMs=round(duration * 1000, 3),
+                error=getattr(error, "message", str(error)),
+            ),
+            [],
+        )
+
+    if request_stage_timings is not None:
+        request_stage_timings.update(stage_timings)
+    return (
+        BackendStatusModel(
+            backend=backend,
+            status=BACKEND_STATUS_SUCCESS,
+            latencyMs=round(duration * 1000, 3),
+            numberOfFilteredRecords=response.number_of_filtered_records,
+            datasetVersion=dataset_version(response, backend),
+        ),
+        response.result,
+    )
+
+
+def filter_record_from_all(
+    request: FilterRequestModel,
+    backends: Optional[List[str]] = None,
+    timeout: Optional[float] = None,
+) -> FederatedFilterResponseModel:
+    """
+    Filter records from all the federated backends at the same time, within a
+    shared deadline, and merge their records by id. The backends failing or
+    missing the deadline are reported and left out of the merge.
+    """
+    with filter_request_timer("federated"):
+        backends = [
+            backend
+            for backend in (backends or FEDERATED_BACKENDS)
+            if backend in enabled_backends()
+        ]
+        if not backends:
+            raise BackendNotEnabledError(
+                message="No federated filter backend is enabled on this host"
+            )
+        timeout = settings.FEDERATED_TIMEOUT_SECONDS if timeout is None else timeout
+        # the backends are given up on at the deadline of the request at the latest
+        request_remaining = remaining_seconds()
+        if request_remaining is not None:
+            timeout = min(timeout, request_remaining)
+
+        futures = {
+            backend: submit_federated_backend(backend, request) for backend in backends
+        }
+        wait(futures.values(), timeout=timeout)
+
+        request_stage_timings = current_stage_timings_ctx.get()
+        records = []
+        backend_statuses = []
+        for backend, future in futures.items():
+            backend_status, backend_records = federated_backend_status(
+                backend, future, timeout, request_stage_timings
+            )
+            FEDERATED_BACKEND_OUTCOMES.inc(
+                backend=backend, status=backend_status.status
+            )
+            backend_statuses.append(backend_status)
+            records.extend(backend_records)
+
+        with stage_timer("federated", "merge"):
+            return FederatedFilterResponseModel(
+                result=records,
+                backends=backend_statuses,
+                datasetVersion=",".join(
+                    backend_status.dataset_version
+                    for backend_status in backend_statuses
+                    if backend_status.dataset_version
+                ),
+            )
+
+
+def dataset_version(response: FilterResponseModel, backend: str) -> str:
+    """
+    Dataset version of a response, the live records of the backend when the
+    backend does not version its records
+    """
+    return response.dataset_version or f"{backend}@{DATASET_VERSION_LIVE}"
+
+
+def hedge_delay(backend: str) -> float:
+    """
+    Time to wait for the backend before hedging the request: the observed
+    latency quantile of the backend once it has enough observations
+    """
+    observed = FILTER_REQUEST_DURATION.quantile(HEDGE_LATENCY_QUANTILE, backend=backend)
+    if observed is None or observed[1] < HEDGE_MIN_OBSERVATIONS:
+        return HEDGE_DEFAULT_DELAY_SECONDS
+    return min(observed[0], HEDGE_MAX_DELAY_SECONDS)
+
+
+def hedge_backend_of(backend: str) -> Optional[str]:
+    """
+    Secondary backend the requests of the backend are hedged to, None when the
+    backend is not hedged on this host
+    """
+    hedge_backend = settings.hedge_policy.get(backend)
+    if hedge_backend in (None, backend) or hedge_backend not in enabled_backends():
+        return None
+    return hedge_backend
+
+
+def render_filter_response(response: FilterResponseModel, backend: str) -> Response:
+    """
+    Serialize the filter response with its aliases, the way FastAPI renders the
+    response model, once and in pydantic-core, timed as the serialization stage
+    """
+    with stage_timer(backend, "serialization"):
+        return Response(
+            content=response.model_dump_json(by_alias=True),
+            media_type="application/json",
+            headers={DATASET_VERSION_HEADER: dataset_version(response, backend)},
+        )
+
+
+def dataset_generation(backend: str) -> str:
+    """
+    Generation of the records the backend serves right now: the published file
+    of the backends serving one, the live records of the databases
+    """
+    dataset_file = FILTER_BACKEND_DATASET_FILES.get(backend)
+    if dataset_file is None:
+        return DATASET_VERSION_LIVE
+
+    try:
+        file_stat = os.stat(f"{RECORD_STORAGE_DIR}/{dataset_file}")
+    except FileNotFoundError:
+        return "missing"
+    return f"{file_stat.st_ino}:{file_stat.st_mtime_ns}"
+
+
+def filter_request_key(request: FilterRequestModel) -> tuple:
+    """
+    Normalized filter request, the same whichever names and order its fields
+    were sent with
+    """
+    return tuple(sorted(request.model_dump().items()))
+
+
+def filter_record_response(
+    backend: str,
+    filter_service: Callable[[FilterRequestModel], FilterResponseModel],
+    request: FilterRequestModel,
+) -> Response:
+    """
+    Serialized filter response of the backend. Identical requests arriving while
+    one is in flight on the same generation of the records wait for it and
+    share its serialized response instead of querying the backend again.
+    """
+    executed = []
+
+    def filter_and_render() -> Response:
+        executed.append(True)
+        return render_filter_response(filter_service(request), backend)
+
+    key = (backend, dataset_generation(backend), filter_request_key(request))
+    try:
+        response, shared = filter_single_flight.do(key, filter_and_render)
+    except DeadlineExceededError:
+        # the request shared ran out of its own time or lost its client; this
+        # one runs on its own when it has time left
+        if executed:
+            raise
+        check_deadline()
+        response, shared = filter_and_render(), False
+
+    FILTER_SINGLE_FLIGHT_REQUESTS.inc(
+        backend=backend, role="follower" if shared else "leader"
+    )
+    single_flight_requests = FILTER_SINGLE_FLIGHT_REQUESTS.snapshot()
+    leaders = single_flight_requests.get((backend, "leader"), 0)
+    followers = single_flight_requests.get((backend, "follower"), 0)
+    FILTER_COALESCING_RATIO.set(followers / (leaders + followers), backend=backend)
+
+    if not shared:
+        return response
+    return Response(
+        content=response.body,
+        media_type=response.media_type,
+        headers={DATASET_VERSION_HEADER: response.headers[DATASET_VERSION_HEADER]},
+    )
+
+
+def filter_record_attempt(
+    backend: str,
+    filter_service: Callable[[FilterRequestModel], FilterResponseModel],
+    request: FilterRequestModel,
+) -> Tuple[Response, dict]:
+    """
+    Serialized filter response of one backend of a hedged request, along with
+    its own stage timings, so the backend answering last never touches the ones
+    of the request
+    """
+    stage_timings = {}
+    current_stage_timings_ctx.set(stage_timings)
+    return filter_record_response(backend, filter_service, request), stage_timings
+
+
+def submit_hedge(
+    backend: str, hedge_backend: str, request: FilterRequestModel
+) -> Optional[asyncio.Future]:
+    """
+    Send a request of the backend to its secondary backend, on the thread pool
+    of the secondary; None when the secondary is at its limits
+    """
+    app_logger.info(
+        "Hedging the filter request of backend %s to backend %s",
+        backend,
+        hedge_backend,
+    )
+    try:
+        hedge = bulkheads[hedge_backend].submit(
+            filter_record_attempt,
+            hedge_backend,
+            FILTER_SERVICES[hedge_backend],
+            request,
+        )
+    except BackendOverloadedError:
+        app_logger.warning(
+            "Filter request of backend %s not hedged, backend %s is at its limits",
+            backend,
+            hedge_backend,
+        )
+        return None
+    return asyncio.wrap_future(hedge)
+
+
+async def first_answer(attempts: Dict[asyncio.Future, str]) -> Tuple[str, tuple]:
+    """
+    Backend and answer of the first attempt answering, the others cancelled
+    while still queued; the error of the first backend is raised when none
+    answers
+    """
+    first_backend = next(iter(attempts.values()))
+    errors = {}
+    while attempts:
+        done, _ = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+        answers = []
+        for attempt in done:
+            backend = attempts.pop(attempt)
+            if attempt.exception() is not None:
+                errors[backend] = attempt.exception()
+            else:
+                answers.append((backend, attempt.result()))
+        if answers:
+            for attempt in attempts:
+                attempt.cancel()
+            return answers[0]
+
+    raise errors[first_backend]
+
+
+async def run_filter_record(
+    backend: str,
+    filter_service: Callable[[FilterRequestModel], FilterResponseModel],
+    request: FilterRequestModel,
+) -> Response:
+    """
+    Serialized filter response of the backend, run on the thread pool of the
+    backend. A request of a hedged backend is also sent to its secondary backend
+    of the hedge policy, on the thread pool of the secondary, when the backend
+    runs past its usual latency or fails before; a secondary at its limits is
+    not hedged to. The first complete answer wins and the other is cancelled
+    while still queued; the error of the backend is raised only when neither
+    answers.
+    """
+    hedge_backend = hedge_backend_of(backend)
+    if hedge_backend is None:
+        return await run_in_bulkhead(
+            backend, filter_record_response, backend, filter_service, request
+        )
+
+    request_stage_timings = current_stage_timings_ctx.get()
+    primary = asyncio.ensure_future(
+        run_in_bulkhead(
+            backend, filter_record_attempt, backend, filter_service, request
+        )
     )
-    return filter_from_sql_worker.filter_records_from_sql()
+    attempts = {primary: backend}
+    await asyncio.wait([primary], timeout=hedge_delay(backend))
+    if not primary.done() or primary.exception() is not None:
+        hedge = submit_hedge(backend, hedge_backend, request)
+        if hedge is not None:
+            attempts[hedge] = hedge_backend
+
+    hedged = len(attempts) > 1
+    try:
+        served_by, (response, stage_timings) = await first_answer(attempts)
+    except Exception:
+        if hedged:
+            FILTER_HEDGED_REQUESTS.inc(
+                backend=backend, hedge_backend=hedge_backend, winner="none"
+            )
+        raise
+
+    if request_stage_timings is not None:
+        request_stage_timings.update(stage_timings)
+    if hedged:
+        FILTER_HEDGED_REQUESTS.inc(
+            backend=backend,
+            hedge_backend=hedge_backend,
+            winner="hedge" if served_by == hedge_backend else "primary",
+        )
+    return response
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.api.filter_records.services import backend_circuit_states
+from app.api.health.services import warm_up_done
+from app.core.constants import CIRCUIT_STATE_OPEN
+
+health_router = APIRouter()
+
+
+@health_router.get(
+    path="/ready",
+    status_code=status.HTTP_200_OK,
+    description="Readiness of the app, with the circuit state of every backend",
+    responses={503: {"description": "Warming up, or no backend is available"}},
+)
+def ready() -> JSONResponse:
+    """Controller of the readiness probe"""
+    backends = backend_circuit_states()
+    is_warm = warm_up_done.is_set()
+    is_ready = is_warm and any(
+        state != CIRCUIT_STATE_OPEN for state in backends.values()
+    )
+    return JSONResponse(
+        status_code=(
+            status.HTTP_200_OK if is_ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+        content={"ready": is_ready, "warm": is_warm, "backends": backends},
+    )
@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from app.api.filter_records.models import (
+    BackendStatusModel,
+    FederatedFilterResponseModel,
+    FilterRequestModel,
+    FilterResponseModel,
+    RecordModel,
+)
+from app.api.filter_records.services import (
+    FILTER_SERVICES,
+    bulkheads,
+    filter_record_response,
+    micro_batching_ctx,
+)
+from app.core.config import settings
+from app.core.constants import (
+    BACKEND_STATUS_SUCCESS,
+    FILTER_ENDPOINT_BACKENDS,
+    WARM_UP_DATE_RANGE,
+    WARM_UP_DEFAULT_ENDPOINT,
+)
+from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import APP_WARM_UP_DURATION
+from app.workers.filter_records.registry import enabled_backends
+
+# set once the app is warmed up, the app is not ready until then
+warm_up_done = threading.Event()
+
+
+def warm_up_models() -> None:
+    """
+    Validate and serialize a filter request and responses once, so the
+    validators and serializers are ready before the first request
+    """
+    request = FilterRequestModel(**{"dateRange": WARM_UP_DATE_RANGE})
+    record = RecordModel(
+        **{
+            "_id": 0,
+            "originationTime": 0,
+            "clusterId": "",
+            "userId": "",
+            "devices": {"phone": "", "voicemail": ""},
+        }
+    )
+    FilterResponseModel(result=[record]).model_dump_json(by_alias=True)
+    FederatedFilterResponseModel(
+        result=[record],
+        backends=[
+            BackendStatusModel(
+                backend="json",
+                status=BACKEND_STATUS_SUCCESS,
+                latencyMs=0,
+            )
+        ],
+    ).model_dump_json(by_alias=True)
+    request.model_dump()
+
+
+def submit_backend_warm_up(backend: str) -> List[Future]:
+    """
+    Run the warm-up filter on every thread of the backend, each held until all
+    have run so no thread runs two of them. The filters are not micro batched,
+    which would run them all on one thread. Each thread then has loaded the
+    published file or opened its connection.
+    """
+    bulkhead = bulkheads[backend]
+    barrier = threading.Barrier(
+        bulkhead.max_workers, timeout=settings.WARM_UP_TIMEOUT_SECONDS
+    )
+    request = FilterRequestModel(**{"dateRange": WARM_UP_DATE_RANGE})
+
+    def warm_up_thread() -> None:
+        micro_batching_ctx.set(False)
+        try:
+            FILTER_SERVICES[backend](request)
+        finally:
+            try:
+                barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+
+    return [bulkhead.submit(warm_up_thread) for _ in range(bulkhead.max_workers)]
+
+
+def load_warm_up_queries(queries_file: str) -> List[dict]:
+    """
+    Warm-up queries of the file, one JSON object per line: a request body of
+    the JSON endpoint, or an object with the "body" and the "endpoint"
+    """
+    queries = []
+    with open(queries_file, "r", encoding="UTF-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            query = json.loads(line)
+            if "body" not in query:
+                query = {"body": query}
+            queries.append(query)
+    return queries
+
+
+def replay_warm_up_queries(queries: List[dict]) -> int:
+    """
+    Run the warm-up queries of the enabled backends one after the other, the
+    way their endpoints do, returning the number that succeeded
+    """
+    # pylint: disable=broad-exception-caught
+    succeeded = 0
+    for query in queries:
+        endpoint = query.get("endpoint", WARM_UP_DEFAULT_ENDPOINT)
+        backend = FILTER_ENDPOINT_BACKENDS.get(endpoint)
+        if backend not in enabled_backends():
+            app_logger.warning("Skipping the warm-up query of %s", endpoint)
+            continue
+
+        try:
+            bulkheads[backend].submit(
+                filter_record_response,
+                backend,
+                FILTER_SERVICES[backend],
+                FilterRequestModel(**query["body"]),
+            ).result(timeout=settings.WARM_UP_TIMEOUT_SECONDS)
+            succeeded += 1
+        except Exception as exc:
+            app_logger.warning("Warm-up query of %s failed: %s", endpoint, exc)
+    return succeeded
+
+
+def warm_up() -> None:
+    """
+    Warm the app up: the models, every enabled backend on every one of its
+    threads at the same time, then the warm-up queries if any. The failures
+    are logged and the app is ready once done, a backend down being left to
+    its circuit breaker.
+    """
+    # pylint: disable=broad-exception-caught
+    started_at = time.perf_counter()
+    app_logger.info("Warming up the app")
+    try:
+        warm_up_models()
+
+        futures = {
+            backend: submit_backend_warm_up(backend) for backend in enabled_backends()
+        }
+        for backend, backend_futures in futures.items():
+            for future in backend_futures:
+                error = future.exception()
+                if error is not None:
+                    app_logger.warning("Warm-up of %s failed: %s", backend, error)
+                    break
+
+        if settings.WARM_UP_QUERIES_FILE:
+            queries = load_warm_up_queries(settings.WARM_UP_QUERIES_FILE)
+            app_logger.info(
+                "Replayed %d of %d warm-up queries",
+                replay_warm_up_queries(queries),
+                len(queries),
+            )
+    except Exception as exc:
+        app_logger.error("Warm-up of the app failed: %s", exc)
+    finally:
+        duration = time.perf_counter() - started_at
+        APP_WARM_UP_DURATION.set(duration)
+        app_logger.info("App warmed up in %.3fs", duration)
+        warm_up_done.set()
+
+
+def start_warm_up() -> None:
+    """
+    Warm the app up in the background, so /ready answers while it runs
+    """
+    if not settings.WARM_UP_ENABLED:
+        warm_up_done.set()
+        return
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
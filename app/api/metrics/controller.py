@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response, status
+
+from app.core.constants import METRICS_CONTENT_TYPE
+from app.utils.metrics_helper import metrics_registry
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get(
+    path="/metrics",
+    status_code=status.HTTP_200_OK,
+    description="Application metrics in the Prometheus text format",
+    include_in_schema=False,
+)
+def metrics() -> Response:
+    """Controller of the Prometheus metrics"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
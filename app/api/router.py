@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
 from app.api.filter_records.controller import record_filter_router
+from app.api.health.controller import health_router
+from app.api.metrics.controller import metrics_router
 
 api_router = APIRouter()
 
@@ -9,3 +11,6 @@ api_router.include_router(
     prefix="/filterRecords",
     tags=["Record Filter"],
 )
+
+api_router.include_router(metrics_router, tags=["Metrics"])
+api_router.include_router(health_router, tags=["Health"])
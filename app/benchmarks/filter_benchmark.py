@@ -0,0 +1,312 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import mysql.connector
+from pymongo import MongoClient
+
+from app.api.filter_records.models import FilterRequestModel
+from app.api.filter_records.services import (
+    filter_record_from_json,
+    filter_record_from_mongo,
+    filter_record_from_parquet,
+    filter_record_from_sql,
+    filter_record_from_sqlite,
+)
+from app.core.config import settings
+from app.core.constants import (
+    BENCHMARK_BACKEND_TIMEOUT_MS,
+    BENCHMARK_BASELINE_FILE,
+    BENCHMARK_REPEATS,
+    BENCHMARK_SCALES,
+    BENCHMARK_SEED,
+    BENCHMARK_TOLERANCE,
+    SQL_DB_NAME,
+)
+from app.utils.logger_helper import app_logger
+from app.utils.record_generation_engine import (
+    SkewProfile,
+    iter_generated_record_chunks,
+)
+from app.utils.record_generator import (
+    store_record_to_mongo,
+    store_record_to_sql,
+    store_records_to_json,
+    store_records_to_parquet,
+    store_records_to_sqlite,
+)
+from app.utils.record_pipeline import run_record_pipeline
+
+FILTER_BACKENDS = {
+    "json": filter_record_from_json,
+    "mongodb": filter_record_from_mongo,
+    "sql": filter_record_from_sql,
+    "sqlite": filter_record_from_sqlite,
+    "parquet": filter_record_from_parquet,
+}
+
+BACKEND_SINKS = {
+    "json": store_records_to_json,
+    "mongodb": store_record_to_mongo,
+    "sql": store_record_to_sql,
+    "sqlite": store_records_to_sqlite,
+    "parquet": store_records_to_parquet,
+}
+
+
+def percentile(latencies: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of the latencies
+    """
+    ordered = sorted(latencies)
+    rank = max(int(-(-percent * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of the benchmark process so far, in MB
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def backend_available(backend: str) -> bool:
+    """
+    Check that the local server of a backend is reachable; JSON, SQLite and
+    Parquet need none
+    """
+    try:
+        if backend == "mongodb":
+            client = MongoClient(
+                settings.MONGO_DB_HOST,
+                settings.MONGO_DB_PORT,
+                serverSelectionTimeoutMS=BENCHMARK_BACKEND_TIMEOUT_MS,
+            )
+            try:
+                client.admin.command("ping")
+            finally:
+                client.close()
+        elif backend == "sql":
+            mysql.connector.connect(
+                host=settings.SQL_DB_HOST,
+                user=settings.SQL_DB_USERNAME,
+                password=settings.SQL_DB_PASSWORD,
+                database=SQL_DB_NAME,
+                connection_timeout=BENCHMARK_BACKEND_TIMEOUT_MS // 1000,
+            ).close()
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        app_logger.warning("Benchmark backend %s is not available: %s", backend, exc)
+        return False
+    return True
+
+
+def sample_record(number_of_records: int, seed: int) -> dict:
+    """
+    First record of the seeded dataset, the filter values are taken from it
+    """
+    return next(iter_generated_record_chunks(number_of_records, seed=seed))[0]
+
+
+def seed_dataset(
+    number_of_records: int, backends: List[str], seed: int, processes: int
+) -> None:
+    """
+    Generate the seeded dataset into the stores of the given backends
+    """
+    run_record_pipeline(
+        iter_generated_record_chunks(number_of_records, seed=seed, processes=processes),
+        {backend: BACKEND_SINKS[backend] for backend in backends},
+    )
+
+
+def build_filter_matrix(
+    record: dict, profile: SkewProfile = SkewProfile()
+) -> Dict[str, FilterRequestModel]:
+    """
+    The fixed set of filter shapes run against every backend, built around a
+    record of the dataset so every shape matches at least one record
+    """
+    record_day = datetime.fromtimestamp(record["originationTime"]).date()
+    narrow = f"{record_day} to {record_day + timedelta(days=1)}"
+    wide = f"{profile.start_year}-01-01 to {profile.end_year}-12-31"
+    all_fields = {
+        "userId": record["userId"],
+        "cluster": record["clusterId"],
+        "phoneNumber": record["devices"]["phone"],
+        "voiceMail": record["devices"]["voicemail"],
+    }
+
+    shapes = {
+        "date_narrow": {"dateRange": narrow},
+        "date_wide": {"dateRange": wide},
+        "multi_field_or": {"dateRange": wide, **all_fields},
+        "multi_field_or_narrow": {"dateRange": narrow, **all_fields},
+    }
+    for field, value in all_fields.items():
+        shapes[f"field_{field}"] = {"dateRange": wide, field: value}
+
+    return {name: FilterRequestModel(**shape) for name, shape in shapes.items()}
+
+
+def measure_filter(
+    filter_function: Callable, request: FilterRequestModel, repeats: int
+) -> dict:
+    """
+    Run one filter shape repeatedly after a warm up call and summarise it
+    """
+    response = filter_function(request)
+
+    latencies = []
+    started_at = time.perf_counter()
+    for _ in range(repeats):
+        call_started_at = time.perf_counter()
+        response = filter_function(request)
+        latencies.append(time.perf_counter() - call_started_at)
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(repeats / elapsed, 3),
+        "rows": response.number_of_filtered_records,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_benchmarks(
+    scales: Dict[str, int],
+    backends: List[str],
+    repeats: int = BENCHMARK_REPEATS,
+    seed: int = BENCHMARK_SEED,
+    skip_seed: bool = False,
+    processes: int = 1,
+) -> dict:
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    """
+    Seed every scale and run the filter matrix against every available backend.
+    Results are keyed by "<scale>/<backend>/<shape>".
+    """
+    backends = [backend for backend in backends if backend_available(backend)]
+    results = {}
+
+    for scale, number_of_records in scales.items():
+        if not skip_seed:
+            app_logger.warning(
+                "Seeding %d records into %s for scale %s",
+                number_of_records,
+                backends,
+                scale,
+            )
+            seed_dataset(number_of_records, backends, seed, processes)
+
+        filter_matrix = build_filter_matrix(sample_record(number_of_records, seed))
+        for backend in backends:
+            for shape, request in filter_matrix.items():
+                key = f"{scale}/{backend}/{shape}"
+                results[key] = measure_filter(
+                    FILTER_BACKENDS[backend], request, repeats
+                )
+                app_logger.warning("Benchmark %s: %s", key, results[key])
+
+    return results
+
+
+def compare_to_baseline(
+    results: dict, baseline: dict, tolerance: float = BENCHMARK_TOLERANCE
+) -> List[str]:
+    """
+    List the benchmarks whose p95 latency or throughput regressed beyond the
+    tolerance compared to the baseline
+    """
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{key}: p95 {result['p95_ms']}ms > baseline {expected['p95_ms']}ms"
+            )
+        if result["throughput_rps"] < expected["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: throughput {result['throughput_rps']}/s < "
+                f"baseline {expected['throughput_rps']}/s"
+            )
+    return regressions
+
+
+def load_baseline(baseline_file: str) -> Optional[dict]:
+    """
+    Read the baseline results if there are any
+    """
+    if not os.path.exists(baseline_file):
+        return None
+    with open(baseline_file, "r", encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def main():
+    """Run the filter benchmarks and check them against the baseline"""
+    parser = argparse.ArgumentParser(
+        prog="Filter benchmark",
+        description="Benchmark every filter backend on seeded datasets",
+    )
+    parser.add_argument(
+        "--scales", nargs="+", choices=list(BENCHMARK_SCALES), default=["10k"]
+    )
+    parser.add_argument(
+        "--backends", nargs="+", choices=list(FILTER_BACKENDS), default=["json"]
+    )
+    parser.add_argument("--repeats", type=int, default=BENCHMARK_REPEATS)
+    parser.add_argument("--seed", type=int, default=BENCHMARK_SEED)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--skip_seed", action="store_true")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE_FILE)
+    parser.add_argument("--update_baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    # per request logs would dominate the timings, only the results are logged
+    app_logger.setLevel(logging.WARNING)
+
+    results = run_benchmarks(
+        {scale: BENCHMARK_SCALES[scale] for scale in args.scales},
+        args.backends,
+        repeats=args.repeats,
+        seed=args.seed,
+        skip_seed=args.skip_seed,
+        processes=args.processes,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="UTF-8") as file:
+            json.dump({**(baseline or {}), **results}, file, indent=2, sort_keys=True)
+        app_logger.warning("Baseline updated: %s", args.baseline)
+        return
+
+    if baseline is None:
+        app_logger.warning("No baseline found at %s to compare with", args.baseline)
+        return
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        app_logger.error("Benchmark regression: %s", regression)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
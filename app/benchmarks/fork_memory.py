@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import sys
+from typing import Dict
+
+from app.api.filter_records.models import FilterRequestModel
+from app.benchmarks.filter_benchmark import (
+    build_filter_matrix,
+    sample_record,
+    seed_dataset,
+)
+from app.core.constants import (
+    BENCHMARK_SEED,
+    FORK_MEMORY_RECORDS,
+    FORK_MEMORY_SHAPES,
+    FORK_MEMORY_SMAPS_FILE,
+)
+from app.utils.logger_helper import app_logger
+from app.utils.server_launcher import preload_datasets
+from app.workers.filter_records.filter_from_json import FilterRecordFromJSON
+
+
+def private_memory_kb() -> Dict[str, int]:
+    """
+    Unique set size (the private clean and dirty pages) and private dirty
+    pages of the current process, in kB
+    """
+    private = {"Private_Clean": 0, "Private_Dirty": 0}
+    with open(FORK_MEMORY_SMAPS_FILE, "r", encoding="UTF-8") as smaps_file:
+        for line in smaps_file:
+            field, _, value = line.partition(":")
+            if field in private:
+                private[field] += int(value.split()[0])
+    return {
+        "uss_kb": private["Private_Clean"] + private["Private_Dirty"],
+        "private_dirty_kb": private["Private_Dirty"],
+    }
+
+
+def measure_forked_worker(request: FilterRequestModel) -> dict:
+    """
+    Fork a worker from the current process, the way the production launcher
+    does, and measure its private memory before and after it filters the
+    records of the request from the preloaded JSON dataset
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        exit_code = 0
+        try:
+            os.close(read_fd)
+            before = private_memory_kb()
+            response = FilterRecordFromJSON(request).filter_records_from_json()
+            after = private_memory_kb()
+            measurement = {
+                "rows": response.number_of_filtered_records,
+                "uss_before_kb": before["uss_kb"],
+                "uss_after_kb": after["uss_kb"],
+                "private_dirty_before_kb": before["private_dirty_kb"],
+                "private_dirty_after_kb": after["private_dirty_kb"],
+            }
+            with os.fdopen(write_fd, "w", encoding="UTF-8") as result_file:
+                json.dump(measurement, result_file)
+        except BaseException as exc:  # pylint: disable=broad-exception-caught
+            app_logger.error("Forked worker %d failed: %s", os.getpid(), exc)
+            exit_code = 1
+        finally:
+            os._exit(exit_code)  # pylint: disable=protected-access
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "r", encoding="UTF-8") as result_file:
+        output = result_file.read()
+    _, wait_status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(wait_status) or not output:
+        raise RuntimeError("The forked worker failed to measure its memory")
+    return json.loads(output)
+
+
+def measure_fork_memory(requests: Dict[str, FilterRequestModel]) -> dict:
+    """
+    Preload the published JSON dataset the way the production launcher does,
+    then measure a freshly forked worker for every request. The growth of its
+    private dirty memory is what the request copied out of the shared pages,
+    along with what it allocated for its response.
+    """
+    preload_datasets()
+    dataset = FilterRecordFromJSON(next(iter(requests.values()))).load_json_dataset()
+    report = {
+        "records": len(dataset),
+        "dataset_kb": (
+            sum(column.nbytes for column in dataset.columns.values())
+            + dataset.file_rows.nbytes
+        )
+        // 1024,
+        "shapes": {},
+    }
+    for shape, request in requests.items():
+        measurement = measure_forked_worker(request)
+        measurement["private_dirty_growth_kb"] = (
+            measurement["private_dirty_after_kb"]
+            - measurement["private_dirty_before_kb"]
+        )
+        report["shapes"][shape] = measurement
+    return report
+
+
+def main():
+    """Measure the private memory of the forked workers running wide queries"""
+    parser = argparse.ArgumentParser(
+        prog="Fork memory benchmark",
+        description="Measure the USS and Private_Dirty of a forked worker "
+        "before and after wide queries on the preloaded JSON dataset",
+    )
+    parser.add_argument("--records", type=int, default=FORK_MEMORY_RECORDS)
+    parser.add_argument("--seed", type=int, default=BENCHMARK_SEED)
+    parser.add_argument("--skip_seed", action="store_true")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if not os.path.exists(FORK_MEMORY_SMAPS_FILE):
+        app_logger.error("%s is not available on this host", FORK_MEMORY_SMAPS_FILE)
+        sys.exit(1)
+
+    if not args.skip_seed:
+        seed_dataset(args.records, ["json"], args.seed, processes=1)
+    matrix = build_filter_matrix(sample_record(args.records, args.seed))
+    report = measure_fork_memory({shape: matrix[shape] for shape in FORK_MEMORY_SHAPES})
+
+    app_logger.warning("Fork memory: %s", json.dumps(report))
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
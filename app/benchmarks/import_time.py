@@ -0,0 +1,134 @@
+import argparse
+import os
+import subprocess  # nosec
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core.constants import (
+    FILTER_BACKEND_DRIVERS,
+    IMPORT_TIME_BUDGET_MS,
+    IMPORT_TIME_MODULE,
+    IMPORT_TIME_TOP,
+)
+from app.utils.logger_helper import app_logger
+
+
+class ImportTiming(NamedTuple):
+    """
+    Self and cumulative import time of a module, in microseconds
+    """
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_time(output: str) -> Dict[str, ImportTiming]:
+    """
+    Parse the `-X importtime` report, one line per imported module like
+    "import time:       376 |      70245 |   mysql.connector"
+    """
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        module = fields[2].strip()
+        timings[module] = ImportTiming(
+            module, int(fields[0].strip()), int(fields[1].strip())
+        )
+    return timings
+
+
+def measure_import_time(
+    module: str = IMPORT_TIME_MODULE, backends: Optional[List[str]] = None
+) -> Dict[str, ImportTiming]:
+    """
+    Import the module in a fresh interpreter with `-X importtime`, with only the
+    given backends enabled when they are given
+    """
+    env = dict(os.environ)
+    if backends is not None:
+        env["APP_BACKENDS"] = ",".join(backends)
+    result = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_import_time(result.stderr)
+
+
+def summarize_import_time(
+    timings: Dict[str, ImportTiming], module: str, top: int = IMPORT_TIME_TOP
+) -> dict:
+    """
+    Total import time of the module and the top level packages costing the most
+    """
+    packages = {}
+    for timing in timings.values():
+        package = timing.module.split(".")[0]
+        packages[package] = packages.get(package, 0) + timing.self_us
+
+    return {
+        "module": module,
+        "total_ms": round(timings[module].cumulative_us / 1000, 1),
+        "modules": len(timings),
+        "top_packages_ms": {
+            package: round(self_us / 1000, 1)
+            for package, self_us in sorted(
+                packages.items(), key=lambda item: item[1], reverse=True
+            )[:top]
+        },
+    }
+
+
+def check_import_time(
+    timings: Dict[str, ImportTiming],
+    module: str,
+    backends: List[str],
+    budget_ms: float = IMPORT_TIME_BUDGET_MS,
+) -> List[str]:
+    """
+    List the violations: the module taking longer than the budget to import,
+    or the driver of a backend that is not enabled being imported
+    """
+    violations = []
+    total_ms = timings[module].cumulative_us / 1000
+    if total_ms > budget_ms:
+        violations.append(f"{module} imports in {total_ms:.1f}ms > {budget_ms}ms")
+    for backend, driver in FILTER_BACKEND_DRIVERS.items():
+        if backend not in backends and driver in timings:
+            violations.append(f"{driver} is imported but {backend} is not enabled")
+    return violations
+
+
+def main():
+    """Measure the import time of the API and check it against the budget"""
+    parser = argparse.ArgumentParser(
+        prog="Import time check",
+        description="Check the cold import time of the API with -X importtime",
+    )
+    parser.add_argument("--module", default=IMPORT_TIME_MODULE)
+    parser.add_argument("--backends", nargs="+", default=["json"])
+    parser.add_argument("--budget_ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=IMPORT_TIME_TOP)
+    args = parser.parse_args()
+
+    timings = measure_import_time(args.module, args.backends)
+    app_logger.warning(
+        "Import time: %s", summarize_import_time(timings, args.module, args.top)
+    )
+
+    violations = check_import_time(timings, args.module, args.backends, args.budget_ms)
+    for violation in violations:
+        app_logger.error("Import time check failed: %s", violation)
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.benchmarks.filter_benchmark import (
+    build_filter_matrix,
+    percentile,
+    sample_record,
+)
+from app.core.config import settings
+from app.core.constants import (
+    BENCHMARK_SCALES,
+    BENCHMARK_SEED,
+    LOAD_TEST_BASE_URL,
+    LOAD_TEST_CONCURRENCY,
+    LOAD_TEST_LATENCY_BUCKETS_MS,
+    LOAD_TEST_MAX_IN_FLIGHT,
+    LOAD_TEST_MIX,
+    LOAD_TEST_REQUESTS,
+    LOAD_TEST_TIMEOUT_SECONDS,
+)
+from app.utils.logger_helper import app_logger
+
+
+class EndpointStats:
+    """
+    Latencies and outcomes of the requests sent to one endpoint
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.status_codes = {}
+
+    def record(self, latency: float, status_code: Optional[int]) -> None:
+        """
+        Record one response, or a failed request without a status code
+        """
+        self.latencies.append(latency)
+        self.status_codes[str(status_code)] = (
+            self.status_codes.get(str(status_code), 0) + 1
+        )
+        if status_code is None or status_code >= 400:
+            self.errors += 1
+
+    def report(self, elapsed: float) -> dict:
+        """
+        Throughput, error rate, percentiles and latency histogram of the endpoint
+        """
+        histogram = [0] * (len(LOAD_TEST_LATENCY_BUCKETS_MS) + 1)
+        for latency in self.latencies:
+            histogram[bisect_left(LOAD_TEST_LATENCY_BUCKETS_MS, latency * 1000)] += 1
+
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "error_rate": round(self.errors / len(self.latencies), 4),
+            "throughput_rps": round(len(self.latencies) / elapsed, 3),
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 3),
+            "p90_ms": round(percentile(self.latencies, 90) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+            "max_ms": round(max(self.latencies) * 1000, 3),
+            "status_codes": self.status_codes,
+            "histogram_ms": {
+                f"<={bucket}": count
+                for bucket, count in zip(LOAD_TEST_LATENCY_BUCKETS_MS, histogram)
+            }
+            | {f">{LOAD_TEST_LATENCY_BUCKETS_MS[-1]}": histogram[-1]},
+        }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Parse a request mix like "fromJson=0.6,fromSQL=0.4" into endpoint weights
+    """
+    weights = {}
+    for part in mix.split(","):
+        endpoint, _, weight = part.partition("=")
+        weights[endpoint.strip()] = float(weight or 1)
+    return weights
+
+
+def endpoint_path(endpoint: str) -> str:
+    """
+    URL path of a filter endpoint
+    """
+    return f"{settings.API_STR}/filterRecords/{endpoint}"
+
+
+def load_replay_log(replay_file: str) -> List[dict]:
+    """
+    Read a captured request log, one JSON object per line.
+    A line is either a FilterRequestModel body, or an object with the "body"
+    and optionally the "endpoint" and the "at" offset in seconds of the request.
+    """
+    entries = []
+    with open(replay_file, "r", encoding="UTF-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "body" not in entry:
+                entry = {"body": entry}
+            entries.append(entry)
+    return entries
+
+
+def build_request_plan(
+    bodies: List[dict],
+    mix: Dict[str, float],
+    number_of_requests: int,
+    rate: Optional[float] = None,
+    seed: int = BENCHMARK_SEED,
+    replay: Optional[List[dict]] = None,
+) -> List[dict]:
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    """
+    The requests of a run: endpoint, body and, for open loop runs, the arrival
+    offset in seconds. Replayed entries keep their own endpoint and offset;
+    otherwise the endpoints follow the mix and the arrivals are Poisson at the
+    given rate. The plan only depends on the seed.
+    """
+    rng = random.Random(seed)  # nosec
+    entries = replay or [
+        {"body": bodies[index % len(bodies)]} for index in range(number_of_requests)
+    ]
+    endpoints = rng.choices(list(mix), weights=list(mix.values()), k=len(entries))
+
+    plan = []
+    arrival = 0.0
+    for entry, endpoint in zip(entries, endpoints):
+        if rate:
+            arrival += rng.expovariate(rate)
+        plan.append(
+            {
+                "endpoint": entry.get("endpoint", endpoint),
+                "body": entry["body"],
+                "at": entry.get("at", arrival if rate else None),
+            }
+        )
+    return plan
+
+
+async def send_request(
+    client: httpx.AsyncClient,
+    stats: Dict[str, EndpointStats],
+    entry: dict,
+    scheduled_at: float,
+) -> None:
+    """
+    Send one planned request; the latency counts from its scheduled time, so
+    a saturated server is not hidden by requests starting late
+    """
+    try:
+        response = await client.post(
+            endpoint_path(entry["endpoint"]),
+            json=entry["body"],
+            headers={"x-api-key": settings.API_TOKEN},
+        )
+        status_code = response.status_code
+    except httpx.HTTPError as exc:
+        app_logger.warning("Load test request failed: %s", exc)
+        status_code = None
+    stats.setdefault(entry["endpoint"], EndpointStats()).record(
+        time.perf_counter() - scheduled_at, status_code
+    )
+
+
+async def run_closed_loop(
+    client: httpx.AsyncClient,
+    stats: Dict[str, EndpointStats],
+    plan: List[dict],
+    concurrency: int,
+) -> None:
+    """
+    Keep `concurrency` requests in flight, each worker sending back-to-back
+    """
+    pending = iter(plan)
+
+    async def worker():
+        for entry in pending:
+            await send_request(client, stats, entry, time.perf_counter())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_open_loop(
+    client: httpx.AsyncClient,
+    stats: Dict[str, EndpointStats],
+    plan: List[dict],
+    max_in_flight: int,
+) -> None:
+    """
+    Start every request at its planned arrival whether or not the previous
+    ones completed, with at most max_in_flight requests outstanding
+    """
+    in_flight = asyncio.Semaphore(max_in_flight)
+    started_at = time.perf_counter()
+
+    async def scheduled(entry, scheduled_at):
+        async with in_flight:
+            await send_request(client, stats, entry, scheduled_at)
+
+    tasks = []
+    for entry in plan:
+        scheduled_at = started_at + entry["at"]
+        await asyncio.sleep(max(scheduled_at - time.perf_counter(), 0))
+        tasks.append(asyncio.create_task(scheduled(entry, scheduled_at)))
+    await asyncio.gather(*tasks)
+
+
+def build_client(url: Optional[str], timeout: float) -> httpx.AsyncClient:
+    """
+    Client for a running server at url, or for the app in-process over ASGI
+    """
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+
+    # imported here so driving a remote server does not build the app
+    from app.main import app  # pylint: disable=import-outside-toplevel
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url=LOAD_TEST_BASE_URL,
+        timeout=timeout,
+    )
+
+
+async def run_load_test(
+    plan: List[dict],
+    url: Optional[str] = None,
+    concurrency: int = LOAD_TEST_CONCURRENCY,
+    max_in_flight: int = LOAD_TEST_MAX_IN_FLIGHT,
+    timeout: float = LOAD_TEST_TIMEOUT_SECONDS,
+) -> dict:
+    """
+    Run the plan, open loop when it has arrival offsets and closed loop
+    otherwise, and report every endpoint
+    """
+    stats = {}
+    started_at = time.perf_counter()
+    async with build_client(url, timeout) as client:
+        if plan and plan[0]["at"] is not None:
+            await run_open_loop(client, stats, plan, max_in_flight)
+        else:
+            await run_closed_loop(client, stats, plan, concurrency)
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "endpoints": {
+            endpoint: endpoint_stats.report(elapsed)
+            for endpoint, endpoint_stats in stats.items()
+        },
+    }
+
+
+def main():
+    """Drive the API with concurrent, open loop or replayed traffic"""
+    parser = argparse.ArgumentParser(
+        prog="Load harness",
+        description="Load test the filter endpoints in-process or over HTTP",
+    )
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--requests", type=int, default=LOAD_TEST_REQUESTS)
+    parser.add_argument("--concurrency", type=int, default=LOAD_TEST_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--max_in_flight", type=int, default=LOAD_TEST_MAX_IN_FLIGHT)
+    parser.add_argument("--mix", default=LOAD_TEST_MIX)
+    parser.add_argument("--replay", default=None)
+    parser.add_argument("--seed", type=int, default=BENCHMARK_SEED)
+    parser.add_argument("--dataset_records", type=int, default=BENCHMARK_SCALES["10k"])
+    parser.add_argument("--timeout", type=float, default=LOAD_TEST_TIMEOUT_SECONDS)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    bodies = [
+        request.model_dump(by_alias=True, exclude_defaults=True)
+        for request in build_filter_matrix(
+            sample_record(args.dataset_records, args.seed)
+        ).values()
+    ]
+    plan = build_request_plan(
+        bodies,
+        parse_mix(args.mix),
+        args.requests,
+        rate=args.rate,
+        seed=args.seed,
+        replay=load_replay_log(args.replay) if args.replay else None,
+    )
+
+    report = asyncio.run(
+        run_load_test(
+            plan,
+            url=args.url,
+            concurrency=args.concurrency,
+            max_in_flight=args.max_in_flight,
+            timeout=args.timeout,
+        )
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            json.dump(report, file, indent=2)
+    for endpoint, endpoint_report in report["endpoints"].items():
+        app_logger.warning("Load test %s: %s", endpoint, endpoint_report)
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
@@ -1,3 +1,5 @@
+from typing import Dict, List, Tuple
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,19 +18,140 @@ class Settings(BaseSettings):
 
     APP_LOGGER_NAME: str = Field(default="VOICE_AUTOMATION")
     APP_LOG_LEVEL: str = Field(default="DEBUG")
+    APP_LOG_QUEUE_SIZE: int = Field(default=10000)
+    APP_LOG_JSON: bool = Field(default=False)
+    APP_LOG_SAMPLE_EVERY: int = Field(default=100)
 
     API_TOKEN: str = Field(description="API Token for access")
 
     MONGO_DB_HOST: str = Field(default="localhost")
     MONGO_DB_PORT: int = Field(default=27017)
+    # time to find a MongoDB server before a request or a probe gives up
+    MONGO_DB_SERVER_SELECTION_TIMEOUT_MS: int = Field(default=2000)
 
     SQL_DB_HOST: str = Field(default="localhost")
     SQL_DB_USERNAME: str = Field(default="root")
     SQL_DB_PASSWORD: str = Field(default="")
+    SQL_USE_UNION_REWRITE: bool = Field(default=False)
+    SQL_DB_CONNECT_TIMEOUT_SECONDS: int = Field(default=2)
+
+    # shared deadline of the backends queried by the federated filter
+    FEDERATED_TIMEOUT_SECONDS: float = Field(default=5.0)
+
+    # comma separated primary:secondary backends, a slow request to the primary
+    # is hedged to the secondary; empty disables hedging
+    HEDGE_POLICY: str = Field(default="")
+
+    # comma separated backends whose concurrent requests are run in batches,
+    # collected for the window
+    MICRO_BATCH_BACKENDS: str = Field(default="")
+    MICRO_BATCH_WINDOW_MS: float = Field(default=2.0)
+
+    # threads and queued requests of every backend before further requests are
+    # shed with a 503; comma separated backend:workers:queue override them for
+    # a backend, the federated filter included
+    BULKHEAD_MAX_WORKERS: int = Field(default=8)
+    BULKHEAD_MAX_QUEUE: int = Field(default=16)
+    BULKHEAD_LIMITS: str = Field(default="")
+    BULKHEAD_RETRY_AFTER_SECONDS: int = Field(default=1)
+
+    # deadline of every request, and comma separated endpoint:seconds overriding
+    # it for an endpoint such as fromSQL; X-Request-Timeout can only shorten it
+    REQUEST_TIMEOUT_SECONDS: float = Field(default=30.0)
+    REQUEST_TIMEOUTS: str = Field(default="")
+
+    # failures in a row opening the circuit of MongoDB and MySQL, seconds before
+    # a trial request once open, and seconds between two health probes
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = Field(default=5)
+    CIRCUIT_BREAKER_RESET_SECONDS: float = Field(default=10.0)
+    HEALTH_PROBE_INTERVAL_SECONDS: float = Field(default=5.0)
+
+    # warm the backends up in the background at startup, /ready reports not
+    # ready until then; the file optionally holds queries to replay, one
+    # request body or {"endpoint": ..., "body": ...} per line
+    WARM_UP_ENABLED: bool = Field(default=True)
+    WARM_UP_QUERIES_FILE: str = Field(default="")
+    WARM_UP_TIMEOUT_SECONDS: float = Field(default=60.0)
+
+    # production server: worker processes forked from a master holding the
+    # preloaded app (0 for one per CPU), pending connections of the socket,
+    # connections served at once by a worker before answering 503 (0 for no
+    # limit), and seconds an idle keep-alive connection is kept open
+    SERVER_HOST: str = Field(default="0.0.0.0")  # nosec
+    SERVER_PORT: int = Field(default=8080)
+    SERVER_WORKERS: int = Field(default=0)
+    SERVER_BACKLOG: int = Field(default=2048)
+    SERVER_LIMIT_CONCURRENCY: int = Field(default=0)
+    SERVER_TIMEOUT_KEEP_ALIVE: int = Field(default=5)
+
+    # comma separated filter backends served by this host, the drivers of the
+    # other backends are never imported
+    APP_BACKENDS: str = Field(default="json,mongodb,sql,sqlite,parquet")
 
     model_config = SettingsConfigDict(
         case_sensitive=True, env_file=".env", extra="allow"
     )
 
+    @property
+    def enabled_backends(self) -> List[str]:
+        # pylint: disable=no-member
+        """
+        Filter backends served by this host
+        """
+        return [
+            backend.strip()
+            for backend in self.APP_BACKENDS.split(",")
+            if backend.strip()
+        ]
+
+    @property
+    def hedge_policy(self) -> Dict[str, str]:
+        # pylint: disable=no-member
+        """
+        Secondary backend of every hedged primary backend
+        """
+        return {
+            primary.strip(): secondary.strip()
+            for primary, _, secondary in (
+                hedge.partition(":") for hedge in self.HEDGE_POLICY.split(",")
+            )
+            if primary.strip() and secondary.strip()
+        }
+
+    @property
+    def micro_batch_backends(self) -> List[str]:
+        # pylint: disable=no-member
+        """
+        Filter backends running their concurrent requests in batches
+        """
+        return [
+            backend.strip()
+            for backend in self.MICRO_BATCH_BACKENDS.split(",")
+            if backend.strip()
+        ]
+
+    def bulkhead_limits(self, backend: str) -> Tuple[int, int]:
+        # pylint: disable=no-member
+        """
+        Threads and queued requests of the backend
+        """
+        for limit in self.BULKHEAD_LIMITS.split(","):
+            name, _, limits = limit.partition(":")
+            if name.strip() == backend:
+                max_workers, _, max_queue = limits.partition(":")
+                return int(max_workers), int(max_queue)
+        return self.BULKHEAD_MAX_WORKERS, self.BULKHEAD_MAX_QUEUE
+
+    def request_timeout(self, endpoint: str) -> float:
+        # pylint: disable=no-member
+        """
+        Default deadline of the requests to the endpoint, in seconds
+        """
+        for timeout in self.REQUEST_TIMEOUTS.split(","):
+            name, _, seconds = timeout.partition(":")
+            if name.strip() == endpoint:
+                return float(seconds)
+        return self.REQUEST_TIMEOUT_SECONDS
+
 
 settings = Settings()
@@ -11,26 +11,286 @@ USER_ID_DIVIDER = 3
 TIMESTAMP_START_YEAR = 2020
 TIMESTAMP_END_YEAR = 2020
 
+DISTRIBUTION_UNIFORM = "uniform"
+DISTRIBUTION_ZIPF = "zipf"
+SKEW_DISTRIBUTIONS = [DISTRIBUTION_UNIFORM, DISTRIBUTION_ZIPF]
+ZIPF_EXPONENT = 1.1
+
+TIME_PATTERN_UNIFORM = "uniform"
+TIME_PATTERN_DIURNAL = "diurnal"
+TIME_PATTERN_WEEKLY = "weekly"
+TIME_PATTERN_DIURNAL_WEEKLY = "diurnal_weekly"
+TIME_PATTERNS = [
+    TIME_PATTERN_UNIFORM,
+    TIME_PATTERN_DIURNAL,
+    TIME_PATTERN_WEEKLY,
+    TIME_PATTERN_DIURNAL_WEEKLY,
+]
+# relative call volume per hour of the day, peaking in business hours
+DIURNAL_HOUR_WEIGHTS = [
+    1, 1, 1, 1, 1, 2, 4, 8, 14, 18, 20, 19,
+    16, 18, 20, 19, 16, 12, 8, 6, 4, 3, 2, 1,
+]  # fmt: skip
+# relative call volume per weekday, Monday first
+WEEKLY_DAY_WEIGHTS = [10, 10, 10, 10, 9, 3, 2]
+
+GENERATOR_CHUNK_SIZE = 100000
+JSON_WRITE_CHUNK_SIZE = 10000
+PIPELINE_QUEUE_SIZE = 4
+
 RECORD_STORAGE_DIR = "records"
 RECORD_FILE_NAME = "current_records.json"
+RECORD_STAGING_FILE_NAME = "staging_records.json"
 RECORD_BACKUP_DIR = "backup_records"
 
 MONGO_DB_NAME = "mydatabase"
 MONGO_DB_COLLECTION = "records"
+MONGO_DB_GENERATION_COLLECTION = "records_{date_format}"
 MONGO_DB_BACKUP_COLLECTION = "BKP_{date_format}_records"
 
+MONGO_INSERT_BATCH_SIZE = 10000
+MONGO_INSERT_WORKERS = 4
+MONGO_INSERT_RETRIES = 3
+MONGO_INSERT_RETRY_DELAY = 1
+MONGO_DUPLICATE_KEY_ERROR = 11000
+
 SQL_DB_NAME = "mydatabase"
 SQL_RECORDS_TABLE = "records"
 SQL_DEVICES_TABLE = "devices"
+SQL_RECORDS_STAGING_TABLE = "staging_records"
+SQL_DEVICES_STAGING_TABLE = "staging_devices"
 SQL_RECORDS_BKP_TABLE = "BKP_{date_format}_records"
 SQL_DEVICES_BKP_TABLE = "BKP_{date_format}_devices"
 
 # pylint: disable=line-too-long
-DEVICES_TABLE_CREATE = f"CREATE TABLE IF NOT EXISTS {SQL_DEVICES_TABLE} (_id INT AUTO_INCREMENT PRIMARY KEY, phone VARCHAR(255), voicemail VARCHAR(255), UNIQUE(phone, voicemail))"
-RECORDS_TABLE_CREATE = f"CREATE TABLE IF NOT EXISTS {SQL_RECORDS_TABLE} (_id INT PRIMARY KEY, userId VARCHAR(255), deviceId INT, clusterId VARCHAR(255), originationTime TIMESTAMP, FOREIGN KEY (deviceId) REFERENCES devices(_id))"
+DEVICES_TABLE_CREATE_TEMPLATE = "CREATE TABLE IF NOT EXISTS {devices_table} (_id INT AUTO_INCREMENT PRIMARY KEY, phone VARCHAR(255), voicemail VARCHAR(255), UNIQUE(phone, voicemail))"
+RECORDS_TABLE_CREATE_TEMPLATE = "CREATE TABLE IF NOT EXISTS {records_table} (_id INT PRIMARY KEY, userId VARCHAR(255), deviceId INT, clusterId VARCHAR(255), originationTime TIMESTAMP, FOREIGN KEY (deviceId) REFERENCES {devices_table}(_id))"
+DEVICES_TABLE_CREATE = DEVICES_TABLE_CREATE_TEMPLATE.format(
+    devices_table=SQL_DEVICES_TABLE
+)
+RECORDS_TABLE_CREATE = RECORDS_TABLE_CREATE_TEMPLATE.format(
+    records_table=SQL_RECORDS_TABLE, devices_table=SQL_DEVICES_TABLE
+)
+
+DEVICES_TABLE_INSERT = (
+    "INSERT INTO {devices_table} (_id, phone, voicemail) VALUES (%s, %s, %s)"
+)
+RECORDS_TABLE_INSERT = "INSERT INTO {records_table} (_id, userId, deviceId, clusterId, originationTime) VALUES (%s, %s, %s, %s, FROM_UNIXTIME(%s))"
+SQL_TABLE_EXISTS_QUERY = "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s"
+
+# Secondary indexes backing the filter query shapes; each (table, name, columns)
+# is applied by the migration in app/utils/sql_migrations.py
+SQL_SECONDARY_INDEXES = [
+    (SQL_RECORDS_TABLE, "idx_records_origination_time", "(originationTime)"),
+    (SQL_RECORDS_TABLE, "idx_records_user_time", "(userId, originationTime)"),
+    (SQL_RECORDS_TABLE, "idx_records_cluster_time", "(clusterId, originationTime)"),
+    (SQL_RECORDS_TABLE, "idx_records_device_time", "(deviceId, originationTime)"),
+    (SQL_DEVICES_TABLE, "idx_devices_voicemail", "(voicemail)"),
+]
+SQL_INDEX_EXISTS_QUERY = "SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = %s AND table_name = %s AND index_name = %s"
+SQL_INDEX_CREATE = "CREATE INDEX {index_name} ON {table_name} {index_columns}"
+
+SQL_INSERT_BATCH_SIZE = 10000
+
+RECORD_SQLITE_FILE_NAME = "current_records.sqlite3"
+RECORD_SQLITE_STAGING_FILE_NAME = "staging_records.sqlite3"
+SQLITE_RECORDS_TABLE = "records"
+# the devices are denormalised into the records, so a filter is a single
+# index-backed SELECT without a join or a per-row device lookup
+SQLITE_RECORDS_TABLE_CREATE = "CREATE TABLE records (_id INTEGER PRIMARY KEY, userId TEXT, clusterId TEXT, phone TEXT, voicemail TEXT, originationTime INTEGER)"
+SQLITE_RECORDS_INSERT = "INSERT INTO records (_id, userId, clusterId, phone, voicemail, originationTime) VALUES (?, ?, ?, ?, ?, ?)"
+# one (field, originationTime) index per filter field lets SQLite answer the OR
+# of the fields with one index range scan per field
+SQLITE_INDEXES = [
+    ("idx_records_origination_time", "(originationTime)"),
+    ("idx_records_user_time", "(userId, originationTime)"),
+    ("idx_records_cluster_time", "(clusterId, originationTime)"),
+    ("idx_records_phone_time", "(phone, originationTime)"),
+    ("idx_records_voicemail_time", "(voicemail, originationTime)"),
+]
+SQLITE_INDEX_CREATE = "CREATE INDEX {index_name} ON {table_name} {index_columns}"
+SQLITE_INSERT_BATCH_SIZE = 10000
+SQLITE_MMAP_SIZE = 268435456
+SQLITE_CACHE_SIZE_KB = 65536
+
+RECORD_PARQUET_FILE_NAME = "current_records.parquet"
+RECORD_PARQUET_STAGING_FILE_NAME = "staging_records.parquet"
+# the records are sorted by originationTime, so a row group covers a narrow time
+# slice and its min/max statistics let a date range skip most of the file
+PARQUET_ROW_GROUP_SIZE = 65536
+PARQUET_WRITE_CHUNK_SIZE = 100000
+PARQUET_COMPRESSION = "zstd"
+# low cardinality columns stored with dictionary pages, their equality filters
+# compare dictionary indices instead of strings
+PARQUET_DICTIONARY_COLUMNS = ["clusterId", "userId"]
+
+# endregion
+
+# region Metrics Constants
+
+METRICS_LATENCY_BUCKETS = [
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+]  # fmt: skip
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_ID_HEADER = "X-Request-ID"
+SERVER_TIMING_HEADER = "Server-Timing"
+# incoming request ids are only honoured when they are safe to log and echo
+REQUEST_ID_PATTERN = r"^[A-Za-z0-9._:-]{1,128}$"
+
+# endregion
+
+# region Backend Registry Constants
+
+# worker class of every filter backend, imported only when the backend is enabled
+FILTER_BACKEND_WORKERS = {
+    "json": "app.workers.filter_records.filter_from_json:FilterRecordFromJSON",
+    "mongodb": "app.workers.filter_records.filter_from_mongo:FilterRecordFromMongo",
+    "sql": "app.workers.filter_records.filter_from_mysql:FilterRecordFromSQL",
+    "sqlite": "app.workers.filter_records.filter_from_sqlite:FilterRecordFromSQLite",
+    "parquet": (
+        "app.workers.filter_records.filter_from_parquet:FilterRecordFromParquet"
+    ),
+}
+# driver module of the backends that need one
+FILTER_BACKEND_DRIVERS = {
+    "mongodb": "pymongo",
+    "sql": "mysql.connector",
+    "parquet": "pyarrow",
+}
+# published file of the backends serving a file, its generation versions the
+# records they serve
+FILTER_BACKEND_DATASET_FILES = {
+    "json": RECORD_FILE_NAME,
+    "sqlite": RECORD_SQLITE_FILE_NAME,
+    "parquet": RECORD_PARQUET_FILE_NAME,
+}
+
+# endregion
+
+# region Federated Filter Constants
+
+# backends queried concurrently by the federated filter, in merge order
+FEDERATED_BACKENDS = ["json", "mongodb", "sql"]
+
+BACKEND_STATUS_SUCCESS = "success"
+BACKEND_STATUS_ERROR = "error"
+BACKEND_STATUS_TIMEOUT = "timeout"
+
+# endregion
+
+# region Hedging Constants
+
+# a request is hedged once the primary backend runs past this quantile of its
+# observed latencies, or past the default delay until enough were observed, and
+# never waits for it longer than the max delay
+HEDGE_LATENCY_QUANTILE = 0.95
+HEDGE_MIN_OBSERVATIONS = 20
+HEDGE_DEFAULT_DELAY_SECONDS = 0.1
+HEDGE_MAX_DELAY_SECONDS = 1.0
+
+DATASET_VERSION_HEADER = "X-Dataset-Version"
+# version of the backends serving whatever records they hold right now
+DATASET_VERSION_LIVE = "live"
+
+# endregion
+
+# region Micro Batching Constants
+
+MICRO_BATCH_MAX_SIZE = 32
+MICRO_BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32]
+
+# endregion
+
+# region Bulkhead Constants
+
+# seconds a shed request is told to wait before retrying
+RETRY_AFTER_HEADER = "Retry-After"
+
+# endregion
+
+# region Deadline Constants
+
+# seconds the client gives the request, capped at the default of the endpoint
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+DEADLINE_REASON_TIMEOUT = "timeout"
+DEADLINE_REASON_CANCELLED = "cancelled"
+# seconds a request waiting for another one sleeps between two deadline checks
+DEADLINE_WAIT_INTERVAL_SECONDS = 0.05
+# MAX_EXECUTION_TIME of the MySQL queries is rounded down to one of these, so a
+# filter shape is prepared for a few limits rather than one per remaining ms
+SQL_MAX_EXECUTION_TIME_BUCKETS_MS = [
+    50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 30000, 60000,
+]  # fmt: skip
+SQL_QUERY_TIMEOUT_ERRNO = 3024
+
+# endregion
+
+# region Circuit Breaker Constants
+
+CIRCUIT_STATE_CLOSED = "closed"
+CIRCUIT_STATE_OPEN = "open"
+CIRCUIT_STATE_HALF_OPEN = "half_open"
+# value of every state in the filter_circuit_breaker_state gauge
+CIRCUIT_STATE_VALUES = {
+    CIRCUIT_STATE_CLOSED: 0,
+    CIRCUIT_STATE_HALF_OPEN: 1,
+    CIRCUIT_STATE_OPEN: 2,
+}
+
+# endregion
+
+# region Warm-up Constants
+
+# filter of the warm-up requests run on every thread of every backend, days
+# without records so only the loading and the connections cost anything
+WARM_UP_DATE_RANGE = "1970-01-02 to 1970-01-03"
+# backend of every filter endpoint, for the warm-up queries
+FILTER_ENDPOINT_BACKENDS = {
+    "fromJson": "json",
+    "fromMongo": "mongodb",
+    "fromSQL": "sql",
+    "fromSQLite": "sqlite",
+    "fromParquet": "parquet",
+}
+WARM_UP_DEFAULT_ENDPOINT = "fromJson"
+
+# endregion
+
+# region Server Constants
+
+SERVER_APP = "app.main:app"
+# seconds before forking a new worker in place of one that died, so a worker
+# failing at startup does not fork in a tight loop
+SERVER_RESPAWN_DELAY_SECONDS = 1
+
+# endregion
+
+# region Benchmark Constants
+
+BENCHMARK_SCALES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+BENCHMARK_SEED = 2020
+BENCHMARK_REPEATS = 20
+BENCHMARK_TOLERANCE = 0.2
+BENCHMARK_BASELINE_FILE = "app/benchmarks/baseline.json"
+BENCHMARK_BACKEND_TIMEOUT_MS = 2000
+
+LOAD_TEST_BASE_URL = "http://load-test"
+LOAD_TEST_REQUESTS = 200
+LOAD_TEST_CONCURRENCY = 10
+LOAD_TEST_MAX_IN_FLIGHT = 1000
+LOAD_TEST_TIMEOUT_SECONDS = 60
+LOAD_TEST_MIX = "fromJson=1"
+LOAD_TEST_LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+IMPORT_TIME_MODULE = "app.main"
+IMPORT_TIME_BUDGET_MS = 1500
+IMPORT_TIME_TOP = 15
 
-DEVICES_TABLE_INSERT = "INSERT INTO {devices_table} (phone, voicemail) VALUES ('{value_phone_number}', '{value_voicemail}') ON DUPLICATE KEY UPDATE _id=LAST_INSERT_ID(_id)"
-RECORDS_TABLE_INSERT = "INSERT INTO {records_table} (_id, userId, deviceId, clusterId, originationTime) VALUES ({value_record_id}, '{value_user_id}', {value_device_id}, '{value_cluster_id}', FROM_UNIXTIME({value_origination_time}))"
+FORK_MEMORY_RECORDS = 1000000
+# a wide scan returning few rows, and a wide range returning every row
+FORK_MEMORY_SHAPES = ["field_userId", "date_wide"]
+FORK_MEMORY_SMAPS_FILE = "/proc/self/smaps_rollup"
 
 # endregion
 
@@ -0,0 +1,6 @@
+class BackendNotEnabledError(Exception):
+    """Filter backend not enabled on this host exception"""
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,7 @@
+class BackendOverloadedError(Exception):
+    """Filter backend at its concurrency and queue limits exception"""
+
+    def __init__(self, message: str, retry_after: int):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
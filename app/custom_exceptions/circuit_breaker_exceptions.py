@@ -0,0 +1,7 @@
+class BackendUnavailableError(Exception):
+    """Filter backend behind an open circuit breaker exception"""
+
+    def __init__(self, message: str, retry_after: int):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
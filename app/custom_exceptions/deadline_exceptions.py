@@ -0,0 +1,7 @@
+class DeadlineExceededError(Exception):
+    """Request deadline exceeded, or request abandoned by its client, exception"""
+
+    def __init__(self, message: str, reason: str):
+        self.message = message
+        self.reason = reason
+        super().__init__(self.message)
@@ -0,0 +1,14 @@
+class ParquetFileNotFoundError(Exception):
+    """Parquet file not found exception"""
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ParquetOperationError(Exception):
+    """Parquet operation error exception"""
+
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
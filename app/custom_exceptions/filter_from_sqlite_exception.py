@@ -0,0 +1,14 @@
+class SQLiteConnectionError(Exception):
+    """SQLite connection error exception"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class SQLiteOperationError(Exception):
+    """SQLite operation error exception"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
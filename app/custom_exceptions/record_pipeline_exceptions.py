@@ -0,0 +1,6 @@
+class RecordPipelineAbortedError(Exception):
+    """Record generation failed before the end of the records exception"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -1,7 +1,18 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+
+from app.api.filter_records.services import health_monitor
+from app.api.health.services import start_warm_up
 from app.api.router import api_router
 from app.core.config import settings
+from app.core.constants import RETRY_AFTER_HEADER
+from app.custom_exceptions.backend_registry_exceptions import BackendNotEnabledError
+from app.custom_exceptions.bulkhead_exceptions import BackendOverloadedError
+from app.custom_exceptions.circuit_breaker_exceptions import BackendUnavailableError
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.utils.deadline_middleware import DeadlineMiddleware
 from app.utils.request_id_middleware import RequestIDMiddleware
 
 # root_path for fixxing api version and all
@@ -9,6 +20,20 @@ from app.utils.request_id_middleware import RequestIDMiddleware
 #  overriding openapi considering we would
 # have different api_str in different env
 
+
+@asynccontextmanager
+async def lifespan(fastapi_app: FastAPI):
+    # pylint: disable=unused-argument
+    """
+    Warm the app up and probe the database backends in the background while
+    the app is up
+    """
+    start_warm_up()
+    health_monitor.start()
+    yield
+    health_monitor.stop()
+
+
 app = FastAPI(
     debug=settings.APP_DEBUG,
     title=settings.APP_NAME,
@@ -17,7 +42,66 @@ app = FastAPI(
     openapi_url=f"{settings.API_STR}/openapi.json",
     docs_url="/docs/swagger",
     redoc_url="/docs/redoc",
+    lifespan=lifespan,
 )
 
+app.add_middleware(DeadlineMiddleware)
 app.add_middleware(RequestIDMiddleware)
 app.include_router(api_router, prefix=settings.API_STR)
+
+
+@app.exception_handler(BackendNotEnabledError)
+def backend_not_enabled_handler(
+    request: Request, exc: BackendNotEnabledError
+) -> JSONResponse:
+    # pylint: disable=unused-argument
+    """
+    Filter endpoints of the backends disabled on this host are not found
+    """
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND, content={"detail": exc.message}
+    )
+
+
+@app.exception_handler(BackendOverloadedError)
+def backend_overloaded_handler(
+    request: Request, exc: BackendOverloadedError
+) -> JSONResponse:
+    # pylint: disable=unused-argument
+    """
+    Requests shed by a backend at its limits are retried later by the client
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": exc.message},
+        headers={RETRY_AFTER_HEADER: str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(BackendUnavailableError)
+def backend_unavailable_handler(
+    request: Request, exc: BackendUnavailableError
+) -> JSONResponse:
+    # pylint: disable=unused-argument
+    """
+    Requests to a backend behind an open circuit fail fast and are retried
+    once the cool-down is over
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": exc.message},
+        headers={RETRY_AFTER_HEADER: str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(DeadlineExceededError)
+def deadline_exceeded_handler(
+    request: Request, exc: DeadlineExceededError
+) -> JSONResponse:
+    # pylint: disable=unused-argument
+    """
+    Requests running past their deadline are stopped and time out
+    """
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT, content={"detail": exc.message}
+    )
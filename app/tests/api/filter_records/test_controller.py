@@ -3,7 +3,17 @@ from unittest.mock import patch
 import pytest
 from fastapi.testclient import TestClient
 
-from app.api.filter_records.models import DeviceModel, FilterResponseModel, RecordModel
+from app.api.filter_records.models import (
+    BackendStatusModel,
+    DeviceModel,
+    FederatedFilterResponseModel,
+    FilterResponseModel,
+    RecordModel,
+)
+from app.api.filter_records.services import bulkheads
+from app.core.config import settings
+from app.custom_exceptions.bulkhead_exceptions import BackendOverloadedError
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
 from app.main import app
 
 client = TestClient(app)
@@ -233,3 +243,269 @@ def test_sql_db_record_filter(mock_filter_record_from_sql) -> None:
         ],
         "numberOfFilteredRecords": 1,
     }
+
+
+@pytest.mark.usefixtures("mock_get_api_key")
+@patch("app.api.filter_records.controller.filter_record_from_sqlite")
+def test_sqlite_record_filter(mock_filter_record_from_sqlite) -> None:
+    """
+    Test SQLite record filter with valid API key
+    """
+    mock_filter_record_from_sqlite.return_value = FilterResponseModel(
+        result=[
+            RecordModel(
+                _id=987983,
+                clusterId="test",
+                userId="test",
+                devices=DeviceModel(phone="test", voicemail="test"),
+                originationTime=1609459200,
+            )
+        ],
+        number_of_filtered_records=1,
+        datasetVersion="sqlite@20210101T000000",
+    )
+
+    mock_get_api_key.return_value = "valid_api_key"
+
+    request_body = {
+        "dateRange": "2021-01-01 to 2021-01-31",
+        "cluster": "cluster1",
+        "userId": "user1",
+        "phoneNumber": "1234567890",
+        "voiceMail": "true",
+    }
+
+    headers = {"x-api-key": "valid_api_key"}
+
+    response = client.post(
+        "/filterRecords/fromSQLite", json=request_body, headers=headers
+    )
+
+    assert response.status_code == 200
+    assert response.headers["X-Dataset-Version"] == "sqlite@20210101T000000"
+    assert response.json() == {
+        "result": [
+            {
+                "_id": 987983,
+                "originationTime": "2020-12-31 19:00:00",
+                "clusterId": "test",
+                "userId": "test",
+                "devices": {"phone": "test", "voicemail": "test"},
+            }
+        ],
+        "numberOfFilteredRecords": 1,
+    }
+
+
+@pytest.mark.usefixtures("mock_get_api_key")
+@patch("app.api.filter_records.controller.filter_record_from_parquet")
+def test_parquet_record_filter(mock_filter_record_from_parquet) -> None:
+    """
+    Test Parquet record filter with valid API key
+    """
+    mock_filter_record_from_parquet.return_value = FilterResponseModel(
+        result=[
+            RecordModel(
+                _id=987983,
+                clusterId="test",
+                userId="test",
+                devices=DeviceModel(phone="test", voicemail="test"),
+                originationTime=1609459200,
+            )
+        ],
+        number_of_filtered_records=1,
+    )
+
+    mock_get_api_key.return_value = "valid_api_key"
+
+    request_body = {
+        "dateRange": "2021-01-01 to 2021-01-31",
+        "cluster": "cluster1",
+        "userId": "user1",
+        "phoneNumber": "1234567890",
+        "voiceMail": "true",
+    }
+
+    headers = {"x-api-key": "valid_api_key"}
+
+    response = client.post(
+        "/filterRecords/fromParquet", json=request_body, headers=headers
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "result": [
+            {
+                "_id": 987983,
+                "originationTime": "2020-12-31 19:00:00",
+                "clusterId": "test",
+                "userId": "test",
+                "devices": {"phone": "test", "voicemail": "test"},
+            }
+        ],
+        "numberOfFilteredRecords": 1,
+    }
+
+
+@pytest.mark.usefixtures("mock_get_api_key")
+@patch.object(settings, "APP_BACKENDS", "json")
+def test_disabled_backend_record_filter() -> None:
+    """
+    Test the filter of a backend not enabled on the host is not found
+    """
+    request_body = {"dateRange": "2021-01-01 to 2021-01-31"}
+
+    headers = {"x-api-key": "valid_api_key"}
+
+    response = client.post("/filterRecords/fromSQL", json=request_body, headers=headers)
+
+    assert response.status_code == 404
+    assert response.json() == {
+        "detail": "Filter backend sql is not enabled on this host"
+    }
+
+
+@pytest.mark.usefixtures("mock_get_api_key")
+@patch("app.api.filter_records.controller.filter_record_from_all")
+def test_federated_record_filter(mock_filter_record_from_all) -> None:
+    """
+    Test federated record filter reports the status of every backend
+    """
+    mock_filter_record_from_all.return_value = FederatedFilterResponseModel(
+        result=[
+            RecordModel(
+                _id=987983,
+                clusterId="test",
+                userId="test",
+                devices=DeviceModel(phone="test", voicemail="test"),
+                originationTime=1609459200,
+            )
+        ],
+        backends=[
+            BackendStatusModel(
+                backend="json",
+                status="success",
+                latencyMs=1.5,
+                numberOfFilteredRecords=1,
+            ),
+            BackendStatusModel(
+                backend="sql",
+                status="error",
+                latencyMs=0.5,
+                error="SQL connection error",
+            ),
+        ],
+    )
+
+    response = client.post(
+        "/filterRecords/fromAll",
+        json={"dateRange": "2021-01-01 to 2021-01-31"},
+        headers={"x-api-key": "valid_api_key"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "result": [
+            {
+                "_id": 987983,
+                "originationTime": "2020-12-31 19:00:00",
+                "clusterId": "test",
+                "userId": "test",
+                "devices": {"phone": "test", "voicemail": "test"},
+            }
+        ],
+        "backends": [
+            {
+                "backend": "json",
+                "status": "success",
+                "latencyMs": 1.5,
+                "numberOfFilteredRecords": 1,
+                "datasetVersion": None,
+                "error": None,
+            },
+            {
+                "backend": "sql",
+                "status": "error",
+                "latencyMs": 0.5,
+                "numberOfFilteredRecords": 0,
+                "datasetVersion": None,
+                "error": "SQL connection error",
+            },
+        ],
+        "numberOfFilteredRecords": 1,
+        "partial": True,
+    }
+
+
+@pytest.mark.usefixtures("mock_get_api_key")
+@patch("app.api.filter_records.controller.filter_record_from_all")
+def test_federated_record_filter_no_backend_answered(
+    mock_filter_record_from_all,
+) -> None:
+    """
+    Test federated record filter is unavailable when no backend answered
+    """
+    mock_filter_record_from_all.return_value = FederatedFilterResponseModel(
+        result=[],
+        backends=[
+            BackendStatusModel(
+                backend="json",
+                status="timeout",
+                latencyMs=5000,
+                error="No answer within 5.0s",
+            )
+        ],
+    )
+
+    response = client.post(
+        "/filterRecords/fromAll",
+        json={"dateRange": "2021-01-01 to 2021-01-31"},
+        headers={"x-api-key": "valid_api_key"},
+    )
+
+    assert response.status_code == 503
+    assert response.json()["backends"][0]["status"] == "timeout"
+    assert response.json()["partial"]
+
+
+@pytest.mark.usefixtures("mock_get_api_key")
+def test_overloaded_backend_record_filter() -> None:
+    """
+    Test the filter of a backend at its limits is shed with a Retry-After
+    """
+    with patch.object(
+        bulkheads["sql"],
+        "submit",
+        side_effect=BackendOverloadedError(
+            message="Backend sql is overloaded, retry later", retry_after=2
+        ),
+    ):
+        response = client.post(
+            "/filterRecords/fromSQL",
+            json={"dateRange": "2021-01-01 to 2021-01-31"},
+            headers={"x-api-key": "valid_api_key"},
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.json() == {"detail": "Backend sql is overloaded, retry later"}
+
+
+@pytest.mark.usefixtures("mock_get_api_key")
+@patch("app.api.filter_records.controller.filter_record_from_json")
+def test_record_filter_past_deadline(mock_filter_record_from_json) -> None:
+    """
+    Test a filter running past the deadline of its request times out
+    """
+    mock_filter_record_from_json.side_effect = DeadlineExceededError(
+        message="Request deadline of 0.5s exceeded", reason="timeout"
+    )
+
+    response = client.post(
+        "/filterRecords/fromJson",
+        json={"dateRange": "2021-01-01 to 2021-01-31"},
+        headers={"x-api-key": "valid_api_key", "X-Request-Timeout": "0.5"},
+    )
+
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline of 0.5s exceeded"}
@@ -1,14 +1,78 @@
+import asyncio
+import json
+import threading
+import time
 from unittest.mock import patch
 
-from app.api.filter_records.models import FilterRequestModel, FilterResponseModel
+import pytest
+
+from app.api.filter_records.models import (
+    DeviceModel,
+    FilterRequestModel,
+    FilterResponseModel,
+    RecordModel,
+)
 from app.api.filter_records.services import (
+    backend_circuit_states,
+    bulkheads,
+    dataset_generation,
+    filter_record_from_all,
     filter_record_from_json,
     filter_record_from_mongo,
+    filter_record_from_parquet,
     filter_record_from_sql,
+    filter_record_from_sqlite,
+    filter_record_response,
+    filter_request_key,
+    filter_single_flight,
+    hedge_delay,
+    micro_batchers,
+    run_filter_record,
+)
+from app.core.config import settings
+from app.core.constants import RECORD_FILE_NAME
+from app.custom_exceptions.backend_registry_exceptions import BackendNotEnabledError
+from app.custom_exceptions.bulkhead_exceptions import BackendOverloadedError
+from app.custom_exceptions.circuit_breaker_exceptions import BackendUnavailableError
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.custom_exceptions.filter_from_mongo_exception import MongoDBConnectionError
+from app.custom_exceptions.filter_from_sql_exception import SQLConnectionError
+from app.utils.circuit_breaker_helper import CircuitBreaker
+from app.utils.deadline_helper import (
+    RequestDeadline,
+    check_deadline,
+    current_deadline_ctx,
 )
+from app.utils.logger_helper import current_request_id_ctx
+from app.utils.metrics_helper import (
+    FILTER_COALESCING_RATIO,
+    FILTER_HEDGED_REQUESTS,
+    FILTER_SINGLE_FLIGHT_REQUESTS,
+    Histogram,
+)
+from app.workers.filter_records.filter_from_mysql import close_thread_connection
+
 
+def filter_response(*record_ids: int) -> FilterResponseModel:
+    """Filter response of records with the given ids"""
+    return FilterResponseModel(
+        result=[
+            RecordModel(
+                _id=record_id,
+                originationTime=1609459200,
+                clusterId="cluster",
+                userId="user",
+                devices=DeviceModel(phone="phone", voicemail="voicemail"),
+            )
+            for record_id in record_ids
+        ]
+    )
 
-@patch("app.api.filter_records.services.FilterRecordFromJSON.filter_records_from_json")
+
+@patch(
+    "app.workers.filter_records.filter_from_json.FilterRecordFromJSON."
+    "filter_records_from_json"
+)
 def test_filter_record_from_json(mock_filter_records_from_json):
     """
     Test filter_record_from_json
@@ -20,7 +84,109 @@ def test_filter_record_from_json(mock_filter_records_from_json):
 
 
 @patch(
-    "app.api.filter_records.services.FilterRecordFromMongo.filter_records_from_mongo"
+    "app.workers.filter_records.filter_from_json.FilterRecordFromJSON."
+    "filter_records_batch_from_json"
+)
+def test_filter_record_from_json_micro_batched(mock_filter_records_batch_from_json):
+    """
+    Test concurrent requests of a micro batched backend run as one batch
+    """
+    mock_filter_records_batch_from_json.side_effect = lambda requests: [
+        filter_response(index) for index, _ in enumerate(requests)
+    ]
+    filter_requests = [
+        FilterRequestModel(**{"dateRange": "2022-01-01 to 2022-01-02", "userId": user})
+        for user in ("user_1", "user_2")
+    ]
+    responses = [None, None]
+
+    def filter_request(index):
+        responses[index] = filter_record_from_json(filter_requests[index])
+
+    with (
+        patch.object(settings, "MICRO_BATCH_BACKENDS", "json"),
+        patch.object(micro_batchers["json"], "window_seconds", 5),
+        patch.object(micro_batchers["json"], "max_batch_size", 2),
+    ):
+        threads = [
+            threading.Thread(target=filter_request, args=(index,)) for index in (0, 1)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    mock_filter_records_batch_from_json.assert_called_once()
+    assert sorted(response.result[0].id for response in responses) == [0, 1]
+
+
+@pytest.mark.parametrize(
+    "backend, filter_service, batch_method, time_limit",
+    [
+        (
+            "mongodb",
+            filter_record_from_mongo,
+            "app.workers.filter_records.filter_from_mongo.FilterRecordFromMongo."
+            "filter_records_batch_from_mongo",
+            "max_time_ms",
+        ),
+        (
+            "sql",
+            filter_record_from_sql,
+            "app.workers.filter_records.filter_from_mysql.FilterRecordFromSQL."
+            "filter_records_batch_from_sql",
+            "max_execution_ms",
+        ),
+    ],
+)
+def test_micro_batch_query_has_a_time_limit(
+    backend, filter_service, batch_method, time_limit
+):
+    """
+    Test the query of a micro batch is limited on the database by the latest
+    deadline of its requests
+    """
+    time_limits = []
+
+    def filter_records_batch(worker, requests):
+        time_limits.append(getattr(worker, time_limit))
+        return [filter_response(index) for index, _ in enumerate(requests)]
+
+    filter_requests = [
+        FilterRequestModel(**{"dateRange": "2022-01-01 to 2022-01-02", "userId": user})
+        for user in ("user_1", "user_2")
+    ]
+
+    def filter_request(index, timeout):
+        current_deadline_ctx.set(RequestDeadline(timeout))
+        try:
+            filter_service(filter_requests[index])
+        finally:
+            close_thread_connection()
+
+    with (
+        patch(batch_method, autospec=True, side_effect=filter_records_batch),
+        patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect"),
+        patch.object(settings, "MICRO_BATCH_BACKENDS", backend),
+        patch.object(micro_batchers[backend], "window_seconds", 5),
+        patch.object(micro_batchers[backend], "max_batch_size", 2),
+    ):
+        threads = [
+            threading.Thread(target=filter_request, args=(index, timeout))
+            for index, timeout in enumerate((5, 10))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(time_limits) == 1
+    assert 5000 < time_limits[0] <= 10000
+
+
+@patch(
+    "app.workers.filter_records.filter_from_mongo.FilterRecordFromMongo."
+    "filter_records_from_mongo"
 )
 def test_filter_record_from_mongo(mock_filter_records_from_mongo):
     """
@@ -32,7 +198,10 @@ def test_filter_record_from_mongo(mock_filter_records_from_mongo):
     assert not response.result
 
 
-@patch("app.api.filter_records.services.FilterRecordFromSQL.filter_records_from_sql")
+@patch(
+    "app.workers.filter_records.filter_from_mysql.FilterRecordFromSQL."
+    "filter_records_from_sql"
+)
 def test_filter_record_from_sql(mock_filter_records_from_sql):
     """
     Test filter_record_from_sql
@@ -41,3 +210,734 @@ def test_filter_record_from_sql(mock_filter_records_from_sql):
     filter_request = FilterRequestModel(**{"dateRange": "2022-01-01 to 2022-01-02"})
     response = filter_record_from_sql(filter_request)
     assert not response.result
+
+
+@patch(
+    "app.workers.filter_records.filter_from_mongo.FilterRecordFromMongo."
+    "filter_records_from_mongo"
+)
+def test_filter_record_from_mongo_circuit_breaker(mock_filter_records_from_mongo):
+    """
+    Test the requests fail fast once MongoDB failed enough requests in a row,
+    the requests running out of time leaving the circuit closed
+    """
+    breaker = CircuitBreaker(
+        "mongodb",
+        failure_threshold=2,
+        reset_timeout=10,
+        failure_exceptions=(MongoDBConnectionError,),
+    )
+    filter_request = FilterRequestModel(**{"dateRange": "2022-01-01 to 2022-01-02"})
+    mock_filter_records_from_mongo.side_effect = DeadlineExceededError(
+        message="late", reason="timeout"
+    )
+
+    with patch.dict(
+        "app.api.filter_records.services.circuit_breakers", {"mongodb": breaker}
+    ):
+        for _ in range(2):
+            with pytest.raises(DeadlineExceededError):
+                filter_record_from_mongo(filter_request)
+        assert backend_circuit_states()["mongodb"] == "closed"
+
+        mock_filter_records_from_mongo.side_effect = MongoDBConnectionError(
+            message="Error occured while connecting to MongoDB"
+        )
+        for _ in range(2):
+            with pytest.raises(MongoDBConnectionError):
+                filter_record_from_mongo(filter_request)
+        assert backend_circuit_states()["mongodb"] == "open"
+
+        with pytest.raises(BackendUnavailableError):
+            filter_record_from_mongo(filter_request)
+        assert mock_filter_records_from_mongo.call_count == 4
+
+
+@patch(
+    "app.workers.filter_records.filter_from_sqlite.FilterRecordFromSQLite."
+    "filter_records_from_sqlite"
+)
+@patch(
+    "app.workers.filter_records.filter_from_sqlite.FilterRecordFromSQLite."
+    "_FilterRecordFromSQLite__get_sqlite_connection"
+)
+def test_filter_record_from_sqlite(
+    mock_get_sqlite_connection, mock_filter_records_from_sqlite
+):
+    # pylint: disable=unused-argument
+    """
+    Test filter_record_from_sqlite
+    """
+    mock_filter_records_from_sqlite.return_value = FilterResponseModel(result=[])
+    filter_request = FilterRequestModel(**{"dateRange": "2022-01-01 to 2022-01-02"})
+    response = filter_record_from_sqlite(filter_request)
+    assert not response.result
+
+
+@patch(
+    "app.workers.filter_records.filter_from_parquet.FilterRecordFromParquet."
+    "filter_records_from_parquet"
+)
+def test_filter_record_from_parquet(mock_filter_records_from_parquet):
+    """
+    Test filter_record_from_parquet
+    """
+    mock_filter_records_from_parquet.return_value = FilterResponseModel(result=[])
+    filter_request = FilterRequestModel(**{"dateRange": "2022-01-01 to 2022-01-02"})
+    response = filter_record_from_parquet(filter_request)
+    assert not response.result
+
+
+class TestFilterRecordFromAll:
+    """
+    Test filter_record_from_all
+    """
+
+    filter_request = FilterRequestModel(**{"dateRange": "2022-01-01 to 2022-01-02"})
+
+    def test_backends_are_merged_by_id(self):
+        """
+        Test the records of every backend are merged once per id
+        """
+        services = {
+            "json": lambda request: filter_response(1, 2),
+            "mongodb": lambda request: filter_response(2, 3),
+            "sql": lambda request: filter_response(3, 4),
+        }
+        with patch.dict("app.api.filter_records.services.FILTER_SERVICES", services):
+            response = filter_record_from_all(self.filter_request)
+
+        assert [record.id for record in response.result] == [1, 2, 3, 4]
+        assert [
+            (backend.backend, backend.status, backend.number_of_filtered_records)
+            for backend in response.backends
+        ] == [("json", "success", 2), ("mongodb", "success", 2), ("sql", "success", 2)]
+        assert not response.partial
+
+    def test_backends_run_concurrently(self):
+        """
+        Test the backends are queried at the same time
+        """
+        barrier = threading.Barrier(3, timeout=2)
+
+        def wait_for_all_backends(request):
+            # pylint: disable=unused-argument
+            barrier.wait()
+            return filter_response(1)
+
+        services = {
+            "json": wait_for_all_backends,
+            "mongodb": wait_for_all_backends,
+            "sql": wait_for_all_backends,
+        }
+        with patch.dict("app.api.filter_records.services.FILTER_SERVICES", services):
+            response = filter_record_from_all(self.filter_request)
+
+        assert {backend.status for backend in response.backends} == {"success"}
+
+    def test_failed_and_slow_backends_are_reported(self):
+        """
+        Test the response is partial when a backend fails or misses the deadline
+        """
+        release = threading.Event()
+
+        def failing_backend(request):
+            raise SQLConnectionError(message="MySQL connection error")
+
+        def slow_backend(request):
+            # pylint: disable=unused-argument
+            release.wait(2)
+            return filter_response(9)
+
+        services = {
+            "json": lambda request: filter_response(1),
+            "mongodb": slow_backend,
+            "sql": failing_backend,
+        }
+        started_at = time.perf_counter()
+        try:
+            with patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES", services
+            ):
+                response = filter_record_from_all(self.filter_request, timeout=0.2)
+        finally:
+            release.set()
+
+        assert time.perf_counter() - started_at < 1
+        assert [record.id for record in response.result] == [1]
+        statuses = {backend.backend: backend for backend in response.backends}
+        assert statuses["json"].status == "success"
+        assert statuses["mongodb"].status == "timeout"
+        assert statuses["mongodb"].latency_ms == 200
+        assert statuses["sql"].status == "error"
+        assert statuses["sql"].error == "MySQL connection error"
+        assert response.partial
+
+    def test_backends_are_given_up_at_request_deadline(self):
+        """
+        Test the backends are waited for until the deadline of the request at
+        the latest
+        """
+        release = threading.Event()
+        services = {
+            "json": lambda request: filter_response(1),
+            "mongodb": lambda request: release.wait(2),
+            "sql": lambda request: filter_response(2),
+        }
+        deadline_token = current_deadline_ctx.set(RequestDeadline(0.2))
+        try:
+            with patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES", services
+            ):
+                response = filter_record_from_all(self.filter_request, timeout=5)
+        finally:
+            release.set()
+            current_deadline_ctx.reset(deadline_token)
+
+        statuses = {backend.backend: backend for backend in response.backends}
+        assert statuses["mongodb"].status == "timeout"
+        assert statuses["mongodb"].latency_ms <= 200
+        assert [record.id for record in response.result] == [1, 2]
+
+    def test_request_context_is_kept(self):
+        """
+        Test the backends log with the request id of the request
+        """
+        request_ids = []
+
+        def record_request_id(request):
+            # pylint: disable=unused-argument
+            request_ids.append(current_request_id_ctx.get())
+            return filter_response()
+
+        token = current_request_id_ctx.set("federated-request")
+        try:
+            with patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES",
+                {"json": record_request_id},
+            ):
+                filter_record_from_all(self.filter_request, backends=["json"])
+        finally:
+            current_request_id_ctx.reset(token)
+
+        assert request_ids == ["federated-request"]
+
+    def test_disabled_backends_are_skipped(self):
+        """
+        Test only the enabled backends are queried, and none enabled is an error
+        """
+        with (
+            patch.object(settings, "APP_BACKENDS", "json"),
+            patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES",
+                {"json": lambda request: filter_response(1)},
+            ),
+        ):
+            response = filter_record_from_all(self.filter_request)
+
+        assert [backend.backend for backend in response.backends] == ["json"]
+
+        with patch.object(settings, "APP_BACKENDS", "sqlite"):
+            with pytest.raises(BackendNotEnabledError):
+                filter_record_from_all(self.filter_request)
+
+    def test_overloaded_backends_are_reported(self):
+        """
+        Test a backend at its limits is reported failed without being queried
+        """
+        services = {
+            "json": lambda request: filter_response(1),
+            "mongodb": lambda request: filter_response(2),
+            "sql": lambda request: filter_response(3),
+        }
+        with (
+            patch.dict("app.api.filter_records.services.FILTER_SERVICES", services),
+            patch.object(
+                bulkheads["sql"],
+                "submit",
+                side_effect=BackendOverloadedError(
+                    message="Backend sql is overloaded, retry later", retry_after=1
+                ),
+            ),
+        ):
+            response = filter_record_from_all(self.filter_request)
+
+        assert [record.id for record in response.result] == [1, 2]
+        assert [(backend.status, backend.error) for backend in response.backends][
+            2
+        ] == ("error", "Backend sql is overloaded, retry later")
+        assert response.partial
+
+
+@patch("app.api.filter_records.services.hedge_delay", return_value=0.01)
+class TestRunFilterRecord:
+    # pylint: disable=unused-argument
+    """
+    Test run_filter_record
+    """
+
+    @staticmethod
+    def filter_request(user_id: str = "user") -> FilterRequestModel:
+        """Filter request of a user, the requests of distinct users never shared"""
+        return FilterRequestModel(
+            **{"dateRange": "2022-01-01 to 2022-01-02", "userId": user_id}
+        )
+
+    @staticmethod
+    def versioned_response(*record_ids: int) -> FilterResponseModel:
+        """Filter response of the JSON dataset"""
+        response = filter_response(*record_ids)
+        response.dataset_version = "json@20220101T000000"
+        return response
+
+    @staticmethod
+    def record_ids(response) -> list:
+        """Ids of the records of a serialized filter response"""
+        return [record["_id"] for record in json.loads(response.body)["result"]]
+
+    def run_filter_record(self, backend, filter_service, user_id="user"):
+        """Run the filter request of the user on a new event loop"""
+        return asyncio.run(
+            run_filter_record(backend, filter_service, self.filter_request(user_id))
+        )
+
+    def test_no_hedge_without_policy(self, mock_hedge_delay):
+        """
+        Test the backend is queried alone when it has no hedge
+        """
+        with patch.object(settings, "HEDGE_POLICY", ""):
+            response = self.run_filter_record(
+                "mongodb", lambda request: filter_response(1)
+            )
+
+        assert self.record_ids(response) == [1]
+        assert response.headers["X-Dataset-Version"] == "mongodb@live"
+        mock_hedge_delay.assert_not_called()
+
+    def test_fast_primary_is_not_hedged(self, mock_hedge_delay):
+        """
+        Test a primary answering within the hedge delay is not hedged
+        """
+        hedge_calls = []
+        with (
+            patch.object(settings, "HEDGE_POLICY", "mongodb:json"),
+            patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES",
+                {"json": hedge_calls.append},
+            ),
+        ):
+            mock_hedge_delay.return_value = 2
+            response = self.run_filter_record(
+                "mongodb", lambda request: filter_response(1)
+            )
+
+        assert self.record_ids(response) == [1]
+        assert response.headers["X-Dataset-Version"] == "mongodb@live"
+        assert not hedge_calls
+
+    def test_slow_primary_is_hedged(self, mock_hedge_delay):
+        """
+        Test the hedge answers when the primary runs past the hedge delay
+        """
+        release = threading.Event()
+
+        def slow_primary(request):
+            release.wait(2)
+            return filter_response(1)
+
+        hedges = FILTER_HEDGED_REQUESTS.values.get(("mongodb", "json", "hedge"), 0)
+        try:
+            with (
+                patch.object(settings, "HEDGE_POLICY", "mongodb:json"),
+                patch.dict(
+                    "app.api.filter_records.services.FILTER_SERVICES",
+                    {"json": lambda request: self.versioned_response(2)},
+                ),
+            ):
+                response = self.run_filter_record(
+                    "mongodb", slow_primary, user_id="slow_primary"
+                )
+        finally:
+            release.set()
+
+        assert self.record_ids(response) == [2]
+        assert response.headers["X-Dataset-Version"] == "json@20220101T000000"
+        assert FILTER_HEDGED_REQUESTS.values[("mongodb", "json", "hedge")] == (
+            hedges + 1
+        )
+
+    def test_failed_primary_after_hedge(self, mock_hedge_delay):
+        """
+        Test the hedge answers when the hedged primary fails
+        """
+        hedge_sent = threading.Event()
+
+        def failing_primary(request):
+            hedge_sent.wait(2)
+            raise MongoDBConnectionError(message="MongoDB connection error")
+
+        def hedge(request):
+            hedge_sent.set()
+            return filter_response(3)
+
+        with (
+            patch.object(settings, "HEDGE_POLICY", "mongodb:sql"),
+            patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES", {"sql": hedge}
+            ),
+        ):
+            response = self.run_filter_record("mongodb", failing_primary)
+
+        assert self.record_ids(response) == [3]
+        assert response.headers["X-Dataset-Version"] == "sql@live"
+
+    def test_fast_failing_primary_falls_through(self, mock_hedge_delay):
+        """
+        Test a primary failing before the hedge delay, like behind an open
+        circuit, is hedged right away instead of failing the request
+        """
+
+        def unavailable_primary(request):
+            raise BackendUnavailableError(
+                message="Backend mongodb is unavailable, retry later", retry_after=1
+            )
+
+        mock_hedge_delay.return_value = 2
+        started_at = time.perf_counter()
+        with (
+            patch.object(settings, "HEDGE_POLICY", "mongodb:json"),
+            patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES",
+                {"json": lambda request: self.versioned_response(4)},
+            ),
+        ):
+            response = self.run_filter_record("mongodb", unavailable_primary)
+
+        assert time.perf_counter() - started_at < 1
+        assert self.record_ids(response) == [4]
+        assert response.headers["X-Dataset-Version"] == "json@20220101T000000"
+
+    def test_shed_primary_falls_through(self, mock_hedge_delay):
+        """
+        Test a primary at its limits is hedged right away
+        """
+        mock_hedge_delay.return_value = 2
+        with (
+            patch.object(settings, "HEDGE_POLICY", "mongodb:json"),
+            patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES",
+                {"json": lambda request: self.versioned_response(5)},
+            ),
+            patch.object(
+                bulkheads["mongodb"],
+                "submit",
+                side_effect=BackendOverloadedError(
+                    message="Backend mongodb is overloaded, retry later",
+                    retry_after=1,
+                ),
+            ),
+        ):
+            response = self.run_filter_record(
+                "mongodb", lambda request: filter_response(1)
+            )
+
+        assert self.record_ids(response) == [5]
+
+    def test_shed_hedge_is_no_hedge(self, mock_hedge_delay):
+        """
+        Test a secondary at its limits is not hedged to, the request waiting
+        for its primary and not counted as hedged
+        """
+
+        def slow_primary(request):
+            time.sleep(0.1)
+            return filter_response(1)
+
+        hedged = sum(
+            count
+            for labels, count in FILTER_HEDGED_REQUESTS.snapshot().items()
+            if labels[:2] == ("mongodb", "json")
+        )
+        with (
+            patch.object(settings, "HEDGE_POLICY", "mongodb:json"),
+            patch.object(
+                bulkheads["json"],
+                "submit",
+                side_effect=BackendOverloadedError(
+                    message="Backend json is overloaded, retry later",
+                    retry_after=1,
+                ),
+            ) as mock_hedge_submit,
+        ):
+            response = self.run_filter_record(
+                "mongodb", slow_primary, user_id="shed_hedge"
+            )
+
+        assert self.record_ids(response) == [1]
+        assert response.headers["X-Dataset-Version"] == "mongodb@live"
+        mock_hedge_submit.assert_called_once()
+        assert (
+            sum(
+                count
+                for labels, count in FILTER_HEDGED_REQUESTS.snapshot().items()
+                if labels[:2] == ("mongodb", "json")
+            )
+            == hedged
+        )
+
+    def test_both_failing(self, mock_hedge_delay):
+        """
+        Test the error of the primary is raised when neither backend answers
+        """
+
+        def failing_primary(request):
+            time.sleep(0.05)
+            raise MongoDBConnectionError(message="MongoDB connection error")
+
+        def failing_hedge(request):
+            raise SQLConnectionError(message="SQL connection error")
+
+        with (
+            patch.object(settings, "HEDGE_POLICY", "mongodb:sql"),
+            patch.dict(
+                "app.api.filter_records.services.FILTER_SERVICES",
+                {"sql": failing_hedge},
+            ),
+        ):
+            with pytest.raises(MongoDBConnectionError):
+                self.run_filter_record("mongodb", failing_primary)
+
+    def test_no_hedge_to_disabled_backend(self, mock_hedge_delay):
+        """
+        Test a request is not hedged to a backend disabled on this host
+        """
+        with (
+            patch.object(settings, "HEDGE_POLICY", "mongodb:json"),
+            patch.object(settings, "APP_BACKENDS", "mongodb"),
+        ):
+            response = self.run_filter_record(
+                "mongodb", lambda request: filter_response(1)
+            )
+
+        assert response.headers["X-Dataset-Version"] == "mongodb@live"
+        mock_hedge_delay.assert_not_called()
+
+    def test_slow_hedged_backend_does_not_delay_others(self, mock_hedge_delay):
+        """
+        Test the primaries and hedges of a slow hedged backend only take the
+        threads of their own backends, so an unrelated hedged backend still
+        answers right away
+        """
+        release = threading.Event()
+
+        def slow_service(request):
+            release.wait(5)
+            return filter_response(1)
+
+        async def slow_and_fast_requests():
+            slow_requests = [
+                asyncio.ensure_future(
+                    run_filter_record(
+                        "mongodb", slow_service, self.filter_request(f"slow_{index}")
+                    )
+                )
+                for index in range(bulkheads["mongodb"].max_workers)
+            ]
+            # the slow requests are hedged and take every thread of both backends
+            await asyncio.sleep(0.1)
+            started_at = time.perf_counter()
+            response = await run_filter_record(
+                "sqlite", lambda request: filter_response(6), self.filter_request()
+            )
+            duration = time.perf_counter() - started_at
+            release.set()
+            await asyncio.gather(*slow_requests)
+            return response, duration
+
+        try:
+            with (
+                patch.object(settings, "HEDGE_POLICY", "mongodb:json,sqlite:parquet"),
+                patch.dict(
+                    "app.api.filter_records.services.FILTER_SERVICES",
+                    {"json": slow_service},
+                ),
+            ):
+                response, duration = asyncio.run(slow_and_fast_requests())
+        finally:
+            release.set()
+
+        assert self.record_ids(response) == [6]
+        assert duration < 0.5
+
+
+def test_hedge_delay():
+    """
+    Test the hedge delay is the default one until the backend latency quantile
+    is observed enough, and never beyond the max delay
+    """
+    durations = Histogram("durations", "Durations", ["backend"], buckets=[0.1, 1])
+    with patch("app.api.filter_records.services.FILTER_REQUEST_DURATION", durations):
+        assert hedge_delay("mongodb") == 0.1
+
+        for _ in range(19):
+            durations.observe(0.5, backend="mongodb")
+        assert hedge_delay("mongodb") == 0.1
+
+        durations.observe(0.5, backend="mongodb")
+        assert hedge_delay("mongodb") == 1
+
+        for _ in range(20):
+            durations.observe(30, backend="mongodb")
+        assert hedge_delay("mongodb") == 1.0
+
+
+class TestFilterRecordResponse:
+    """
+    Test filter_record_response
+    """
+
+    filter_request = FilterRequestModel(
+        **{"dateRange": "2022-01-01 to 2022-01-02", "userId": "user"}
+    )
+
+    def test_identical_requests_are_coalesced(self):
+        """
+        Test identical requests in flight query the backend once and share its
+        serialized response
+        """
+        release = threading.Event()
+        calls = []
+        responses = []
+
+        def slow_service(request):
+            calls.append(request)
+            release.wait(2)
+            return filter_response(1, 2)
+
+        def send_request():
+            responses.append(
+                filter_record_response(
+                    "mongodb",
+                    slow_service,
+                    FilterRequestModel(
+                        **{"userId": "user", "dateRange": "2022-01-01 to 2022-01-02"}
+                    ),
+                )
+            )
+
+        threads = [threading.Thread(target=send_request) for _ in range(4)]
+        threads[0].start()
+        key = ("mongodb", "live", filter_request_key(self.filter_request))
+        wait_for_flight(key, 0)
+        for thread in threads[1:]:
+            thread.start()
+        wait_for_flight(key, 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert len({response.body for response in responses}) == 1
+        assert {response.headers["X-Dataset-Version"] for response in responses} == {
+            "mongodb@live"
+        }
+        assert FILTER_SINGLE_FLIGHT_REQUESTS.values[("mongodb", "follower")] >= 3
+        assert 0 < FILTER_COALESCING_RATIO.values[("mongodb",)] < 1
+
+    def test_follower_of_abandoned_request_runs_on_its_own(self):
+        """
+        Test a request sharing one whose client disconnected runs on its own
+        instead of failing with it
+        """
+        release = threading.Event()
+        calls = []
+        errors = []
+        responses = []
+
+        def slow_service(request):
+            calls.append(request)
+            release.wait(2)
+            check_deadline()
+            return filter_response(1)
+
+        def send_abandoned_request():
+            deadline = RequestDeadline(10)
+            deadline.cancelled.set()
+            current_deadline_ctx.set(deadline)
+            try:
+                filter_record_response("mongodb", slow_service, self.filter_request)
+            except DeadlineExceededError as exc:
+                errors.append(exc)
+
+        leader = threading.Thread(target=send_abandoned_request)
+        follower = threading.Thread(
+            target=lambda: responses.append(
+                filter_record_response("mongodb", slow_service, self.filter_request)
+            )
+        )
+        key = ("mongodb", "live", filter_request_key(self.filter_request))
+        leader.start()
+        wait_for_flight(key, 0)
+        follower.start()
+        wait_for_flight(key, 1)
+        release.set()
+        leader.join()
+        follower.join()
+
+        assert [error.reason for error in errors] == ["cancelled"]
+        assert len(calls) == 2
+        assert len(responses) == 1
+
+    def test_different_requests_are_not_coalesced(self):
+        """
+        Test requests for other records or another generation of the records
+        execute on their own
+        """
+        other_request = FilterRequestModel(
+            **{"dateRange": "2022-01-01 to 2022-01-02", "userId": "other_user"}
+        )
+
+        assert filter_request_key(other_request) != filter_request_key(
+            self.filter_request
+        )
+
+        with (
+            patch(
+                "app.api.filter_records.services.dataset_generation",
+                side_effect=["1:1", "2:2"],
+            ),
+            patch.object(
+                filter_single_flight, "do", wraps=filter_single_flight.do
+            ) as mock_do,
+        ):
+            for _ in range(2):
+                filter_record_response(
+                    "json", lambda request: filter_response(1), self.filter_request
+                )
+
+        assert [call.args[0][1] for call in mock_do.call_args_list] == ["1:1", "2:2"]
+
+    def test_dataset_generation(self, tmp_path):
+        """
+        Test the generation of a file backend follows its published file
+        """
+        with patch("app.api.filter_records.services.RECORD_STORAGE_DIR", str(tmp_path)):
+            assert dataset_generation("json") == "missing"
+            (tmp_path / RECORD_FILE_NAME).write_text("[]", encoding="UTF-8")
+            generation = dataset_generation("json")
+            (tmp_path / RECORD_FILE_NAME).write_text("[ ]", encoding="UTF-8")
+
+            assert dataset_generation("json") != generation
+            assert dataset_generation("mongodb") == "live"
+
+
+def wait_for_flight(key: tuple, waiters: int) -> None:
+    """Wait until the given number of requests joined the flight of the key"""
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        with filter_single_flight.lock:
+            flight = filter_single_flight.flights.get(key)
+            if flight is not None and flight.waiters == waiters:
+                return
+        time.sleep(0.001)
+    raise AssertionError(f"{waiters} requests never joined the flight of {key}")
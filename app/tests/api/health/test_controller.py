@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.health.services import warm_up_done
+from app.core.config import settings
+from app.core.constants import TEST_TOKEN
+from app.custom_exceptions.circuit_breaker_exceptions import BackendUnavailableError
+from app.main import app
+from app.utils.circuit_breaker_helper import CircuitBreaker
+
+client = TestClient(app)
+
+
+def open_breaker(backend: str) -> CircuitBreaker:
+    """
+    Circuit breaker of the backend, open
+    """
+    breaker = CircuitBreaker(backend, failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    return breaker
+
+
+@pytest.fixture
+def warmed_up():
+    """
+    App warmed up for the test
+    """
+    warm_up_done.set()
+    yield
+    warm_up_done.clear()
+
+
+def test_not_ready_while_warming_up():
+    """
+    Test the app is not ready until it is warmed up
+    """
+    with patch.object(settings, "APP_BACKENDS", "json"):
+        response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json() == {
+        "ready": False,
+        "warm": False,
+        "backends": {"json": "closed"},
+    }
+
+
+def test_ready(warmed_up):
+    # pylint: disable=redefined-outer-name, unused-argument
+    """
+    Test the app is ready while a backend is available, and reports the
+    circuit state of every backend
+    """
+    with (
+        patch.object(settings, "APP_BACKENDS", "json,mongodb"),
+        patch.dict(
+            "app.api.filter_records.services.circuit_breakers",
+            {"mongodb": open_breaker("mongodb")},
+        ),
+    ):
+        response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "ready": True,
+        "warm": True,
+        "backends": {"json": "closed", "mongodb": "open"},
+    }
+
+
+def test_not_ready(warmed_up):
+    # pylint: disable=redefined-outer-name, unused-argument
+    """
+    Test the app is not ready once every backend is unavailable
+    """
+    with (
+        patch.object(settings, "APP_BACKENDS", "mongodb,sql"),
+        patch.dict(
+            "app.api.filter_records.services.circuit_breakers",
+            {"mongodb": open_breaker("mongodb"), "sql": open_breaker("sql")},
+        ),
+    ):
+        response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json() == {
+        "ready": False,
+        "warm": True,
+        "backends": {"mongodb": "open", "sql": "open"},
+    }
+
+
+@patch("app.utils.api_token_helper.api_keys", [TEST_TOKEN])
+@patch("app.api.filter_records.controller.filter_record_from_mongo")
+def test_unavailable_backend(mock_filter_record_from_mongo):
+    """
+    Test a request to a backend behind an open circuit is a 503 to retry after
+    the cool-down
+    """
+    mock_filter_record_from_mongo.side_effect = BackendUnavailableError(
+        message="Backend mongodb is unavailable, retry later", retry_after=7
+    )
+
+    response = client.post(
+        "/filterRecords/fromMongo",
+        json={"dateRange": "2020-01-01 to 2020-01-02"},
+        headers={"x-api-key": TEST_TOKEN},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert response.json() == {"detail": "Backend mongodb is unavailable, retry later"}
@@ -0,0 +1,169 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app.api.filter_records.models import FilterResponseModel
+from app.api.health.services import (
+    load_warm_up_queries,
+    replay_warm_up_queries,
+    start_warm_up,
+    warm_up,
+    warm_up_done,
+)
+from app.core.config import settings
+from app.utils.bulkhead_helper import Bulkhead
+from app.utils.metrics_helper import APP_WARM_UP_DURATION
+
+
+@pytest.fixture(autouse=True)
+def reset_warm_up():
+    """
+    App not warmed up at the start of every test
+    """
+    warm_up_done.clear()
+    yield
+    warm_up_done.clear()
+
+
+@patch("app.api.health.services.enabled_backends", return_value=["json"])
+def test_warm_up_runs_on_every_thread(mock_enabled_backends):
+    # pylint: disable=unused-argument
+    """
+    Test the warm-up filter runs once on every thread of the backend
+    """
+    threads = []
+
+    def warm_up_filter(request):
+        threads.append(threading.current_thread().name)
+        return FilterResponseModel(result=[])
+
+    with (
+        patch.dict(
+            "app.api.health.services.bulkheads",
+            {"json": Bulkhead("test_warm_up", 3, 0, 1)},
+        ),
+        patch.dict("app.api.health.services.FILTER_SERVICES", {"json": warm_up_filter}),
+        patch.object(settings, "WARM_UP_QUERIES_FILE", ""),
+    ):
+        warm_up()
+
+    assert len(threads) == 3
+    assert len(set(threads)) == 3
+    assert warm_up_done.is_set()
+    assert APP_WARM_UP_DURATION.values[()] > 0
+
+
+@patch("app.api.health.services.enabled_backends", return_value=["json"])
+def test_warm_up_is_not_micro_batched(mock_enabled_backends):
+    # pylint: disable=unused-argument
+    """
+    Test the warm-up filter runs on every thread of a micro batched backend,
+    rather than in one batch on a single thread
+    """
+    threads = []
+
+    def filter_records_from_json():
+        threads.append(threading.current_thread().name)
+        return FilterResponseModel(result=[])
+
+    with (
+        patch.dict(
+            "app.api.health.services.bulkheads",
+            {"json": Bulkhead("test_warm_up", 3, 0, 1)},
+        ),
+        patch(
+            "app.workers.filter_records.filter_from_json.FilterRecordFromJSON."
+            "filter_records_from_json",
+            side_effect=filter_records_from_json,
+        ),
+        patch(
+            "app.workers.filter_records.filter_from_json.FilterRecordFromJSON."
+            "filter_records_batch_from_json"
+        ) as mock_filter_records_batch_from_json,
+        patch.object(settings, "MICRO_BATCH_BACKENDS", "json"),
+        patch.object(settings, "WARM_UP_QUERIES_FILE", ""),
+    ):
+        warm_up()
+
+    assert len(set(threads)) == 3
+    mock_filter_records_batch_from_json.assert_not_called()
+
+
+@patch("app.api.health.services.enabled_backends", return_value=["json"])
+def test_failed_warm_up_is_ready(mock_enabled_backends):
+    # pylint: disable=unused-argument
+    """
+    Test the app is ready once warmed up even when a backend failed it
+    """
+
+    def failing_filter(request):
+        raise ConnectionError("backend down")
+
+    with (
+        patch.dict(
+            "app.api.health.services.bulkheads",
+            {"json": Bulkhead("test_failed_warm_up", 2, 0, 1)},
+        ),
+        patch.dict("app.api.health.services.FILTER_SERVICES", {"json": failing_filter}),
+        patch.object(settings, "WARM_UP_QUERIES_FILE", "missing_queries.jsonl"),
+    ):
+        warm_up()
+
+    assert warm_up_done.is_set()
+
+
+@patch("app.api.health.services.enabled_backends", return_value=["json", "sql"])
+@patch("app.api.health.services.filter_record_response")
+def test_replay_warm_up_queries(
+    mock_filter_record_response, mock_enabled_backends, tmp_path
+):
+    # pylint: disable=unused-argument
+    """
+    Test the warm-up queries are replayed on their backends, the ones of
+    disabled or unknown endpoints and the invalid ones skipped
+    """
+    queries_file = tmp_path / "warm_up_queries.jsonl"
+    queries_file.write_text(
+        "\n".join(
+            [
+                json.dumps({"dateRange": "2020-01-01 to 2020-01-02"}),
+                "",
+                json.dumps(
+                    {
+                        "endpoint": "fromSQL",
+                        "body": {"dateRange": "2020-01-01 to 2020-01-02"},
+                    }
+                ),
+                json.dumps(
+                    {
+                        "endpoint": "fromMongo",
+                        "body": {"dateRange": "2020-01-01 to 2020-01-02"},
+                    }
+                ),
+                json.dumps({"endpoint": "fromAll", "body": {}}),
+                json.dumps({"dateRange": "2020-01-02 to 2020-01-01"}),
+            ]
+        ),
+        encoding="UTF-8",
+    )
+
+    queries = load_warm_up_queries(str(queries_file))
+
+    assert len(queries) == 5
+    assert replay_warm_up_queries(queries) == 2
+    assert [call.args[0] for call in mock_filter_record_response.call_args_list] == [
+        "json",
+        "sql",
+    ]
+
+
+def test_warm_up_disabled():
+    """
+    Test the app is ready right away when the warm-up is disabled
+    """
+    with patch.object(settings, "WARM_UP_ENABLED", False):
+        start_warm_up()
+
+    assert warm_up_done.is_set()
@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.api.filter_records.models import FilterResponseModel
+from app.core.constants import TEST_TOKEN
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_metrics():
+    """
+    Test the metrics are exposed in the Prometheus text format
+    """
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE filter_stage_duration_seconds histogram" in response.text
+    assert "# TYPE mysql_thread_connections gauge" in response.text
+
+
+@patch("app.utils.api_token_helper.api_keys", [TEST_TOKEN])
+@patch("app.api.filter_records.controller.filter_record_from_json")
+def test_metrics_serialization_stage(mock_filter_record_from_json):
+    """
+    Test the serialization of a filter response is timed
+    """
+    mock_filter_record_from_json.return_value = FilterResponseModel(result=[])
+
+    response = client.post(
+        "/filterRecords/fromJson",
+        json={"dateRange": "2020-01-01 to 2020-01-02"},
+        headers={"x-api-key": TEST_TOKEN},
+    )
+
+    assert response.json() == {"result": [], "numberOfFilteredRecords": 0}
+    assert 'stage="serialization"' in client.get("/metrics").text
@@ -0,0 +1,137 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.benchmarks.filter_benchmark import (
+    build_filter_matrix,
+    compare_to_baseline,
+    main,
+    percentile,
+    run_benchmarks,
+)
+
+RECORD = {
+    "_id": 1,
+    "originationTime": 1583150400,
+    "clusterId": "domainserver1",
+    "userId": "123456789",
+    "devices": {"phone": "SEP1234567891", "voicemail": "123456789VM"},
+}
+
+
+@pytest.mark.parametrize(
+    "percent, expected", [(50, 50), (95, 95), (99, 99), (100, 100), (1, 1)]
+)
+def test_percentile(percent, expected):
+    """
+    Test the nearest-rank percentile
+    """
+    assert percentile(list(range(100, 0, -1)), percent) == expected
+
+
+def test_build_filter_matrix():
+    """
+    Test the filter matrix covers the date ranges, every field and the OR of them
+    """
+    matrix = build_filter_matrix(RECORD)
+
+    assert matrix["date_narrow"].date_range.endswith(" to 2020-03-03")
+    assert matrix["date_wide"].date_range == "2020-01-01 to 2020-12-31"
+    assert matrix["field_userId"].user_id == "123456789"
+    assert matrix["field_cluster"].cluster == "domainserver1"
+    assert matrix["field_phoneNumber"].phone_number == "SEP1234567891"
+    assert matrix["field_voiceMail"].voice_mail == "123456789VM"
+    assert matrix["multi_field_or"].user_id == "123456789"
+    assert matrix["multi_field_or"].voice_mail == "123456789VM"
+
+
+def test_compare_to_baseline():
+    """
+    Test only regressions beyond the tolerance are reported
+    """
+    baseline = {
+        "10k/json/date_wide": {"p95_ms": 100, "throughput_rps": 10},
+        "10k/json/date_narrow": {"p95_ms": 100, "throughput_rps": 10},
+    }
+    results = {
+        "10k/json/date_wide": {"p95_ms": 115, "throughput_rps": 9},
+        "10k/json/date_narrow": {"p95_ms": 130, "throughput_rps": 7},
+        "10k/json/field_userId": {"p95_ms": 1000, "throughput_rps": 1},
+    }
+
+    regressions = compare_to_baseline(results, baseline, tolerance=0.2)
+
+    assert len(regressions) == 2
+    assert all(
+        regression.startswith("10k/json/date_narrow") for regression in regressions
+    )
+
+
+def test_run_benchmarks_on_json():
+    """
+    Test a small seeded benchmark run on the JSON backend
+    """
+    results = run_benchmarks({"tiny": 300}, ["json"], repeats=3, seed=1)
+
+    assert len(results) == 8
+    for key, result in results.items():
+        assert key.startswith("tiny/json/")
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert result["throughput_rps"] > 0
+        assert result["peak_rss_mb"] > 0
+    assert results["tiny/json/date_wide"]["rows"] == 300
+    assert results["tiny/json/field_userId"]["rows"] >= 1
+
+
+@patch("app.benchmarks.filter_benchmark.backend_available")
+def test_run_benchmarks_skips_unavailable_backends(mock_backend_available):
+    """
+    Test backends without a reachable server are left out
+    """
+    mock_backend_available.return_value = False
+
+    assert not run_benchmarks({"tiny": 10}, ["mongodb", "sql"], repeats=1)
+
+
+class TestMain:
+    """
+    Test the benchmark entry point
+    """
+
+    def run_main(self, tmp_path, *extra_args):
+        """
+        Run main with a mocked benchmark run
+        """
+        argv = ["filter_benchmark", "--baseline", str(tmp_path / "baseline.json")]
+        with patch("sys.argv", argv + list(extra_args)):
+            with patch("app.benchmarks.filter_benchmark.app_logger"):
+                with patch(
+                    "app.benchmarks.filter_benchmark.run_benchmarks"
+                ) as mock_run_benchmarks:
+                    mock_run_benchmarks.return_value = {
+                        "10k/json/date_wide": {"p95_ms": 100, "throughput_rps": 10}
+                    }
+                    main()
+
+    def test_update_then_check_baseline(self, tmp_path):
+        """
+        Test the baseline is written and a run matching it passes
+        """
+        self.run_main(tmp_path, "--update_baseline")
+        with open(tmp_path / "baseline.json", "r", encoding="UTF-8") as file:
+            assert json.load(file)["10k/json/date_wide"]["p95_ms"] == 100
+
+        self.run_main(tmp_path)
+
+    def test_regression_fails(self, tmp_path):
+        """
+        Test a run slower than the baseline exits with an error
+        """
+        with open(tmp_path / "baseline.json", "w", encoding="UTF-8") as file:
+            json.dump(
+                {"10k/json/date_wide": {"p95_ms": 10, "throughput_rps": 100}}, file
+            )
+
+        with pytest.raises(SystemExit):
+            self.run_main(tmp_path)
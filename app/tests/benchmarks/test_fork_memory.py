@@ -0,0 +1,104 @@
+import gc
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.benchmarks.filter_benchmark import (
+    build_filter_matrix,
+    sample_record,
+    seed_dataset,
+)
+from app.benchmarks.fork_memory import main, measure_fork_memory, private_memory_kb
+from app.core.constants import FORK_MEMORY_SMAPS_FILE
+from app.workers.filter_records import filter_from_json
+
+RECORD = {
+    "_id": 1,
+    "originationTime": 1583150400,
+    "clusterId": "domainserver1",
+    "userId": "123456789",
+    "devices": {"phone": "SEP1234567891", "voicemail": "123456789VM"},
+}
+
+SMAPS_ROLLUP = """55d0c0a00000-7ffd3b1f2000 ---p 00000000 00:00 0    [rollup]
+Rss:               20480 kB
+Pss:               12288 kB
+Shared_Clean:       4096 kB
+Shared_Dirty:       4096 kB
+Private_Clean:      2048 kB
+Private_Dirty:     10240 kB
+Swap:                  0 kB
+"""
+
+
+def test_private_memory_kb(tmp_path):
+    """
+    Test the USS is the private clean and dirty pages of the process
+    """
+    smaps_path = tmp_path / "smaps_rollup"
+    smaps_path.write_text(SMAPS_ROLLUP, encoding="UTF-8")
+
+    with patch("app.benchmarks.fork_memory.FORK_MEMORY_SMAPS_FILE", str(smaps_path)):
+        assert private_memory_kb() == {"uss_kb": 12288, "private_dirty_kb": 10240}
+
+
+@pytest.mark.skipif(
+    not os.path.exists(FORK_MEMORY_SMAPS_FILE) or not hasattr(os, "fork"),
+    reason="needs fork and the smaps of the process",
+)
+def test_wide_scan_keeps_the_dataset_shared(tmp_path):
+    """
+    Test a forked worker scanning every preloaded record copies only a small
+    part of the dataset out of the pages it shares with its parent
+    """
+    filter_from_json._dataset_cache.clear()  # pylint: disable=W0212
+    with (
+        patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)),
+        patch(
+            "app.workers.filter_records.filter_from_json.RECORD_STORAGE_DIR",
+            str(tmp_path),
+        ),
+        patch("app.benchmarks.filter_benchmark.app_logger"),
+    ):
+        seed_dataset(50000, ["json"], seed=1, processes=1)
+        matrix = build_filter_matrix(sample_record(50000, 1))
+        try:
+            report = measure_fork_memory({"field_userId": matrix["field_userId"]})
+        finally:
+            gc.unfreeze()
+            filter_from_json._dataset_cache.clear()  # pylint: disable=W0212
+
+    measurement = report["shapes"]["field_userId"]
+    assert report["records"] == 50000
+    assert measurement["rows"] >= 1
+    assert measurement["uss_after_kb"] >= measurement["uss_before_kb"]
+    assert measurement["private_dirty_growth_kb"] < report["dataset_kb"] / 2
+
+
+def test_main_writes_the_report(tmp_path):
+    """
+    Test the report of the measured shapes is written to the output file
+    """
+    report = {"records": 10, "dataset_kb": 1, "shapes": {}}
+    output_path = tmp_path / "fork_memory.json"
+    argv = ["fork_memory", "--records", "10", "--output", str(output_path)]
+    with (
+        patch("sys.argv", argv),
+        patch("app.benchmarks.fork_memory.app_logger"),
+        patch("app.benchmarks.fork_memory.seed_dataset") as mock_seed_dataset,
+        patch("app.benchmarks.fork_memory.sample_record", return_value=RECORD),
+        patch(
+            "app.benchmarks.fork_memory.measure_fork_memory", return_value=report
+        ) as mock_measure_fork_memory,
+    ):
+        main()
+
+    mock_seed_dataset.assert_called_once_with(10, ["json"], 2020, processes=1)
+    assert list(mock_measure_fork_memory.call_args.args[0]) == [
+        "field_userId",
+        "date_wide",
+    ]
+    with open(output_path, "r", encoding="UTF-8") as output_file:
+        assert json.load(output_file) == report
@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.benchmarks.import_time import (
+    ImportTiming,
+    check_import_time,
+    main,
+    measure_import_time,
+    parse_import_time,
+    summarize_import_time,
+)
+
+IMPORT_TIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     pydantic.version
+import time:      3000 |       3120 |   pydantic
+import time:       376 |      70245 |     mysql.connector
+import time:      9817 |      90000 | app.main
+"""
+
+
+def test_parse_import_time():
+    """
+    Test the -X importtime report is parsed per module, skipping the header
+    """
+    timings = parse_import_time(IMPORT_TIME_OUTPUT)
+
+    assert list(timings) == [
+        "pydantic.version",
+        "pydantic",
+        "mysql.connector",
+        "app.main",
+    ]
+    assert timings["mysql.connector"] == ImportTiming("mysql.connector", 376, 70245)
+
+
+def test_summarize_import_time():
+    """
+    Test the summary totals the module and ranks the top level packages
+    """
+    summary = summarize_import_time(
+        parse_import_time(IMPORT_TIME_OUTPUT), "app.main", top=2
+    )
+
+    assert summary == {
+        "module": "app.main",
+        "total_ms": 90.0,
+        "modules": 4,
+        "top_packages_ms": {"app": 9.8, "pydantic": 3.1},
+    }
+
+
+def test_check_import_time():
+    """
+    Test the budget and the drivers of disabled backends are checked
+    """
+    timings = parse_import_time(IMPORT_TIME_OUTPUT)
+
+    assert not check_import_time(timings, "app.main", ["json", "sql"], 100)
+    assert check_import_time(timings, "app.main", ["json"], 50) == [
+        "app.main imports in 90.0ms > 50ms",
+        "mysql.connector is imported but sql is not enabled",
+    ]
+
+
+@patch("app.benchmarks.import_time.app_logger")
+@patch("app.benchmarks.import_time.measure_import_time")
+def test_main_fails_on_violation(mock_measure_import_time, mock_app_logger):
+    """
+    Test the check exits with an error when a disabled driver is imported
+    """
+    mock_measure_import_time.return_value = parse_import_time(IMPORT_TIME_OUTPUT)
+
+    with patch("sys.argv", ["import_time", "--backends", "json"]):
+        with pytest.raises(SystemExit):
+            main()
+
+    mock_measure_import_time.assert_called_once_with("app.main", ["json"])
+    mock_app_logger.error.assert_called_once()
+
+
+def test_measure_import_time_json_only():
+    """
+    Test the API imports no backend driver on a JSON only host
+    """
+    timings = measure_import_time("app.main", ["json"])
+
+    assert "app.main" in timings
+    assert "pymongo" not in timings
+    assert "mysql.connector" not in timings
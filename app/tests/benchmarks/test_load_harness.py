@@ -0,0 +1,132 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from app.api.filter_records.models import FilterResponseModel
+from app.benchmarks.load_harness import (
+    EndpointStats,
+    build_request_plan,
+    load_replay_log,
+    parse_mix,
+    run_load_test,
+)
+
+BODY = {"dateRange": "2020-01-01 to 2020-12-31"}
+
+
+def test_parse_mix():
+    """
+    Test the request mix is parsed into endpoint weights
+    """
+    assert parse_mix("fromJson=0.6, fromSQL=0.4") == {"fromJson": 0.6, "fromSQL": 0.4}
+    assert parse_mix("fromMongo") == {"fromMongo": 1.0}
+
+
+def test_endpoint_stats_report():
+    """
+    Test the endpoint report counts errors and fills the latency histogram
+    """
+    stats = EndpointStats()
+    for latency in [0.0005, 0.003, 0.003, 0.2]:
+        stats.record(latency, 200)
+    stats.record(7, None)
+    stats.record(0.01, 500)
+
+    report = stats.report(elapsed=2)
+
+    assert report["requests"] == 6
+    assert report["errors"] == 2
+    assert report["error_rate"] == round(2 / 6, 4)
+    assert report["throughput_rps"] == 3
+    assert report["status_codes"] == {"200": 4, "None": 1, "500": 1}
+    assert report["histogram_ms"]["<=1"] == 1
+    assert report["histogram_ms"]["<=5"] == 2
+    assert report["histogram_ms"]["<=10"] == 1
+    assert report["histogram_ms"]["<=200"] == 1
+    assert report["histogram_ms"][">5000"] == 1
+    assert report["max_ms"] == 7000
+
+
+class TestBuildRequestPlan:
+    """
+    Test build_request_plan function
+    """
+
+    def test_closed_loop_plan(self):
+        """
+        Test the closed loop plan follows the mix, reproducibly, with no arrivals
+        """
+        mix = {"fromJson": 3, "fromSQL": 1}
+        plan = build_request_plan([BODY], mix, 400, seed=1)
+
+        assert plan == build_request_plan([BODY], mix, 400, seed=1)
+        assert len(plan) == 400
+        assert all(entry["at"] is None for entry in plan)
+        json_share = sum(entry["endpoint"] == "fromJson" for entry in plan) / 400
+        assert 0.65 < json_share < 0.85
+
+    def test_open_loop_plan(self):
+        """
+        Test the open loop arrivals increase at about the requested rate
+        """
+        plan = build_request_plan([BODY], {"fromJson": 1}, 1000, rate=100, seed=1)
+        arrivals = [entry["at"] for entry in plan]
+
+        assert arrivals == sorted(arrivals)
+        assert 8 < arrivals[-1] < 12
+
+    def test_replay_plan(self, tmp_path):
+        """
+        Test replayed entries keep their endpoint and arrival offset
+        """
+        replay_file = tmp_path / "requests.jsonl"
+        replay_file.write_text(
+            json.dumps(BODY)
+            + "\n\n"
+            + json.dumps({"endpoint": "fromSQL", "body": BODY, "at": 0.5})
+            + "\n",
+            encoding="UTF-8",
+        )
+
+        replay = load_replay_log(str(replay_file))
+        plan = build_request_plan([], {"fromJson": 1}, 0, replay=replay)
+
+        assert plan == [
+            {"endpoint": "fromJson", "body": BODY, "at": None},
+            {"endpoint": "fromSQL", "body": BODY, "at": 0.5},
+        ]
+
+
+class TestRunLoadTest:
+    """
+    Test run_load_test against the in-process app
+    """
+
+    @patch("app.api.filter_records.controller.filter_record_from_json")
+    def test_closed_loop(self, mock_filter_record_from_json):
+        """
+        Test every planned request is sent and reported per endpoint
+        """
+        mock_filter_record_from_json.return_value = FilterResponseModel(result=[])
+        plan = build_request_plan([BODY, {"dateRange": "bad"}], {"fromJson": 1}, 10)
+
+        report = asyncio.run(run_load_test(plan, concurrency=3))
+
+        endpoint_report = report["endpoints"]["fromJson"]
+        assert endpoint_report["requests"] == 10
+        assert endpoint_report["status_codes"] == {"200": 5, "422": 5}
+        assert endpoint_report["error_rate"] == 0.5
+        assert mock_filter_record_from_json.call_count == 5
+
+    @patch("app.api.filter_records.controller.filter_record_from_json")
+    def test_open_loop(self, mock_filter_record_from_json):
+        """
+        Test the open loop run sends the requests at their arrival offsets
+        """
+        mock_filter_record_from_json.return_value = FilterResponseModel(result=[])
+        plan = build_request_plan([BODY], {"fromJson": 1}, 20, rate=200, seed=2)
+
+        report = asyncio.run(run_load_test(plan))
+
+        assert report["endpoints"]["fromJson"]["requests"] == 20
+        assert report["elapsed_seconds"] >= plan[-1]["at"]
@@ -0,0 +1,102 @@
+import contextvars
+import threading
+
+import pytest
+
+from app.custom_exceptions.bulkhead_exceptions import BackendOverloadedError
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.utils.bulkhead_helper import Bulkhead
+from app.utils.deadline_helper import RequestDeadline, current_deadline_ctx
+from app.utils.metrics_helper import (
+    FILTER_BULKHEAD_IN_FLIGHT,
+    FILTER_BULKHEAD_QUEUE_DEPTH,
+    FILTER_BULKHEAD_REJECTIONS,
+)
+
+test_ctx = contextvars.ContextVar("test_ctx", default=None)
+
+
+class TestBulkhead:
+    """
+    Test cases for the bounded thread pool of a backend
+    """
+
+    def test_calls_beyond_the_limits_are_rejected(self):
+        """
+        Test the calls beyond the workers and the queue are rejected right away,
+        and admitted again once a slot is released
+        """
+        bulkhead = Bulkhead("test_limits", max_workers=1, max_queue=1, retry_after=3)
+        release = threading.Event()
+        running = threading.Event()
+
+        def blocked_call():
+            running.set()
+            release.wait(2)
+            return "done"
+
+        running_future = bulkhead.submit(blocked_call)
+        running.wait(2)
+        queued_future = bulkhead.submit(lambda: "queued")
+
+        assert FILTER_BULKHEAD_IN_FLIGHT.values[("test_limits",)] == 2
+        assert FILTER_BULKHEAD_QUEUE_DEPTH.values[("test_limits",)] == 1
+
+        with pytest.raises(BackendOverloadedError) as exc_info:
+            bulkhead.submit(lambda: "rejected")
+        assert exc_info.value.retry_after == 3
+        assert FILTER_BULKHEAD_REJECTIONS.values[("test_limits",)] == 1
+
+        release.set()
+        assert running_future.result(2) == "done"
+        assert queued_future.result(2) == "queued"
+        assert bulkhead.submit(lambda: "admitted").result(2) == "admitted"
+        bulkhead.executor.shutdown(wait=True)
+        assert bulkhead.in_flight == 0
+        assert FILTER_BULKHEAD_QUEUE_DEPTH.values[("test_limits",)] == 0
+
+    def test_cancelled_call_releases_its_slot(self):
+        """
+        Test a queued call cancelled before running releases its slot
+        """
+        bulkhead = Bulkhead("test_cancel", max_workers=1, max_queue=1, retry_after=1)
+        release = threading.Event()
+
+        running_future = bulkhead.submit(release.wait, 2)
+        queued_future = bulkhead.submit(lambda: "queued")
+
+        assert queued_future.cancel()
+        assert bulkhead.in_flight == 1
+        release.set()
+        running_future.result(2)
+        bulkhead.executor.shutdown(wait=True)
+        assert bulkhead.in_flight == 0
+
+    def test_call_runs_in_calling_context(self):
+        """
+        Test the call sees the context of the caller
+        """
+        bulkhead = Bulkhead("test_context", max_workers=1, max_queue=0, retry_after=1)
+        token = test_ctx.set("request_id")
+        try:
+            assert bulkhead.submit(test_ctx.get).result(2) == "request_id"
+        finally:
+            test_ctx.reset(token)
+
+    def test_call_past_deadline_is_not_run(self):
+        """
+        Test a call whose request ran out of time while queued is dropped
+        """
+        bulkhead = Bulkhead("test_deadline", max_workers=1, max_queue=0, retry_after=1)
+        calls = []
+        deadline = RequestDeadline(10)
+        deadline.cancelled.set()
+        deadline_token = current_deadline_ctx.set(deadline)
+        try:
+            future = bulkhead.submit(calls.append, "called")
+        finally:
+            current_deadline_ctx.reset(deadline_token)
+
+        with pytest.raises(DeadlineExceededError):
+            future.result(2)
+        assert not calls
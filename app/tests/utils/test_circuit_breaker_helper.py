@@ -0,0 +1,118 @@
+import pytest
+
+from app.custom_exceptions.circuit_breaker_exceptions import BackendUnavailableError
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.utils.circuit_breaker_helper import CircuitBreaker
+from app.utils.metrics_helper import (
+    FILTER_CIRCUIT_BREAKER_REJECTIONS,
+    FILTER_CIRCUIT_BREAKER_STATE,
+    FILTER_CIRCUIT_BREAKER_TRANSITIONS,
+)
+
+
+def fail(breaker: CircuitBreaker) -> None:
+    """
+    Run a request of the backend failing through the circuit
+    """
+    with pytest.raises(ConnectionError):
+        with breaker.guard():
+            raise ConnectionError("backend down")
+
+
+class TestCircuitBreaker:
+    """
+    Test cases for the circuit breaker of a backend
+    """
+
+    def test_opens_after_failures_in_a_row(self):
+        """
+        Test the circuit opens after the threshold of failures in a row and
+        fails the requests fast
+        """
+        breaker = CircuitBreaker(
+            "test_open",
+            failure_threshold=3,
+            reset_timeout=10,
+            failure_exceptions=(ConnectionError,),
+        )
+        fail(breaker)
+        fail(breaker)
+        with breaker.guard():
+            pass
+        fail(breaker)
+        fail(breaker)
+        assert breaker.state == "closed"
+
+        fail(breaker)
+        assert breaker.state == "open"
+        assert FILTER_CIRCUIT_BREAKER_STATE.values[("test_open",)] == 2
+
+        with pytest.raises(BackendUnavailableError) as exc_info:
+            with breaker.guard():
+                pytest.fail("request let through an open circuit")  # pragma: no cover
+        assert exc_info.value.retry_after == 10
+        assert FILTER_CIRCUIT_BREAKER_REJECTIONS.values[("test_open",)] == 1
+
+    def test_trial_request_after_cool_down(self):
+        """
+        Test a single trial request goes through once the cool-down is over, its
+        failure opening the circuit again and its success closing it
+        """
+        breaker = CircuitBreaker("test_trial", failure_threshold=1, reset_timeout=10)
+        fail(breaker)
+        breaker.opened_at -= 10
+
+        with breaker.guard():
+            assert breaker.state == "half_open"
+            with pytest.raises(BackendUnavailableError):
+                breaker.allow()
+        assert breaker.state == "closed"
+
+        fail(breaker)
+        breaker.opened_at -= 10
+        fail(breaker)
+        assert breaker.state == "open"
+        assert FILTER_CIRCUIT_BREAKER_TRANSITIONS.values[("test_trial", "open")] == 3
+        assert FILTER_CIRCUIT_BREAKER_TRANSITIONS.values[("test_trial", "closed")] == 1
+
+    def test_other_errors_are_ignored(self):
+        """
+        Test the errors that are not the backend's neither open the circuit nor
+        keep the trial
+        """
+        breaker = CircuitBreaker(
+            "test_ignored",
+            failure_threshold=1,
+            reset_timeout=10,
+            failure_exceptions=(ConnectionError,),
+        )
+        with pytest.raises(DeadlineExceededError):
+            with breaker.guard():
+                raise DeadlineExceededError(message="late", reason="timeout")
+        assert breaker.state == "closed"
+
+        fail(breaker)
+        breaker.opened_at -= 10
+        with pytest.raises(DeadlineExceededError):
+            with breaker.guard():
+                raise DeadlineExceededError(message="late", reason="timeout")
+        assert breaker.state == "half_open"
+        breaker.allow()
+
+    def test_probes(self):
+        """
+        Test an unhealthy probe counts as a failure and a healthy one lets the
+        trial through before the end of the cool-down
+        """
+        breaker = CircuitBreaker("test_probes", failure_threshold=2, reset_timeout=10)
+        breaker.record_probe(True)
+        breaker.record_probe(False)
+        breaker.record_probe(False)
+        assert breaker.state == "open"
+
+        breaker.record_probe(True)
+        assert breaker.state == "half_open"
+        breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert FILTER_CIRCUIT_BREAKER_STATE.values[("test_probes",)] == 0
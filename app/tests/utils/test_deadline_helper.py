@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.utils.deadline_helper import (
+    RequestDeadline,
+    check_deadline,
+    current_deadline_ctx,
+    latest_deadline,
+    remaining_ms,
+    remaining_seconds,
+    run_within_deadline,
+    wait_within_deadline,
+)
+
+
+@pytest.fixture
+def request_deadline():
+    """
+    Deadline of 10s in the context of the test
+    """
+    deadline = RequestDeadline(10)
+    deadline_token = current_deadline_ctx.set(deadline)
+    yield deadline
+    current_deadline_ctx.reset(deadline_token)
+
+
+class TestRequestDeadline:
+    # pylint: disable=redefined-outer-name
+    """
+    Test cases for the deadline of the current request
+    """
+
+    def test_no_deadline(self):
+        """
+        Test a context without deadline is never stopped
+        """
+        check_deadline()
+        assert remaining_seconds() is None
+        assert remaining_ms() is None
+
+    def test_remaining_time(self, request_deadline):
+        """
+        Test the time left is given in seconds and in ms
+        """
+        assert 9 < remaining_seconds() <= 10
+        assert 9000 < remaining_ms() <= 10000
+
+        request_deadline.expires_at = 0
+        assert remaining_seconds() == 0
+        assert remaining_ms() == 1
+
+    def test_expired_deadline(self, request_deadline):
+        """
+        Test the work stops once the deadline is over
+        """
+        check_deadline()
+        request_deadline.expires_at = 0
+
+        with pytest.raises(DeadlineExceededError) as exc_info:
+            check_deadline()
+        assert exc_info.value.reason == "timeout"
+
+    def test_cancelled_deadline(self, request_deadline):
+        """
+        Test the work stops once the client is gone
+        """
+        request_deadline.cancelled.set()
+
+        with pytest.raises(DeadlineExceededError) as exc_info:
+            check_deadline()
+        assert exc_info.value.reason == "cancelled"
+        assert remaining_seconds() == 0
+
+    def test_run_within_deadline(self, request_deadline):
+        """
+        Test shared work runs within its own deadline rather than the deadline
+        of the current request
+        """
+        request_deadline.cancelled.set()
+
+        assert run_within_deadline(None, remaining_seconds) is None
+        assert 4 < run_within_deadline(RequestDeadline(5), remaining_seconds) <= 5
+        assert current_deadline_ctx.get() is request_deadline
+
+    def test_latest_deadline(self):
+        """
+        Test shared work lasts as long as the latest deadline of its requests,
+        without limit when one of them has none
+        """
+        cancelled_deadline = RequestDeadline(20)
+        cancelled_deadline.cancelled.set()
+
+        deadline = latest_deadline(
+            [RequestDeadline(5), RequestDeadline(10), cancelled_deadline]
+        )
+
+        assert 9 < deadline.remaining() <= 10
+        assert latest_deadline([RequestDeadline(5), None]) is None
+        assert latest_deadline([]) is None
+
+    def test_wait_within_deadline(self, request_deadline):
+        """
+        Test waiting for another request ends when the event is set, or with an
+        error once the request is cancelled or its deadline is over
+        """
+        event = threading.Event()
+        event.set()
+        wait_within_deadline(event)
+
+        waited = threading.Event()
+        threading.Timer(0.05, request_deadline.cancelled.set).start()
+        with pytest.raises(DeadlineExceededError) as exc_info:
+            wait_within_deadline(waited)
+        assert exc_info.value.reason == "cancelled"
+
+        deadline_token = current_deadline_ctx.set(RequestDeadline(0.05))
+        try:
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                wait_within_deadline(waited)
+        finally:
+            current_deadline_ctx.reset(deadline_token)
+        assert exc_info.value.reason == "timeout"
@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.utils.deadline_helper import current_deadline_ctx
+from app.utils.deadline_middleware import DeadlineMiddleware, request_timeout
+
+test_app = FastAPI()
+test_app.add_middleware(DeadlineMiddleware)
+
+
+@test_app.post("/filterRecords/fromJson")
+def deadline() -> dict:
+    """Endpoint returning the deadline of the request"""
+    return {"timeout": current_deadline_ctx.get().timeout}
+
+
+client = TestClient(test_app)
+
+
+@pytest.mark.parametrize(
+    "header_value, expected_timeout",
+    [
+        (None, 30.0),
+        ("2.5", 2.5),
+        ("120", 30.0),
+        ("0", 30.0),
+        ("-1", 30.0),
+        ("nan", 30.0),
+        ("soon", 30.0),
+    ],
+)
+def test_request_timeout(header_value, expected_timeout):
+    """
+    Test the request timeout can only shorten the default of the endpoint
+    """
+    with patch.object(settings, "REQUEST_TIMEOUT_SECONDS", 30.0):
+        assert (
+            request_timeout("/filterRecords/fromJson", header_value) == expected_timeout
+        )
+
+
+def test_request_timeout_of_endpoint():
+    """
+    Test the default deadline of an endpoint overrides the one of every request
+    """
+    with (
+        patch.object(settings, "REQUEST_TIMEOUT_SECONDS", 30.0),
+        patch.object(settings, "REQUEST_TIMEOUTS", "fromSQL:10,fromAll:5"),
+    ):
+        assert request_timeout("/filterRecords/fromSQL", None) == 10.0
+        assert request_timeout("/filterRecords/fromSQL/", "20") == 10.0
+        assert request_timeout("/filterRecords/fromJson", None) == 30.0
+
+
+def test_deadline_in_context():
+    """
+    Test the request runs with its deadline in context
+    """
+    with patch.object(settings, "REQUEST_TIMEOUT_SECONDS", 30.0):
+        response = client.post(
+            "/filterRecords/fromJson", headers={"X-Request-Timeout": "1.5"}
+        )
+
+    assert response.json() == {"timeout": 1.5}
+
+
+def test_client_disconnect_cancels_deadline():
+    """
+    Test the deadline is cancelled once the client disconnects after sending
+    the body
+    """
+    deadlines = []
+    received = []
+
+    async def app(scope, receive, send):
+        # pylint: disable=unused-argument
+        deadlines.append(current_deadline_ctx.get())
+        received.append(await receive())
+        for _ in range(100):
+            if deadlines[0].cancelled.is_set():
+                break
+            await asyncio.sleep(0.01)
+
+    async def receive():
+        if not received:
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        received.append(message)  # pragma: no cover
+
+    scope = {"type": "http", "path": "/filterRecords/fromJson", "headers": []}
+    asyncio.run(DeadlineMiddleware(app)(scope, receive, send))
+
+    assert deadlines[0].cancelled.is_set()
+    assert current_deadline_ctx.get() is None
@@ -0,0 +1,56 @@
+import threading
+
+from app.utils.circuit_breaker_helper import CircuitBreaker
+from app.utils.health_monitor_helper import HealthMonitor
+from app.utils.metrics_helper import BACKEND_HEALTH_PROBES
+
+
+class TestHealthMonitor:
+    """
+    Test cases for the background health probes of the backends
+    """
+
+    def test_probe(self):
+        """
+        Test the outcome of a probe is counted and fed to the circuit breaker
+        """
+        breakers = {
+            "test_probe": CircuitBreaker(
+                "test_probe", failure_threshold=1, reset_timeout=10
+            )
+        }
+        healthy = []
+
+        def probe():
+            if not healthy:
+                raise ConnectionError("backend down")
+
+        monitor = HealthMonitor({"test_probe": probe}, breakers, interval=10)
+
+        assert not monitor.probe("test_probe")
+        assert breakers["test_probe"].state == "open"
+
+        healthy.append(True)
+        assert monitor.probe("test_probe")
+        assert breakers["test_probe"].state == "half_open"
+        assert BACKEND_HEALTH_PROBES.values[("test_probe", "unhealthy")] == 1
+        assert BACKEND_HEALTH_PROBES.values[("test_probe", "healthy")] == 1
+
+    def test_start_and_stop(self):
+        """
+        Test the backends are probed in the background until stopped
+        """
+        probed = threading.Event()
+        breakers = {
+            "test_thread": CircuitBreaker(
+                "test_thread", failure_threshold=1, reset_timeout=10
+            )
+        }
+        monitor = HealthMonitor({"test_thread": probed.set}, breakers, interval=10)
+
+        monitor.start()
+        assert probed.wait(2)
+        monitor.stop(timeout=2)
+
+        assert monitor.thread is None
+        assert breakers["test_thread"].state == "closed"
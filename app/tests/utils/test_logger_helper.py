@@ -1,15 +1,53 @@
+import json
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler
+from unittest.mock import MagicMock
 
-from app.utils.logger_helper import RequestIDFilter, current_request_id_ctx, get_logger
+import pytest
+
+from app.utils.logger_helper import (
+    DroppingQueueHandler,
+    JSONFormatter,
+    LogSampler,
+    RequestIDFilter,
+    app_logger,
+    current_request_id_ctx,
+    get_logger,
+)
+from app.utils.metrics_helper import LOG_RECORDS_DROPPED
+
+
+def build_log_record(msg="test message", args=()):
+    """Build a log record for the tests"""
+    return logging.LogRecord(
+        name="test",
+        level=logging.INFO,
+        pathname="",
+        lineno=0,
+        msg=msg,
+        args=args,
+        exc_info=None,
+    )
+
+
+def queued_handlers(logger):
+    """Queue handlers of the logger"""
+    return [handler for handler in logger.handlers if isinstance(handler, QueueHandler)]
 
 
 def test_get_logger():
     """Test get_logger function"""
     logger = get_logger()
 
-    assert len(logger.handlers) == 2
-    handler = logger.handlers[0]
+    # pytest attaches its own capture handlers, only the application's count
+    queue_handlers = queued_handlers(logger)
+    assert len(queue_handlers) == 1
+    assert isinstance(queue_handlers[0], DroppingQueueHandler)
+
+    handler = logger.log_listener.handlers[0]
     assert isinstance(handler, logging.StreamHandler)
     assert handler.stream == sys.stdout
 
@@ -20,18 +58,116 @@ def test_get_logger():
     )
 
     filters = logger.filters
-    assert len(filters) == 2
+    assert len(filters) == 1
     assert isinstance(filters[0], RequestIDFilter)
 
-    current_request_id_ctx.set("test_request_id")
-    log_record = logging.LogRecord(
-        name="test",
-        level=logging.INFO,
-        pathname="",
-        lineno=0,
-        msg="test message",
-        args=(),
-        exc_info=None,
-    )
-    logger.handle(log_record)
-    assert log_record.request_id == "test_request_id"  # pylint: disable=no-member
+    token = current_request_id_ctx.set("test_request_id")
+    try:
+        log_record = build_log_record()
+        logger.handle(log_record)
+        assert log_record.request_id == "test_request_id"  # pylint: disable=no-member
+    finally:
+        current_request_id_ctx.reset(token)
+
+
+def test_get_logger_is_idempotent():
+    """Test get_logger does not add handlers or start listeners twice"""
+    logger = get_logger()
+    listener = logger.log_listener
+
+    assert get_logger() is logger
+    assert len(queued_handlers(logger)) == 1
+    assert logger.log_listener is listener
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Needs fork")
+def test_log_listener_restarted_after_fork():
+    """Test a forked process logs through a listener of its own, on a new queue"""
+    parent_queue = queued_handlers(app_logger)[0].queue
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        handler_queue = queued_handlers(app_logger)[0].queue
+        listener = app_logger.log_listener
+        os._exit(  # pylint: disable=protected-access
+            0
+            if handler_queue is not parent_queue
+            and listener.queue is handler_queue
+            and listener._thread.is_alive()  # pylint: disable=protected-access
+            else 1
+        )
+
+    _, wait_status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(wait_status) == 0
+    assert queued_handlers(app_logger)[0].queue is parent_queue
+
+
+class TestDroppingQueueHandler:
+    """Test DroppingQueueHandler class"""
+
+    def test_enqueue(self):
+        """Test the records are put on the queue while there is room"""
+        log_queue = queue.Queue(maxsize=1)
+        handler = DroppingQueueHandler(log_queue)
+
+        handler.handle(build_log_record())
+
+        assert log_queue.get_nowait().getMessage() == "test message"
+
+    def test_enqueue_full_queue(self):
+        """Test the records are dropped and counted when the queue is full"""
+        log_queue = queue.Queue(maxsize=1)
+        handler = DroppingQueueHandler(log_queue)
+        dropped = LOG_RECORDS_DROPPED.values[()]
+
+        handler.handle(build_log_record())
+        handler.handle(build_log_record())
+        handler.handle(build_log_record())
+
+        assert log_queue.qsize() == 1
+        assert LOG_RECORDS_DROPPED.values[()] == dropped + 2
+
+
+def test_json_formatter():
+    """Test JSONFormatter formats the records as JSON objects"""
+    log_record = build_log_record("%d records", (3,))
+    log_record.request_id = "test_request_id"
+
+    log_entry = json.loads(JSONFormatter().format(log_record))
+
+    assert log_entry["level"] == "INFO"
+    assert log_entry["logger"] == "test"
+    assert log_entry["request_id"] == "test_request_id"
+    assert log_entry["message"] == "3 records"
+    assert "exception" not in log_entry
+
+
+class TestLogSampler:
+    """Test LogSampler class"""
+
+    def test_info(self):
+        """Test only the first and every n-th message is logged"""
+        logger = MagicMock()
+        logger.isEnabledFor.return_value = True
+        sampler = LogSampler(logger, 3)
+
+        for index in range(7):
+            sampler.info("record %d", index)
+
+        messages = [call.args[2] for call in logger.log.call_args_list]
+        assert messages == ["record 0", "record 3", "record 6"]
+        assert logger.log.call_args.args[:2] == (
+            logging.INFO,
+            "%s (sampled 1/%d)",
+        )
+
+    def test_log_disabled_level(self):
+        """Test nothing is logged or counted for a disabled level"""
+        logger = MagicMock()
+        logger.isEnabledFor.return_value = False
+        sampler = LogSampler(logger, 1)
+
+        sampler.log(logging.DEBUG, "record")
+
+        logger.log.assert_not_called()
+        assert next(sampler.counter) == 0
@@ -0,0 +1,127 @@
+import pytest
+
+from app.utils.metrics_helper import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    filter_request_timer,
+    metrics_registry,
+    stage_timer,
+)
+
+
+def test_counter_and_gauge_render():
+    """
+    Test counters and gauges render one sample per label set
+    """
+    counter = Counter("rows_total", "Rows", ["backend"])
+    counter.inc(backend="json")
+    counter.inc(5, backend="json")
+    counter.inc(backend='sq"l')
+    gauge = Gauge("connections", "Open connections")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    registry = MetricsRegistry()
+    registry.register(counter)
+    registry.register(gauge)
+
+    assert registry.render() == (
+        "# HELP rows_total Rows\n"
+        "# TYPE rows_total counter\n"
+        'rows_total{backend="json"} 6\n'
+        'rows_total{backend="sq\\"l"} 1\n'
+        "# HELP connections Open connections\n"
+        "# TYPE connections gauge\n"
+        "connections 1\n"
+    )
+
+
+def test_snapshot_is_a_copy():
+    """
+    Test the snapshot of a metric is not changed by later updates
+    """
+    counter = Counter("requests_total", "Requests", ["role"])
+    counter.inc(role="leader")
+
+    snapshot = counter.snapshot()
+    counter.inc(role="follower")
+
+    assert snapshot == {("leader",): 1}
+    assert counter.snapshot() == {("leader",): 1, ("follower",): 1}
+
+
+def test_histogram_render():
+    """
+    Test histogram buckets are cumulative with the sum and count
+    """
+    histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=[0.1, 1])
+    histogram.observe(0.05, stage="load")
+    histogram.observe(0.1, stage="load")
+    histogram.observe(0.5, stage="load")
+    histogram.observe(3, stage="load")
+
+    assert histogram.samples() == [
+        'latency_seconds_bucket{stage="load",le="0.1"} 2',
+        'latency_seconds_bucket{stage="load",le="1"} 3',
+        'latency_seconds_bucket{stage="load",le="+Inf"} 4',
+        'latency_seconds_sum{stage="load"} 3.65',
+        'latency_seconds_count{stage="load"} 4',
+    ]
+
+
+def test_histogram_quantile():
+    """
+    Test the quantile is the upper bound of the bucket holding it
+    """
+    histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=[0.1, 1])
+
+    assert histogram.quantile(0.95, stage="load") is None
+
+    for _ in range(19):
+        histogram.observe(0.05, stage="load")
+    histogram.observe(0.5, stage="load")
+
+    assert histogram.quantile(0.95, stage="load") == (0.1, 20)
+    assert histogram.quantile(0.99, stage="load") == (1, 20)
+
+    histogram.observe(3, stage="load")
+    histogram.observe(3, stage="load")
+
+    assert histogram.quantile(0.95, stage="load") == (float("inf"), 22)
+
+
+def test_registry_registers_once():
+    """
+    Test a metric name is only registered once
+    """
+    registry = MetricsRegistry()
+    first = registry.register(Counter("requests_total", "Requests"))
+
+    assert registry.register(Counter("requests_total", "Requests")) is first
+
+
+def test_stage_and_request_timers():
+    """
+    Test the timers observe the stage and count the request outcomes
+    """
+    with stage_timer("test_backend", "load"):
+        pass
+    with filter_request_timer("test_backend"):
+        pass
+    with pytest.raises(ValueError):
+        with filter_request_timer("test_backend"):
+            raise ValueError("failed")
+
+    rendered = metrics_registry.render()
+    assert (
+        'filter_stage_duration_seconds_count{backend="test_backend",stage="load"} 1'
+        in rendered
+    )
+    assert (
+        'filter_requests_total{backend="test_backend",outcome="success"} 1' in rendered
+    )
+    assert 'filter_requests_total{backend="test_backend",outcome="error"} 1' in rendered
+    assert 'filter_request_duration_seconds_count{backend="test_backend"} 2' in rendered
@@ -0,0 +1,253 @@
+import threading
+import time
+
+import pytest
+
+from app.api.filter_records.models import FilterRequestModel, RecordModel
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.utils.deadline_helper import (
+    RequestDeadline,
+    current_deadline_ctx,
+    remaining_seconds,
+)
+from app.utils.micro_batch_helper import (
+    MicroBatcher,
+    batch_field_values,
+    demultiplex,
+    request_date_bounds,
+)
+
+
+def record(record_id: int, origination_time: str, user_id: str, cluster_id: str):
+    """Record model of the given fields"""
+    return RecordModel(
+        **{
+            "_id": record_id,
+            "originationTime": origination_time,
+            "clusterId": cluster_id,
+            "userId": user_id,
+            "devices": {"phone": f"phone_{record_id}", "voicemail": "voicemail"},
+        }
+    )
+
+
+def submit_concurrently(batcher: MicroBatcher, requests: list) -> list:
+    """Submit every request on its own thread, results or errors in order"""
+    outcomes = [None] * len(requests)
+
+    def submit(index):
+        try:
+            outcomes[index] = batcher.submit(requests[index])
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            outcomes[index] = exc
+
+    threads = [
+        threading.Thread(target=submit, args=(index,)) for index in range(len(requests))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+class TestMicroBatcher:
+    """
+    Test cases for running concurrent requests in batches
+    """
+
+    def test_concurrent_requests_run_in_one_batch(self):
+        """
+        Test the requests submitted within the window run as one batch, and
+        each gets its own result
+        """
+        batches = []
+        batch_sizes = []
+
+        def run_batch(requests):
+            batches.append(list(requests))
+            return [f"result_{request}" for request in requests]
+
+        batcher = MicroBatcher(
+            run_batch, window_seconds=0.5, max_batch_size=3, on_batch=batch_sizes.append
+        )
+
+        outcomes = submit_concurrently(batcher, ["a", "b", "c"])
+
+        assert outcomes == ["result_a", "result_b", "result_c"]
+        assert len(batches) == 1
+        assert sorted(batches[0]) == ["a", "b", "c"]
+        assert batch_sizes == [3]
+
+    def test_full_batch_does_not_wait_for_window(self):
+        """
+        Test a full batch runs without waiting for the end of the window, and
+        the next request opens a new batch
+        """
+        batches = []
+
+        def run_batch(requests):
+            batches.append(list(requests))
+            return list(requests)
+
+        batcher = MicroBatcher(run_batch, window_seconds=10, max_batch_size=2)
+
+        started_at = time.monotonic()
+        outcomes = submit_concurrently(batcher, ["a", "b"])
+
+        assert time.monotonic() - started_at < 5
+        assert outcomes == ["a", "b"]
+        assert batcher.open_batch is None
+
+    def test_window_closes_partial_batch(self):
+        """
+        Test a single request runs once the window is over
+        """
+        batcher = MicroBatcher(list, window_seconds=0.01, max_batch_size=32)
+
+        assert batcher.submit("a") == "a"
+        assert batcher.open_batch is None
+
+    def test_batch_error_is_shared(self):
+        """
+        Test the error of a batch is raised to every request of the batch
+        """
+
+        def run_batch(requests):
+            raise ValueError("backend down")
+
+        batcher = MicroBatcher(run_batch, window_seconds=0.5, max_batch_size=2)
+
+        outcomes = submit_concurrently(batcher, ["a", "b"])
+
+        assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+    def test_request_waits_within_its_deadline(self):
+        """
+        Test a request waiting for the batch of another stops at its own
+        deadline, the batch going on for the others
+        """
+        release = threading.Event()
+
+        def run_batch(requests):
+            release.wait(2)
+            return requests
+
+        batcher = MicroBatcher(run_batch, window_seconds=0.01, max_batch_size=2)
+        results = []
+        leader = threading.Thread(target=lambda: results.append(batcher.submit("a")))
+        leader.start()
+        while batcher.open_batch is None:
+            time.sleep(0.001)
+
+        deadline_token = current_deadline_ctx.set(RequestDeadline(0.05))
+        try:
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                batcher.submit("b")
+        finally:
+            current_deadline_ctx.reset(deadline_token)
+            release.set()
+        leader.join()
+
+        assert exc_info.value.reason == "timeout"
+        assert results == ["a"]
+
+    def test_batch_runs_within_the_latest_deadline(self):
+        """
+        Test a batch runs within the latest deadline of its requests, not the
+        deadline of the request running it
+        """
+        remaining = []
+
+        def run_batch(requests):
+            remaining.append(remaining_seconds())
+            return requests
+
+        def submit(request, timeout):
+            current_deadline_ctx.set(RequestDeadline(timeout))
+            batcher.submit(request)
+
+        batcher = MicroBatcher(run_batch, window_seconds=5, max_batch_size=2)
+        threads = [
+            threading.Thread(target=submit, args=(request, timeout))
+            for request, timeout in (("a", 5), ("b", 10))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(remaining) == 1
+        assert 5 < remaining[0] <= 10
+
+
+def test_request_date_bounds():
+    """
+    Test the date bounds of a request against the formatted origination times
+    """
+    request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+
+    assert request_date_bounds(request, end_at_midnight=False) == (
+        "2021-01-01",
+        "2021-01-02",
+    )
+    assert request_date_bounds(request, end_at_midnight=True) == (
+        "2021-01-01",
+        "2021-01-02 00:00:00",
+    )
+
+
+def test_batch_field_values():
+    """
+    Test the values of every filter field across a batch, and no field values
+    when a request filters by date range only
+    """
+    requests = [
+        FilterRequestModel(
+            **{"dateRange": "2021-01-01 to 2021-01-02", "userId": "user_2"}
+        ),
+        FilterRequestModel(
+            **{
+                "dateRange": "2021-01-01 to 2021-01-02",
+                "userId": "user_1",
+                "cluster": "cluster_1",
+            }
+        ),
+    ]
+
+    assert batch_field_values(requests) == {
+        "user_id": ["user_1", "user_2"],
+        "cluster": ["cluster_1"],
+    }
+    assert not batch_field_values(
+        requests + [FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})]
+    )
+
+
+@pytest.mark.parametrize("end_at_midnight", [False, True])
+def test_demultiplex(end_at_midnight):
+    """
+    Test every request gets the records matching its own fields and date range
+    """
+    records = [
+        record(1, "2021-01-01 10:00:00", "user_1", "cluster_1"),
+        record(2, "2021-01-02 00:00:00", "user_2", "cluster_1"),
+        record(3, "2021-01-03 10:00:00", "user_1", "cluster_2"),
+    ]
+    requests = [
+        FilterRequestModel(
+            **{"dateRange": "2021-01-01 to 2021-01-03", "userId": "user_1"}
+        ),
+        FilterRequestModel(
+            **{"dateRange": "2021-01-01 to 2021-01-02", "cluster": "cluster_1"}
+        ),
+        FilterRequestModel(**{"dateRange": "2021-01-03 to 2021-01-04"}),
+    ]
+
+    request_records = demultiplex(records, requests, end_at_midnight)
+
+    assert [[item.id for item in matched] for matched in request_records] == [
+        [1],
+        [1, 2] if end_at_midnight else [1],
+        [3],
+    ]
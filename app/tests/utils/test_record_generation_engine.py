@@ -0,0 +1,205 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.constants import (
+    INITIAL_ID,
+    SERVER_RANGE_END,
+    SERVER_RANGE_START,
+    TIMESTAMP_END_YEAR,
+    TIMESTAMP_START_YEAR,
+    USER_ID_DIVIDER,
+    USER_ID_LENGTH,
+)
+from app.utils.record_generation_engine import (
+    USER_ID_MULTIPLIER,
+    SkewProfile,
+    digit_strings,
+    draw_indices,
+    draw_origination_times,
+    iter_generated_record_chunks,
+)
+
+
+def test_digit_strings():
+    """
+    Test digit_strings renders numbers with digits 1-9 and the given affixes
+    """
+    rendered = digit_strings(np.array([0, 8, 9, 9**4 - 1]), 4, prefix="SEP")
+    assert rendered.tolist() == ["SEP1111", "SEP1119", "SEP1121", "SEP9999"]
+
+    assert digit_strings(np.array([0]), 2, suffix="VM").tolist() == ["11VM"]
+
+
+def test_user_id_mixing_is_a_bijection():
+    """
+    Test every user index maps to a distinct user id
+    """
+    assert USER_ID_MULTIPLIER % 3 != 0
+    user_indices = np.arange(100000, dtype=np.int64)
+    user_values = (user_indices * USER_ID_MULTIPLIER) % (9**USER_ID_LENGTH)
+    assert len(np.unique(user_values)) == len(user_indices)
+
+
+class TestIterGeneratedRecordChunks:
+    """
+    Test iter_generated_record_chunks function
+    """
+
+    def test_record_fields(self):
+        """
+        Test the generated records have the stored record shape and value ranges
+        """
+        chunks = list(iter_generated_record_chunks(25, chunk_size=10, seed=7))
+        records = [record for chunk in chunks for record in chunk]
+
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        assert [record["_id"] for record in records] == list(
+            range(INITIAL_ID, INITIAL_ID + 25)
+        )
+        start_epoch = datetime(TIMESTAMP_START_YEAR, 1, 1).timestamp()
+        end_epoch = datetime(TIMESTAMP_END_YEAR + 1, 1, 1).timestamp()
+        cluster_ids = {
+            f"domainserver{server}"
+            for server in range(SERVER_RANGE_START, SERVER_RANGE_END + 1)
+        }
+
+        for record in records:
+            assert isinstance(record["_id"], int)
+            assert isinstance(record["originationTime"], int)
+            assert start_epoch <= record["originationTime"] < end_epoch
+            assert record["clusterId"] in cluster_ids
+            assert len(record["userId"]) == USER_ID_LENGTH
+            assert record["userId"].isdigit()
+            assert "0" not in record["userId"]
+            assert record["devices"]["phone"].startswith("SEP")
+            assert len(record["devices"]["phone"]) == 13
+            assert record["devices"]["voicemail"].endswith("VM")
+            assert len(record["devices"]["voicemail"]) == 11
+
+        assert len({record["userId"] for record in records}) <= 25 // USER_ID_DIVIDER
+
+    def test_same_seed_same_records(self):
+        """
+        Test the records only depend on the seed and the chunk size
+        """
+        first_run = list(iter_generated_record_chunks(30, chunk_size=8, seed=11))
+        second_run = list(iter_generated_record_chunks(30, chunk_size=8, seed=11))
+        other_seed = list(iter_generated_record_chunks(30, chunk_size=8, seed=12))
+
+        assert first_run == second_run
+        assert first_run != other_seed
+
+    def test_process_pool_matches_single_process(self):
+        """
+        Test the sharded generation yields the same chunks, in order
+        """
+        single_process = list(iter_generated_record_chunks(50, chunk_size=7, seed=3))
+        process_pool = list(
+            iter_generated_record_chunks(50, chunk_size=7, seed=3, processes=2)
+        )
+
+        assert process_pool == single_process
+
+    def test_no_records(self):
+        """
+        Test nothing is yielded for zero records
+        """
+        assert not list(iter_generated_record_chunks(0, seed=1))
+
+
+class TestSkewProfile:
+    """
+    Test the skewed distributions of the record generator
+    """
+
+    @pytest.mark.parametrize("zipf_exponent", [0.8, 1, 1.2])
+    def test_zipf_indices(self, zipf_exponent):
+        """
+        Test Zipf indices stay in range and favour the lowest indices
+        """
+        rng = np.random.default_rng(1)
+        indices = draw_indices(rng, 1000, 100000, "zipf", zipf_exponent)
+
+        assert indices.min() >= 0
+        assert indices.max() < 1000
+        counts = np.bincount(indices, minlength=1000)
+        assert counts[0] > counts[1] > counts[10] > counts[500]
+
+    def test_unknown_distribution(self):
+        """
+        Test an unknown distribution is rejected
+        """
+        with pytest.raises(ValueError):
+            draw_indices(np.random.default_rng(1), 10, 10, "normal", 1.1)
+
+    def test_diurnal_weekly_times(self):
+        """
+        Test the time patterns favour weekdays and business hours within the years
+        """
+        profile = SkewProfile(
+            start_year=2019, end_year=2021, time_pattern="diurnal_weekly"
+        )
+        epochs = draw_origination_times(np.random.default_rng(1), 50000, profile)
+
+        assert epochs.min() >= datetime(2019, 1, 1).timestamp()
+        assert epochs.max() < datetime(2022, 1, 1).timestamp()
+        times = [datetime.fromtimestamp(epoch) for epoch in epochs.tolist()]
+        assert {time.year for time in times} == {2019, 2020, 2021}
+        hours = np.bincount([time.hour for time in times], minlength=24)
+        weekdays = np.bincount([time.weekday() for time in times], minlength=7)
+        assert hours[10] > 5 * hours[3]
+        assert weekdays[1] > 3 * weekdays[6]
+
+    def test_weekly_and_diurnal_times(self):
+        """
+        Test the weekly and diurnal patterns on their own
+        """
+        rng = np.random.default_rng(1)
+        weekly = draw_origination_times(rng, 20000, SkewProfile(time_pattern="weekly"))
+        diurnal = draw_origination_times(
+            rng, 20000, SkewProfile(time_pattern="diurnal")
+        )
+
+        weekdays = np.bincount(
+            [datetime.fromtimestamp(epoch).weekday() for epoch in weekly.tolist()]
+        )
+        hours = np.bincount(
+            [datetime.fromtimestamp(epoch).hour for epoch in diurnal.tolist()]
+        )
+        assert weekdays[0] > 3 * weekdays[6]
+        assert hours[14] > 5 * hours[2]
+
+    def test_skewed_records_are_reproducible(self):
+        """
+        Test a skewed profile yields hot users and clusters, reproducibly
+        """
+        profile = SkewProfile(
+            user_distribution="zipf",
+            cluster_distribution="zipf",
+            time_pattern="diurnal",
+        )
+        records = [
+            record
+            for chunk in iter_generated_record_chunks(
+                3000, chunk_size=1000, seed=5, profile=profile
+            )
+            for record in chunk
+        ]
+        assert records == [
+            record
+            for chunk in iter_generated_record_chunks(
+                3000, chunk_size=1000, seed=5, profile=profile
+            )
+            for record in chunk
+        ]
+
+        cluster_counts = {}
+        for record in records:
+            cluster_counts[record["clusterId"]] = (
+                cluster_counts.get(record["clusterId"], 0) + 1
+            )
+        assert max(cluster_counts, key=cluster_counts.get) == "domainserver0"
+        # uniform users would cover about 95% of the 1000 users
+        assert len({record["userId"] for record in records}) < 800
@@ -1,45 +1,61 @@
 import argparse
 import json
 import os
+import sqlite3
 from unittest.mock import MagicMock, patch
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
-
-from app.core.constants import RECORD_FILE_NAME, RECORD_STORAGE_DIR, USER_ID_LENGTH
+from pymongo.errors import BulkWriteError
+
+from app.core.constants import (
+    DEVICES_TABLE_INSERT,
+    MONGO_DB_COLLECTION,
+    MONGO_DUPLICATE_KEY_ERROR,
+    MONGO_INSERT_RETRIES,
+    RECORD_BACKUP_DIR,
+    RECORD_FILE_NAME,
+    RECORD_PARQUET_FILE_NAME,
+    RECORD_PARQUET_STAGING_FILE_NAME,
+    RECORD_SQLITE_FILE_NAME,
+    RECORD_SQLITE_STAGING_FILE_NAME,
+    RECORD_STAGING_FILE_NAME,
+    RECORD_STORAGE_DIR,
+    RECORDS_TABLE_INSERT,
+    SQL_DEVICES_STAGING_TABLE,
+    SQL_RECORDS_STAGING_TABLE,
+    SQLITE_INDEXES,
+)
 from app.custom_exceptions.filter_from_mongo_exception import (
     MongoDBConnectionError,
     MongoDBOperationError,
 )
+from app.custom_exceptions.filter_from_parquet_exception import ParquetOperationError
 from app.custom_exceptions.filter_from_sql_exception import (
     SQLConnectionError,
     SQLOperationError,
 )
+from app.utils.record_generation_engine import SkewProfile
 from app.utils.record_generator import (
-    generate_long_random_int,
+    bulk_insert_records_to_sql,
     generate_records,
+    insert_chunk_to_mongo,
+    iter_record_chunks,
     main,
+    parallel_insert_records_to_mongo,
     store_record_to_mongo,
     store_record_to_sql,
     store_records_to_json,
+    store_records_to_parquet,
+    store_records_to_sqlite,
 )
 
 
-@pytest.mark.parametrize("length", [1, 2, 3, 4, 5, 6, 7, 8, 9])
-def test_generate_long_random_int(length):
-    """Test generate_long_random_int function"""
-    random_int = generate_long_random_int(length)
-    assert isinstance(random_int, str)
-    assert len(random_int) == length
-    assert random_int != "0" * length
-
-
-@patch("app.utils.record_generator.generate_long_random_int")
-def test_generate_records(mock_generate_long_random_int):
+def test_generate_records():
     """
     Test generate_records function
     """
-    mock_generate_long_random_int.return_value = "1" * USER_ID_LENGTH
-
     records = generate_records(10)
     assert len(records) == 10
 
@@ -66,6 +82,14 @@ def test_generate_records(mock_generate_long_random_int):
         assert record["devices"]["voicemail"].endswith("VM")
 
 
+def test_generate_records_with_seed():
+    """
+    Test generate_records returns the same records for the same seed
+    """
+    assert generate_records(10, seed=42) == generate_records(10, seed=42)
+    assert generate_records(10, seed=42) != generate_records(10, seed=43)
+
+
 class TestStoreRecordsToJson:
     """
     Test store_records_to_json function
@@ -95,6 +119,22 @@ class TestStoreRecordsToJson:
         assert os.path.exists(f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}")
         assert stored_records == records
 
+    @patch("app.utils.record_generator.JSON_WRITE_CHUNK_SIZE", 2)
+    def test_store_records_to_json_from_iterator(self):
+        """
+        Test store_records_to_json streams an iterator of records in chunks
+        """
+        records = [
+            {"_id": record_id, "originationTime": 1234567890} for record_id in range(5)
+        ]
+
+        store_records_to_json(iter(records))
+
+        with open(
+            f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}", "r", encoding="UTF-8"
+        ) as file:
+            assert file.read() == json.dumps(records)
+
     @patch("app.utils.record_generator.os.path.exists")
     @patch("app.utils.record_generator.os.makedirs")
     def test_store_records_to_json_with_dir_creation(self, mock_makedirs, mock_exists):
@@ -153,6 +193,32 @@ class TestStoreRecordsToJson:
 
         assert stored_records == records
 
+    def test_store_records_to_json_keeps_previous_generation(self):
+        """
+        Test store_records_to_json keeps the replaced records as backup
+        """
+        old_records = [{"_id": 1}]
+        new_records = [{"_id": 2}]
+
+        store_records_to_json(old_records)
+        with patch("app.utils.record_generator.datetime") as mock_datetime:
+            mock_datetime.now.return_value.strftime.return_value = "test_generation"
+            store_records_to_json(new_records)
+
+        backup_file_path = (
+            f"{RECORD_STORAGE_DIR}/{RECORD_BACKUP_DIR}/"
+            f"BKUP_test_generation_{RECORD_FILE_NAME}"
+        )
+        with open(backup_file_path, "r", encoding="UTF-8") as file:
+            assert json.load(file) == old_records
+        with open(
+            f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}", "r", encoding="UTF-8"
+        ) as file:
+            assert json.load(file) == new_records
+        assert not os.path.exists(f"{RECORD_STORAGE_DIR}/{RECORD_STAGING_FILE_NAME}")
+
+        os.remove(backup_file_path)
+
 
 class TestStoreRecordsToMongoDB:
     """
@@ -192,6 +258,66 @@ class TestStoreRecordsToMongoDB:
 
         assert result is True
 
+    @patch("app.utils.record_generator.MongoClient")
+    def test_store_records_to_mongodb_repoints_the_view(self, mock_mongo_client):
+        """
+        Test records are loaded into a collection of their own generation and
+        published by pointing the live view at it, without copying any record
+        """
+        mock_db = MagicMock()
+        collections = {}
+        mock_mongo_client.return_value.__getitem__.return_value = mock_db
+        mock_db.__getitem__.side_effect = lambda name: collections.setdefault(
+            name, MagicMock()
+        )
+        mock_db.list_collections.return_value = [
+            {
+                "name": MONGO_DB_COLLECTION,
+                "type": "view",
+                "options": {"viewOn": "records_2020_01_01_00_00_00"},
+            }
+        ]
+
+        store_record_to_mongo([{"_id": 1}])
+
+        generation_name = mock_db.command.call_args.kwargs["viewOn"]
+        assert list(collections) == [generation_name]
+        assert generation_name.startswith(f"{MONGO_DB_COLLECTION}_")
+        collections[generation_name].insert_many.assert_called_once()
+        collections[generation_name].drop.assert_not_called()
+        mock_db.command.assert_called_once_with(
+            "collMod", MONGO_DB_COLLECTION, viewOn=generation_name, pipeline=[]
+        )
+
+    @patch("app.utils.record_generator.MongoClient")
+    def test_store_records_to_mongodb_moves_the_collection_aside(
+        self, mock_mongo_client
+    ):
+        """
+        Test live records stored in a plain collection are renamed to a backup
+        before the live view is created
+        """
+        mock_db = MagicMock()
+        collections = {}
+        mock_mongo_client.return_value.__getitem__.return_value = mock_db
+        mock_db.__getitem__.side_effect = lambda name: collections.setdefault(
+            name, MagicMock()
+        )
+        mock_db.list_collections.return_value = [
+            {"name": MONGO_DB_COLLECTION, "type": "collection", "options": {}}
+        ]
+
+        store_record_to_mongo([{"_id": 1}])
+
+        (backup_name,) = collections[MONGO_DB_COLLECTION].rename.call_args.args
+        assert backup_name.startswith("BKP_")
+        collections[MONGO_DB_COLLECTION].aggregate.assert_not_called()
+        generation_name = mock_db.command.call_args.kwargs["viewOn"]
+        assert generation_name.startswith(f"{MONGO_DB_COLLECTION}_")
+        mock_db.command.assert_called_once_with(
+            "create", MONGO_DB_COLLECTION, viewOn=generation_name, pipeline=[]
+        )
+
     @patch("app.utils.record_generator.MongoClient")
     def test_store_records_to_mongodb_connection_error(self, mock_mongo_client):
         """
@@ -212,8 +338,11 @@ class TestStoreRecordsToMongoDB:
         with pytest.raises(MongoDBConnectionError):
             store_record_to_mongo(records)
 
+    @patch("app.utils.record_generator.time.sleep")
     @patch("app.utils.record_generator.MongoClient")
-    def test_store_records_to_mongodb_operation_error(self, mock_mongo_client):
+    def test_store_records_to_mongodb_operation_error(
+        self, mock_mongo_client, mock_sleep
+    ):
         """
         Test MongoDB operation error
         """
@@ -237,6 +366,47 @@ class TestStoreRecordsToMongoDB:
         with pytest.raises(MongoDBOperationError):
             store_record_to_mongo(records)
 
+        assert mock_collection.insert_many.call_count == MONGO_INSERT_RETRIES
+        assert mock_sleep.call_count == MONGO_INSERT_RETRIES - 1
+        mock_collection.drop.assert_called_once()
+
+    def test_parallel_insert_records_to_mongo_chunks(self):
+        """
+        Test records are inserted unordered in chunks of the given size
+        """
+        mock_collection = MagicMock()
+        records = ({"_id": record_id} for record_id in range(25))
+
+        stored_records = parallel_insert_records_to_mongo(
+            mock_collection, records, batch_size=10, max_workers=2, retries=1
+        )
+
+        assert stored_records == 25
+        assert sorted(
+            len(call.args[0]) for call in mock_collection.insert_many.call_args_list
+        ) == [5, 10, 10]
+        for call in mock_collection.insert_many.call_args_list:
+            assert call.kwargs == {"ordered": False}
+
+    @patch("app.utils.record_generator.time.sleep")
+    def test_insert_chunk_to_mongo_retry_with_duplicates(self, mock_sleep):
+        """
+        Test a retried chunk counts documents stored by the failed attempt
+        """
+        mock_collection = MagicMock()
+        mock_collection.insert_many.side_effect = [
+            Exception("Network error"),
+            BulkWriteError(
+                {"writeErrors": [{"code": MONGO_DUPLICATE_KEY_ERROR, "index": 0}]}
+            ),
+        ]
+
+        stored_records = insert_chunk_to_mongo(mock_collection, [{"_id": 1}], 3)
+
+        assert stored_records == 1
+        assert mock_collection.insert_many.call_count == 2
+        mock_sleep.assert_called_once()
+
 
 class TestStoreRecordsToSQL:
     """
@@ -267,10 +437,42 @@ class TestStoreRecordsToSQL:
         store_record_to_sql(records)
 
         mock_cursor.execute.assert_called()
+        mock_cursor.executemany.assert_called()
         mock_conn.commit.assert_called_once()
         mock_cursor.close.assert_called_once()
         mock_conn.close.assert_called_once()
 
+    @patch("app.utils.record_generator.mysql.connector.connect")
+    def test_store_record_to_sql_swaps_tables(self, mock_connect):
+        """
+        Test records are published with one atomic RENAME TABLE
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = [1]
+
+        store_record_to_sql([])
+
+        executed_statements = [
+            call.args[0] for call in mock_cursor.execute.call_args_list
+        ]
+        rename_statements = [
+            statement
+            for statement in executed_statements
+            if statement.startswith("RENAME TABLE")
+        ]
+        assert len(rename_statements) == 1
+        assert rename_statements[0].startswith("RENAME TABLE records TO BKP_")
+        assert rename_statements[0].endswith(
+            f"{SQL_RECORDS_STAGING_TABLE} TO records, "
+            f"{SQL_DEVICES_STAGING_TABLE} TO devices"
+        )
+        assert not any(
+            statement.startswith("DELETE FROM") for statement in executed_statements
+        )
+
     @patch("app.utils.record_generator.mysql.connector.connect")
     def test_store_record_to_sql_connection_error(self, mock_connect):
         """
@@ -385,44 +587,264 @@ class TestStoreRecordsToSQL:
             mock_conn.rollback.assert_called_once()
 
 
+class TestStoreRecordsToSQLite:
+    """
+    Test store_records_to_sqlite function
+    """
+
+    records = [
+        {
+            "_id": record_id,
+            "originationTime": 1609459200 + record_id,
+            "clusterId": "cluster_id",
+            "userId": f"user_{record_id}",
+            "devices": {"phone": "phone", "voicemail": "voicemail"},
+        }
+        for record_id in range(5)
+    ]
+
+    def test_store_records_to_sqlite(self, tmp_path):
+        """
+        Test the records are stored, indexed and published without a WAL
+        """
+        with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+            store_records_to_sqlite(iter(self.records), batch_size=2)
+
+        conn = sqlite3.connect(tmp_path / RECORD_SQLITE_FILE_NAME)
+        try:
+            assert conn.execute("SELECT * FROM records ORDER BY _id").fetchall() == [
+                (
+                    record["_id"],
+                    record["userId"],
+                    record["clusterId"],
+                    "phone",
+                    "voicemail",
+                    record["originationTime"],
+                )
+                for record in self.records
+            ]
+            assert {
+                index_name
+                for (index_name,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index'"
+                )
+            } == {index_name for index_name, _ in SQLITE_INDEXES}
+            assert conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+        finally:
+            conn.close()
+
+        assert not os.path.exists(tmp_path / RECORD_SQLITE_STAGING_FILE_NAME)
+        assert not os.path.exists(tmp_path / f"{RECORD_SQLITE_FILE_NAME}-wal")
+
+    def test_store_records_to_sqlite_keeps_previous_generation(self, tmp_path):
+        """
+        Test the replaced SQLite file is kept as backup
+        """
+        with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+            store_records_to_sqlite(self.records[:1])
+            with patch("app.utils.record_generator.datetime") as mock_datetime:
+                mock_datetime.now.return_value.strftime.return_value = "generation"
+                store_records_to_sqlite(self.records)
+
+        backup_conn = sqlite3.connect(
+            tmp_path / RECORD_BACKUP_DIR / f"BKUP_generation_{RECORD_SQLITE_FILE_NAME}"
+        )
+        live_conn = sqlite3.connect(tmp_path / RECORD_SQLITE_FILE_NAME)
+        try:
+            assert backup_conn.execute("SELECT COUNT(*) FROM records").fetchone() == (
+                1,
+            )
+            assert live_conn.execute("SELECT COUNT(*) FROM records").fetchone() == (5,)
+        finally:
+            backup_conn.close()
+            live_conn.close()
+
+
+class TestStoreRecordsToParquet:
+    """
+    Test store_records_to_parquet function
+    """
+
+    records = [
+        {
+            "_id": record_id,
+            "originationTime": 1609459200 - record_id,
+            "clusterId": f"cluster_{record_id % 2}",
+            "userId": f"user_{record_id}",
+            "devices": {"phone": "phone", "voicemail": "voicemail"},
+        }
+        for record_id in range(5)
+    ]
+
+    def test_store_records_to_parquet(self, tmp_path):
+        """
+        Test the records are stored sorted by time in row groups with statistics
+        """
+        with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+            store_records_to_parquet(iter(self.records), row_group_size=2)
+
+        parquet_file = pq.ParquetFile(tmp_path / RECORD_PARQUET_FILE_NAME)
+        table = parquet_file.read()
+
+        assert table.column("_id").to_pylist() == [4, 3, 2, 1, 0]
+        assert table.column("originationTime").to_pylist() == sorted(
+            record["originationTime"] for record in self.records
+        )
+        assert table.column("phone").to_pylist() == ["phone"] * 5
+        assert parquet_file.metadata.num_row_groups == 3
+
+        time_column = parquet_file.schema_arrow.get_field_index("originationTime")
+        first_statistics = parquet_file.metadata.row_group(0).column(time_column)
+        assert first_statistics.statistics.min == 1609459196
+        assert first_statistics.statistics.max == 1609459197
+
+        cluster_column = parquet_file.schema_arrow.get_field_index("clusterId")
+        assert "RLE_DICTIONARY" in (
+            parquet_file.metadata.row_group(0).column(cluster_column).encodings
+        )
+        assert not os.path.exists(tmp_path / RECORD_PARQUET_STAGING_FILE_NAME)
+
+    def test_store_records_to_parquet_keeps_previous_generation(self, tmp_path):
+        """
+        Test the replaced Parquet file is kept as backup
+        """
+        with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+            store_records_to_parquet(self.records[:1])
+            with patch("app.utils.record_generator.datetime") as mock_datetime:
+                mock_datetime.now.return_value.strftime.return_value = "generation"
+                store_records_to_parquet(self.records)
+
+        backup_path = (
+            tmp_path / RECORD_BACKUP_DIR / f"BKUP_generation_{RECORD_PARQUET_FILE_NAME}"
+        )
+        assert pq.read_metadata(backup_path).num_rows == 1
+        assert pq.read_metadata(tmp_path / RECORD_PARQUET_FILE_NAME).num_rows == 5
+
+    def test_store_records_to_parquet_error(self, tmp_path):
+        """
+        Test a failed write raises an operation error and keeps the live file
+        """
+        with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+            with patch(
+                "app.utils.record_generator.pq.write_table",
+                side_effect=pa.ArrowIOError("disk full"),
+            ):
+                with pytest.raises(ParquetOperationError):
+                    store_records_to_parquet(self.records)
+
+        assert not os.path.exists(tmp_path / RECORD_PARQUET_FILE_NAME)
+
+
+def test_iter_record_chunks():
+    """
+    Test iter_record_chunks function
+    """
+    chunks = list(iter_record_chunks(({"_id": _id} for _id in range(5)), 2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[-1] == [{"_id": 4}]
+
+
+def test_bulk_insert_records_to_sql():
+    """
+    Test bulk_insert_records_to_sql dedupes devices and batches the inserts
+    """
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+
+    records = [
+        {
+            "_id": record_id,
+            "originationTime": 1234567890,
+            "clusterId": "cluster_id",
+            "userId": "user_id",
+            "devices": {"phone": f"phone{record_id % 2}", "voicemail": "voicemail"},
+        }
+        for record_id in range(3)
+    ]
+
+    stored_records = bulk_insert_records_to_sql(mock_conn, mock_cursor, records, 2)
+
+    assert stored_records == 3
+    device_batches = [
+        call.args[1]
+        for call in mock_cursor.executemany.call_args_list
+        if call.args[0] == DEVICES_TABLE_INSERT.format(devices_table="devices")
+    ]
+    record_batches = [
+        call.args[1]
+        for call in mock_cursor.executemany.call_args_list
+        if call.args[0] == RECORDS_TABLE_INSERT.format(records_table="records")
+    ]
+    assert device_batches == [[(1, "phone0", "voicemail"), (2, "phone1", "voicemail")]]
+    assert [[row[2] for row in batch] for batch in record_batches] == [[1, 2], [1]]
+    assert mock_conn.commit.call_count == 2
+
+
 class TestRecordGenerator:
     """
     Test the main record generator functions
     """
 
-    # pylint: disable=too-many-arguments, too-many-positional-arguments
     @patch("argparse.ArgumentParser.parse_args")
-    @patch("app.utils.record_generator.generate_records")
-    @patch("app.utils.record_generator.store_records_to_json")
-    @patch("app.utils.record_generator.store_record_to_mongo")
-    @patch("app.utils.record_generator.store_record_to_sql")
+    @patch("app.utils.record_generator.iter_generated_record_chunks")
+    @patch("app.utils.record_generator.run_record_pipeline")
     def test_main(
         self,
-        mock_store_record_to_sql,
-        mock_store_record_to_mongo,
-        mock_store_records_to_json,
-        mock_generate_records,
+        mock_run_record_pipeline,
+        mock_iter_generated_record_chunks,
         mock_parse_args,
     ):
         """
-        Test the main function
+        Test the main function streams the generated chunks to every enabled sink
         """
         mock_parse_args.return_value = argparse.Namespace(
-            number_of_records=10, store_to_mongodb=True, store_to_sql=True
+            number_of_records=10,
+            store_to_mongodb=True,
+            store_to_sql=True,
+            store_to_sqlite=True,
+            store_to_parquet=True,
+            mongo_batch_size=100,
+            mongo_workers=2,
+            sql_batch_size=100,
+            chunk_size=5,
+            processes=1,
+            seed=42,
+            queue_size=3,
+            start_year=2019,
+            end_year=2021,
+            user_distribution="zipf",
+            user_zipf_exponent=1.2,
+            cluster_distribution="uniform",
+            cluster_zipf_exponent=1.1,
+            time_pattern="diurnal_weekly",
         )
-        mock_generate_records.return_value = [
-            {
-                "_id": 1,
-                "originationTime": 1234567890,
-                "clusterId": "cluster_id",
-                "userId": "user_id",
-                "devices": {"phone": "phone", "voicemail": "voicemail"},
-            }
-        ]
 
         main()
 
-        mock_generate_records.assert_called_once_with(10)
-        mock_store_records_to_json.assert_called_once()
-        mock_store_record_to_mongo.assert_called_once()
-        mock_store_record_to_sql.assert_called_once()
+        mock_iter_generated_record_chunks.assert_called_once_with(
+            10,
+            chunk_size=5,
+            seed=42,
+            processes=1,
+            profile=SkewProfile(
+                start_year=2019,
+                end_year=2021,
+                user_distribution="zipf",
+                user_zipf_exponent=1.2,
+                cluster_distribution="uniform",
+                cluster_zipf_exponent=1.1,
+                time_pattern="diurnal_weekly",
+            ),
+        )
+        record_chunks, sinks = mock_run_record_pipeline.call_args.args
+        assert record_chunks is mock_iter_generated_record_chunks.return_value
+        assert list(sinks) == ["json", "mongodb", "sql", "sqlite", "parquet"]
+        assert sinks["json"] is store_records_to_json
+        assert sinks["mongodb"].func is store_record_to_mongo
+        assert sinks["mongodb"].keywords == {"batch_size": 100, "max_workers": 2}
+        assert sinks["sql"].func is store_record_to_sql
+        assert sinks["sql"].keywords == {"batch_size": 100}
+        assert sinks["sqlite"] is store_records_to_sqlite
+        assert sinks["parquet"] is store_records_to_parquet
+        assert mock_run_record_pipeline.call_args.kwargs == {"queue_size": 3}
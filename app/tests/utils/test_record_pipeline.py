@@ -0,0 +1,184 @@
+import json
+import sqlite3
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.constants import (
+    MONGO_DB_COLLECTION,
+    RECORD_FILE_NAME,
+    RECORD_SQLITE_FILE_NAME,
+)
+from app.custom_exceptions.record_pipeline_exceptions import (
+    RecordPipelineAbortedError,
+)
+from app.utils.record_generator import (
+    store_record_to_mongo,
+    store_records_to_json,
+    store_records_to_sqlite,
+)
+from app.utils.record_pipeline import (
+    ABORT_RECORDS,
+    SinkWriter,
+    run_record_pipeline,
+)
+
+
+def record_chunks(number_of_chunks: int, chunk_size: int = 3):
+    """
+    Chunks of minimal records with consecutive ids
+    """
+    return [
+        [{"_id": chunk * chunk_size + offset} for offset in range(chunk_size)]
+        for chunk in range(number_of_chunks)
+    ]
+
+
+class TestRunRecordPipeline:
+    """
+    Test run_record_pipeline function
+    """
+
+    def test_every_sink_gets_every_record(self):
+        """
+        Test the chunks are streamed to all the sinks, in order
+        """
+        stored = {"json": [], "mongodb": []}
+        sink_threads = set()
+
+        def sink(name):
+            def store(records):
+                sink_threads.add(threading.current_thread().name)
+                stored[name].extend(records)
+
+            return store
+
+        reports = run_record_pipeline(
+            iter(record_chunks(4)),
+            {"json": sink("json"), "mongodb": sink("mongodb")},
+            queue_size=1,
+        )
+
+        expected = [record for chunk in record_chunks(4) for record in chunk]
+        assert stored["json"] == expected
+        assert stored["mongodb"] == expected
+        assert sink_threads == {"json-sink-writer", "mongodb-sink-writer"}
+        assert [report["sink"] for report in reports] == ["json", "mongodb"]
+        for report in reports:
+            assert report["records"] == 12
+            assert report["error"] is None
+            assert report["producer_blocked_seconds"] >= 0
+            assert report["sink_idle_seconds"] >= 0
+
+    def test_failed_sink_does_not_block_the_others(self):
+        """
+        Test a failing sink is drained, the others complete and the error is raised
+        """
+        stored = []
+
+        def failing_store(records):
+            next(iter(records))
+            raise ValueError("sink down")
+
+        with pytest.raises(ValueError, match="sink down"):
+            run_record_pipeline(
+                iter(record_chunks(10)),
+                {"json": stored.extend, "sql": failing_store},
+                queue_size=1,
+            )
+
+        assert len(stored) == 30
+
+    def test_sink_stopping_early_is_drained(self):
+        """
+        Test a sink that does not read its records does not block generation
+        """
+        reports = run_record_pipeline(
+            iter(record_chunks(10)), {"json": lambda records: None}, queue_size=1
+        )
+
+        assert reports[0]["records"] == 0
+        assert reports[0]["error"] is None
+
+
+@patch("app.utils.record_generator.MongoClient")
+def test_failed_generation_keeps_the_published_records(mock_mongo_client, tmp_path):
+    """
+    Test records failing midway are not published by any sink, the previous
+    generation staying live
+    """
+    mock_db = MagicMock()
+    collections = {}
+    mock_mongo_client.return_value.__getitem__.return_value = mock_db
+    mock_db.__getitem__.side_effect = lambda name: collections.setdefault(
+        name, MagicMock()
+    )
+    records = [
+        {
+            "_id": record_id,
+            "originationTime": 1609459200 + record_id,
+            "clusterId": "cluster_id",
+            "userId": "user_id",
+            "devices": {"phone": "phone", "voicemail": "voicemail"},
+        }
+        for record_id in range(4)
+    ]
+
+    def failing_chunks():
+        yield records[2:]
+        raise RuntimeError("generation failed")
+
+    sinks = {
+        "json": store_records_to_json,
+        "mongodb": store_record_to_mongo,
+        "sqlite": store_records_to_sqlite,
+    }
+    with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+        run_record_pipeline(iter([records[:2]]), sinks)
+        with pytest.raises(RuntimeError, match="generation failed"):
+            run_record_pipeline(failing_chunks(), sinks)
+
+    with open(tmp_path / RECORD_FILE_NAME, "r", encoding="UTF-8") as record_file:
+        assert [record["_id"] for record in json.load(record_file)] == [0, 1]
+    conn = sqlite3.connect(tmp_path / RECORD_SQLITE_FILE_NAME)
+    try:
+        assert conn.execute("SELECT _id FROM records ORDER BY _id").fetchall() == [
+            (0,),
+            (1,),
+        ]
+    finally:
+        conn.close()
+    # the first generation only is published, the failed one being dropped
+    mock_db.command.assert_called_once()
+    assert mock_db.command.call_args.args[1] == MONGO_DB_COLLECTION
+    published_name = mock_db.command.call_args.kwargs["viewOn"]
+    (failed_name,) = set(collections) - {published_name}
+    collections[published_name].drop.assert_not_called()
+    collections[failed_name].drop.assert_called_once()
+
+
+def test_sink_writer_aborted():
+    """
+    Test SinkWriter raises once the producer aborts
+    """
+    writer = SinkWriter("json", list, queue_size=2)
+    writer.put([{"_id": 1}])
+    writer.put(ABORT_RECORDS)
+
+    records = writer.records()
+    assert next(records) == {"_id": 1}
+    with pytest.raises(RecordPipelineAbortedError):
+        next(records)
+
+
+def test_sink_writer_records_until_end():
+    """
+    Test SinkWriter yields the queued records up to the end marker
+    """
+    writer = SinkWriter("json", list, queue_size=2)
+    writer.put([{"_id": 1}, {"_id": 2}])
+    writer.put(None)
+
+    assert list(writer.records()) == [{"_id": 1}, {"_id": 2}]
+    assert writer.records_written == 2
@@ -0,0 +1,78 @@
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.logger_helper import current_request_id_ctx
+from app.utils.metrics_helper import stage_timer
+from app.utils.request_id_middleware import RequestIDMiddleware, server_timing
+
+test_app = FastAPI()
+test_app.add_middleware(RequestIDMiddleware)
+
+
+@test_app.get("/stages")
+def stages() -> dict:
+    """Endpoint timing two stages in the request thread"""
+    with stage_timer("json", "load"):
+        pass
+    with stage_timer("json", "field_filter"):
+        pass
+    return {"request_id": current_request_id_ctx.get()}
+
+
+client = TestClient(test_app)
+
+
+def test_server_timing():
+    """
+    Test the Server-Timing value lists the stages and the total in ms
+    """
+    assert (
+        server_timing({"json.load": 0.0125}, 0.02)
+        == "json.load;dur=12.500, total;dur=20.000"
+    )
+
+
+def test_generated_request_id():
+    """
+    Test a request without an ID gets a new one, in context and echoed back
+    """
+    response = client.get("/stages")
+
+    request_id = response.headers["x-request-id"]
+    assert uuid.UUID(request_id)
+    assert response.json() == {"request_id": request_id}
+
+
+def test_incoming_request_id_is_honoured():
+    """
+    Test an incoming request ID is used and echoed back
+    """
+    response = client.get("/stages", headers={"X-Request-ID": "lb-1234.abc"})
+
+    assert response.headers["x-request-id"] == "lb-1234.abc"
+    assert response.json() == {"request_id": "lb-1234.abc"}
+
+
+def test_unsafe_request_id_is_replaced():
+    """
+    Test an incoming request ID unsafe to log is replaced
+    """
+    response = client.get("/stages", headers={"X-Request-ID": "bad id\twith tab"})
+
+    assert response.headers["x-request-id"] != "bad id\twith tab"
+    assert uuid.UUID(response.headers["x-request-id"])
+
+
+def test_server_timing_header():
+    """
+    Test the stages timed in the endpoint are reported in Server-Timing
+    """
+    response = client.get("/stages")
+
+    timings = [
+        timing.split(";")[0] for timing in response.headers["server-timing"].split(", ")
+    ]
+    assert timings == ["json.load", "json.field_filter", "total"]
+    assert current_request_id_ctx.get() == "No Request ID Found"
@@ -0,0 +1,98 @@
+import signal
+from unittest.mock import MagicMock, patch
+
+from app.core.config import settings
+from app.custom_exceptions.filter_from_json_exceptions import JSONFileNotFoundError
+from app.utils.server_launcher import (
+    WorkerSupervisor,
+    preload_app,
+    server_config,
+    worker_count,
+)
+
+
+def test_server_config():
+    """
+    Test the server settings of the workers
+    """
+    with (
+        patch.object(settings, "SERVER_PORT", 9090),
+        patch.object(settings, "SERVER_BACKLOG", 512),
+        patch.object(settings, "SERVER_LIMIT_CONCURRENCY", 0),
+        patch.object(settings, "SERVER_TIMEOUT_KEEP_ALIVE", 15),
+    ):
+        config = server_config()
+
+    assert config.port == 9090
+    assert config.backlog == 512
+    assert config.limit_concurrency is None
+    assert config.timeout_keep_alive == 15
+
+
+@patch("app.utils.server_launcher.os.cpu_count", return_value=6)
+def test_worker_count(mock_cpu_count):
+    # pylint: disable=unused-argument
+    """
+    Test one worker is forked per CPU unless configured
+    """
+    with patch.object(settings, "SERVER_WORKERS", 0):
+        assert worker_count() == 6
+    with patch.object(settings, "SERVER_WORKERS", 2):
+        assert worker_count() == 2
+
+
+@patch("app.utils.server_launcher.gc.freeze")
+@patch(
+    "app.workers.filter_records.filter_from_json.FilterRecordFromJSON."
+    "load_json_dataset"
+)
+def test_preload_app(mock_load_json_dataset, mock_freeze):
+    """
+    Test the app and the JSON dataset are loaded before being frozen, a missing
+    dataset being left to the workers
+    """
+    config = MagicMock()
+    with patch.object(settings, "APP_BACKENDS", "json"):
+        preload_app(config)
+
+        mock_load_json_dataset.side_effect = JSONFileNotFoundError("missing")
+        preload_app(config)
+
+    assert config.load.call_count == 2
+    assert mock_load_json_dataset.call_count == 2
+    assert mock_freeze.call_count == 2
+
+    with patch.object(settings, "APP_BACKENDS", "sql"):
+        preload_app(config)
+    assert mock_load_json_dataset.call_count == 2
+
+
+@patch("app.utils.server_launcher.time.sleep")
+@patch("app.utils.server_launcher.signal.signal")
+@patch("app.utils.server_launcher.os.kill")
+@patch("app.utils.server_launcher.os.wait")
+@patch("app.utils.server_launcher.os.fork", side_effect=[101, 102, 103])
+def test_worker_supervisor(mock_fork, mock_wait, mock_kill, mock_signal, mock_sleep):
+    # pylint: disable=unused-argument, too-many-arguments, too-many-positional-arguments
+    """
+    Test a worker that dies is replaced, and the workers are stopped with the
+    master
+    """
+    supervisor = WorkerSupervisor(MagicMock(), MagicMock(), workers=2)
+    exits = [(101, 256), (102, 0), (103, 0)]
+
+    def wait_for_worker():
+        pid, wait_status = exits.pop(0)
+        if pid == 102:
+            supervisor.stop(signal.SIGTERM, None)
+        return pid, wait_status
+
+    mock_wait.side_effect = wait_for_worker
+    supervisor.run()
+
+    assert mock_fork.call_count == 3
+    assert sorted(call.args for call in mock_kill.call_args_list) == [
+        (102, signal.SIGTERM),
+        (103, signal.SIGTERM),
+    ]
+    assert not supervisor.pids
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+from app.utils.deadline_helper import RequestDeadline, current_deadline_ctx
+from app.utils.single_flight_helper import SingleFlight
+
+
+def wait_for_waiters(single_flight: SingleFlight, key: str, waiters: int) -> None:
+    """Wait until the given number of callers joined the flight of the key"""
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        with single_flight.lock:
+            flight = single_flight.flights.get(key)
+            if flight is not None and flight.waiters == waiters:
+                return
+        time.sleep(0.001)
+    raise AssertionError(f"{waiters} waiters never joined the flight of {key}")
+
+
+def test_concurrent_calls_share_one_execution():
+    """
+    Test the callers arriving while a call runs share its result
+    """
+    single_flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+    results = []
+
+    def call():
+        executions.append(1)
+        release.wait(2)
+        return "result"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(single_flight.do("key", call)))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    wait_for_waiters(single_flight, "key", 0)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for_waiters(single_flight, "key", 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert sorted(results) == [("result", False)] + [("result", True)] * 4
+    assert not single_flight.flights
+
+
+def test_error_is_shared():
+    """
+    Test the callers waiting on a failing call get its error
+    """
+    single_flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def call():
+        release.wait(2)
+        raise ValueError("backend down")
+
+    def caller():
+        try:
+            single_flight.do("key", call)
+        except ValueError as exc:
+            errors.append(str(exc))
+
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    threads[0].start()
+    wait_for_waiters(single_flight, "key", 0)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for_waiters(single_flight, "key", 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["backend down"] * 3
+    assert not single_flight.flights
+
+
+def test_follower_waits_within_its_deadline():
+    """
+    Test a caller waiting for the execution of another stops at its own
+    deadline, the execution going on for its caller
+    """
+    single_flight = SingleFlight()
+    release = threading.Event()
+    results = []
+
+    def call():
+        release.wait(2)
+        return "result"
+
+    leader = threading.Thread(
+        target=lambda: results.append(single_flight.do("key", call))
+    )
+    leader.start()
+    wait_for_waiters(single_flight, "key", 0)
+
+    deadline_token = current_deadline_ctx.set(RequestDeadline(0.05))
+    try:
+        with pytest.raises(DeadlineExceededError) as exc_info:
+            single_flight.do("key", call)
+    finally:
+        current_deadline_ctx.reset(deadline_token)
+        release.set()
+    leader.join()
+
+    assert exc_info.value.reason == "timeout"
+    assert results == [("result", False)]
+
+
+def test_sequential_calls_execute_again():
+    """
+    Test a call arriving after the previous one returned executes again
+    """
+    single_flight = SingleFlight()
+    executions = []
+
+    assert single_flight.do("key", lambda: executions.append(1) or 1) == (1, False)
+    assert single_flight.do("key", lambda: executions.append(2) or 2) == (2, False)
+    assert executions == [1, 2]
+
+    with pytest.raises(ZeroDivisionError):
+        single_flight.do("key", lambda: 1 / 0)
+    assert not single_flight.flights
@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core.constants import SQL_SECONDARY_INDEXES
+from app.custom_exceptions.filter_from_sql_exception import (
+    SQLConnectionError,
+    SQLOperationError,
+)
+from app.utils.sql_migrations import apply_secondary_indexes, main
+
+
+def test_apply_secondary_indexes_creates_missing():
+    """
+    Test apply_secondary_indexes creates every missing index
+    """
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = [0]
+
+    created_indexes = apply_secondary_indexes(mock_cursor)
+
+    assert created_indexes == [index_name for _, index_name, _ in SQL_SECONDARY_INDEXES]
+    assert mock_cursor.execute.call_count == 2 * len(SQL_SECONDARY_INDEXES)
+
+
+def test_apply_secondary_indexes_on_staging_tables():
+    """
+    Test apply_secondary_indexes indexes the mapped tables
+    """
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = [0]
+
+    apply_secondary_indexes(mock_cursor, table_names={"records": "staging_records"})
+
+    created_statements = [
+        call.args[0]
+        for call in mock_cursor.execute.call_args_list
+        if call.args[0].startswith("CREATE INDEX")
+    ]
+    assert "CREATE INDEX idx_records_user_time ON staging_records " in (
+        " ".join(created_statements)
+    )
+    assert all(" ON records " not in statement for statement in created_statements)
+
+
+def test_apply_secondary_indexes_skips_existing():
+    """
+    Test apply_secondary_indexes skips already existing indexes
+    """
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = [1]
+
+    created_indexes = apply_secondary_indexes(mock_cursor)
+
+    assert not created_indexes
+    assert mock_cursor.execute.call_count == len(SQL_SECONDARY_INDEXES)
+
+
+@patch("app.utils.sql_migrations.mysql.connector.connect")
+def test_main_connection_error(mock_connect):
+    """
+    Test migration main with connection error
+    """
+    mock_connect.side_effect = Exception("Connection error")
+
+    with pytest.raises(SQLConnectionError):
+        main()
+
+
+@patch("app.utils.sql_migrations.mysql.connector.connect")
+def test_main_operation_error(mock_connect):
+    """
+    Test migration main with operation error
+    """
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_connect.return_value = mock_conn
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.execute.side_effect = Exception("Operation error")
+
+    with pytest.raises(SQLOperationError):
+        main()
+
+    mock_cursor.close.assert_called_once()
+    mock_conn.close.assert_called_once()
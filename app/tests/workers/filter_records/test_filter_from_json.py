@@ -1,5 +1,7 @@
+import json
 from unittest.mock import mock_open, patch
 
+import numpy as np
 import pytest
 
 from app.api.filter_records.models import (
@@ -7,9 +9,44 @@ from app.api.filter_records.models import (
     FilterResponseModel,
     RecordModel,
 )
+from app.core.constants import RECORD_FILE_NAME
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
 from app.custom_exceptions.filter_from_json_exceptions import JSONFileNotFoundError
+from app.utils.deadline_helper import RequestDeadline, current_deadline_ctx
+from app.workers.filter_records import filter_from_json
 from app.workers.filter_records.filter_from_json import FilterRecordFromJSON
 
+RECORDS = [
+    {
+        "_id": 2,
+        "originationTime": 1609545600,
+        "clusterId": "cluster_id",
+        "userId": "user_2",
+        "devices": {"phone": "phone", "voicemail": "voicemail"},
+    },
+    {
+        "_id": 1,
+        "originationTime": 1609459200,
+        "clusterId": "cluster_id",
+        "userId": "user_id",
+        "devices": {"phone": "phone", "voicemail": "voicemail"},
+    },
+]
+
+
+@pytest.fixture
+def record_storage_dir(tmp_path):
+    """
+    Published JSON file of the test records, with an empty dataset cache
+    """
+    (tmp_path / RECORD_FILE_NAME).write_text(json.dumps(RECORDS), encoding="UTF-8")
+    filter_from_json._dataset_cache.clear()  # pylint: disable=W0212
+    with patch(
+        "app.workers.filter_records.filter_from_json.RECORD_STORAGE_DIR", str(tmp_path)
+    ):
+        yield tmp_path
+    filter_from_json._dataset_cache.clear()  # pylint: disable=W0212
+
 
 class TestFilterRecordFromJSON:
     # pylint: disable=redefined-outer-name, unused-argument
@@ -98,91 +135,110 @@ class TestFilterRecordFromJSON:
                 "devices": {"phone": "phone", "voicemail": "voicemail"},
             },
         ]
-        records = [RecordModel(**record) for record in records]
+        origination_times = np.array(
+            [RecordModel(**record).origination_time for record in records]
+        )
 
-        filtered_records = filter_record.filter_record_with_date(records)
-        assert len(filtered_records) == expected_number_of_records
+        rows = filter_record.filter_record_with_date(origination_times)
 
-    @patch("app.workers.filter_records.filter_from_json.os.path.exists")
-    @patch(
-        "builtins.open",
-        new_callable=mock_open,
-        read_data='[{"_id": 1, "originationTime": 1609459200, '
-        '"clusterId": "cluster_id", "userId": "user_id", '
-        '"devices": {"phone": "phone", '
-        '"voicemail": "voicemail"}}]',
-    )
-    def test_filter_records_from_json(self, mock_open, mock_path_exists):
+        assert len(origination_times[rows]) == expected_number_of_records
+
+    @pytest.mark.usefixtures("record_storage_dir")
+    def test_filter_records_from_json(self):
         """
         Test case for filtering records from JSON
         """
-        mock_path_exists.return_value = True
-
         request = FilterRequestModel(
-            **{"dateRange": "2020-12-31 to 2021-01-02", "cluster": "cluster_id"}
+            **{"dateRange": "2020-12-31 to 2021-01-02", "userId": "user_id"}
         )
         filter_record = FilterRecordFromJSON(request)
         response = filter_record.filter_records_from_json()
 
         assert isinstance(response, FilterResponseModel)
         assert len(response.result) == 1
-        assert response.result[0].cluster_id == "cluster_id"
+        assert response.result[0].user_id == "user_id"
+        assert response.dataset_version.startswith("json@")
 
-    @patch("app.workers.filter_records.filter_from_json.os.path.exists")
-    @patch(
-        "builtins.open",
-        new_callable=mock_open,
-        read_data='[{"_id": 1, "originationTime": 1609459200, '
-        '"clusterId": "cluster_id", "userId": "user_id", '
-        '"devices": {"phone": "phone", '
-        '"voicemail": "voicemail"}}]',
-    )
-    def test_filter_records_from_json_no_filters(self, mock_open, mock_path_exists):
+    @pytest.mark.usefixtures("record_storage_dir")
+    def test_filter_records_from_json_no_filters(self):
         """
-        Test case for filtering records from JSON with no extra filters
+        Test case for filtering records from JSON with no extra filters, the
+        records being returned in the order of the file
         """
-        mock_path_exists.return_value = True
-
-        request = FilterRequestModel(**{"dateRange": "2020-12-31 to 2021-01-02"})
+        request = FilterRequestModel(**{"dateRange": "2020-12-31 to 2021-01-03"})
         filter_record = FilterRecordFromJSON(request)
         response = filter_record.filter_records_from_json()
 
         assert isinstance(response, FilterResponseModel)
-        assert len(response.result) == 1
-        assert response.result[0].cluster_id == "cluster_id"
+        assert [record.id for record in response.result] == [2, 1]
 
-    @patch("app.workers.filter_records.filter_from_json.os.path.exists")
-    def test_filter_records_from_json_no_file_found(self, mock_path_exists):
+    @pytest.mark.usefixtures("record_storage_dir")
+    def test_filter_records_from_json_in_file_order(self):
+        """
+        Test the records matching a field are returned in the order of the
+        file, not of their origination time
+        """
+        request = FilterRequestModel(
+            **{"dateRange": "2020-12-31 to 2021-01-03", "cluster": "cluster_id"}
+        )
+        response = FilterRecordFromJSON(request).filter_records_from_json()
+
+        assert [record.id for record in response.result] == [2, 1]
+
+    def test_filter_records_from_json_no_file_found(self, tmp_path):
         """
         Test case for filtering records from JSON with no extra filters
         """
-        mock_path_exists.return_value = False
+        request = FilterRequestModel(**{"dateRange": "2020-12-31 to 2021-01-02"})
+        filter_record = FilterRecordFromJSON(request)
+        with patch(
+            "app.workers.filter_records.filter_from_json.RECORD_STORAGE_DIR",
+            str(tmp_path),
+        ):
+            with pytest.raises(JSONFileNotFoundError):
+                _ = filter_record.filter_records_from_json()
 
+    def test_load_json_dataset_is_cached(self, record_storage_dir):
+        """
+        Test the JSON file is read once per published generation, sorted by
+        origination time
+        """
         request = FilterRequestModel(**{"dateRange": "2020-12-31 to 2021-01-02"})
         filter_record = FilterRecordFromJSON(request)
-        with pytest.raises(JSONFileNotFoundError):
-            _ = filter_record.filter_records_from_json()
 
+        with patch.object(
+            FilterRecordFromJSON,
+            "load_json_file",
+            autospec=True,
+            side_effect=FilterRecordFromJSON.load_json_file,
+        ) as mock_load_json_file:
+            dataset = filter_record.load_json_dataset()
+            assert filter_record.load_json_dataset() is dataset
+
+            (record_storage_dir / RECORD_FILE_NAME).write_text(
+                json.dumps(RECORDS[:1]), encoding="UTF-8"
+            )
+            republished_dataset = filter_record.load_json_dataset()
+
+        assert mock_load_json_file.call_count == 2
+        assert dataset.columns["_id"].tolist() == [1, 2]
+        assert dataset.columns["originationTime"].tolist() == sorted(
+            dataset.columns["originationTime"].tolist()
+        )
+        assert dataset.file_rows.tolist() == [1, 0]
+        assert republished_dataset.columns["_id"].tolist() == [2]
+
+    @pytest.mark.usefixtures("record_storage_dir")
     @patch(
         "app.workers.filter_records.filter_from_json."
         "FilterRecordFromJSON.filter_record_with_date"
     )
-    @patch("app.workers.filter_records.filter_from_json.os.path.exists")
-    @patch(
-        "builtins.open",
-        new_callable=mock_open,
-        read_data='[{"_id": 1, "originationTime": 1609459200, '
-        '"clusterId": "cluster_id", "userId": "user_id", '
-        '"devices": {"phone": "phone", '
-        '"voicemail": "voicemail"}}]',
-    )
     def test_filter_records_from_json_with_date_exception(
-        self, mock_open, mock_path_exists, mock_filter_record_with_date
+        self, mock_filter_record_with_date
     ):
         """
         Test case for filtering records from JSON with no extra filters
         """
-        mock_path_exists.return_value = True
         mock_filter_record_with_date.side_effect = Exception(
             "Error while filtering records with date range"
         )
@@ -191,3 +247,50 @@ class TestFilterRecordFromJSON:
         filter_record = FilterRecordFromJSON(request)
         with pytest.raises(Exception):
             _ = filter_record.filter_records_from_json()
+
+    @pytest.mark.usefixtures("record_storage_dir")
+    def test_filter_records_batch_from_json(self):
+        """
+        Test every request of a batch gets the records it gets on its own
+        """
+        requests = [
+            FilterRequestModel(
+                **{"dateRange": "2020-12-31 to 2021-01-02", "userId": "user_id"}
+            ),
+            FilterRequestModel(**{"dateRange": "2020-12-31 to 2021-01-03"}),
+            FilterRequestModel(
+                **{"dateRange": "2021-01-05 to 2021-01-06", "cluster": "cluster_id"}
+            ),
+        ]
+
+        responses = FilterRecordFromJSON(requests[0]).filter_records_batch_from_json(
+            requests
+        )
+
+        assert [response.model_dump() for response in responses] == [
+            FilterRecordFromJSON(request).filter_records_from_json().model_dump()
+            for request in requests
+        ]
+        assert [response.number_of_filtered_records for response in responses] == [
+            1,
+            2,
+            0,
+        ]
+        assert responses[0].dataset_version.startswith("json@")
+
+    @pytest.mark.usefixtures("record_storage_dir")
+    def test_filter_records_from_json_past_deadline(self):
+        """
+        Test the scan of a request past its deadline is stopped
+        """
+        request = FilterRequestModel(
+            **{"dateRange": "2020-12-31 to 2021-01-02", "userId": "user_id"}
+        )
+        deadline = RequestDeadline(10)
+        deadline.expires_at = 0
+        deadline_token = current_deadline_ctx.set(deadline)
+        try:
+            with pytest.raises(DeadlineExceededError):
+                FilterRecordFromJSON(request).filter_records_from_json()
+        finally:
+            current_deadline_ctx.reset(deadline_token)
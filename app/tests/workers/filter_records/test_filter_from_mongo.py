@@ -1,17 +1,32 @@
 from unittest.mock import MagicMock, patch
 
 import pytest
+from pymongo.errors import ExecutionTimeout, ServerSelectionTimeoutError
 
 from app.api.filter_records.models import (
     FilterRequestModel,
     FilterResponseModel,
     RecordModel,
 )
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
 from app.custom_exceptions.filter_from_mongo_exception import (
     MongoDBConnectionError,
     MongoDBOperationError,
 )
-from app.workers.filter_records.filter_from_mongo import FilterRecordFromMongo
+from app.workers.filter_records.filter_from_mongo import (
+    FilterRecordFromMongo,
+    close_mongo_clients,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_mongo_clients():
+    """
+    Drop the MongoDB clients shared by the workers between tests
+    """
+    close_mongo_clients()
+    yield
+    close_mongo_clients()
 
 
 class TestFilterRecordFromMongo:
@@ -292,3 +307,159 @@ class TestFilterRecordFromMongo:
 
         with pytest.raises(Exception):
             _ = filter_record.filter_records_from_mongo()
+
+    def test_mongo_db_batch_query_builder(self):
+        """
+        Test case for building the mongo db query of a batch of requests
+        """
+        requests = [
+            FilterRequestModel(
+                **{"dateRange": "2021-01-01 to 2021-01-02", "userId": "user_2"}
+            ),
+            FilterRequestModel(
+                **{
+                    "dateRange": "2021-01-02 to 2021-01-03",
+                    "userId": "user_1",
+                    "phoneNumber": "phone",
+                }
+            ),
+        ]
+
+        query = FilterRecordFromMongo.mongo_db_batch_query_builder(requests)
+
+        assert query == {
+            "originationTime": {"$gte": 1609477200, "$lte": 1609650000},
+            "$or": [
+                {"userId": {"$in": ["user_1", "user_2"]}},
+                {"devices.phone": {"$in": ["phone"]}},
+            ],
+        }
+
+        requests.append(FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"}))
+        assert FilterRecordFromMongo.mongo_db_batch_query_builder(requests) == {
+            "originationTime": {"$gte": 1609477200, "$lte": 1609650000},
+        }
+
+    @patch("app.workers.filter_records.filter_from_mongo.MongoClient")
+    def test_filter_records_batch_from_mongo(self, mock_mongo_client):
+        """
+        Test case for filtering records from MongoDB for a batch of requests
+        with one query
+        """
+        mock_client = MagicMock()
+        mock_collection = MagicMock()
+        mock_mongo_client.return_value = mock_client
+
+        requests = [
+            FilterRequestModel(
+                **{"dateRange": "2020-12-31 to 2021-01-02", "userId": "user_1"}
+            ),
+            FilterRequestModel(
+                **{"dateRange": "2021-01-01 to 2021-01-02", "cluster": "cluster_2"}
+            ),
+        ]
+        filter_record = FilterRecordFromMongo(
+            mongo_host="test",
+            mongo_db_name="test",
+            mongo_collection_name="test",
+            mongo_port=0,
+            request=requests[0],
+        )
+        mock_collection.find.return_value = [
+            {
+                "_id": 1,
+                "originationTime": 1609459200,
+                "clusterId": "cluster_1",
+                "userId": "user_1",
+                "devices": {"phone": "phone", "voicemail": "voicemail"},
+            },
+            {
+                "_id": 2,
+                "originationTime": 1609545600,
+                "clusterId": "cluster_2",
+                "userId": "user_1",
+                "devices": {"phone": "phone", "voicemail": "voicemail"},
+            },
+        ]
+        filter_record.collection = mock_collection
+
+        responses = filter_record.filter_records_batch_from_mongo(requests)
+
+        assert [
+            [record.id for record in response.result] for response in responses
+        ] == [
+            [1, 2],
+            [2],
+        ]
+        mock_collection.find.assert_called_once()
+
+    @patch("app.workers.filter_records.filter_from_mongo.MongoClient")
+    def test_filter_record_with_query_time_limit(self, mock_mongo_client):
+        """
+        Test case for the time limit of the request applied on the server, and
+        a query exceeding it
+        """
+        mock_collection = MagicMock()
+        mock_mongo_client.return_value = MagicMock()
+
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        filter_record = FilterRecordFromMongo(
+            mongo_host="test",
+            mongo_db_name="test",
+            mongo_collection_name="test",
+            mongo_port=0,
+            request=request,
+            max_time_ms=250,
+        )
+        mock_cursor = mock_collection.find.return_value
+        mock_cursor.max_time_ms.return_value = []
+        filter_record.collection = mock_collection
+
+        query = filter_record.mongo_db_query_builder()
+        assert not filter_record.filter_record_with_query(query)
+        mock_cursor.max_time_ms.assert_called_once_with(250)
+
+        mock_cursor.max_time_ms.side_effect = ExecutionTimeout("operation exceeded")
+        with pytest.raises(DeadlineExceededError):
+            filter_record.filter_record_with_query(query)
+
+    @patch("app.workers.filter_records.filter_from_mongo.MongoClient")
+    def test_shared_client(self, mock_mongo_client):
+        """
+        Test case for the workers of a server sharing one client, created with
+        the server selection timeout
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        workers = [
+            FilterRecordFromMongo(
+                mongo_host="test",
+                mongo_db_name="test",
+                mongo_collection_name="test",
+                mongo_port=0,
+                request=request,
+                server_selection_timeout_ms=2000,
+            )
+            for _ in range(3)
+        ]
+
+        mock_mongo_client.assert_called_once_with(
+            "test", 0, serverSelectionTimeoutMS=2000
+        )
+        assert all(worker.client is workers[0].client for worker in workers)
+
+        close_mongo_clients()
+        mock_mongo_client.return_value.close.assert_called_once()
+
+    @patch("app.workers.filter_records.filter_from_mongo.MongoClient")
+    def test_ping(self, mock_mongo_client):
+        """
+        Test case for the health probe of the server
+        """
+        mock_command = mock_mongo_client.return_value.admin.command
+
+        FilterRecordFromMongo.ping("test", 0, server_selection_timeout_ms=2000)
+        mock_command.assert_called_once_with("ping")
+
+        mock_command.side_effect = ServerSelectionTimeoutError("No servers found")
+        with pytest.raises(MongoDBConnectionError):
+            FilterRecordFromMongo.ping("test", 0, server_selection_timeout_ms=2000)
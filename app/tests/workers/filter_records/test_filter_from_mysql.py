@@ -5,12 +5,40 @@ import mysql.connector
 import pytest
 
 from app.api.filter_records.models import FilterRequestModel
-from app.core.constants import SQL_RECORDS_TABLE
+from app.core.config import settings
+from app.core.constants import (
+    DEVICES_TABLE_CREATE,
+    RECORDS_TABLE_CREATE,
+    SQL_DB_NAME,
+    SQL_DEVICES_TABLE,
+    SQL_RECORDS_TABLE,
+)
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
 from app.custom_exceptions.filter_from_sql_exception import (
     SQLConnectionError,
     SQLOperationError,
 )
-from app.workers.filter_records.filter_from_mysql import FilterRecordFromSQL
+from app.utils.metrics_helper import (
+    MYSQL_PREPARED_STATEMENTS,
+    MYSQL_THREAD_CONNECTIONS,
+)
+from app.utils.sql_migrations import apply_secondary_indexes
+from app.workers.filter_records.filter_from_mysql import (
+    FilterRecordFromSQL,
+    close_thread_connection,
+)
+
+EXPLAIN_TEST_DB = f"{SQL_DB_NAME}_explain_test"
+
+
+@pytest.fixture(autouse=True)
+def reset_thread_connection():
+    """
+    Drop the per-thread MySQL connection cached by the worker between tests
+    """
+    close_thread_connection()
+    yield
+    close_thread_connection()
 
 
 class TestFilterRecordFromSQL:
@@ -93,9 +121,12 @@ class TestFilterRecordFromSQL:
 
         expected_query = (
             f"SELECT * FROM {SQL_RECORDS_TABLE} WHERE originationTime "  # nosec
-            "BETWEEN '2021-01-01 00:00:00' AND '2021-01-02 00:00:00'"  # nosec
+            "BETWEEN %s AND %s"
+        )
+        assert filter_record.sql_query_builder() == (
+            expected_query,
+            (datetime(2021, 1, 1), datetime(2021, 1, 2)),
         )
-        assert filter_record.sql_query_builder() == expected_query
 
     @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
     def test_sql_query_builder_with_filters(self, mock_connect):
@@ -125,10 +156,38 @@ class TestFilterRecordFromSQL:
 
         expected_query = (
             f"SELECT * FROM {SQL_RECORDS_TABLE} WHERE originationTime "  # nosec
-            "BETWEEN '2021-01-01 00:00:00' AND '2021-01-02 00:00:00' AND "  # nosec
-            "(userId = 'user_id' OR clusterId = 'cluster_id')"  # nosec
+            "BETWEEN %s AND %s AND (userId = %s OR clusterId = %s)"
+        )
+        assert filter_record.sql_query_builder() == (
+            expected_query,
+            (datetime(2021, 1, 1), datetime(2021, 1, 2), "user_id", "cluster_id"),
         )
-        assert filter_record.sql_query_builder() == expected_query
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_sql_query_builder_does_not_inline_values(self, mock_connect):
+        """
+        Test case for filter values never being interpolated in the SQL text
+        """
+        mock_connect.return_value = MagicMock()
+
+        request = FilterRequestModel(
+            **{
+                "dateRange": "2021-01-01 to 2021-01-02",
+                "userId": "' OR '1'='1",
+            }
+        )
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=request,
+        )
+
+        query, params = filter_record.sql_query_builder()
+
+        assert "'1'='1" not in query
+        assert params[-1] == "' OR '1'='1"
 
     @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
     def test_sql_query_builder_with_device_filters(self, mock_connect):
@@ -152,15 +211,16 @@ class TestFilterRecordFromSQL:
             request=request,
         )
 
-        mock_cursor.execute.return_value = None
-        mock_cursor.fetchall.return_value = [{"_id": 1}, {"_id": 2}]
-
         expected_query = (
             f"SELECT * FROM {SQL_RECORDS_TABLE} WHERE originationTime "  # nosec
-            "BETWEEN '2021-01-01 00:00:00' AND '2021-01-02 00:00:00' "  # nosec
-            "AND (deviceId IN (1,2))"  # nosec
+            "BETWEEN %s AND %s AND (deviceId IN "
+            f"(SELECT _id FROM {SQL_DEVICES_TABLE} WHERE phone = %s))"  # nosec
         )
-        assert filter_record.sql_query_builder() == expected_query
+        assert filter_record.sql_query_builder() == (
+            expected_query,
+            (datetime(2021, 1, 1), datetime(2021, 1, 2), "1234567890"),
+        )
+        mock_cursor.execute.assert_not_called()
 
     @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
     def test_process_records(self, mock_connect):
@@ -200,13 +260,17 @@ class TestFilterRecordFromSQL:
         ]
 
         mock_cursor.execute.side_effect = [None, None]
-        mock_cursor.fetchone.side_effect = [
-            {"phone": "1234567890", "voicemail": "voicemail1"},
-            {"phone": "0987654321", "voicemail": "voicemail2"},
+        mock_cursor.fetchall.side_effect = [
+            [{"phone": "1234567890", "voicemail": "voicemail1"}],
+            [{"phone": "0987654321", "voicemail": "voicemail2"}],
         ]
 
         processed_records = filter_record.process_records(records)
 
+        mock_conn.cursor.assert_called_once_with(prepared=True, dictionary=True)
+        assert mock_cursor.execute.call_args_list[0].args[1] == (1,)
+        assert mock_cursor.execute.call_args_list[1].args[1] == (2,)
+
         assert len(processed_records) == 2
         assert processed_records[0].origination_time == "2021-01-01 12:00:00"
         assert processed_records[0].devices.model_dump() == {
@@ -240,25 +304,25 @@ class TestFilterRecordFromSQL:
         )
 
         mock_cursor.execute.return_value = None
-        mock_cursor.fetchall.return_value = [
-            {
-                "_id": 1,
-                "originationTime": datetime(2021, 1, 1, 12, 0, 0),
-                "deviceId": 1,
-                "userId": "user1",
-                "clusterId": "cluster1",
-            },
-            {
-                "_id": 2,
-                "originationTime": datetime(2021, 1, 2, 12, 0, 0),
-                "deviceId": 2,
-                "userId": "user2",
-                "clusterId": "cluster2",
-            },
-        ]
-        mock_cursor.fetchone.side_effect = [
-            {"phone": "1234567890", "voicemail": "voicemail1"},
-            {"phone": "0987654321", "voicemail": "voicemail2"},
+        mock_cursor.fetchall.side_effect = [
+            [
+                {
+                    "_id": 1,
+                    "originationTime": datetime(2021, 1, 1, 12, 0, 0),
+                    "deviceId": 1,
+                    "userId": "user1",
+                    "clusterId": "cluster1",
+                },
+                {
+                    "_id": 2,
+                    "originationTime": datetime(2021, 1, 2, 12, 0, 0),
+                    "deviceId": 2,
+                    "userId": "user2",
+                    "clusterId": "cluster2",
+                },
+            ],
+            [{"phone": "1234567890", "voicemail": "voicemail1"}],
+            [{"phone": "0987654321", "voicemail": "voicemail2"}],
         ]
 
         response = filter_record.filter_records_from_sql()
@@ -302,3 +366,529 @@ class TestFilterRecordFromSQL:
 
         mock_cursor.close.assert_called_once()
         mock_conn.close.assert_called_once()
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_connection_and_prepared_cursor_reused(self, mock_connect):
+        """
+        Test case for workers on one thread sharing connection and prepared cursors
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_conn.is_connected.return_value = True
+        mock_cursor.fetchall.return_value = []
+
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        for _ in range(3):
+            FilterRecordFromSQL(
+                mysql_host="test",
+                mysql_db_name="test",
+                mysql_password="test",  # nosec
+                mysql_user="test",
+                request=request,
+            ).filter_records_from_sql()
+
+        mock_connect.assert_called_once()
+        mock_conn.cursor.assert_called_once_with(prepared=True, dictionary=True)
+        executed_queries = [call.args[0] for call in mock_cursor.execute.call_args_list]
+        assert len(executed_queries) == 3
+        assert all(query is executed_queries[0] for query in executed_queries)
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_connection_timeout(self, mock_connect):
+        """
+        Test case for the connection giving up on an unreachable server
+        """
+        mock_connect.side_effect = mysql.connector.Error("Can't connect")
+
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        with pytest.raises(SQLConnectionError):
+            FilterRecordFromSQL(
+                mysql_host="test",
+                mysql_db_name="test",
+                mysql_password="test",  # nosec
+                mysql_user="test",
+                request=request,
+                connection_timeout=2,
+            )
+
+        assert mock_connect.call_args.kwargs["connection_timeout"] == 2
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_ping(self, mock_connect):
+        """
+        Test case for the health probe of the server, on a connection of its own
+        """
+        mock_conn = mock_connect.return_value
+
+        FilterRecordFromSQL.ping("test", "test", "test", "test", connection_timeout=2)
+        mock_conn.ping.assert_called_once()
+        mock_conn.close.assert_called_once()
+        assert MYSQL_THREAD_CONNECTIONS.values[()] == 0
+
+        mock_connect.side_effect = mysql.connector.Error("Can't connect")
+        with pytest.raises(SQLConnectionError):
+            FilterRecordFromSQL.ping(
+                "test", "test", "test", "test", connection_timeout=2
+            )
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_connection_gauges(self, mock_connect):
+        """
+        Test case for the cached connection and prepared statement gauges
+        """
+        mock_conn = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchall.return_value = []
+        mock_conn.is_connected.return_value = True
+        connections = MYSQL_THREAD_CONNECTIONS.values[()]
+        prepared_statements = MYSQL_PREPARED_STATEMENTS.values[()]
+
+        FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"}),
+        ).filter_records_from_sql()
+
+        assert MYSQL_THREAD_CONNECTIONS.values[()] == connections + 1
+        assert MYSQL_PREPARED_STATEMENTS.values[()] == prepared_statements + 1
+
+        close_thread_connection()
+
+        assert MYSQL_THREAD_CONNECTIONS.values[()] == connections
+        assert MYSQL_PREPARED_STATEMENTS.values[()] == prepared_statements
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_sql_query_builder_with_union_rewrite(self, mock_connect):
+        """
+        Test case for SQL query building with OR rewritten into UNION branches
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+
+        request = FilterRequestModel(
+            **{
+                "dateRange": "2021-01-01 to 2021-01-02",
+                "userId": "user_id",
+                "cluster": "cluster_id",
+            }
+        )
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=request,
+            use_union=True,
+        )
+
+        expected_query = (
+            f"SELECT * FROM {SQL_RECORDS_TABLE} "  # nosec
+            "WHERE userId = %s AND originationTime BETWEEN %s AND %s UNION "
+            f"SELECT * FROM {SQL_RECORDS_TABLE} "  # nosec
+            "WHERE clusterId = %s AND originationTime BETWEEN %s AND %s"
+        )
+        start_date, end_date = datetime(2021, 1, 1), datetime(2021, 1, 2)
+        assert filter_record.sql_query_builder() == (
+            expected_query,
+            ("user_id", start_date, end_date, "cluster_id", start_date, end_date),
+        )
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_sql_query_builder_with_union_rewrite_single_field(self, mock_connect):
+        """
+        Test case for UNION rewrite keeping a single filter field as plain query
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+
+        request = FilterRequestModel(
+            **{"dateRange": "2021-01-01 to 2021-01-02", "userId": "user_id"}
+        )
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=request,
+            use_union=True,
+        )
+
+        expected_query = (
+            f"SELECT * FROM {SQL_RECORDS_TABLE} WHERE originationTime "  # nosec
+            "BETWEEN %s AND %s AND (userId = %s)"
+        )
+        assert filter_record.sql_query_builder() == (
+            expected_query,
+            (datetime(2021, 1, 1), datetime(2021, 1, 2), "user_id"),
+        )
+
+
+def _local_mysql_connection():
+    """Connect to the local MySQL used for EXPLAIN checks, None if unreachable"""
+    try:
+        return mysql.connector.connect(
+            host=settings.SQL_DB_HOST,
+            user=settings.SQL_DB_USERNAME,
+            password=settings.SQL_DB_PASSWORD,
+            connection_timeout=1,
+        )
+    except mysql.connector.Error:
+        return None
+
+
+@pytest.fixture(scope="module")
+def explain_cursor():
+    """
+    Cursor on a scratch database with the application schema and indexes
+    """
+    conn = _local_mysql_connection()
+    if conn is None:
+        pytest.skip("Local MySQL is not reachable for EXPLAIN checks")
+
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {EXPLAIN_TEST_DB}")
+    cursor.execute(f"USE {EXPLAIN_TEST_DB}")
+    cursor.execute(DEVICES_TABLE_CREATE)
+    cursor.execute(RECORDS_TABLE_CREATE)
+    apply_secondary_indexes(cursor, database_name=EXPLAIN_TEST_DB)
+
+    cursor.executemany(
+        f"INSERT IGNORE INTO {SQL_DEVICES_TABLE} (_id, phone, voicemail) "  # nosec
+        "VALUES (%s, %s, %s)",
+        [
+            (device_id, f"SEP{device_id}", f"{device_id}VM")
+            for device_id in range(1, 51)
+        ],
+    )
+    cursor.executemany(
+        f"INSERT IGNORE INTO {SQL_RECORDS_TABLE} "  # nosec
+        "(_id, userId, deviceId, clusterId, originationTime) "
+        "VALUES (%s, %s, %s, %s, FROM_UNIXTIME(%s))",
+        [
+            (
+                record_id,
+                f"user{record_id % 20}",
+                record_id % 50 + 1,
+                f"domainserver{record_id % 10}",
+                1609459200 + record_id * 600,
+            )
+            for record_id in range(1000)
+        ],
+    )
+    conn.commit()
+    cursor.execute(f"ANALYZE TABLE {SQL_RECORDS_TABLE}, {SQL_DEVICES_TABLE}")
+    cursor.fetchall()
+
+    dictionary_cursor = conn.cursor(dictionary=True)
+    yield dictionary_cursor
+
+    dictionary_cursor.close()
+    cursor.execute(f"DROP DATABASE {EXPLAIN_TEST_DB}")
+    cursor.close()
+    conn.close()
+
+
+class TestFilterRecordFromSQLExplain:
+    # pylint: disable=redefined-outer-name
+    """
+    EXPLAIN checks for the index usage of the filter queries on a local MySQL
+    """
+
+    @pytest.mark.parametrize(
+        "request_fields, expected_indexes",
+        [
+            ({"userId": "user1"}, {"idx_records_user_time"}),
+            ({"cluster": "domainserver1"}, {"idx_records_cluster_time"}),
+            (
+                {"userId": "user1", "cluster": "domainserver1"},
+                {"idx_records_user_time", "idx_records_cluster_time"},
+            ),
+            (
+                {"userId": "user1", "phoneNumber": "SEP1"},
+                {"idx_records_user_time", "idx_records_device_time"},
+            ),
+        ],
+    )
+    def test_union_branches_use_indexes(
+        self, explain_cursor, request_fields, expected_indexes
+    ):
+        """
+        Test case for every UNION branch being served by its own index
+        """
+        request = FilterRequestModel(
+            **{"dateRange": "2021-01-01 to 2021-01-02", **request_fields}
+        )
+        with patch(
+            "app.workers.filter_records.filter_from_mysql.mysql.connector.connect"
+        ) as mock_connect:
+            mock_connect.return_value.cursor.return_value = explain_cursor
+            filter_record = FilterRecordFromSQL(
+                mysql_host="test",
+                mysql_db_name=EXPLAIN_TEST_DB,
+                mysql_password="test",  # nosec
+                mysql_user="test",
+                request=request,
+                use_union=True,
+            )
+            query, params = filter_record.sql_query_builder()
+            explain_cursor.execute(f"EXPLAIN {query}", params)
+            used_indexes = {
+                row["key"]
+                for row in explain_cursor.fetchall()
+                if row["table"] == SQL_RECORDS_TABLE
+            }
+
+        assert used_indexes == expected_indexes
+
+    def test_voicemail_lookup_uses_index(self, explain_cursor):
+        """
+        Test case for voicemail only device lookup being served by an index
+        """
+        explain_cursor.execute(
+            f"EXPLAIN SELECT _id FROM {SQL_DEVICES_TABLE} "  # nosec
+            "WHERE voicemail = '1VM'"
+        )
+        assert explain_cursor.fetchone()["key"] == "idx_devices_voicemail"
+
+    def test_sql_batch_query_builder(self):
+        """
+        Test case for building the MySQL query of a batch of requests
+        """
+        requests = [
+            FilterRequestModel(
+                **{"dateRange": "2021-01-02 to 2021-01-03", "userId": "user2"}
+            ),
+            FilterRequestModel(
+                **{
+                    "dateRange": "2021-01-01 to 2021-01-02",
+                    "userId": "user1",
+                    "voiceMail": "voicemail1",
+                }
+            ),
+        ]
+
+        query, params = FilterRecordFromSQL.sql_batch_query_builder(requests)
+
+        assert query == (
+            f"SELECT * FROM {SQL_RECORDS_TABLE} "
+            "WHERE originationTime BETWEEN %s AND %s "
+            "AND (userId IN (%s, %s) OR deviceId IN "
+            f"(SELECT _id FROM {SQL_DEVICES_TABLE} WHERE voicemail IN (%s)))"
+        )
+        assert params == (
+            datetime(2021, 1, 1),
+            datetime(2021, 1, 3),
+            "user1",
+            "user2",
+            "voicemail1",
+        )
+
+        requests.append(FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"}))
+        query, params = FilterRecordFromSQL.sql_batch_query_builder(requests)
+
+        assert query == (
+            f"SELECT * FROM {SQL_RECORDS_TABLE} "
+            "WHERE originationTime BETWEEN %s AND %s"
+        )
+        assert params == (datetime(2021, 1, 1), datetime(2021, 1, 3))
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_filter_records_batch_from_sql(self, mock_connect):
+        """
+        Test case for filtering records from MySQL for a batch of requests with
+        one query
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+
+        requests = [
+            FilterRequestModel(
+                **{"dateRange": "2021-01-01 to 2021-01-03", "userId": "user1"}
+            ),
+            FilterRequestModel(
+                **{"dateRange": "2021-01-01 to 2021-01-02", "cluster": "cluster2"}
+            ),
+        ]
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=requests[0],
+        )
+
+        mock_cursor.fetchall.side_effect = [
+            [
+                {
+                    "_id": 1,
+                    "originationTime": datetime(2021, 1, 1, 12, 0, 0),
+                    "deviceId": 1,
+                    "userId": "user1",
+                    "clusterId": "cluster1",
+                },
+                {
+                    "_id": 2,
+                    "originationTime": datetime(2021, 1, 2, 12, 0, 0),
+                    "deviceId": 2,
+                    "userId": "user1",
+                    "clusterId": "cluster2",
+                },
+            ],
+            [{"phone": "1234567890", "voicemail": "voicemail1"}],
+            [{"phone": "0987654321", "voicemail": "voicemail2"}],
+        ]
+
+        responses = filter_record.filter_records_batch_from_sql(requests)
+
+        assert [
+            [record.id for record in response.result] for response in responses
+        ] == [
+            [1, 2],
+            [],
+        ]
+        mock_conn.cursor.assert_any_call(dictionary=True)
+        assert mock_cursor.execute.call_args_list[0].args[1][2:] == (
+            "user1",
+            "cluster2",
+        )
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_filter_records_batch_from_sql_sql_error(self, mock_connect):
+        """
+        Test case for SQL error while filtering records from MySQL for a batch
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = mysql.connector.Error("SQL error")
+
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=request,
+        )
+
+        with pytest.raises(SQLOperationError):
+            filter_record.filter_records_batch_from_sql([request])
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_filter_records_batch_from_sql_time_limit_exceeded(self, mock_connect):
+        """
+        Test case for a batch query killed at its time limit
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = mysql.connector.Error(errno=3024)
+
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=request,
+            max_execution_ms=500,
+        )
+
+        with pytest.raises(DeadlineExceededError):
+            filter_record.filter_records_batch_from_sql([request])
+
+        assert "MAX_EXECUTION_TIME(500)" in mock_cursor.execute.call_args.args[0]
+        mock_conn.close.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "max_execution_ms, expected_hint",
+        [
+            (None, None),
+            (20, "MAX_EXECUTION_TIME(20)"),
+            (100, "MAX_EXECUTION_TIME(100)"),
+            (1499, "MAX_EXECUTION_TIME(1000)"),
+            (90000, "MAX_EXECUTION_TIME(60000)"),
+        ],
+    )
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_with_max_execution_time(
+        self, mock_connect, max_execution_ms, expected_hint
+    ):
+        """
+        Test case for the time limit hint, rounded down to a bucket and placed
+        after the first SELECT
+        """
+        mock_connect.return_value = MagicMock()
+        request = FilterRequestModel(
+            **{
+                "dateRange": "2021-01-01 to 2021-01-02",
+                "userId": "user1",
+                "cluster": "cluster1",
+            }
+        )
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=request,
+            use_union=True,
+            max_execution_ms=max_execution_ms,
+        )
+        query, _ = filter_record.sql_query_builder()
+
+        hinted_query = filter_record.with_max_execution_time(query)
+
+        if expected_hint is None:
+            assert hinted_query == query
+        else:
+            assert hinted_query == query.replace(
+                "SELECT ", f"SELECT /*+ {expected_hint} */ ", 1
+            )
+            assert hinted_query.count("MAX_EXECUTION_TIME") == 1
+
+    @patch("app.workers.filter_records.filter_from_mysql.mysql.connector.connect")
+    def test_filter_records_from_sql_time_limit_exceeded(self, mock_connect):
+        """
+        Test case for a query killed at its time limit, keeping the connection
+        """
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = mysql.connector.Error(errno=3024)
+
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        filter_record = FilterRecordFromSQL(
+            mysql_host="test",
+            mysql_db_name="test",
+            mysql_password="test",  # nosec
+            mysql_user="test",
+            request=request,
+            max_execution_ms=500,
+        )
+
+        with pytest.raises(DeadlineExceededError):
+            filter_record.filter_records_from_sql()
+
+        assert "MAX_EXECUTION_TIME(500)" in mock_cursor.execute.call_args.args[0]
+        mock_conn.close.assert_not_called()
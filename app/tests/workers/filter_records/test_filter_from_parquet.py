@@ -0,0 +1,237 @@
+import os
+from datetime import datetime
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.api.filter_records.models import FilterRequestModel, FilterResponseModel
+from app.core.constants import RECORD_PARQUET_FILE_NAME
+from app.custom_exceptions.filter_from_parquet_exception import (
+    ParquetFileNotFoundError,
+    ParquetOperationError,
+)
+from app.utils.record_generator import store_records_to_parquet
+from app.workers.filter_records import filter_from_parquet
+from app.workers.filter_records.filter_from_parquet import (
+    FilterRecordFromParquet,
+    equal_mask,
+)
+
+
+def timestamp(date: str) -> int:
+    """Local timestamp of a date, the way the records are generated"""
+    return int(datetime.strptime(date, "%Y-%m-%d %H:%M:%S").timestamp())
+
+
+RECORDS = [
+    {
+        "_id": 1,
+        "originationTime": timestamp("2021-01-01 10:00:00"),
+        "clusterId": "cluster_1",
+        "userId": "user_1",
+        "devices": {"phone": "phone_1", "voicemail": "voicemail_1"},
+    },
+    {
+        "_id": 2,
+        "originationTime": timestamp("2021-01-01 12:00:00"),
+        "clusterId": "cluster_2",
+        "userId": "user_2",
+        "devices": {"phone": "phone_2", "voicemail": "voicemail_2"},
+    },
+    {
+        "_id": 3,
+        "originationTime": timestamp("2021-01-05 10:00:00"),
+        "clusterId": "cluster_1",
+        "userId": "user_3",
+        "devices": {"phone": "phone_3", "voicemail": "voicemail_3"},
+    },
+]
+
+
+@pytest.fixture
+def parquet_path(tmp_path):
+    """
+    Parquet file of the test records, stored the way the record generator does
+    """
+    with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+        store_records_to_parquet(RECORDS, row_group_size=1)
+    return str(tmp_path / RECORD_PARQUET_FILE_NAME)
+
+
+class TestFilterRecordFromParquet:
+    # pylint: disable=redefined-outer-name
+    """
+    Test for filtering records from Parquet
+    """
+
+    def test_filter_records_with_date_range(self, parquet_path):
+        """
+        Test the records are filtered with the date range only
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+
+        response = FilterRecordFromParquet(
+            parquet_path, request
+        ).filter_records_from_parquet()
+
+        assert isinstance(response, FilterResponseModel)
+        assert [record.id for record in response.result] == [1, 2]
+        assert response.result[0].origination_time == "2021-01-01 10:00:00"
+        assert response.result[0].devices.phone == "phone_1"
+
+    def test_filter_records_with_fields(self, parquet_path):
+        """
+        Test the records matching any of the fields within the date range are
+        returned once
+        """
+        request = FilterRequestModel(
+            **{
+                "dateRange": "2021-01-01 to 2021-01-10",
+                "cluster": "cluster_1",
+                "userId": "user_1",
+                "phoneNumber": "phone_2",
+            }
+        )
+
+        response = FilterRecordFromParquet(
+            parquet_path, request
+        ).filter_records_from_parquet()
+
+        assert [record.id for record in response.result] == [1, 2, 3]
+        assert response.number_of_filtered_records == 3
+
+    def test_filter_records_with_unknown_value(self, parquet_path):
+        """
+        Test a value missing from the dictionary of a column matches no record
+        """
+        request = FilterRequestModel(
+            **{"dateRange": "2021-01-01 to 2021-01-10", "cluster": "cluster_9"}
+        )
+
+        response = FilterRecordFromParquet(
+            parquet_path, request
+        ).filter_records_from_parquet()
+
+        assert not response.result
+
+    def test_row_groups_are_pruned(self, parquet_path):
+        """
+        Test only the row groups overlapping the date range are read
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-04 to 2021-01-06"})
+        worker = FilterRecordFromParquet(parquet_path, request)
+        with pa.memory_map(parquet_path) as parquet_source:
+            metadata = worker.load_metadata(parquet_source)
+
+        assert metadata.num_row_groups == 3
+        assert worker.prune_row_groups(metadata, *worker.date_bounds()) == [2]
+
+        with patch.object(
+            FilterRecordFromParquet,
+            "filter_row_group",
+            autospec=True,
+            side_effect=FilterRecordFromParquet.filter_row_group,
+        ) as mock_filter_row_group:
+            response = worker.filter_records_from_parquet()
+
+        assert [call.args[2] for call in mock_filter_row_group.call_args_list] == [2]
+        assert [record.id for record in response.result] == [3]
+
+    def test_equal_mask(self):
+        """
+        Test the mask of dictionary encoded and plain columns
+        """
+        values = ["cluster_1", "cluster_2", "cluster_1"]
+        dictionary_column = pa.chunked_array([pa.array(values).dictionary_encode()])
+        plain_column = pa.chunked_array([pa.array(values)])
+
+        assert equal_mask(dictionary_column, "cluster_1").to_pylist() == [
+            True,
+            False,
+            True,
+        ]
+        assert equal_mask(dictionary_column, "cluster_9").to_pylist() == [
+            False,
+            False,
+            False,
+        ]
+        assert equal_mask(plain_column, "cluster_2").to_pylist() == [
+            False,
+            True,
+            False,
+        ]
+
+    def test_metadata_is_cached(self, parquet_path):
+        """
+        Test the footer is read once per published file
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        filter_from_parquet._metadata_cache.clear()  # pylint: disable=W0212
+
+        with (
+            patch(
+                "app.workers.filter_records.filter_from_parquet.pq.read_metadata",
+                side_effect=pq.read_metadata,
+            ) as mock_read_metadata,
+            pa.memory_map(parquet_path) as parquet_source,
+        ):
+            first = FilterRecordFromParquet(parquet_path, request).load_metadata(
+                parquet_source
+            )
+            second = FilterRecordFromParquet(parquet_path, request).load_metadata(
+                parquet_source
+            )
+
+        assert second is first
+        assert mock_read_metadata.call_count == 1
+
+    def test_file_is_read_through_one_handle(self, parquet_path):
+        """
+        Test the footer and the row groups are read from the file opened once,
+        even when a new generation is published at the path meanwhile, and the
+        response reports the generation read
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-10"})
+        worker = FilterRecordFromParquet(parquet_path, request)
+        parquet_source = pa.memory_map(parquet_path)
+        version = datetime.fromtimestamp(os.stat(parquet_path).st_mtime).strftime(
+            "%Y%m%dT%H%M%S"
+        )
+        with patch(
+            "app.utils.record_generator.RECORD_STORAGE_DIR",
+            os.path.dirname(parquet_path),
+        ):
+            store_records_to_parquet(RECORDS[:1])
+
+        with patch.object(worker, "open_parquet_file", return_value=parquet_source):
+            response = worker.filter_records_from_parquet()
+
+        assert sorted(record.id for record in response.result) == [1, 2, 3]
+        assert response.dataset_version == f"parquet@{version}"
+        assert parquet_source.closed
+
+    def test_missing_file(self, tmp_path):
+        """
+        Test a missing Parquet file raises a not found error
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+
+        with pytest.raises(ParquetFileNotFoundError):
+            FilterRecordFromParquet(
+                str(tmp_path / "missing.parquet"), request
+            ).filter_records_from_parquet()
+
+    def test_corrupt_file(self, tmp_path):
+        """
+        Test a file that is not Parquet raises an operation error
+        """
+        corrupt_path = tmp_path / "corrupt.parquet"
+        corrupt_path.write_bytes(b"not a parquet file")
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+
+        with pytest.raises(ParquetOperationError):
+            FilterRecordFromParquet(
+                str(corrupt_path), request
+            ).filter_records_from_parquet()
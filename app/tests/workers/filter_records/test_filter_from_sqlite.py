@@ -0,0 +1,225 @@
+import os
+import sqlite3
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from app.api.filter_records.models import FilterRequestModel, FilterResponseModel
+from app.core.constants import RECORD_SQLITE_FILE_NAME
+from app.custom_exceptions.filter_from_sqlite_exception import (
+    SQLiteConnectionError,
+    SQLiteOperationError,
+)
+from app.utils.metrics_helper import SQLITE_THREAD_CONNECTIONS
+from app.utils.record_generator import store_records_to_sqlite
+from app.workers.filter_records.filter_from_sqlite import (
+    FilterRecordFromSQLite,
+    close_thread_connection,
+)
+
+
+def timestamp(date: str) -> int:
+    """Local timestamp of a date, the way the records are generated"""
+    return int(datetime.strptime(date, "%Y-%m-%d %H:%M:%S").timestamp())
+
+
+RECORDS = [
+    {
+        "_id": 1,
+        "originationTime": timestamp("2021-01-01 10:00:00"),
+        "clusterId": "cluster_1",
+        "userId": "user_1",
+        "devices": {"phone": "phone_1", "voicemail": "voicemail_1"},
+    },
+    {
+        "_id": 2,
+        "originationTime": timestamp("2021-01-01 12:00:00"),
+        "clusterId": "cluster_2",
+        "userId": "user_2",
+        "devices": {"phone": "phone_2", "voicemail": "voicemail_2"},
+    },
+    {
+        "_id": 3,
+        "originationTime": timestamp("2021-01-05 10:00:00"),
+        "clusterId": "cluster_1",
+        "userId": "user_3",
+        "devices": {"phone": "phone_3", "voicemail": "voicemail_3"},
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def reset_thread_connection():
+    """
+    Drop the per-thread SQLite connection cached by the worker between tests
+    """
+    close_thread_connection()
+    yield
+    close_thread_connection()
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    """
+    SQLite file of the test records, stored the way the record generator does
+    """
+    with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+        store_records_to_sqlite(RECORDS)
+    return str(tmp_path / RECORD_SQLITE_FILE_NAME)
+
+
+class TestFilterRecordFromSQLite:
+    # pylint: disable=redefined-outer-name
+    """
+    Test for filtering records from SQLite
+    """
+
+    def test_filter_records_with_date_range(self, sqlite_path):
+        """
+        Test the records are filtered with the date range only
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+
+        response = FilterRecordFromSQLite(
+            sqlite_path, request
+        ).filter_records_from_sqlite()
+
+        assert isinstance(response, FilterResponseModel)
+        assert sorted(record.id for record in response.result) == [1, 2]
+        assert response.result[0].origination_time == "2021-01-01 10:00:00"
+        assert response.result[0].devices.phone == "phone_1"
+
+    def test_filter_records_with_fields(self, sqlite_path):
+        """
+        Test the records matching any of the fields within the date range are
+        returned once
+        """
+        request = FilterRequestModel(
+            **{
+                "dateRange": "2021-01-01 to 2021-01-10",
+                "cluster": "cluster_1",
+                "userId": "user_1",
+                "phoneNumber": "phone_2",
+            }
+        )
+
+        response = FilterRecordFromSQLite(
+            sqlite_path, request
+        ).filter_records_from_sqlite()
+
+        assert sorted(record.id for record in response.result) == [1, 2, 3]
+        assert response.number_of_filtered_records == 3
+
+    def test_query_uses_field_indexes(self, tmp_path):
+        """
+        Test every OR term is served by a range scan of its field index
+        """
+        # the planner rightly scans a table of a few rows, so the plan is
+        # checked on one large enough for its statistics to favour the indexes
+        with patch("app.utils.record_generator.RECORD_STORAGE_DIR", str(tmp_path)):
+            store_records_to_sqlite(
+                {
+                    "_id": record_id,
+                    "originationTime": RECORDS[0]["originationTime"] + record_id * 60,
+                    "clusterId": f"cluster_{record_id % 10}",
+                    "userId": f"user_{record_id}",
+                    "devices": {
+                        "phone": f"phone_{record_id}",
+                        "voicemail": f"voicemail_{record_id}",
+                    },
+                }
+                for record_id in range(10000)
+            )
+        sqlite_path = str(tmp_path / RECORD_SQLITE_FILE_NAME)
+        request = FilterRequestModel(
+            **{
+                "dateRange": "2021-01-01 to 2021-01-10",
+                "cluster": "cluster_1",
+                "voiceMail": "voicemail_2",
+            }
+        )
+        worker = FilterRecordFromSQLite(sqlite_path, request)
+        query, params = worker.sqlite_query_builder()
+
+        plan = " | ".join(
+            row[3] for row in worker.conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        )
+
+        assert "MULTI-INDEX OR" in plan
+        assert "idx_records_cluster_time (clusterId=? AND originationTime>?" in plan
+        assert "idx_records_voicemail_time (voicemail=? AND originationTime>?" in plan
+
+    def test_dataset_version_follows_the_file(self, sqlite_path):
+        """
+        Test the responses report the generation of the file they were read from
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        version = datetime.fromtimestamp(os.stat(sqlite_path).st_mtime).strftime(
+            "%Y%m%dT%H%M%S"
+        )
+
+        response = FilterRecordFromSQLite(
+            sqlite_path, request
+        ).filter_records_from_sqlite()
+
+        assert response.dataset_version == f"sqlite@{version}"
+
+    def test_connection_is_cached_per_thread(self, sqlite_path):
+        """
+        Test the thread connection is reused until a new file is published
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        connections = SQLITE_THREAD_CONNECTIONS.values[()]
+
+        first_worker = FilterRecordFromSQLite(sqlite_path, request)
+        second_worker = FilterRecordFromSQLite(sqlite_path, request)
+
+        assert second_worker.conn is first_worker.conn
+        assert SQLITE_THREAD_CONNECTIONS.values[()] == connections + 1
+
+        with patch(
+            "app.utils.record_generator.RECORD_STORAGE_DIR",
+            os.path.dirname(sqlite_path),
+        ):
+            store_records_to_sqlite(RECORDS[:1])
+        republished_worker = FilterRecordFromSQLite(sqlite_path, request)
+
+        assert republished_worker.conn is not first_worker.conn
+        assert SQLITE_THREAD_CONNECTIONS.values[()] == connections + 1
+        assert [
+            record.id
+            for record in republished_worker.filter_records_from_sqlite().result
+        ] == [1]
+
+    def test_connection_is_read_only(self, sqlite_path):
+        """
+        Test the worker connection refuses writes
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+        worker = FilterRecordFromSQLite(sqlite_path, request)
+
+        with pytest.raises(sqlite3.Error):
+            worker.conn.execute("DELETE FROM records")
+
+    def test_missing_file(self, tmp_path):
+        """
+        Test a missing SQLite file raises a connection error
+        """
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+
+        with pytest.raises(SQLiteConnectionError):
+            FilterRecordFromSQLite(str(tmp_path / "missing.sqlite3"), request)
+
+    def test_query_error(self, tmp_path):
+        """
+        Test a file without the records table raises an operation error
+        """
+        empty_path = tmp_path / "empty.sqlite3"
+        sqlite3.connect(empty_path).close()
+        request = FilterRequestModel(**{"dateRange": "2021-01-01 to 2021-01-02"})
+
+        with pytest.raises(SQLiteOperationError):
+            FilterRecordFromSQLite(
+                str(empty_path), request
+            ).filter_records_from_sqlite()
@@ -0,0 +1,33 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.custom_exceptions.backend_registry_exceptions import BackendNotEnabledError
+from app.workers.filter_records.filter_from_json import FilterRecordFromJSON
+from app.workers.filter_records.registry import enabled_backends, get_worker_class
+
+
+@patch.object(settings, "APP_BACKENDS", "json, sql,unknown,")
+def test_enabled_backends():
+    """
+    Test only the known backends enabled in the settings are enabled
+    """
+    assert enabled_backends() == ["json", "sql"]
+
+
+@patch.object(settings, "APP_BACKENDS", "json")
+def test_get_worker_class():
+    """
+    Test the worker class of an enabled backend is imported
+    """
+    assert get_worker_class("json") is FilterRecordFromJSON
+
+
+@patch.object(settings, "APP_BACKENDS", "json")
+def test_get_worker_class_not_enabled():
+    """
+    Test a backend not enabled on the host is refused
+    """
+    with pytest.raises(BackendNotEnabledError, match="mongodb is not enabled"):
+        get_worker_class("mongodb")
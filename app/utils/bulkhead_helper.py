@@ -0,0 +1,97 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from app.custom_exceptions.bulkhead_exceptions import BackendOverloadedError
+from app.utils.deadline_helper import check_deadline
+from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import (
+    FILTER_BULKHEAD_IN_FLIGHT,
+    FILTER_BULKHEAD_QUEUE_DEPTH,
+    FILTER_BULKHEAD_REJECTIONS,
+)
+
+
+class Bulkhead:
+    """
+    Dedicated, bounded thread pool of one backend. A backend runs at most
+    max_workers calls at a time and queues at most max_queue more; the calls
+    beyond are rejected right away instead of waiting, so a slow backend
+    neither takes the threads of the others nor piles up latency.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self, name: str, max_workers: int, max_queue: int, retry_after: int
+    ) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"{name}-bulkhead"
+        )
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+
+    def publish(self) -> None:
+        """
+        Publish the calls in flight and queued, under the lock
+        """
+        FILTER_BULKHEAD_IN_FLIGHT.set(self.in_flight, backend=self.name)
+        FILTER_BULKHEAD_QUEUE_DEPTH.set(
+            self.in_flight - self.running, backend=self.name
+        )
+
+    def run(self, call: Callable, *args):
+        """
+        Run an admitted call on a thread of the pool, unless its request was
+        cancelled or ran out of time while queued
+        """
+        check_deadline()
+        with self.lock:
+            self.running += 1
+            self.publish()
+        try:
+            return call(*args)
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.publish()
+
+    def release(self, future: Future) -> None:
+        # pylint: disable=unused-argument
+        """
+        Release the slot of a call once it is done or cancelled
+        """
+        with self.lock:
+            self.in_flight -= 1
+            self.publish()
+
+    def submit(self, call: Callable, *args) -> Future:
+        """
+        Run the call on the pool, in a copy of the calling context, or reject it
+        when the pool and its queue are full
+        """
+        with self.lock:
+            if self.in_flight >= self.max_workers + self.max_queue:
+                FILTER_BULKHEAD_REJECTIONS.inc(backend=self.name)
+                app_logger.warning(
+                    "Shedding a %s request, %d requests already in flight",
+                    self.name,
+                    self.in_flight,
+                )
+                raise BackendOverloadedError(
+                    message=f"Backend {self.name} is overloaded, retry later",
+                    retry_after=self.retry_after,
+                )
+            self.in_flight += 1
+            self.publish()
+
+        future = self.executor.submit(
+            contextvars.copy_context().run, self.run, call, *args
+        )
+        future.add_done_callback(self.release)
+        return future
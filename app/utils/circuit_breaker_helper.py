@@ -0,0 +1,158 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Tuple, Type
+
+from app.core.constants import (
+    CIRCUIT_STATE_CLOSED,
+    CIRCUIT_STATE_HALF_OPEN,
+    CIRCUIT_STATE_OPEN,
+    CIRCUIT_STATE_VALUES,
+)
+from app.custom_exceptions.circuit_breaker_exceptions import BackendUnavailableError
+from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import (
+    FILTER_CIRCUIT_BREAKER_REJECTIONS,
+    FILTER_CIRCUIT_BREAKER_STATE,
+    FILTER_CIRCUIT_BREAKER_TRANSITIONS,
+)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one backend, fed by the outcomes of its requests and by
+    its health probes. After failure_threshold failures in a row the circuit
+    opens and the requests fail fast. Once reset_timeout has passed, or as soon
+    as a probe finds the backend healthy again, the circuit is half open and a
+    single trial request goes through: its success closes the circuit, its
+    failure opens it again. Every failure while open restarts the cool-down.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # errors of the backend itself, the other errors leave the circuit as is
+        self.failure_exceptions = failure_exceptions
+        self.lock = threading.Lock()
+        self.state = CIRCUIT_STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        FILTER_CIRCUIT_BREAKER_STATE.set(
+            CIRCUIT_STATE_VALUES[self.state], backend=self.name
+        )
+
+    def transition(self, state: str) -> None:
+        """
+        Enter the state, under the lock
+        """
+        if state == CIRCUIT_STATE_OPEN:
+            self.opened_at = time.monotonic()
+        if state == self.state:
+            return
+
+        app_logger.warning(
+            "Circuit breaker of backend %s is now %s",
+            self.name,
+            state.replace("_", " "),
+        )
+        self.state = state
+        self.failures = 0
+        self.trial_in_flight = False
+        FILTER_CIRCUIT_BREAKER_STATE.set(CIRCUIT_STATE_VALUES[state], backend=self.name)
+        FILTER_CIRCUIT_BREAKER_TRANSITIONS.inc(backend=self.name, state=state)
+
+    def retry_after(self) -> int:
+        """
+        Whole seconds left of the cool-down, at least one
+        """
+        return max(1, math.ceil(self.opened_at + self.reset_timeout - time.monotonic()))
+
+    def allow(self) -> None:
+        """
+        Let a request through, or raise a BackendUnavailableError right away
+        while the circuit is open or its trial request is in flight
+        """
+        with self.lock:
+            if (
+                self.state == CIRCUIT_STATE_OPEN
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.transition(CIRCUIT_STATE_HALF_OPEN)
+            if self.state == CIRCUIT_STATE_CLOSED:
+                return
+            if self.state == CIRCUIT_STATE_HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+
+            FILTER_CIRCUIT_BREAKER_REJECTIONS.inc(backend=self.name)
+            raise BackendUnavailableError(
+                message=f"Backend {self.name} is unavailable, retry later",
+                retry_after=self.retry_after(),
+            )
+
+    def record_success(self) -> None:
+        """
+        Count a request the backend answered
+        """
+        with self.lock:
+            if self.state == CIRCUIT_STATE_HALF_OPEN:
+                self.transition(CIRCUIT_STATE_CLOSED)
+            elif self.state == CIRCUIT_STATE_CLOSED:
+                self.failures = 0
+
+    def record_failure(self) -> None:
+        """
+        Count a request or a probe the backend failed
+        """
+        with self.lock:
+            if self.state == CIRCUIT_STATE_CLOSED:
+                self.failures += 1
+                if self.failures < self.failure_threshold:
+                    return
+            self.transition(CIRCUIT_STATE_OPEN)
+
+    def record_ignored(self) -> None:
+        """
+        Count a request failing for another reason than the backend, freeing
+        the trial when it was the trial request
+        """
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_probe(self, healthy: bool) -> None:
+        """
+        Count a health probe of the backend: a healthy backend gets its trial
+        request without waiting for the end of the cool-down
+        """
+        if not healthy:
+            self.record_failure()
+            return
+        with self.lock:
+            if self.state == CIRCUIT_STATE_OPEN:
+                self.transition(CIRCUIT_STATE_HALF_OPEN)
+
+    @contextmanager
+    def guard(self):
+        """
+        Run a request of the backend through the circuit and count its outcome
+        """
+        self.allow()
+        try:
+            yield
+        except self.failure_exceptions:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.record_ignored()
+            raise
+        self.record_success()
@@ -0,0 +1,117 @@
+import contextvars
+import math
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+from app.core.constants import (
+    DEADLINE_REASON_CANCELLED,
+    DEADLINE_REASON_TIMEOUT,
+    DEADLINE_WAIT_INTERVAL_SECONDS,
+)
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+
+
+class RequestDeadline:
+    """
+    Deadline of a request, cancelled early when its client disconnects
+    """
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        """
+        Seconds left before the deadline, none once it is cancelled
+        """
+        if self.cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self) -> None:
+        """
+        Raise a DeadlineExceededError once the request is cancelled or its
+        deadline is over
+        """
+        if self.cancelled.is_set():
+            raise DeadlineExceededError(
+                message="Request cancelled by its client",
+                reason=DEADLINE_REASON_CANCELLED,
+            )
+        if time.monotonic() >= self.expires_at:
+            raise DeadlineExceededError(
+                message=f"Request deadline of {self.timeout}s exceeded",
+                reason=DEADLINE_REASON_TIMEOUT,
+            )
+
+
+# deadline of the current request, copied with the context to the backend threads
+current_deadline_ctx = contextvars.ContextVar("current_deadline", default=None)
+
+
+def check_deadline() -> None:
+    """
+    Stop the work of the current request once it is cancelled or its deadline
+    is over
+    """
+    deadline = current_deadline_ctx.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def remaining_seconds() -> Optional[float]:
+    """
+    Seconds left to the current request, None when it has no deadline
+    """
+    deadline = current_deadline_ctx.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def remaining_ms() -> Optional[int]:
+    """
+    Milliseconds left to the current request, as a server side time limit: at
+    least 1, since a limit of 0 means no limit to the databases
+    """
+    remaining = remaining_seconds()
+    return None if remaining is None else max(1, math.floor(remaining * 1000))
+
+
+def wait_within_deadline(event: threading.Event) -> None:
+    """
+    Wait for the event set by another request, raising a DeadlineExceededError
+    once the current request is cancelled or its deadline is over
+    """
+    deadline = current_deadline_ctx.get()
+    if deadline is None:
+        event.wait()
+        return
+
+    while not event.wait(min(deadline.remaining(), DEADLINE_WAIT_INTERVAL_SECONDS)):
+        deadline.check()
+
+
+def latest_deadline(
+    deadlines: Sequence[Optional[RequestDeadline]],
+) -> Optional[RequestDeadline]:
+    """
+    Deadline of work shared by several requests: the latest of theirs, so it
+    goes on while one of them still waits for it; None when one of them has no
+    deadline
+    """
+    if not deadlines or any(deadline is None for deadline in deadlines):
+        return None
+    return RequestDeadline(max(deadline.remaining() for deadline in deadlines))
+
+
+def run_within_deadline(deadline: Optional[RequestDeadline], call: Callable, *args):
+    """
+    Run work shared by several requests within their shared deadline, rather
+    than the deadline of the current one, which would end it for all of them
+    """
+    deadline_token = current_deadline_ctx.set(deadline)
+    try:
+        return call(*args)
+    finally:
+        current_deadline_ctx.reset(deadline_token)
@@ -0,0 +1,77 @@
+import asyncio
+import math
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.constants import REQUEST_TIMEOUT_HEADER
+from app.utils.deadline_helper import RequestDeadline, current_deadline_ctx
+
+
+def request_timeout(path: str, header_value: Optional[str]) -> float:
+    """
+    Deadline of a request in seconds: the default of its endpoint, shortened by
+    a valid X-Request-Timeout
+    """
+    timeout = settings.request_timeout(path.rstrip("/").rsplit("/", 1)[-1])
+    try:
+        requested_timeout = float(header_value)
+    except (TypeError, ValueError):
+        return timeout
+    if requested_timeout > 0 and math.isfinite(requested_timeout):
+        return min(timeout, requested_timeout)
+    return timeout
+
+
+class DeadlineMiddleware:
+    """
+    Deadline Middleware.
+    A plain ASGI middleware running the request with its deadline in context.
+    Once the body is read, the client connection is watched, and the deadline
+    is cancelled when the client disconnects, so the backend work of an
+    abandoned request stops at its next deadline check.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Run the request with its deadline in context"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = RequestDeadline(
+            request_timeout(
+                scope["path"], Headers(scope=scope).get(REQUEST_TIMEOUT_HEADER)
+            )
+        )
+        disconnect_watcher: Optional[asyncio.Task] = None
+
+        async def watch_disconnect() -> Message:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                deadline.cancelled.set()
+            return message
+
+        async def receive_watching_disconnect() -> Message:
+            nonlocal disconnect_watcher
+            if disconnect_watcher is not None:
+                return await disconnect_watcher
+
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                deadline.cancelled.set()
+            elif not message.get("more_body", False):
+                disconnect_watcher = asyncio.create_task(watch_disconnect())
+            return message
+
+        deadline_token = current_deadline_ctx.set(deadline)
+        try:
+            await self.app(scope, receive_watching_disconnect, send)
+        finally:
+            if disconnect_watcher is not None:
+                disconnect_watcher.cancel()
+            current_deadline_ctx.reset(deadline_token)
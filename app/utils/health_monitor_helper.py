@@ -0,0 +1,75 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from app.utils.circuit_breaker_helper import CircuitBreaker
+from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import BACKEND_HEALTH_PROBES
+
+
+class HealthMonitor:
+    """
+    Background thread probing the backends every interval and feeding the
+    outcomes to their circuit breakers, so a backend going down opens its
+    circuit without waiting for requests to fail, and one coming back is
+    tried again without waiting for the end of the cool-down
+    """
+
+    def __init__(
+        self,
+        probes: Dict[str, Callable[[], None]],
+        breakers: Dict[str, CircuitBreaker],
+        interval: float,
+    ) -> None:
+        self.probes = probes
+        self.breakers = breakers
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def probe(self, backend: str) -> bool:
+        """
+        Probe the backend once, the probe raising when the backend is unhealthy
+        """
+        # pylint: disable=broad-exception-caught
+        try:
+            self.probes[backend]()
+            healthy = True
+        except Exception as exc:
+            app_logger.warning("Health probe of backend %s failed: %s", backend, exc)
+            healthy = False
+
+        BACKEND_HEALTH_PROBES.inc(
+            backend=backend, outcome="healthy" if healthy else "unhealthy"
+        )
+        self.breakers[backend].record_probe(healthy)
+        return healthy
+
+    def run(self) -> None:
+        """
+        Probe every backend, then again every interval until stopped
+        """
+        while not self.stopped.is_set():
+            for backend in self.probes:
+                self.probe(backend)
+            self.stopped.wait(self.interval)
+
+    def start(self) -> None:
+        """
+        Start probing in the background, once
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="health-monitor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop probing, waiting for the probe in progress
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
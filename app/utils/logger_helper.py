@@ -1,8 +1,16 @@
+import atexit
 import contextvars
+import itertools
+import json
 import logging
+import os
+import queue
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
 from app.core.config import settings
+from app.utils.metrics_helper import LOG_RECORDS_DROPPED
 
 current_request_id_ctx = contextvars.ContextVar(
     "request_id", default="No Request ID Found"
@@ -22,6 +30,88 @@ class RequestIDFilter(logging.Filter):
         return True
 
 
+class JSONFormatter(logging.Formatter):
+    """
+    Formats the log records as one JSON object per line
+    """
+
+    def format(self, record):
+        """
+        Format the log record as JSON
+        """
+        log_entry = {
+            "timestamp": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            log_entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_entry["exception"] = record.exc_text
+        return json.dumps(log_entry)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that drops the log record instead of blocking or failing
+    when the bounded log queue is full
+    """
+
+    def enqueue(self, record):
+        """
+        Enqueue the record if there is room for it
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LogSampler:
+    """
+    Logs only the first and then every `every`-th message of a hot path, like
+    a message repeated for every record of a result, noting the sampling rate
+    """
+
+    def __init__(self, logger: logging.Logger, every: int):
+        self.logger = logger
+        self.every = max(every, 1)
+        self.counter = itertools.count()
+
+    def emit(self, level: int, msg: str, args: tuple) -> None:
+        """
+        Log the message if it is sampled, attributed to the caller of the sampler
+        """
+        if not self.logger.isEnabledFor(level) or next(self.counter) % self.every:
+            return
+        self.logger.log(
+            level,
+            "%s (sampled 1/%d)",
+            msg % args if args else msg,
+            self.every,
+            stacklevel=3,
+        )
+
+    def log(self, level: int, msg: str, *args) -> None:
+        """
+        Log a sampled message
+        """
+        self.emit(level, msg, args)
+
+    def info(self, msg: str, *args) -> None:
+        """
+        Log a sampled INFO message
+        """
+        self.emit(logging.INFO, msg, args)
+
+
 def get_console_handler(formatter) -> logging.Handler:
     """
     A console log handler to print logs in console
@@ -34,22 +124,54 @@ def get_console_handler(formatter) -> logging.Handler:
 
 def get_logger():
     """
-    Create logger for the application and returns the same
+    Create logger for the application and returns the same.
+    Request threads only put the log records on a bounded queue, a listener
+    thread writes them to the console; records are dropped when it is full.
     """
+    logger_obj = logging.getLogger(settings.APP_LOGGER_NAME)
+    if any(isinstance(handler, QueueHandler) for handler in logger_obj.handlers):
+        return logger_obj
 
-    formatter_pattern = logging.Formatter(
-        "%(asctime)s %(levelname)s [%(name)s, %(request_id)s] "
-        "--- %(module)s::%(funcName)s::%(lineno)d : %(message)s"
+    if settings.APP_LOG_JSON:
+        formatter_pattern = JSONFormatter()
+    else:
+        formatter_pattern = logging.Formatter(
+            "%(asctime)s %(levelname)s [%(name)s, %(request_id)s] "
+            "--- %(module)s::%(funcName)s::%(lineno)d : %(message)s"
+        )
+
+    log_queue = queue.Queue(maxsize=settings.APP_LOG_QUEUE_SIZE)
+    log_listener = QueueListener(
+        log_queue, get_console_handler(formatter_pattern), respect_handler_level=True
     )
+    log_listener.start()
+    atexit.register(log_listener.stop)
 
-    logger_obj = logging.getLogger(settings.APP_LOGGER_NAME)
     logger_obj.setLevel(settings.APP_LOG_LEVEL)
     logger_obj.propagate = False
-    logger_obj.addHandler(get_console_handler(formatter_pattern))
+    logger_obj.addHandler(DroppingQueueHandler(log_queue))
     logger_obj.addFilter(RequestIDFilter())
+    logger_obj.log_listener = log_listener
     logging.getLogger("multipart.multipart").setLevel(settings.APP_LOG_LEVEL)
 
     return logger_obj
 
 
+def restart_log_listener() -> None:
+    """
+    Restart the log listener in a forked process on a new queue: the listener
+    thread is not forked along with the process, and the queue of the parent
+    may have been forked locked
+    """
+    log_queue = queue.Queue(maxsize=settings.APP_LOG_QUEUE_SIZE)
+    for handler in app_logger.handlers:
+        if isinstance(handler, QueueHandler):
+            handler.queue = log_queue
+    app_logger.log_listener.queue = log_queue
+    app_logger.log_listener.start()
+
+
 app_logger = get_logger()
+sampled_logger = LogSampler(app_logger, settings.APP_LOG_SAMPLE_EVERY)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_log_listener)
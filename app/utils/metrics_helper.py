@@ -0,0 +1,433 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.constants import METRICS_LATENCY_BUCKETS, MICRO_BATCH_SIZE_BUCKETS
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
+
+
+def escape_label_value(value: str) -> str:
+    """
+    Escape a label value for the Prometheus text format
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    """
+    Base of the in-process metrics, one value per combination of label values
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+        if not self.labelnames and self.metric_type in ("counter", "gauge"):
+            self.values[()] = 0
+
+    def label_values(self, labels: dict) -> Tuple[str, ...]:
+        """
+        Label values of a sample in the order of the label names
+        """
+        return tuple(str(labels[labelname]) for labelname in self.labelnames)
+
+    def format_labels(self, label_values: Tuple[str, ...], **extra_labels) -> str:
+        """
+        Prometheus label set of a sample
+        """
+        labels = list(zip(self.labelnames, label_values)) + list(extra_labels.items())
+        if not labels:
+            return ""
+        return (
+            "{"
+            + ",".join(
+                f'{name}="{escape_label_value(str(value))}"' for name, value in labels
+            )
+            + "}"
+        )
+
+    def snapshot(self) -> Dict[Tuple[str, ...], object]:
+        """
+        Copy of the values of every labelled sample, taken under the lock
+        """
+        with self.lock:
+            return dict(self.values)
+
+    def samples(self) -> List[str]:
+        """
+        Exposition lines of the samples of the metric
+        """
+        with self.lock:
+            return [
+                f"{self.name}{self.format_labels(label_values)} {value}"
+                for label_values, value in sorted(self.values.items())
+            ]
+
+    def render(self) -> str:
+        """
+        Metric in the Prometheus text exposition format
+        """
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.description}",
+                f"# TYPE {self.name} {self.metric_type}",
+                *self.samples(),
+            ]
+        )
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing count
+    """
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        Increase the count of the labelled sample
+        """
+        label_values = self.label_values(labels)
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Value that goes up and down, like the size of a pool or cache
+    """
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """
+        Set the value of the labelled sample
+        """
+        label_values = self.label_values(labels)
+        with self.lock:
+            self.values[label_values] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        Increase the value of the labelled sample
+        """
+        label_values = self.label_values(labels)
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """
+        Decrease the value of the labelled sample
+        """
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values over fixed buckets
+    """
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = tuple(METRICS_LATENCY_BUCKETS),
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Count the value in its bucket of the labelled sample
+        """
+        label_values = self.label_values(labels)
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(
+                label_values, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts[bucket] += 1
+            self.values[label_values] = (counts, total + value)
+
+    def quantile(self, quantile: float, **labels) -> Optional[Tuple[float, int]]:
+        """
+        Upper bound of the bucket holding the quantile of the labelled sample,
+        infinite beyond the last bucket, along with its number of observations;
+        None when nothing was observed
+        """
+        label_values = self.label_values(labels)
+        with self.lock:
+            counts, _ = self.values.get(label_values, ([], 0.0))
+            counts = list(counts)
+
+        observations = sum(counts)
+        if not observations:
+            return None
+
+        cumulative = 0
+        for bucket, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            if cumulative >= quantile * observations:
+                return bucket, observations
+        return float("inf"), observations
+
+    def samples(self) -> List[str]:
+        """
+        Cumulative bucket counts, sum and count of every labelled sample
+        """
+        with self.lock:
+            values = sorted(
+                (label_values, (list(counts), total))
+                for label_values, (counts, total) in self.values.items()
+            )
+
+        lines = []
+        for label_values, (counts, total) in values:
+            cumulative = 0
+            for bucket, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{self.format_labels(label_values, le=bucket)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{self.format_labels(label_values)} {total}")
+            lines.append(
+                f"{self.name}_count{self.format_labels(label_values)} {cumulative}"
+            )
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registry of the metrics exposed by the /metrics endpoint
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Register a metric, once per name
+        """
+        return self.metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """
+        All the metrics in the Prometheus text exposition format
+        """
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+# stage durations of the current request, reported in its Server-Timing header
+current_stage_timings_ctx = contextvars.ContextVar("stage_timings", default=None)
+
+FILTER_REQUESTS = metrics_registry.register(
+    Counter(
+        "filter_requests_total",
+        "Filter requests by backend and outcome",
+        ["backend", "outcome"],
+    )
+)
+FILTER_REQUEST_DURATION = metrics_registry.register(
+    Histogram(
+        "filter_request_duration_seconds",
+        "Duration of the filter requests by backend",
+        ["backend"],
+    )
+)
+FILTER_STAGE_DURATION = metrics_registry.register(
+    Histogram(
+        "filter_stage_duration_seconds",
+        "Duration of the stages of the filter requests",
+        ["backend", "stage"],
+    )
+)
+FILTER_ROWS_SCANNED = metrics_registry.register(
+    Counter(
+        "filter_rows_scanned_total",
+        "Rows read from the backend by the filter requests",
+        ["backend"],
+    )
+)
+FILTER_ROWS_RETURNED = metrics_registry.register(
+    Counter(
+        "filter_rows_returned_total",
+        "Rows returned by the filter requests",
+        ["backend"],
+    )
+)
+MYSQL_THREAD_CONNECTIONS = metrics_registry.register(
+    Gauge(
+        "mysql_thread_connections",
+        "MySQL connections cached by the request threads",
+    )
+)
+MYSQL_PREPARED_STATEMENTS = metrics_registry.register(
+    Gauge(
+        "mysql_prepared_statements",
+        "Prepared statements cached on the MySQL thread connections",
+    )
+)
+SQLITE_THREAD_CONNECTIONS = metrics_registry.register(
+    Gauge(
+        "sqlite_thread_connections",
+        "SQLite connections cached by the request threads",
+    )
+)
+FEDERATED_BACKEND_OUTCOMES = metrics_registry.register(
+    Counter(
+        "federated_backend_outcomes_total",
+        "Outcomes of the backends queried by the federated filter requests",
+        ["backend", "status"],
+    )
+)
+FILTER_HEDGED_REQUESTS = metrics_registry.register(
+    Counter(
+        "filter_hedged_requests_total",
+        "Filter requests hedged to a secondary backend, by the backend answering",
+        ["backend", "hedge_backend", "winner"],
+    )
+)
+FILTER_SINGLE_FLIGHT_REQUESTS = metrics_registry.register(
+    Counter(
+        "filter_single_flight_requests_total",
+        "Filter requests executed (leader) or sharing the result of an identical "
+        "request in flight (follower)",
+        ["backend", "role"],
+    )
+)
+FILTER_COALESCING_RATIO = metrics_registry.register(
+    Gauge(
+        "filter_coalescing_ratio",
+        "Share of the filter requests served by an identical request in flight",
+        ["backend"],
+    )
+)
+FILTER_MICRO_BATCH_SIZE = metrics_registry.register(
+    Histogram(
+        "filter_micro_batch_size",
+        "Filter requests run together in one backend query",
+        ["backend"],
+        buckets=MICRO_BATCH_SIZE_BUCKETS,
+    )
+)
+FILTER_BULKHEAD_IN_FLIGHT = metrics_registry.register(
+    Gauge(
+        "filter_bulkhead_in_flight",
+        "Filter requests admitted to the thread pool of the backend, running or "
+        "queued",
+        ["backend"],
+    )
+)
+FILTER_BULKHEAD_QUEUE_DEPTH = metrics_registry.register(
+    Gauge(
+        "filter_bulkhead_queue_depth",
+        "Filter requests waiting for a thread of the backend",
+        ["backend"],
+    )
+)
+FILTER_BULKHEAD_REJECTIONS = metrics_registry.register(
+    Counter(
+        "filter_bulkhead_rejections_total",
+        "Filter requests shed because the backend was at its limits",
+        ["backend"],
+    )
+)
+FILTER_CIRCUIT_BREAKER_STATE = metrics_registry.register(
+    Gauge(
+        "filter_circuit_breaker_state",
+        "Circuit breaker state of the backend: 0 closed, 1 half open, 2 open",
+        ["backend"],
+    )
+)
+FILTER_CIRCUIT_BREAKER_TRANSITIONS = metrics_registry.register(
+    Counter(
+        "filter_circuit_breaker_transitions_total",
+        "Circuit breaker state changes of the backend, by the state entered",
+        ["backend", "state"],
+    )
+)
+FILTER_CIRCUIT_BREAKER_REJECTIONS = metrics_registry.register(
+    Counter(
+        "filter_circuit_breaker_rejections_total",
+        "Filter requests failed fast because the circuit of the backend was open",
+        ["backend"],
+    )
+)
+BACKEND_HEALTH_PROBES = metrics_registry.register(
+    Counter(
+        "backend_health_probes_total",
+        "Background health probes of the backends, by outcome",
+        ["backend", "outcome"],
+    )
+)
+APP_WARM_UP_DURATION = metrics_registry.register(
+    Gauge(
+        "app_warm_up_duration_seconds",
+        "Duration of the warm-up of the app at startup",
+    )
+)
+LOG_RECORDS_DROPPED = metrics_registry.register(
+    Counter(
+        "log_records_dropped_total",
+        "Log records dropped because the log queue was full",
+    )
+)
+
+
+@contextmanager
+def stage_timer(backend: str, stage: str):
+    """
+    Time a stage of a filter request, also adding it to the stage timings of
+    the current request if they are being collected
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started_at
+        FILTER_STAGE_DURATION.observe(duration, backend=backend, stage=stage)
+        stage_timings = current_stage_timings_ctx.get()
+        if stage_timings is not None:
+            timing_name = f"{backend}.{stage}"
+            stage_timings[timing_name] = stage_timings.get(timing_name, 0) + duration
+
+
+@contextmanager
+def filter_request_timer(backend: str):
+    """
+    Time a filter request and count it by its outcome
+    """
+    started_at = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    except DeadlineExceededError as exc:
+        outcome = exc.reason
+        raise
+    finally:
+        FILTER_REQUEST_DURATION.observe(
+            time.perf_counter() - started_at, backend=backend
+        )
+        FILTER_REQUESTS.inc(backend=backend, outcome=outcome)
+
+
+def count_rows(backend: str, scanned: int, returned: int) -> None:
+    """
+    Count the rows read from a backend and the rows returned from them
+    """
+    FILTER_ROWS_SCANNED.inc(scanned, backend=backend)
+    FILTER_ROWS_RETURNED.inc(returned, backend=backend)
@@ -0,0 +1,164 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.api.filter_records.models import FilterRequestModel, RecordModel
+from app.utils.deadline_helper import (
+    RequestDeadline,
+    current_deadline_ctx,
+    latest_deadline,
+    run_within_deadline,
+    wait_within_deadline,
+)
+
+# filter fields of the request and the record attribute each of them matches
+BATCH_FILTER_FIELDS = [
+    ("user_id", lambda record: record.user_id),
+    ("cluster", lambda record: record.cluster_id),
+    ("phone_number", lambda record: record.devices.phone),
+    ("voice_mail", lambda record: record.devices.voicemail),
+]
+
+
+class Batch:
+    """
+    Requests collected during one batching window, and their results
+    """
+
+    def __init__(self):
+        self.requests: List[FilterRequestModel] = []
+        self.deadlines: List[Optional[RequestDeadline]] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: Optional[list] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    Collect the requests arriving within a short window and run them as one
+    batch. The first request of a batch waits for the window, or for the batch
+    to be full, then runs the whole batch on its own thread within the latest
+    deadline of its requests; the others wait for their result within their
+    own deadline.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[FilterRequestModel]], list],
+        window_seconds: float,
+        max_batch_size: int,
+        on_batch: Optional[Callable[[int], None]] = None,
+    ):
+        self.run_batch = run_batch
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.on_batch = on_batch
+        self.lock = threading.Lock()
+        self.open_batch: Optional[Batch] = None
+
+    def submit(self, request: FilterRequestModel):
+        """
+        Result of the request, once the batch holding it has run
+        """
+        with self.lock:
+            batch = self.open_batch
+            leader = batch is None
+            if leader:
+                batch = self.open_batch = Batch()
+            index = len(batch.requests)
+            batch.requests.append(request)
+            batch.deadlines.append(current_deadline_ctx.get())
+            if len(batch.requests) >= self.max_batch_size:
+                self.open_batch = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window_seconds)
+            with self.lock:
+                if self.open_batch is batch:
+                    self.open_batch = None
+            try:
+                if self.on_batch is not None:
+                    self.on_batch(len(batch.requests))
+                batch.results = run_within_deadline(
+                    latest_deadline(batch.deadlines), self.run_batch, batch.requests
+                )
+            except BaseException as exc:
+                batch.error = exc
+                raise
+            finally:
+                batch.done.set()
+        else:
+            wait_within_deadline(batch.done)
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+
+def request_date_bounds(
+    request: FilterRequestModel, end_at_midnight: bool
+) -> Tuple[str, str]:
+    """
+    Origination time bounds of the request, comparable with the formatted
+    origination time of the records. The backends comparing timestamps include
+    a record at midnight of the end date, the JSON file compares the dates.
+    """
+    start_date, end_date = [date.strip() for date in request.date_range.split(" to ")]
+    return start_date, f"{end_date} 00:00:00" if end_at_midnight else end_date
+
+
+def batch_field_values(requests: Sequence[FilterRequestModel]) -> Dict[str, List[str]]:
+    """
+    Values of every filter field across the requests of a batch, for the
+    combined query; empty when some request filters by date range only, as the
+    combined query then has to read the whole date range
+    """
+    if any(
+        not any(getattr(request, field) for field, _ in BATCH_FILTER_FIELDS)
+        for request in requests
+    ):
+        return {}
+
+    return {
+        field: sorted({getattr(request, field) for request in requests} - {""})
+        for field, _ in BATCH_FILTER_FIELDS
+        if any(getattr(request, field) for request in requests)
+    }
+
+
+def demultiplex(
+    records: Sequence[RecordModel],
+    requests: Sequence[FilterRequestModel],
+    end_at_midnight: bool,
+) -> List[List[RecordModel]]:
+    # pylint: disable=too-many-locals
+    """
+    Split the records of a combined query into the records of every request,
+    in one pass: a record is only checked against the requests filtering on
+    one of its field values, or on the date range only
+    """
+    date_bounds = [
+        request_date_bounds(request, end_at_midnight) for request in requests
+    ]
+    date_only_requests = []
+    requests_by_field = {field: defaultdict(list) for field, _ in BATCH_FILTER_FIELDS}
+    for index, request in enumerate(requests):
+        fields = [field for field, _ in BATCH_FILTER_FIELDS if getattr(request, field)]
+        if not fields:
+            date_only_requests.append(index)
+        for field in fields:
+            requests_by_field[field][getattr(request, field)].append(index)
+
+    request_records = [[] for _ in requests]
+    for record in records:
+        candidates = set(date_only_requests)
+        for field, record_value in BATCH_FILTER_FIELDS:
+            candidates.update(requests_by_field[field].get(record_value(record), ()))
+        for index in candidates:
+            start_date, end_date = date_bounds[index]
+            if start_date <= record.origination_time <= end_date:
+                request_records[index].append(record)
+
+    return request_records
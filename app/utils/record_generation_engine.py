@@ -0,0 +1,336 @@
+import gc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.core.constants import (
+    DISTRIBUTION_UNIFORM,
+    DISTRIBUTION_ZIPF,
+    DIURNAL_HOUR_WEIGHTS,
+    GENERATOR_CHUNK_SIZE,
+    INITIAL_ID,
+    SERVER_RANGE_END,
+    SERVER_RANGE_START,
+    TIME_PATTERN_DIURNAL,
+    TIME_PATTERN_DIURNAL_WEEKLY,
+    TIME_PATTERN_UNIFORM,
+    TIME_PATTERN_WEEKLY,
+    TIMESTAMP_END_YEAR,
+    TIMESTAMP_START_YEAR,
+    USER_ID_DIVIDER,
+    USER_ID_LENGTH,
+    WEEKLY_DAY_WEIGHTS,
+    ZIPF_EXPONENT,
+)
+from app.utils.logger_helper import app_logger
+
+PHONE_NUMBER_LENGTH = 10
+VOICEMAIL_LENGTH = 9
+
+# Not a multiple of 3, so it is coprime with 9 ** USER_ID_LENGTH and mixing a user
+# index with it is a bijection: every user index maps to a distinct user id
+USER_ID_MULTIPLIER = 2654435761
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+
+
+class SkewProfile(NamedTuple):
+    """
+    Distributions the generated records are drawn from.
+    The defaults draw everything uniformly within the configured years.
+    """
+
+    start_year: int = TIMESTAMP_START_YEAR
+    end_year: int = TIMESTAMP_END_YEAR
+    user_distribution: str = DISTRIBUTION_UNIFORM
+    user_zipf_exponent: float = ZIPF_EXPONENT
+    cluster_distribution: str = DISTRIBUTION_UNIFORM
+    cluster_zipf_exponent: float = ZIPF_EXPONENT
+    time_pattern: str = TIME_PATTERN_UNIFORM
+
+
+def digit_strings(
+    values: np.ndarray, length: int, prefix: str = "", suffix: str = ""
+) -> np.ndarray:
+    """
+    Render integers in [0, 9 ** length) as strings of `length` digits from 1-9,
+    wrapped with the given prefix and suffix, without a Python level loop
+    """
+    digits = np.empty((len(values), length), dtype=np.uint8)
+    remaining = values.astype(np.int64)
+    for position in range(length - 1, -1, -1):
+        remaining, digit = np.divmod(remaining, 9)
+        digits[:, position] = digit + ord("1")
+
+    characters = np.hstack(
+        [
+            np.broadcast_to(
+                np.frombuffer(prefix.encode(), dtype=np.uint8),
+                (len(values), len(prefix)),
+            ),
+            digits,
+            np.broadcast_to(
+                np.frombuffer(suffix.encode(), dtype=np.uint8),
+                (len(values), len(suffix)),
+            ),
+        ]
+    )
+    return (
+        np.ascontiguousarray(characters)
+        .view(f"S{characters.shape[1]}")
+        .ravel()
+        .astype(str)
+    )
+
+
+def timestamp_bounds(
+    start_year: int = TIMESTAMP_START_YEAR, end_year: int = TIMESTAMP_END_YEAR
+) -> tuple:
+    """
+    Epoch range covering start_year to the end of end_year
+    """
+    return (
+        int(datetime(start_year, 1, 1).timestamp()),
+        int(datetime(end_year + 1, 1, 1).timestamp()),
+    )
+
+
+@lru_cache(maxsize=8)
+def day_calendar(start_year: int, end_year: int) -> tuple:
+    """
+    Start epochs and weekdays of every day from start_year to end_year
+    """
+    first_day = datetime(start_year, 1, 1)
+    days = [
+        first_day + timedelta(days=offset)
+        for offset in range((datetime(end_year + 1, 1, 1) - first_day).days)
+    ]
+    return (
+        np.array([int(day.timestamp()) for day in days], dtype=np.int64),
+        np.array([day.weekday() for day in days]),
+    )
+
+
+def draw_indices(
+    rng: np.random.Generator,
+    number_of_items: int,
+    count: int,
+    distribution: str,
+    zipf_exponent: float,
+) -> np.ndarray:
+    """
+    Draw indices in [0, number_of_items), uniformly or Zipf distributed with
+    index 0 the most frequent one.
+    The Zipf ranks come from the inverse CDF of a power law bounded to the
+    items, which needs no per item table even for millions of users.
+    """
+    if distribution == DISTRIBUTION_UNIFORM:
+        return rng.integers(0, number_of_items, size=count, dtype=np.int64)
+    if distribution != DISTRIBUTION_ZIPF:
+        raise ValueError(f"Unknown distribution: {distribution}")
+
+    uniform = rng.random(count)
+    if zipf_exponent == 1:
+        ranks = (number_of_items + 1) ** uniform
+    else:
+        power = 1 - zipf_exponent
+        ranks = (1 + uniform * ((number_of_items + 1) ** power - 1)) ** (1 / power)
+    return np.minimum(ranks.astype(np.int64) - 1, number_of_items - 1)
+
+
+def draw_origination_times(
+    rng: np.random.Generator, count: int, profile: SkewProfile
+) -> np.ndarray:
+    """
+    Draw origination epochs following the time pattern of the profile.
+    The weekly pattern weights the days by weekday and the diurnal pattern
+    weights the hours of the day, seconds within them stay uniform.
+    """
+    if profile.time_pattern == TIME_PATTERN_UNIFORM:
+        return rng.integers(
+            *timestamp_bounds(profile.start_year, profile.end_year), size=count
+        )
+
+    day_starts, weekdays = day_calendar(profile.start_year, profile.end_year)
+    if profile.time_pattern in (TIME_PATTERN_WEEKLY, TIME_PATTERN_DIURNAL_WEEKLY):
+        day_weights = np.array(WEEKLY_DAY_WEIGHTS, dtype=float)[weekdays]
+        days = rng.choice(
+            len(day_starts), size=count, p=day_weights / day_weights.sum()
+        )
+    elif profile.time_pattern == TIME_PATTERN_DIURNAL:
+        days = rng.integers(0, len(day_starts), size=count)
+    else:
+        raise ValueError(f"Unknown time pattern: {profile.time_pattern}")
+
+    if profile.time_pattern == TIME_PATTERN_WEEKLY:
+        return day_starts[days] + rng.integers(0, SECONDS_PER_DAY, size=count)
+
+    hour_weights = np.array(DIURNAL_HOUR_WEIGHTS, dtype=float)
+    hours = rng.choice(24, size=count, p=hour_weights / hour_weights.sum())
+    return (
+        day_starts[days]
+        + hours * SECONDS_PER_HOUR
+        + rng.integers(0, SECONDS_PER_HOUR, size=count)
+    )
+
+
+def generate_record_columns(
+    seed_entropy: int,
+    chunk_index: int,
+    start_index: int,
+    count: int,
+    number_of_users: int,
+    user_id_offset: int,
+    profile: SkewProfile = SkewProfile(),
+) -> dict:
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    """
+    Generate one chunk of records as columns.
+    Every chunk draws from its own generator spawned off the run seed, so the
+    output does not depend on which process generated the chunk.
+    """
+    rng = np.random.default_rng(
+        np.random.SeedSequence(seed_entropy, spawn_key=(chunk_index,))
+    )
+    cluster_names = np.array(
+        [
+            f"domainserver{server}"
+            for server in range(SERVER_RANGE_START, SERVER_RANGE_END + 1)
+        ]
+    )
+
+    user_indices = draw_indices(
+        rng,
+        number_of_users,
+        count,
+        profile.user_distribution,
+        profile.user_zipf_exponent,
+    )
+    user_values = (user_indices * USER_ID_MULTIPLIER + user_id_offset) % (
+        9**USER_ID_LENGTH
+    )
+
+    return {
+        "_id": INITIAL_ID + np.arange(start_index, start_index + count),
+        "originationTime": draw_origination_times(rng, count, profile),
+        "clusterId": cluster_names[
+            draw_indices(
+                rng,
+                len(cluster_names),
+                count,
+                profile.cluster_distribution,
+                profile.cluster_zipf_exponent,
+            )
+        ],
+        "userId": digit_strings(user_values, USER_ID_LENGTH),
+        "phone": digit_strings(
+            rng.integers(0, 9**PHONE_NUMBER_LENGTH, size=count, dtype=np.int64),
+            PHONE_NUMBER_LENGTH,
+            prefix="SEP",
+        ),
+        "voicemail": digit_strings(
+            rng.integers(0, 9**VOICEMAIL_LENGTH, size=count, dtype=np.int64),
+            VOICEMAIL_LENGTH,
+            suffix="VM",
+        ),
+    }
+
+
+def records_from_columns(columns: dict) -> List[dict]:
+    """
+    Convert a chunk of record columns to the record documents stored by the sinks.
+    The documents hold no reference cycles, so the cyclic garbage collector is
+    paused while they are built instead of rescanning them on every allocation.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return build_record_documents(columns)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def build_record_documents(columns: dict) -> List[dict]:
+    """
+    Zip the record columns into record documents
+    """
+    return [
+        {
+            "_id": record_id,
+            "originationTime": origination_time,
+            "clusterId": cluster_id,
+            "userId": user_id,
+            "devices": {"phone": phone, "voicemail": voicemail},
+        }
+        for record_id, origination_time, cluster_id, user_id, phone, voicemail in zip(
+            columns["_id"].tolist(),
+            columns["originationTime"].tolist(),
+            columns["clusterId"].tolist(),
+            columns["userId"].tolist(),
+            columns["phone"].tolist(),
+            columns["voicemail"].tolist(),
+        )
+    ]
+
+
+def iter_generated_record_chunks(
+    number_of_records: int,
+    chunk_size: int = GENERATOR_CHUNK_SIZE,
+    seed: Optional[int] = None,
+    processes: int = 1,
+    profile: SkewProfile = SkewProfile(),
+) -> Iterator[List[dict]]:
+    """
+    Yield the dummy records chunk by chunk, in _id order.
+    With processes > 1 the chunks are generated by a process pool with at most
+    two chunks per process in flight, so memory stays bounded by the chunk size
+    however many records are generated. The same seed, chunk size and profile
+    always produce the same records.
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    number_of_users = max(number_of_records // USER_ID_DIVIDER, 1)
+    user_id_offset = int(seed_sequence.generate_state(1)[0]) % (9**USER_ID_LENGTH)
+
+    app_logger.info(
+        "Generating %d dummy records with seed %d in chunks of %d on %d processes",
+        number_of_records,
+        seed_sequence.entropy,
+        chunk_size,
+        processes,
+    )
+    app_logger.info("Record skew profile: %s", profile._asdict())
+
+    chunk_tasks = (
+        (
+            seed_sequence.entropy,
+            chunk_index,
+            start_index,
+            min(chunk_size, number_of_records - start_index),
+            number_of_users,
+            user_id_offset,
+            profile,
+        )
+        for chunk_index, start_index in enumerate(
+            range(0, number_of_records, chunk_size)
+        )
+    )
+
+    if processes <= 1:
+        for chunk_task in chunk_tasks:
+            yield records_from_columns(generate_record_columns(*chunk_task))
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        pending_chunks = deque()
+        for chunk_task in chunk_tasks:
+            pending_chunks.append(executor.submit(generate_record_columns, *chunk_task))
+            if len(pending_chunks) >= 2 * processes:
+                yield records_from_columns(pending_chunks.popleft().result())
+        while pending_chunks:
+            yield records_from_columns(pending_chunks.popleft().result())
@@ -1,109 +1,142 @@
 import argparse
 import json
 import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from random import SystemRandom
-from typing import List
+from functools import partial
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Optional
 
 import mysql.connector
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pymongo import MongoClient
-from randomtimestamp import randomtimestamp
+from pymongo.errors import BulkWriteError
 
 from app.core.config import settings
 from app.core.constants import (
-    DEVICES_TABLE_CREATE,
+    DEVICES_TABLE_CREATE_TEMPLATE,
     DEVICES_TABLE_INSERT,
-    INITIAL_ID,
+    DISTRIBUTION_UNIFORM,
+    GENERATOR_CHUNK_SIZE,
+    JSON_WRITE_CHUNK_SIZE,
     MONGO_DB_BACKUP_COLLECTION,
     MONGO_DB_COLLECTION,
+    MONGO_DB_GENERATION_COLLECTION,
     MONGO_DB_NAME,
+    MONGO_DUPLICATE_KEY_ERROR,
+    MONGO_INSERT_BATCH_SIZE,
+    MONGO_INSERT_RETRIES,
+    MONGO_INSERT_RETRY_DELAY,
+    MONGO_INSERT_WORKERS,
+    PARQUET_COMPRESSION,
+    PARQUET_DICTIONARY_COLUMNS,
+    PARQUET_ROW_GROUP_SIZE,
+    PARQUET_WRITE_CHUNK_SIZE,
+    PIPELINE_QUEUE_SIZE,
     RECORD_BACKUP_DIR,
     RECORD_FILE_NAME,
+    RECORD_PARQUET_FILE_NAME,
+    RECORD_PARQUET_STAGING_FILE_NAME,
+    RECORD_SQLITE_FILE_NAME,
+    RECORD_SQLITE_STAGING_FILE_NAME,
+    RECORD_STAGING_FILE_NAME,
     RECORD_STORAGE_DIR,
-    RECORDS_TABLE_CREATE,
+    RECORDS_TABLE_CREATE_TEMPLATE,
     RECORDS_TABLE_INSERT,
-    SERVER_RANGE_END,
-    SERVER_RANGE_START,
+    SKEW_DISTRIBUTIONS,
     SQL_DB_NAME,
     SQL_DEVICES_BKP_TABLE,
+    SQL_DEVICES_STAGING_TABLE,
     SQL_DEVICES_TABLE,
+    SQL_INSERT_BATCH_SIZE,
     SQL_RECORDS_BKP_TABLE,
+    SQL_RECORDS_STAGING_TABLE,
     SQL_RECORDS_TABLE,
+    SQL_TABLE_EXISTS_QUERY,
+    SQLITE_INDEX_CREATE,
+    SQLITE_INDEXES,
+    SQLITE_INSERT_BATCH_SIZE,
+    SQLITE_RECORDS_INSERT,
+    SQLITE_RECORDS_TABLE,
+    SQLITE_RECORDS_TABLE_CREATE,
+    TIME_PATTERN_UNIFORM,
+    TIME_PATTERNS,
     TIMESTAMP_END_YEAR,
     TIMESTAMP_START_YEAR,
-    USER_ID_DIVIDER,
-    USER_ID_LENGTH,
+    ZIPF_EXPONENT,
 )
 from app.custom_exceptions.filter_from_mongo_exception import (
     MongoDBConnectionError,
     MongoDBOperationError,
 )
+from app.custom_exceptions.filter_from_parquet_exception import ParquetOperationError
 from app.custom_exceptions.filter_from_sql_exception import (
     SQLConnectionError,
     SQLOperationError,
 )
+from app.custom_exceptions.filter_from_sqlite_exception import SQLiteOperationError
 from app.utils.logger_helper import app_logger
+from app.utils.record_generation_engine import (
+    SkewProfile,
+    iter_generated_record_chunks,
+)
+from app.utils.record_pipeline import run_record_pipeline
+from app.utils.sql_migrations import apply_secondary_indexes
+
+# the devices are flattened into columns, so a filter reads only the columns
+# of the fields it is given
+PARQUET_RECORD_SCHEMA = pa.schema(
+    [
+        ("_id", pa.int64()),
+        ("originationTime", pa.int64()),
+        ("clusterId", pa.string()),
+        ("userId", pa.string()),
+        ("phone", pa.string()),
+        ("voicemail", pa.string()),
+    ]
+)
 
 
-def generate_long_random_int(required_length: int) -> str:
-    """
-    Generates long random intiger for given length
-    required_length: length, of which the number is required
-    """
-
-    return "".join(
-        [str(SystemRandom().randint(1, 9)) for _ in range(0, required_length)]
-    )
-
-
-def generate_records(number_of_records: int) -> List[dict]:
+def generate_records(number_of_records: int, seed: Optional[int] = None) -> List[dict]:
     """
     Generates the given number of dummy records
     """
-    app_logger.info("Generating %d dummy records", number_of_records)
-
-    records = []
-    user_ids = [
-        generate_long_random_int(USER_ID_LENGTH)
-        for _ in range(number_of_records // USER_ID_DIVIDER)
-    ]
-
-    for record_id in range(number_of_records):
-        records.append(
-            {
-                "_id": INITIAL_ID + record_id,
-                "originationTime": int(
-                    randomtimestamp(
-                        start_year=TIMESTAMP_START_YEAR, end_year=TIMESTAMP_END_YEAR
-                    ).timestamp()
-                ),
-                "clusterId": f"domainserver"
-                f"{SystemRandom().randint(SERVER_RANGE_START, SERVER_RANGE_END)}",
-                "userId": SystemRandom().choice(user_ids),
-                "devices": {
-                    "phone": f"SEP{generate_long_random_int(10)}",
-                    "voicemail": f"{generate_long_random_int(9)}VM",
-                },
-            }
-        )
+    records = list(
+        chain.from_iterable(iter_generated_record_chunks(number_of_records, seed=seed))
+    )
 
     app_logger.info("Successfully generated %d dummy records", number_of_records)
 
     return records
 
 
-def store_records_to_json(records: List[dict]):
+def iter_record_chunks(
+    records: Iterable[dict], chunk_size: int
+) -> Iterator[List[dict]]:
     """
-    Save the generated records to the pre-defined file.
-    Also, keep track of older record by keeping backup of the same.
+    Yield the records in lists of at most chunk_size records
     """
-    app_logger.info("Handeling the record storage")
+    records_iterator = iter(records)
+    while True:
+        records_chunk = list(islice(records_iterator, chunk_size))
+        if not records_chunk:
+            return
+        yield records_chunk
 
+
+def prepare_record_storage() -> None:
+    """
+    Create the record storage directory and its backup directory if missing.
+    Sinks running side by side may both create them, which is not an error.
+    """
     if not os.path.exists(RECORD_STORAGE_DIR):
         app_logger.error(
             "Main record storage directory %s not found", RECORD_STORAGE_DIR
         )
-        os.makedirs(f"{RECORD_STORAGE_DIR}/{RECORD_BACKUP_DIR}")
+        os.makedirs(f"{RECORD_STORAGE_DIR}/{RECORD_BACKUP_DIR}", exist_ok=True)
         app_logger.info(
             "Created record storage directories: %s/%s",
             RECORD_STORAGE_DIR,
@@ -120,26 +153,38 @@ def store_records_to_json(records: List[dict]):
                 RECORD_STORAGE_DIR,
                 RECORD_BACKUP_DIR,
             )
-            os.makedirs(f"{RECORD_STORAGE_DIR}/{RECORD_BACKUP_DIR}")
+            os.makedirs(f"{RECORD_STORAGE_DIR}/{RECORD_BACKUP_DIR}", exist_ok=True)
             app_logger.info(
                 "Created backup record storage directory: %s/%s",
                 RECORD_STORAGE_DIR,
                 RECORD_BACKUP_DIR,
             )
 
-    if os.path.exists(f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}"):
+
+def backup_record_file(file_name: str) -> None:
+    """
+    Keep the live record file, if there is one, as a backup of the previous
+    generation before it is replaced
+    """
+    if os.path.exists(f"{RECORD_STORAGE_DIR}/{file_name}"):
         app_logger.info(
             "Existing set of records found in file: %s/%s",
             RECORD_STORAGE_DIR,
-            RECORD_FILE_NAME,
+            file_name,
         )
         backup_file_name = (
-            f"BKUP_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}_{RECORD_FILE_NAME}"
+            f"BKUP_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}_{file_name}"
         )
-        os.rename(
-            f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}",
-            f"{RECORD_STORAGE_DIR}/{RECORD_BACKUP_DIR}/{backup_file_name}",
+        backup_file_path = (
+            f"{RECORD_STORAGE_DIR}/{RECORD_BACKUP_DIR}/{backup_file_name}"
         )
+        # generations stored within the same second share a backup name, the
+        # latest one wins as it did when the live file was renamed to it
+        if os.path.lexists(backup_file_path):
+            os.remove(backup_file_path)
+        # a hard link keeps the previous generation without copying it and
+        # without ever moving the live file away from readers
+        os.link(f"{RECORD_STORAGE_DIR}/{file_name}", backup_file_path)
         app_logger.info(
             "Existing set of records are saved in backup file: %s/%s/%s",
             RECORD_STORAGE_DIR,
@@ -147,10 +192,37 @@ def store_records_to_json(records: List[dict]):
             backup_file_name,
         )
 
-    with open(
-        f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}", "w", encoding="UTF-8"
-    ) as record_file:
-        json.dump(records, record_file)
+
+def store_records_to_json(records: Iterable[dict]):
+    """
+    Save the generated records to the pre-defined file.
+    Also, keep track of older record by keeping backup of the same.
+    The records are written to a staging file which then atomically replaces
+    the live file, so readers see either the old or the new records.
+    The records are streamed to the file chunk by chunk, so any iterable of
+    records can be stored without holding all of them in memory.
+    """
+    app_logger.info("Handeling the record storage")
+
+    prepare_record_storage()
+
+    staging_file_path = f"{RECORD_STORAGE_DIR}/{RECORD_STAGING_FILE_NAME}"
+    with open(staging_file_path, "w", encoding="UTF-8") as record_file:
+        record_file.write("[")
+        for chunk_index, records_chunk in enumerate(
+            iter_record_chunks(records, JSON_WRITE_CHUNK_SIZE)
+        ):
+            if chunk_index:
+                record_file.write(", ")
+            # encoding a whole chunk keeps the work in the C encoder and gives the
+            # same output as a single json.dump of all the records
+            record_file.write(json.dumps(records_chunk)[1:-1])
+        record_file.write("]")
+    app_logger.info("New dummy records are staged in: %s", staging_file_path)
+
+    backup_record_file(RECORD_FILE_NAME)
+
+    os.replace(staging_file_path, f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}")
 
     app_logger.info(
         "New dummy records are successfully stored in: %s/%s",
@@ -159,36 +231,157 @@ def store_records_to_json(records: List[dict]):
     )
 
 
-def store_record_to_mongo(records: List[dict]):
+def insert_chunk_to_mongo(collection, records_chunk: List[dict], retries: int) -> int:
     """
-    Function to store recors in mongodb as well on user request
+    Insert one chunk unordered so a bad document does not stop the rest of it.
+    A retry re-sends the whole chunk; documents stored by an earlier attempt come
+    back as duplicate key errors, which are counted as stored.
+    Returns the number of records of the chunk stored in MongoDB.
     """
-    try:
-        mongo_client = MongoClient(settings.MONGO_DB_HOST, settings.MONGO_DB_PORT)
-        db = mongo_client[MONGO_DB_NAME]
-        collection = db[MONGO_DB_COLLECTION]
-        existin_collection = collection.find()
-        if existin_collection:
-            app_logger.info(
-                "Existing records found in MongoDB, moving them to backup collection"
+    last_exc = None
+    for attempt in range(1, retries + 1):
+        try:
+            collection.insert_many(records_chunk, ordered=False)
+            return len(records_chunk)
+        except BulkWriteError as exc:
+            write_errors = exc.details.get("writeErrors", [])
+            if all(
+                error.get("code") == MONGO_DUPLICATE_KEY_ERROR for error in write_errors
+            ):
+                return len(records_chunk)
+            app_logger.warning(
+                "Attempt %d/%d to store a chunk of %d records in MongoDB "
+                "failed with %d write errors",
+                attempt,
+                retries,
+                len(records_chunk),
+                len(write_errors),
             )
-            collection.aggregate(
-                [
-                    {"$match": {}},
-                    {
-                        "$out": MONGO_DB_BACKUP_COLLECTION.format(
-                            date_format=datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-                        )
-                    },
-                ]
+            last_exc = exc
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            app_logger.warning(
+                "Attempt %d/%d to store a chunk of %d records in MongoDB failed: %s",
+                attempt,
+                retries,
+                len(records_chunk),
+                exc,
             )
-            app_logger.info(
-                "Successfully moved existing records moved to backup collection"
+            last_exc = exc
+
+        if attempt < retries:
+            time.sleep(MONGO_INSERT_RETRY_DELAY * attempt)
+
+    raise MongoDBOperationError(
+        message="MongoDB Operation Error while writing records to MongoDB"
+    ) from last_exc
+
+
+def parallel_insert_records_to_mongo(
+    collection,
+    records: Iterable[dict],
+    batch_size: int,
+    max_workers: int,
+    retries: int,
+) -> int:
+    """
+    Feed record chunks to a small thread pool of unordered insert_many calls.
+    At most two chunks per worker are in flight, so a generator input is never
+    materialised in memory as a whole.
+    Returns the number of records stored in MongoDB.
+    """
+    stored_records = 0
+    load_start_time = time.perf_counter()
+
+    def collect(done_futures) -> None:
+        nonlocal stored_records
+        for future in done_futures:
+            stored_records += future.result()
+        load_duration = time.perf_counter() - load_start_time
+        app_logger.info(
+            "Stored %d records in MongoDB so far (%.0f rows/s)",
+            stored_records,
+            stored_records / load_duration if load_duration else stored_records,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending_futures = set()
+        for records_chunk in iter_record_chunks(records, batch_size):
+            if len(pending_futures) >= 2 * max_workers:
+                done_futures, pending_futures = wait(
+                    pending_futures, return_when=FIRST_COMPLETED
+                )
+                collect(done_futures)
+            pending_futures.add(
+                executor.submit(
+                    insert_chunk_to_mongo, collection, records_chunk, retries
+                )
             )
+        collect(wait(pending_futures).done)
+
+    return stored_records
+
 
-            app_logger.info("Droping records from the existing collection")
-            collection.delete_many({})
-            app_logger.info("Successfully dropped records from the collection")
+def publish_mongo_generation(db, generation_collection_name: str) -> None:
+    """
+    Point the live view at the collection of a generation. Once the live name
+    is a view only its definition changes, so readers see either generation
+    and never a missing or partly loaded one.
+    """
+    live = next(iter(db.list_collections(filter={"name": MONGO_DB_COLLECTION})), None)
+    if live is not None and live.get("type") == "view":
+        app_logger.info(
+            "Publishing %s in place of %s, kept as the backup",
+            generation_collection_name,
+            live["options"]["viewOn"],
+        )
+        db.command(
+            "collMod",
+            MONGO_DB_COLLECTION,
+            viewOn=generation_collection_name,
+            pipeline=[],
+        )
+        app_logger.info("Successfully published the new records in MongoDB")
+        return
+
+    if live is not None:
+        # records loaded before the live name became a view, moved aside once
+        backup_collection = MONGO_DB_BACKUP_COLLECTION.format(
+            date_format=datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+        )
+        app_logger.info(
+            "Existing records found in MongoDB, renaming them to backup "
+            "collection: %s",
+            backup_collection,
+        )
+        db[MONGO_DB_COLLECTION].rename(backup_collection)
+
+    app_logger.info("Publishing %s as the live records", generation_collection_name)
+    db.command(
+        "create", MONGO_DB_COLLECTION, viewOn=generation_collection_name, pipeline=[]
+    )
+    app_logger.info("Successfully published the new records in MongoDB")
+
+
+def store_record_to_mongo(
+    records: Iterable[dict],
+    batch_size: int = MONGO_INSERT_BATCH_SIZE,
+    max_workers: int = MONGO_INSERT_WORKERS,
+    retries: int = MONGO_INSERT_RETRIES,
+):
+    """
+    Function to store recors in mongodb as well on user request.
+    Records are loaded into a collection of their own generation, then the live
+    name, a view, is pointed at it with a single collMod. No record is copied:
+    the collection of the previous generation is kept as the backup.
+    """
+    # to the microsecond, so two loads never write into the same generation
+    generation_collection_name = MONGO_DB_GENERATION_COLLECTION.format(
+        date_format=datetime.now().strftime("%Y_%m_%d_%H_%M_%S_%f")
+    )
+    try:
+        mongo_client = MongoClient(settings.MONGO_DB_HOST, settings.MONGO_DB_PORT)
+        db = mongo_client[MONGO_DB_NAME]
+        generation_collection = db[generation_collection_name]
     except Exception as exc:
         app_logger.error(
             "Error occured while connecting to MongoDB to Store the records: %s", exc
@@ -198,20 +391,134 @@ def store_record_to_mongo(records: List[dict]):
         ) from exc
 
     try:
-        collection.insert_many(records)
+        load_start_time = time.perf_counter()
+        stored_records = parallel_insert_records_to_mongo(
+            generation_collection, records, batch_size, max_workers, retries
+        )
+        load_duration = time.perf_counter() - load_start_time
+        app_logger.info(
+            "Stored %d records in MongoDB in %.2fs (%.0f rows/s)",
+            stored_records,
+            load_duration,
+            stored_records / load_duration if load_duration else stored_records,
+        )
     except Exception as exc:
         app_logger.error("Error occured while storing records in MongoDB: %s", exc)
+        app_logger.info(
+            "Dropping the unpublished collection: %s", generation_collection_name
+        )
+        generation_collection.drop()
         raise MongoDBOperationError(
             message="MongoDB Operation Error while writing records to MongoDB"
         ) from exc
 
+    try:
+        publish_mongo_generation(db, generation_collection_name)
+    except Exception as exc:
+        app_logger.error("Error occured while publishing records in MongoDB: %s", exc)
+        raise MongoDBOperationError(
+            message="MongoDB Operation Error while publishing records to MongoDB"
+        ) from exc
+
     return True
 
 
-def store_record_to_sql(records: List[dict]):
-    # pylint: disable=too-many-statements
+def bulk_insert_records_to_sql(
+    conn,
+    cursor,
+    records: Iterable[dict],
+    batch_size: int,
+    records_table: str = SQL_RECORDS_TABLE,
+    devices_table: str = SQL_DEVICES_TABLE,
+) -> int:
+    # pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+    """
+    Insert records and their devices with multi-row batches into empty tables.
+    Devices are deduplicated here and get their ids assigned client-side, so a
+    record row never waits on a round trip to learn its device id.
+    Returns the number of records inserted.
     """
-    Function to store recors in sql as well on user request
+    devices_insert = DEVICES_TABLE_INSERT.format(devices_table=devices_table)
+    records_insert = RECORDS_TABLE_INSERT.format(records_table=records_table)
+    next_device_id = 1
+    device_ids = {}
+    stored_records = 0
+
+    # the rows come from a single generator run, so they are checked up front
+    cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+
+    for records_chunk in iter_record_chunks(records, batch_size):
+        new_devices = []
+        record_rows = []
+
+        for record in records_chunk:
+            device_key = (record["devices"]["phone"], record["devices"]["voicemail"])
+            if device_key not in device_ids:
+                device_ids[device_key] = next_device_id
+                new_devices.append((next_device_id, *device_key))
+                next_device_id += 1
+
+            record_rows.append(
+                (
+                    record["_id"],
+                    record["userId"],
+                    device_ids[device_key],
+                    record["clusterId"],
+                    record["originationTime"],
+                )
+            )
+
+        if new_devices:
+            cursor.executemany(devices_insert, new_devices)
+        cursor.executemany(records_insert, record_rows)
+        conn.commit()
+
+        stored_records += len(record_rows)
+        app_logger.info("Stored %d records in SQL so far", stored_records)
+
+    cursor.execute("SET unique_checks = 1, foreign_key_checks = 1")
+
+    return stored_records
+
+
+def publish_sql_staging_tables(cursor) -> None:
+    """
+    Swap the staging tables in with one atomic RENAME TABLE; the live tables,
+    when present, are renamed to backup tables in the same statement.
+    The live tables are renamed first so their foreign key names are free
+    for the staging tables taking over the live names.
+    """
+    table_renames = []
+
+    cursor.execute(SQL_TABLE_EXISTS_QUERY, (SQL_DB_NAME, SQL_RECORDS_TABLE))
+    if cursor.fetchone()[0] > 0:
+        date_format = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+        table_renames.append(
+            f"{SQL_RECORDS_TABLE} TO "
+            f"{SQL_RECORDS_BKP_TABLE.format(date_format=date_format)}"
+        )
+        cursor.execute(SQL_TABLE_EXISTS_QUERY, (SQL_DB_NAME, SQL_DEVICES_TABLE))
+        if cursor.fetchone()[0] > 0:
+            table_renames.append(
+                f"{SQL_DEVICES_TABLE} TO "
+                f"{SQL_DEVICES_BKP_TABLE.format(date_format=date_format)}"
+            )
+
+    table_renames.append(f"{SQL_RECORDS_STAGING_TABLE} TO {SQL_RECORDS_TABLE}")
+    table_renames.append(f"{SQL_DEVICES_STAGING_TABLE} TO {SQL_DEVICES_TABLE}")
+
+    app_logger.info("Publishing staging tables: %s", ", ".join(table_renames))
+    cursor.execute(f"RENAME TABLE {', '.join(table_renames)}")  # nosec
+    app_logger.info("Successfully published the new records in SQL")
+
+
+def store_record_to_sql(
+    records: Iterable[dict], batch_size: int = SQL_INSERT_BATCH_SIZE
+):
+    """
+    Function to store recors in sql as well on user request.
+    Records are loaded into staging tables which are then swapped in with the
+    live tables, keeping the previous generation as backup tables.
     """
     try:
         conn = mysql.connector.connect(
@@ -230,113 +537,235 @@ def store_record_to_sql(records: List[dict]):
         ) from exc
 
     try:
-        app_logger.info("Checking for existence of %s table", SQL_RECORDS_TABLE)
+        app_logger.info("Creating staging tables for the new records")
+        cursor.execute(f"DROP TABLE IF EXISTS {SQL_RECORDS_STAGING_TABLE}")  # nosec
+        cursor.execute(f"DROP TABLE IF EXISTS {SQL_DEVICES_STAGING_TABLE}")  # nosec
         cursor.execute(
-            f"""SELECT COUNT(*) FROM information_schema.tables WHERE table_schema """
-            f"""= '{SQL_DB_NAME}' AND table_name = '{SQL_RECORDS_TABLE}'"""  # nosec
-        )
-        if cursor.fetchone()[0] > 0:
-            app_logger.info(
-                "Existing table found in MySQL: %s; taking backup of the same",
-                SQL_RECORDS_TABLE,
-            )
-            cursor.execute(
-                "CREATE TABLE IF NOT EXISTS "  # nosec
-                f"{SQL_RECORDS_BKP_TABLE.format(date_format=datetime.now().strftime('%Y_%m_%d_%H_%M_%S'))}"  # nosec  # pylint: disable=line-too-long
-                f" AS SELECT * FROM {SQL_RECORDS_TABLE}"  # nosec
+            DEVICES_TABLE_CREATE_TEMPLATE.format(
+                devices_table=SQL_DEVICES_STAGING_TABLE
             )
-            app_logger.info("Successfully moved existing records moved to backup table")
-
-            app_logger.info(
-                "Droping records from the existing table: %s", SQL_RECORDS_TABLE
-            )
-            cursor.execute(f"DELETE FROM {SQL_RECORDS_TABLE}")  # nosec
-            app_logger.info(
-                "Successfully dropped records from the table: %s", SQL_RECORDS_TABLE
+        )
+        cursor.execute(
+            RECORDS_TABLE_CREATE_TEMPLATE.format(
+                records_table=SQL_RECORDS_STAGING_TABLE,
+                devices_table=SQL_DEVICES_STAGING_TABLE,
             )
+        )
+    except Exception as exc:
+        app_logger.error("Error occured while creating tables in SQL: %s", exc)
+        cursor.close()
+        conn.close()
+        raise SQLOperationError(
+            message="SQL operation error occured while creating tables"
+        ) from exc
 
-        app_logger.info("Checking for existence of %s table", SQL_DEVICES_TABLE)
-        cursor.execute(
-            f"""SELECT COUNT(*) FROM information_schema.tables WHERE """
-            f"""table_schema = '{SQL_DB_NAME}' AND table_name = '{SQL_DEVICES_TABLE}'"""  # nosec # pylint: disable=line-too-long
+    try:
+        load_start_time = time.perf_counter()
+        stored_records = bulk_insert_records_to_sql(
+            conn,
+            cursor,
+            records,
+            batch_size,
+            records_table=SQL_RECORDS_STAGING_TABLE,
+            devices_table=SQL_DEVICES_STAGING_TABLE,
+        )
+        load_duration = time.perf_counter() - load_start_time
+        app_logger.info(
+            "Stored %d records in SQL in %.2fs (%.0f rows/s)",
+            stored_records,
+            load_duration,
+            stored_records / load_duration if load_duration else stored_records,
         )
-        if cursor.fetchone()[0] > 0:
-            app_logger.info(
-                "Existing table found in MySQL: %s; taking backup of the same",
-                SQL_DEVICES_TABLE,
-            )
-            cursor.execute(
-                "CREATE TABLE IF NOT EXISTS "  # nosec
-                f"{SQL_DEVICES_BKP_TABLE.format(date_format=datetime.now().strftime('%Y_%m_%d_%H_%M_%S'))}"  # nosec  # pylint: disable=line-too-long
-                f" AS SELECT * FROM {SQL_DEVICES_TABLE}"  # nosec
-            )
-            app_logger.info("Successfully moved existing records moved to backup table")
 
-            app_logger.info(
-                "Droping records from the existing table: %s", SQL_DEVICES_TABLE
-            )
-            cursor.execute(f"DELETE FROM {SQL_DEVICES_TABLE}")  # nosec
-            app_logger.info(
-                "Successfully dropped records from the table: %s", SQL_DEVICES_TABLE
-            )
-    except Exception as exc:
-        app_logger.error(
-            "Error occured while creating backup of existing records in SQL: %s", exc
+        app_logger.info("Building secondary indexes after the bulk load")
+        apply_secondary_indexes(
+            cursor,
+            table_names={
+                SQL_RECORDS_TABLE: SQL_RECORDS_STAGING_TABLE,
+                SQL_DEVICES_TABLE: SQL_DEVICES_STAGING_TABLE,
+            },
         )
+        total_duration = time.perf_counter() - load_start_time
+        app_logger.info(
+            "SQL bulk load completed in %.2fs including index build (%.0f rows/s)",
+            total_duration,
+            stored_records / total_duration if total_duration else stored_records,
+        )
+    except Exception as exc:
+        app_logger.error("Error occurred while storing records in SQL: %s", exc)
+        conn.rollback()
+        cursor.close()
+        conn.close()
         raise SQLOperationError(
-            message="SQL operation error occured while "
-            "creating backup of existing records"
+            message="SQL operation error while storing the records"
         ) from exc
 
     try:
-        app_logger.info("Creating tables if not exists")
-        cursor.execute(DEVICES_TABLE_CREATE)
-        cursor.execute(RECORDS_TABLE_CREATE)
+        publish_sql_staging_tables(cursor)
     except Exception as exc:
-        app_logger.error("Error occured while creating tables in SQL: %s", exc)
+        app_logger.error("Error occurred while publishing records in SQL: %s", exc)
         raise SQLOperationError(
-            message="SQL operation error occured while creating tables"
+            message="SQL operation error while publishing the records"
         ) from exc
+    finally:
+        cursor.close()
+        conn.close()
+
 
+def store_records_to_sqlite(
+    records: Iterable[dict], batch_size: int = SQLITE_INSERT_BATCH_SIZE
+):
+    """
+    Function to store records in a SQLite file for the embedded filter backend.
+    The records are loaded into a staging file in WAL mode, indexed once the
+    load is done and then atomically replace the live file, keeping the
+    previous generation as backup like the JSON records.
+    """
+    prepare_record_storage()
+
+    staging_file_path = f"{RECORD_STORAGE_DIR}/{RECORD_SQLITE_STAGING_FILE_NAME}"
+    for leftover_file_path in (
+        staging_file_path,
+        f"{staging_file_path}-wal",
+        f"{staging_file_path}-shm",
+    ):
+        if os.path.exists(leftover_file_path):
+            os.remove(leftover_file_path)
+
+    conn = sqlite3.connect(staging_file_path)
     try:
-        for record in records:
-            record_id = record["_id"]
-            origination_time = record["originationTime"]
-            cluster_id = record["clusterId"]
-            user_id = record["userId"]
-            phone_number = record["devices"]["phone"]
-            voicemail = record["devices"]["voicemail"]
-
-            cursor.execute(
-                DEVICES_TABLE_INSERT.format(
-                    devices_table=SQL_DEVICES_TABLE,
-                    value_phone_number=phone_number,
-                    value_voicemail=voicemail,
-                )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(SQLITE_RECORDS_TABLE_CREATE)
+
+        load_start_time = time.perf_counter()
+        stored_records = 0
+        for records_chunk in iter_record_chunks(records, batch_size):
+            conn.executemany(
+                SQLITE_RECORDS_INSERT,
+                [
+                    (
+                        record["_id"],
+                        record["userId"],
+                        record["clusterId"],
+                        record["devices"]["phone"],
+                        record["devices"]["voicemail"],
+                        record["originationTime"],
+                    )
+                    for record in records_chunk
+                ],
             )
-            device_id = cursor.lastrowid
-
-            cursor.execute(
-                RECORDS_TABLE_INSERT.format(
-                    records_table=SQL_RECORDS_TABLE,
-                    value_record_id=record_id,
-                    value_user_id=user_id,
-                    value_device_id=device_id,
-                    value_cluster_id=cluster_id,
-                    value_origination_time=origination_time,
+            conn.commit()
+            stored_records += len(records_chunk)
+            app_logger.info("Stored %d records in SQLite so far", stored_records)
+
+        app_logger.info("Building SQLite indexes after the bulk load")
+        for index_name, index_columns in SQLITE_INDEXES:
+            conn.execute(
+                SQLITE_INDEX_CREATE.format(
+                    index_name=index_name,
+                    table_name=SQLITE_RECORDS_TABLE,
+                    index_columns=index_columns,
                 )
             )
+        conn.execute("ANALYZE")
         conn.commit()
-    except Exception as exc:
-        app_logger.error("Error occurred while storing records in SQL: %s", exc)
-        conn.rollback()
-        raise SQLOperationError(
-            message="SQL operation error while storing the records"
+
+        # the published file is opened immutable by the filter worker, so the
+        # WAL is folded back into it and no -wal or -shm file is left behind
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode = DELETE")
+
+        load_duration = time.perf_counter() - load_start_time
+        app_logger.info(
+            "SQLite load completed in %.2fs including index build (%.0f rows/s)",
+            load_duration,
+            stored_records / load_duration if load_duration else stored_records,
+        )
+    except sqlite3.Error as exc:
+        app_logger.error("Error occurred while storing records in SQLite: %s", exc)
+        raise SQLiteOperationError(
+            message="SQLite operation error while storing the records"
         ) from exc
     finally:
-        cursor.close()
         conn.close()
 
+    backup_record_file(RECORD_SQLITE_FILE_NAME)
+
+    os.replace(staging_file_path, f"{RECORD_STORAGE_DIR}/{RECORD_SQLITE_FILE_NAME}")
+
+    app_logger.info(
+        "New dummy records are successfully stored in: %s/%s",
+        RECORD_STORAGE_DIR,
+        RECORD_SQLITE_FILE_NAME,
+    )
+
+
+def store_records_to_parquet(
+    records: Iterable[dict], row_group_size: int = PARQUET_ROW_GROUP_SIZE
+):
+    """
+    Function to store records in a Parquet file for the columnar filter backend.
+    The records are sorted by originationTime before they are written, so every
+    row group covers a narrow time slice and a date range can skip the row
+    groups outside it from their statistics alone. The records are buffered as
+    compact Arrow columns for the sort rather than as documents.
+    The file is published like the JSON records, keeping the previous one.
+    """
+    prepare_record_storage()
+
+    staging_file_path = f"{RECORD_STORAGE_DIR}/{RECORD_PARQUET_STAGING_FILE_NAME}"
+    try:
+        load_start_time = time.perf_counter()
+        record_batches = [
+            pa.record_batch(
+                [
+                    [record["_id"] for record in records_chunk],
+                    [record["originationTime"] for record in records_chunk],
+                    [record["clusterId"] for record in records_chunk],
+                    [record["userId"] for record in records_chunk],
+                    [record["devices"]["phone"] for record in records_chunk],
+                    [record["devices"]["voicemail"] for record in records_chunk],
+                ],
+                schema=PARQUET_RECORD_SCHEMA,
+            )
+            for records_chunk in iter_record_chunks(records, PARQUET_WRITE_CHUNK_SIZE)
+        ]
+        records_table = pa.Table.from_batches(
+            record_batches, schema=PARQUET_RECORD_SCHEMA
+        ).sort_by("originationTime")
+
+        pq.write_table(
+            records_table,
+            staging_file_path,
+            row_group_size=row_group_size,
+            compression=PARQUET_COMPRESSION,
+            use_dictionary=PARQUET_DICTIONARY_COLUMNS,
+            write_statistics=True,
+        )
+        load_duration = time.perf_counter() - load_start_time
+        app_logger.info(
+            "Stored %d records in Parquet in %.2fs (%.0f rows/s)",
+            records_table.num_rows,
+            load_duration,
+            records_table.num_rows / load_duration if load_duration else 0,
+        )
+    except (pa.ArrowException, OSError) as exc:
+        app_logger.error("Error occurred while storing records in Parquet: %s", exc)
+        raise ParquetOperationError(
+            message="Parquet operation error while storing the records"
+        ) from exc
+
+    backup_record_file(RECORD_PARQUET_FILE_NAME)
+
+    os.replace(staging_file_path, f"{RECORD_STORAGE_DIR}/{RECORD_PARQUET_FILE_NAME}")
+
+    app_logger.info(
+        "New dummy records are successfully stored in: %s/%s",
+        RECORD_STORAGE_DIR,
+        RECORD_PARQUET_FILE_NAME,
+    )
+
 
 def main():
     """Main function to generate records"""
@@ -347,22 +776,95 @@ def main():
     parser.add_argument("--number_of_records", required=True, type=int)
     parser.add_argument("--store_to_mongodb", required=False, type=bool, default=False)
     parser.add_argument("--store_to_sql", required=False, type=bool, default=False)
+    parser.add_argument("--store_to_sqlite", required=False, type=bool, default=False)
+    parser.add_argument("--store_to_parquet", required=False, type=bool, default=False)
+    parser.add_argument(
+        "--mongo_batch_size", required=False, type=int, default=MONGO_INSERT_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--mongo_workers", required=False, type=int, default=MONGO_INSERT_WORKERS
+    )
+    parser.add_argument(
+        "--sql_batch_size", required=False, type=int, default=SQL_INSERT_BATCH_SIZE
+    )
+    parser.add_argument(
+        "--chunk_size", required=False, type=int, default=GENERATOR_CHUNK_SIZE
+    )
+    parser.add_argument(
+        "--processes", required=False, type=int, default=os.cpu_count() or 1
+    )
+    parser.add_argument("--seed", required=False, type=int, default=None)
+    parser.add_argument(
+        "--queue_size", required=False, type=int, default=PIPELINE_QUEUE_SIZE
+    )
+    parser.add_argument(
+        "--start_year", required=False, type=int, default=TIMESTAMP_START_YEAR
+    )
+    parser.add_argument(
+        "--end_year", required=False, type=int, default=TIMESTAMP_END_YEAR
+    )
+    parser.add_argument(
+        "--user_distribution",
+        required=False,
+        choices=SKEW_DISTRIBUTIONS,
+        default=DISTRIBUTION_UNIFORM,
+    )
+    parser.add_argument(
+        "--user_zipf_exponent", required=False, type=float, default=ZIPF_EXPONENT
+    )
+    parser.add_argument(
+        "--cluster_distribution",
+        required=False,
+        choices=SKEW_DISTRIBUTIONS,
+        default=DISTRIBUTION_UNIFORM,
+    )
+    parser.add_argument(
+        "--cluster_zipf_exponent", required=False, type=float, default=ZIPF_EXPONENT
+    )
+    parser.add_argument(
+        "--time_pattern",
+        required=False,
+        choices=TIME_PATTERNS,
+        default=TIME_PATTERN_UNIFORM,
+    )
 
     args = parser.parse_args()
 
-    dummy_records = generate_records(args.number_of_records)
-
-    store_records_to_json(dummy_records)
-
+    sinks = {"json": store_records_to_json}
     if args.store_to_mongodb:
-        app_logger.info("Storing the generated records to MongoDB")
-        store_record_to_mongo(dummy_records)
-        app_logger.info("Successfully stored generated records in MongoDB")
-
+        sinks["mongodb"] = partial(
+            store_record_to_mongo,
+            batch_size=args.mongo_batch_size,
+            max_workers=args.mongo_workers,
+        )
     if args.store_to_sql:
-        app_logger.info("Storing the generated records to SQL")
-        store_record_to_sql(dummy_records)
-        app_logger.info("Successfully stored generated records in SQL")
+        sinks["sql"] = partial(store_record_to_sql, batch_size=args.sql_batch_size)
+    if args.store_to_sqlite:
+        sinks["sqlite"] = store_records_to_sqlite
+    if args.store_to_parquet:
+        sinks["parquet"] = store_records_to_parquet
+
+    app_logger.info("Storing the generated records to: %s", list(sinks))
+    run_record_pipeline(
+        iter_generated_record_chunks(
+            args.number_of_records,
+            chunk_size=args.chunk_size,
+            seed=args.seed,
+            processes=args.processes,
+            profile=SkewProfile(
+                start_year=args.start_year,
+                end_year=args.end_year,
+                user_distribution=args.user_distribution,
+                user_zipf_exponent=args.user_zipf_exponent,
+                cluster_distribution=args.cluster_distribution,
+                cluster_zipf_exponent=args.cluster_zipf_exponent,
+                time_pattern=args.time_pattern,
+            ),
+        ),
+        sinks,
+        queue_size=args.queue_size,
+    )
+    app_logger.info("Successfully stored generated records in: %s", list(sinks))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from app.core.constants import PIPELINE_QUEUE_SIZE
+from app.custom_exceptions.record_pipeline_exceptions import (
+    RecordPipelineAbortedError,
+)
+from app.utils.logger_helper import app_logger
+
+END_OF_RECORDS = None
+# sent instead of the end of the records when the producer failed, the sinks
+# then fail before publishing what they stored
+ABORT_RECORDS = object()
+
+
+class SinkWriter:
+    """
+    Feeds one storage sink from a bounded queue of record chunks on its own
+    writer thread. The sink is any callable consuming an iterable of records,
+    like the store functions of the record generator.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self, name: str, store: Callable[[Iterable[dict]], object], queue_size: int
+    ):
+        self.name = name
+        self.store = store
+        self.chunks = queue.Queue(maxsize=queue_size)
+        self.records_written = 0
+        self.blocked_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.elapsed_seconds = 0.0
+        self.error = None
+        self.exhausted = False
+        self.thread = threading.Thread(
+            target=self.run, name=f"{name}-sink-writer", daemon=True
+        )
+
+    def put(self, chunk) -> None:
+        """
+        Hand a chunk to the sink, blocking while its queue is full.
+        The time spent blocked is the backpressure of this sink on generation.
+        """
+        started_at = time.perf_counter()
+        self.chunks.put(chunk)
+        self.blocked_seconds += time.perf_counter() - started_at
+
+    def records(self) -> Iterator[dict]:
+        """
+        Yield the records of the queued chunks until the end of the records,
+        raising a RecordPipelineAbortedError when the producer failed
+        """
+        while True:
+            started_at = time.perf_counter()
+            chunk = self.chunks.get()
+            self.idle_seconds += time.perf_counter() - started_at
+            if chunk is END_OF_RECORDS:
+                self.exhausted = True
+                return
+            if chunk is ABORT_RECORDS:
+                self.exhausted = True
+                raise RecordPipelineAbortedError(
+                    message="Record generation failed, the records are not published"
+                )
+            for record in chunk:
+                self.records_written += 1
+                yield record
+
+    def run(self) -> None:
+        """
+        Run the sink over the queued records.
+        Whatever the sink leaves unread, because it failed or stopped early, is
+        still drained so the producer never blocks on a dead sink.
+        """
+        started_at = time.perf_counter()
+        records = self.records()
+        try:
+            self.store(records)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            app_logger.error("Record sink %s failed: %s", self.name, exc)
+            self.error = exc
+        finally:
+            self.elapsed_seconds = time.perf_counter() - started_at
+            records.close()
+            while not self.exhausted:
+                chunk = self.chunks.get()
+                self.exhausted = chunk is END_OF_RECORDS or chunk is ABORT_RECORDS
+
+    def report(self) -> dict:
+        """
+        Throughput and backpressure of the sink
+        """
+        return {
+            "sink": self.name,
+            "records": self.records_written,
+            "seconds": round(self.elapsed_seconds, 3),
+            "records_per_second": round(
+                self.records_written / max(self.elapsed_seconds, 1e-9)
+            ),
+            "producer_blocked_seconds": round(self.blocked_seconds, 3),
+            "sink_idle_seconds": round(self.idle_seconds, 3),
+            "error": str(self.error) if self.error else None,
+        }
+
+
+def run_record_pipeline(
+    record_chunks: Iterable[List[dict]],
+    sinks: Dict[str, Callable[[Iterable[dict]], object]],
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+) -> List[dict]:
+    """
+    Stream the record chunks to every sink at the same time.
+    Every sink gets its own bounded queue and writer thread, so the slowest
+    sink sets the pace and memory stays bounded by queue_size chunks per sink.
+    Returns the per sink report and raises the first sink error, if any, once
+    every sink is done. When the chunks fail, every sink is aborted before
+    publishing and the error of the chunks is raised.
+    """
+    writers = [SinkWriter(name, store, queue_size) for name, store in sinks.items()]
+    for writer in writers:
+        writer.thread.start()
+
+    started_at = time.perf_counter()
+    end_of_records = ABORT_RECORDS
+    try:
+        for chunk in record_chunks:
+            for writer in writers:
+                writer.put(chunk)
+        end_of_records = END_OF_RECORDS
+    finally:
+        for writer in writers:
+            writer.put(end_of_records)
+        for writer in writers:
+            writer.thread.join()
+
+    reports = [writer.report() for writer in writers]
+    app_logger.info(
+        "Record pipeline finished in %.3f seconds", time.perf_counter() - started_at
+    )
+    for report in reports:
+        app_logger.info("Record sink report: %s", report)
+
+    for writer in writers:
+        if writer.error is not None:
+            raise writer.error
+
+    return reports
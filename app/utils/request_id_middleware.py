@@ -1,17 +1,68 @@
+import re
+import time
 import uuid
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.constants import (
+    REQUEST_ID_HEADER,
+    REQUEST_ID_PATTERN,
+    SERVER_TIMING_HEADER,
+)
 from app.utils.logger_helper import current_request_id_ctx
+from app.utils.metrics_helper import current_stage_timings_ctx
 
+request_id_pattern = re.compile(REQUEST_ID_PATTERN)
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Request ID Middleware"""
 
-    async def dispatch(self, request: Request, call_next):
-        """Method to dispatch the request with ID"""
-        request_id = str(uuid.uuid4())
-        current_request_id_ctx.set(request_id)
-        response = await call_next(request)
-        return response
+def server_timing(stage_timings: dict, total: float) -> str:
+    """
+    Server-Timing header value of the stage durations and the total, in ms
+    """
+    return ", ".join(
+        f"{name};dur={duration * 1000:.3f}"
+        for name, duration in [*stage_timings.items(), ("total", total)]
+    )
+
+
+class RequestIDMiddleware:
+    """
+    Request ID Middleware.
+    A plain ASGI middleware, so the request runs in the calling task and the
+    response is passed through untouched apart from its headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Run the request with its ID and stage timings in context"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER, "")
+        if not request_id_pattern.match(request_id):
+            request_id = str(uuid.uuid4())
+
+        stage_timings = {}
+        request_id_token = current_request_id_ctx.set(request_id)
+        stage_timings_token = current_stage_timings_ctx.set(stage_timings)
+        started_at = time.perf_counter()
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(REQUEST_ID_HEADER, request_id)
+                headers.append(
+                    SERVER_TIMING_HEADER,
+                    server_timing(stage_timings, time.perf_counter() - started_at),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_stage_timings_ctx.reset(stage_timings_token)
+            current_request_id_ctx.reset(request_id_token)
@@ -0,0 +1,171 @@
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Set
+
+import uvicorn
+
+from app.api.filter_records.models import FilterRequestModel
+from app.core.config import settings
+from app.core.constants import (
+    SERVER_APP,
+    SERVER_RESPAWN_DELAY_SECONDS,
+    WARM_UP_DATE_RANGE,
+)
+from app.custom_exceptions.filter_from_json_exceptions import JSONFileNotFoundError
+from app.utils.logger_helper import app_logger
+from app.workers.filter_records.registry import enabled_backends, get_worker_class
+
+
+def worker_count() -> int:
+    """
+    Worker processes to fork, one per CPU unless configured
+    """
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def server_config() -> uvicorn.Config:
+    """
+    Server configuration of every worker
+    """
+    return uvicorn.Config(
+        SERVER_APP,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        backlog=settings.SERVER_BACKLOG,
+        limit_concurrency=settings.SERVER_LIMIT_CONCURRENCY or None,
+        timeout_keep_alive=settings.SERVER_TIMEOUT_KEEP_ALIVE,
+        lifespan="on",
+    )
+
+
+def preload_datasets() -> None:
+    """
+    Load the published JSON dataset in the master process, so the forked
+    workers share it copy-on-write instead of each loading its own copy. The
+    loaded objects are then frozen out of the garbage collector: a collection
+    in a worker would otherwise write to every one of them and copy every page
+    they are on.
+    """
+    if "json" in enabled_backends():
+        try:
+            get_worker_class("json")(
+                FilterRequestModel(**{"dateRange": WARM_UP_DATE_RANGE})
+            ).load_json_dataset()
+        except JSONFileNotFoundError as exc:
+            app_logger.warning("JSON dataset not preloaded: %s", exc)
+
+    gc.collect()
+    gc.freeze()
+    app_logger.info("App preloaded, %d objects frozen", gc.get_freeze_count())
+
+
+def preload_app(config: uvicorn.Config) -> None:
+    """
+    Import the app and load its datasets in the master process, shared by the
+    forked workers
+    """
+    config.load()
+    preload_datasets()
+
+
+def serve_worker(config: uvicorn.Config, sock: socket.socket) -> None:
+    """
+    Serve the preloaded app on the shared socket, in a forked worker
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class WorkerSupervisor:
+    """
+    Master process forking the workers that serve the shared socket, and
+    forking a new worker in place of one that dies until it is stopped
+    """
+
+    def __init__(
+        self, config: uvicorn.Config, sock: socket.socket, workers: int
+    ) -> None:
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.pids: Set[int] = set()
+        self.stopping = False
+
+    def spawn(self) -> None:
+        """
+        Fork a worker
+        """
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            exit_code = 0
+            try:
+                serve_worker(self.config, self.sock)
+            except BaseException as exc:  # pylint: disable=broad-exception-caught
+                app_logger.error("Worker %d failed: %s", os.getpid(), exc)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)  # pylint: disable=protected-access
+        self.pids.add(pid)
+
+    def stop(self, signum: int, frame) -> None:
+        # pylint: disable=unused-argument
+        """
+        Stop the workers on SIGTERM or SIGINT, each finishing its requests
+        """
+        app_logger.info("Stopping %d workers", len(self.pids))
+        self.stopping = True
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        """
+        Fork the workers and wait for them until they are all stopped
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+
+        while self.pids:
+            try:
+                pid, wait_status = os.wait()
+            except ChildProcessError:
+                break
+            self.pids.discard(pid)
+            if self.stopping:
+                continue
+
+            app_logger.warning(
+                "Worker %d exited with code %d, forking a new one",
+                pid,
+                os.waitstatus_to_exitcode(wait_status),
+            )
+            time.sleep(SERVER_RESPAWN_DELAY_SECONDS)
+            if not self.stopping:
+                self.spawn()
+
+
+def main():
+    """Serve the API on forked workers sharing the preloaded app"""
+    config = server_config()
+    preload_app(config)
+    sock = config.bind_socket()
+    workers = worker_count()
+    app_logger.info(
+        "Serving on %s:%d with %d workers",
+        settings.SERVER_HOST,
+        settings.SERVER_PORT,
+        workers,
+    )
+    WorkerSupervisor(config, sock, workers).run()
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
@@ -0,0 +1,62 @@
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from app.utils.deadline_helper import wait_within_deadline
+
+Result = TypeVar("Result")
+
+
+class Flight:
+    """
+    One execution of a call, shared by the callers asking for the same key
+    while it runs
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution: the first
+    caller runs the call and the ones arriving before it returns wait for its
+    result, or its error, within their own deadline
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: Dict[Hashable, Flight] = {}
+
+    def do(self, key: Hashable, call: Callable[[], Result]) -> Tuple[Result, bool]:
+        """
+        Result of the call for the key, along with whether it was shared from
+        the execution of another caller
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            wait_within_deadline(flight.done)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = call()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+        return flight.result, False
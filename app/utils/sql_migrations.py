@@ -0,0 +1,88 @@
+from typing import Optional
+
+import mysql.connector
+
+from app.core.config import settings
+from app.core.constants import (
+    SQL_DB_NAME,
+    SQL_INDEX_CREATE,
+    SQL_INDEX_EXISTS_QUERY,
+    SQL_SECONDARY_INDEXES,
+)
+from app.custom_exceptions.filter_from_sql_exception import (
+    SQLConnectionError,
+    SQLOperationError,
+)
+from app.utils.logger_helper import app_logger
+
+
+def apply_secondary_indexes(
+    cursor, database_name: str = SQL_DB_NAME, table_names: Optional[dict] = None
+) -> list:
+    """
+    Create the secondary indexes used by the filter queries if they are missing.
+    MySQL has no CREATE INDEX IF NOT EXISTS, so the existence is checked in
+    information_schema first which makes the migration safe to re-run.
+    table_names maps a live table to the table to index instead, e.g. staging.
+    Returns the names of the indexes created by this run.
+    """
+    created_indexes = []
+    table_names = table_names or {}
+
+    for live_table_name, index_name, index_columns in SQL_SECONDARY_INDEXES:
+        table_name = table_names.get(live_table_name, live_table_name)
+        cursor.execute(SQL_INDEX_EXISTS_QUERY, (database_name, table_name, index_name))
+        if cursor.fetchone()[0] > 0:
+            app_logger.info(
+                "Index %s already exists on table %s", index_name, table_name
+            )
+            continue
+
+        app_logger.info(
+            "Creating index %s on table %s %s", index_name, table_name, index_columns
+        )
+        cursor.execute(
+            SQL_INDEX_CREATE.format(
+                index_name=index_name,
+                table_name=table_name,
+                index_columns=index_columns,
+            )
+        )
+        created_indexes.append(index_name)
+
+    return created_indexes
+
+
+def main():
+    """Apply the secondary index migration on the configured MySQL database"""
+    try:
+        conn = mysql.connector.connect(
+            host=settings.SQL_DB_HOST,
+            user=settings.SQL_DB_USERNAME,
+            password=settings.SQL_DB_PASSWORD,
+            database=SQL_DB_NAME,
+        )
+        cursor = conn.cursor()
+    except Exception as exc:
+        app_logger.error("Error occured while connecting to SQL for migration: %s", exc)
+        raise SQLConnectionError(
+            message="SQL connection Error while applying the migration"
+        ) from exc
+
+    try:
+        created_indexes = apply_secondary_indexes(cursor)
+        app_logger.info(
+            "Secondary index migration completed, created: %s", created_indexes
+        )
+    except Exception as exc:
+        app_logger.error("Error occured while applying SQL migration: %s", exc)
+        raise SQLOperationError(
+            message="SQL operation error while applying the migration"
+        ) from exc
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
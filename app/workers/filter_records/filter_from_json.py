@@ -1,6 +1,10 @@
 import json
 import os
-from typing import List
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
 
 from app.api.filter_records.models import (
     FilterRequestModel,
@@ -9,7 +13,89 @@ from app.api.filter_records.models import (
 )
 from app.core.constants import RECORD_FILE_NAME, RECORD_STORAGE_DIR
 from app.custom_exceptions.filter_from_json_exceptions import JSONFileNotFoundError
+from app.utils.deadline_helper import check_deadline
 from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import count_rows, stage_timer
+from app.utils.micro_batch_helper import (
+    batch_field_values,
+    demultiplex,
+    request_date_bounds,
+)
+
+# columns of the records kept by the dataset, and the record field of each
+RECORD_COLUMNS = {
+    "_id": lambda record: record.id,
+    "originationTime": lambda record: record.origination_time,
+    "clusterId": lambda record: record.cluster_id,
+    "userId": lambda record: record.user_id,
+    "phone": lambda record: record.devices.phone,
+    "voicemail": lambda record: record.devices.voicemail,
+}
+# column compared with every filter field of the request
+FILTER_FIELD_COLUMNS = [
+    ("cluster", "clusterId"),
+    ("user_id", "userId"),
+    ("phone_number", "phone"),
+    ("voice_mail", "voicemail"),
+]
+
+
+class JSONDataset(NamedTuple):
+    """
+    Records of a published JSON file, sorted by origination time, as one NumPy
+    array per column. A column is a single buffer rather than one Python object
+    per record, so reading it never writes a reference count and the workers
+    forked after the dataset is preloaded keep sharing its pages; the record
+    models are only built for the rows a request returns. The position of every
+    row in the file is kept, so the records are returned in the file order.
+    """
+
+    version: str
+    columns: Dict[str, np.ndarray]
+    file_rows: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.columns["_id"])
+
+    def in_file_order(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Rows sorted by their position in the file
+        """
+        return rows[np.argsort(self.file_rows[rows])]
+
+    def build_records(self, rows: np.ndarray) -> List[RecordModel]:
+        """
+        Build the record models of the rows
+        """
+        values = [self.columns[column][rows].tolist() for column in RECORD_COLUMNS]
+        return [
+            RecordModel(
+                **{
+                    "_id": row[0],
+                    "originationTime": row[1],
+                    "clusterId": row[2],
+                    "userId": row[3],
+                    "devices": {"phone": row[4], "voicemail": row[5]},
+                }
+            )
+            for row in zip(*values)
+        ]
+
+
+def date_rows(origination_times: np.ndarray, start_date: str, end_date: str) -> slice:
+    """
+    Rows of the records sorted by origination time from the start date to the
+    end date, both included
+    """
+    start_row = int(np.searchsorted(origination_times, start_date, side="left"))
+    end_row = int(np.searchsorted(origination_times, end_date, side="right"))
+    return slice(start_row, max(start_row, end_row))
+
+
+# the published file is loaded once per generation and shared by every
+# request; a new generation is a new file at the same path
+_dataset_cache: Dict[Tuple[str, int, int], JSONDataset] = {}
+_dataset_cache_lock = threading.Lock()
 
 
 class FilterRecordFromJSON:
@@ -31,36 +117,76 @@ class FilterRecordFromJSON:
             raise JSONFileNotFoundError(f"File not found: {json_file_path}")
 
         with open(json_file_path, "r", encoding="UTF-8") as json_file:
-            records = json.load(json_file)
+            with stage_timer("json", "load"):
+                records = json.load(json_file)
+
+        with stage_timer("json", "model_build"):
             return [RecordModel(**record) for record in records]
 
-    def filter_record_with_date(self, records: List[RecordModel]) -> List:
+    def load_json_dataset(self) -> JSONDataset:
         """
-        Filter records with date range
+        Records of the published JSON file, read and sorted only when a new
+        generation of the file is published
+        """
+        json_file_path = f"{RECORD_STORAGE_DIR}/{RECORD_FILE_NAME}"
+
+        try:
+            file_stat = os.stat(json_file_path)
+        except FileNotFoundError as exc:
+            app_logger.error("JSON file not found at location %s", json_file_path)
+            raise JSONFileNotFoundError(f"File not found: {json_file_path}") from exc
+
+        dataset_key = (json_file_path, file_stat.st_ino, file_stat.st_mtime_ns)
+        with _dataset_cache_lock:
+            dataset = _dataset_cache.get(dataset_key)
+            if dataset is None:
+                records = self.load_json_file()
+                with stage_timer("json", "column_build"):
+                    columns = {
+                        column: np.array(
+                            [field(record) for record in records],
+                            dtype=np.int64 if column == "_id" else np.str_,
+                        )
+                        for column, field in RECORD_COLUMNS.items()
+                    }
+                    del records
+                    file_rows = np.argsort(columns["originationTime"], kind="stable")
+                    dataset = JSONDataset(
+                        version=datetime.fromtimestamp(file_stat.st_mtime).strftime(
+                            "%Y%m%dT%H%M%S"
+                        ),
+                        columns={
+                            column: values[file_rows]
+                            for column, values in columns.items()
+                        },
+                        file_rows=file_rows,
+                    )
+                _dataset_cache.clear()
+                _dataset_cache[dataset_key] = dataset
+
+        return dataset
+
+    def filter_record_with_date(self, origination_times: np.ndarray) -> slice:
+        """
+        Rows of the records sorted by origination time within the date range
         """
         start_date, end_date = [
             date.strip() for date in self.request.date_range.split(" to ")
         ]
-        filtered_records = []
 
-        for record in records:
-            if start_date <= record.origination_time <= end_date:
-                filtered_records.append(record)
-
-        return filtered_records
+        return date_rows(origination_times, start_date, end_date)
 
     def filter_records_from_json(self) -> FilterResponseModel:
         """
         Filter records from JSON
         """
-
-        final_filtered_records = []
-
         try:
-            app_logger.info("Loading the JSON file to filter the records")
-            records = self.load_json_file()
+            app_logger.info("Loading the JSON dataset to filter the records")
+            dataset = self.load_json_dataset()
             app_logger.info(
-                "JSON file found successfully with %d records", len(records)
+                "JSON dataset %s found successfully with %d records",
+                dataset.version,
+                len(dataset),
             )
         except JSONFileNotFoundError as exc:
             app_logger.error("Error while loading JSON file: %s", exc)
@@ -68,59 +194,126 @@ class FilterRecordFromJSON:
                 message="No JSON file found to filter the records"
             ) from exc
 
+        check_deadline()
         try:
             app_logger.info("Filtering records with date range")
-            date_filtered_records = self.filter_record_with_date(records)
+            with stage_timer("json", "date_filter"):
+                request_rows = self.filter_record_with_date(
+                    dataset.columns["originationTime"]
+                )
+            number_of_request_rows = request_rows.stop - request_rows.start
             app_logger.info(
                 "Records filtered successfully with given date range: %d records",
-                len(date_filtered_records),
+                number_of_request_rows,
             )
         except Exception as exc:
             app_logger.error("Error while filtering records with date range: %s", exc)
             raise exc
 
-        filter_conditions = [
-            ("cluster", "cluster_id"),
-            ("user_id", "user_id"),
-            ("phone_number", "devices.phone"),
-            ("voice_mail", "devices.voicemail"),
-        ]
-
-        for filter_request_field, model_attribute in filter_conditions:
-            value = getattr(self.request, filter_request_field, None)
-            if value:
-                app_logger.info(
-                    "Filtering records with field: %s", filter_request_field
-                )
-                filtered_records = [
-                    record
-                    for record in date_filtered_records
-                    if eval(  # nosec # pylint: disable=eval-used
-                        f"record.{model_attribute}"
+        matched_rows = []
+        with stage_timer("json", "field_filter"):
+            for filter_request_field, column in FILTER_FIELD_COLUMNS:
+                value = getattr(self.request, filter_request_field, None)
+                if value:
+                    check_deadline()
+                    app_logger.info(
+                        "Filtering records with field: %s", filter_request_field
                     )
-                    == value
-                ]
-
-                final_filtered_records.extend(filtered_records)
+                    field_rows = dataset.in_file_order(
+                        np.flatnonzero(dataset.columns[column][request_rows] == value)
+                        + request_rows.start
+                    )
+                    matched_rows.append(field_rows)
 
-                app_logger.info(
-                    "Records filtered successfully with %s filed: %d",
-                    filter_request_field,
-                    len(filtered_records),
-                )
+                    app_logger.info(
+                        "Records filtered successfully with %s filed: %d",
+                        filter_request_field,
+                        len(field_rows),
+                    )
 
-        if not any(
-            getattr(self.request, filter_request_field, None)
-            for filter_request_field, _ in filter_conditions
-        ):
+        if not matched_rows:
             app_logger.info(
                 "No extra fields filter found in "
                 "request; returning records with date range only"
             )
-            final_filtered_records.extend(date_filtered_records)
+            matched_rows.append(
+                dataset.in_file_order(np.arange(request_rows.start, request_rows.stop))
+            )
 
+        check_deadline()
+        with stage_timer("json", "model_build"):
+            final_filtered_records = dataset.build_records(np.concatenate(matched_rows))
         app_logger.info(
             "Number of records found after filtering JSON file with given: %d records",
             len(final_filtered_records),
         )
-        return FilterResponseModel(result=final_filtered_records)
+        with stage_timer("json", "response_build"):
+            response = FilterResponseModel(
+                result=final_filtered_records, datasetVersion=f"json@{dataset.version}"
+            )
+        count_rows(
+            "json", scanned=number_of_request_rows, returned=len(response.result)
+        )
+
+        return response
+
+    def filter_records_batch_from_json(
+        self, requests: List[FilterRequestModel]
+    ) -> List[FilterResponseModel]:
+        """
+        Filter records from JSON for a batch of requests, in one pass over the
+        records of the union of their date ranges; only the rows matching a
+        field value of some request of the batch are built into records, in
+        the order of the file
+        """
+        dataset = self.load_json_dataset()
+
+        date_bounds = [
+            request_date_bounds(request, end_at_midnight=False) for request in requests
+        ]
+        with stage_timer("json", "date_filter"):
+            batch_rows = date_rows(
+                dataset.columns["originationTime"],
+                min(start_date for start_date, _ in date_bounds),
+                max(end_date for _, end_date in date_bounds),
+            )
+        number_of_date_rows = batch_rows.stop - batch_rows.start
+
+        field_values = batch_field_values(requests)
+        with stage_timer("json", "field_filter"):
+            if field_values:
+                mask = np.zeros(number_of_date_rows, dtype=bool)
+                for field, column in FILTER_FIELD_COLUMNS:
+                    if field in field_values:
+                        mask |= np.isin(
+                            dataset.columns[column][batch_rows], field_values[field]
+                        )
+                rows = np.flatnonzero(mask) + batch_rows.start
+            else:
+                rows = np.arange(batch_rows.start, batch_rows.stop)
+            rows = dataset.in_file_order(rows)
+
+        with stage_timer("json", "model_build"):
+            records = dataset.build_records(rows)
+        with stage_timer("json", "batch_demultiplex"):
+            request_records = demultiplex(records, requests, end_at_midnight=False)
+        app_logger.info(
+            "Filtered %d records from JSON for a batch of %d requests",
+            number_of_date_rows,
+            len(requests),
+        )
+
+        with stage_timer("json", "response_build"):
+            responses = [
+                FilterResponseModel(
+                    result=matched_records, datasetVersion=f"json@{dataset.version}"
+                )
+                for matched_records in request_records
+            ]
+        count_rows(
+            "json",
+            scanned=number_of_date_rows,
+            returned=sum(len(response.result) for response in responses),
+        )
+
+        return responses
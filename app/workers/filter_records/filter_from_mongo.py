@@ -1,14 +1,68 @@
+import threading
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from pymongo import MongoClient
+from pymongo.errors import ExecutionTimeout, PyMongoError
 
-from app.api.filter_records.models import FilterRequestModel, FilterResponseModel
+from app.api.filter_records.models import (
+    FilterRequestModel,
+    FilterResponseModel,
+    RecordModel,
+)
+from app.core.constants import DEADLINE_REASON_TIMEOUT
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
 from app.custom_exceptions.filter_from_mongo_exception import (
     MongoDBConnectionError,
     MongoDBOperationError,
 )
+from app.utils.deadline_helper import check_deadline
 from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import count_rows, stage_timer
+from app.utils.micro_batch_helper import batch_field_values, demultiplex
+
+# document attribute of every filter field of the request
+MONGO_FILTER_FIELDS = {
+    "cluster": "clusterId",
+    "user_id": "userId",
+    "phone_number": "devices.phone",
+    "voice_mail": "devices.voicemail",
+}
+
+# MongoClient keeps its own connection pool and monitor threads, so one client
+# per server is shared by every request rather than one created per request
+_mongo_clients: Dict[Tuple[str, int, Optional[int]], MongoClient] = {}
+_mongo_clients_lock = threading.Lock()
+
+
+def get_mongo_client(
+    mongo_host: str, mongo_port: int, server_selection_timeout_ms: Optional[int] = None
+) -> MongoClient:
+    """
+    Shared MongoDB client of the server, created on first use
+    """
+    client_key = (mongo_host, mongo_port, server_selection_timeout_ms)
+    with _mongo_clients_lock:
+        client = _mongo_clients.get(client_key)
+        if client is None:
+            client_options = {}
+            if server_selection_timeout_ms is not None:
+                client_options["serverSelectionTimeoutMS"] = server_selection_timeout_ms
+            client = _mongo_clients[client_key] = MongoClient(
+                mongo_host, mongo_port, **client_options
+            )
+        return client
+
+
+def close_mongo_clients() -> None:
+    """
+    Close the shared MongoDB clients; the next request creates its client again
+    """
+    with _mongo_clients_lock:
+        clients = list(_mongo_clients.values())
+        _mongo_clients.clear()
+    for client in clients:
+        client.close()
 
 
 class FilterRecordFromMongo:
@@ -24,15 +78,21 @@ class FilterRecordFromMongo:
         mongo_db_name: str,
         mongo_collection_name: str,
         request: FilterRequestModel,
+        max_time_ms: Optional[int] = None,
+        server_selection_timeout_ms: Optional[int] = None,
     ) -> None:
         self.request = request
+        # server side time limit of the queries, from the request deadline
+        self.max_time_ms = max_time_ms
 
         self.mongo_host = mongo_host
         self.mongo_port = mongo_port
         self.mongo_db_name = mongo_db_name
         self.mongo_collection_name = mongo_collection_name
 
-        self.client = MongoClient(self.mongo_host, self.mongo_port)
+        self.client = get_mongo_client(
+            self.mongo_host, self.mongo_port, server_selection_timeout_ms
+        )
         self.db = self.client[self.mongo_db_name]
         self.collection = self.db[self.mongo_collection_name]
 
@@ -80,8 +140,11 @@ class FilterRecordFromMongo:
         try:
             app_logger.info("Filtering records with query: %s", query)
 
-            filtered_records = self.collection.find(query)
-            filtered_records = list(filtered_records)
+            with stage_timer("mongodb", "db_round_trip"):
+                filtered_records = self.collection.find(query)
+                if self.max_time_ms is not None:
+                    filtered_records = filtered_records.max_time_ms(self.max_time_ms)
+                filtered_records = list(filtered_records)
 
             app_logger.info(
                 "Records filtered successfully with given query: %d records",
@@ -90,6 +153,14 @@ class FilterRecordFromMongo:
 
             return filtered_records
 
+        except ExecutionTimeout as exc:
+            app_logger.error(
+                "MongoDB query exceeded its %sms time limit", self.max_time_ms
+            )
+            raise DeadlineExceededError(
+                message=f"MongoDB query exceeded its {self.max_time_ms}ms time limit",
+                reason=DEADLINE_REASON_TIMEOUT,
+            ) from exc
         except Exception as exc:
             app_logger.error(
                 "Error occured while filtering records from MongoDB with query: %s", exc
@@ -98,27 +169,52 @@ class FilterRecordFromMongo:
                 message="Error occured while filtering records with given query"
             ) from exc
 
-    def filter_records_from_mongo(self) -> FilterResponseModel:
+    @staticmethod
+    def ping(
+        mongo_host: str,
+        mongo_port: int,
+        server_selection_timeout_ms: Optional[int] = None,
+    ) -> None:
         """
-        Filter records from MongoDB
+        Health probe of the MongoDB server, through the shared client
         """
+        try:
+            get_mongo_client(
+                mongo_host, mongo_port, server_selection_timeout_ms
+            ).admin.command("ping")
+        except PyMongoError as exc:
+            raise MongoDBConnectionError(
+                message="MongoDB server is not answering"
+            ) from exc
 
+    def check_connection(self) -> None:
+        """
+        Check the MongoDB server answers
+        """
         try:
             app_logger.info("Checking connection to MongoDB")
-            _ = self.collection.find_one()
+            with stage_timer("mongodb", "connect"):
+                _ = self.collection.find_one()
         except Exception as exc:
             app_logger.error("Error while connecting to MongoDB: %s", exc)
             raise MongoDBConnectionError(
                 message="Error occured while connecting to MongoDB"
             ) from exc
 
+    def filter_records_from_mongo(self) -> FilterResponseModel:
+        """
+        Filter records from MongoDB
+        """
+        self.check_connection()
+        check_deadline()
+
         final_filtered_records = []
 
         try:
             app_logger.info("Filtering records with query")
-            final_filtered_records = self.filter_record_with_query(
-                self.mongo_db_query_builder()
-            )
+            with stage_timer("mongodb", "query_build"):
+                query = self.mongo_db_query_builder()
+            final_filtered_records = self.filter_record_with_query(query)
             app_logger.info(
                 "Records filtered successfully with given query: %d records",
                 len(final_filtered_records),
@@ -131,4 +227,76 @@ class FilterRecordFromMongo:
             "Number of records found after filtering JSON file with given: %d records",
             len(final_filtered_records),
         )
-        return FilterResponseModel(result=final_filtered_records)
+        with stage_timer("mongodb", "response_build"):
+            response = FilterResponseModel(result=final_filtered_records)
+        count_rows(
+            "mongodb",
+            scanned=len(final_filtered_records),
+            returned=len(response.result),
+        )
+
+        return response
+
+    @staticmethod
+    def mongo_db_batch_query_builder(requests: List[FilterRequestModel]) -> dict:
+        """
+        Build the MongoDB query of a batch of requests: the union of their date
+        ranges, and the values of each filter field matched with $in
+        """
+        date_bounds = [
+            [
+                int(datetime.strptime(date.strip(), "%Y-%m-%d").timestamp())
+                for date in request.date_range.split(" to ")
+            ]
+            for request in requests
+        ]
+        query = {
+            "originationTime": {
+                "$gte": min(start_date for start_date, _ in date_bounds),
+                "$lte": max(end_date for _, end_date in date_bounds),
+            }
+        }
+
+        field_values = batch_field_values(requests)
+        if field_values:
+            query["$or"] = [
+                {MONGO_FILTER_FIELDS[field]: {"$in": values}}
+                for field, values in field_values.items()
+            ]
+
+        return query
+
+    def filter_records_batch_from_mongo(
+        self, requests: List[FilterRequestModel]
+    ) -> List[FilterResponseModel]:
+        """
+        Filter records from MongoDB for a batch of requests with one query
+        """
+        self.check_connection()
+
+        with stage_timer("mongodb", "query_build"):
+            query = self.mongo_db_batch_query_builder(requests)
+        documents = self.filter_record_with_query(query)
+
+        with stage_timer("mongodb", "model_build"):
+            records = [RecordModel(**document) for document in documents]
+        with stage_timer("mongodb", "batch_demultiplex"):
+            request_records = demultiplex(records, requests, end_at_midnight=True)
+        app_logger.info(
+            "Filtered %d records from MongoDB for a batch of %d requests",
+            len(records),
+            len(requests),
+        )
+
+        with stage_timer("mongodb", "response_build"):
+            responses = [
+                FilterResponseModel(result=matched_records)
+                for matched_records in request_records
+            ]
+        count_rows(
+            "mongodb",
+            scanned=len(records),
+            returned=sum(len(response.result) for response in responses),
+        )
+
+        return responses
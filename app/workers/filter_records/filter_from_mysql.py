@@ -1,5 +1,7 @@
+import threading
+from bisect import bisect_right
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Tuple
 
 import mysql.connector
 
@@ -8,12 +10,55 @@ from app.api.filter_records.models import (
     FilterResponseModel,
     RecordModel,
 )
-from app.core.constants import SQL_DEVICES_TABLE, SQL_RECORDS_TABLE
+from app.core.constants import (
+    DEADLINE_REASON_TIMEOUT,
+    SQL_DEVICES_TABLE,
+    SQL_MAX_EXECUTION_TIME_BUCKETS_MS,
+    SQL_QUERY_TIMEOUT_ERRNO,
+    SQL_RECORDS_TABLE,
+)
+from app.custom_exceptions.deadline_exceptions import DeadlineExceededError
 from app.custom_exceptions.filter_from_sql_exception import (
     SQLConnectionError,
     SQLOperationError,
 )
-from app.utils.logger_helper import app_logger
+from app.utils.deadline_helper import check_deadline
+from app.utils.logger_helper import app_logger, sampled_logger
+from app.utils.metrics_helper import (
+    MYSQL_PREPARED_STATEMENTS,
+    MYSQL_THREAD_CONNECTIONS,
+    count_rows,
+    stage_timer,
+)
+from app.utils.micro_batch_helper import batch_field_values, demultiplex
+
+# Prepared statements live on the server session, so every request thread keeps
+# its connection and the prepared cursors of the filter shapes it has executed
+_thread_connections = threading.local()
+
+
+def close_thread_connection() -> None:
+    """
+    Close the MySQL connection cached for the current thread along with its
+    prepared cursors; the next worker on this thread reconnects
+    """
+    prepared_cursors = getattr(_thread_connections, "prepared_cursors", {})
+    conn = getattr(_thread_connections, "conn", None)
+
+    try:
+        for cursor, _ in prepared_cursors.values():
+            cursor.close()
+        if conn is not None:
+            conn.close()
+    except mysql.connector.Error as exc:
+        app_logger.warning("Error occurred while closing MySQL connection: %s", exc)
+    finally:
+        MYSQL_PREPARED_STATEMENTS.dec(len(prepared_cursors))
+        if conn is not None:
+            MYSQL_THREAD_CONNECTIONS.dec()
+        _thread_connections.conn = None
+        _thread_connections.connection_key = None
+        _thread_connections.prepared_cursors = {}
 
 
 class FilterRecordFromSQL:
@@ -21,7 +66,7 @@ class FilterRecordFromSQL:
     Class for all the services related to filtering records from MySQL
     """
 
-    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    # pylint: disable=too-many-instance-attributes, too-many-arguments, too-many-positional-arguments
     def __init__(
         self,
         mysql_host: str,
@@ -29,93 +74,230 @@ class FilterRecordFromSQL:
         mysql_password: str,
         mysql_db_name: str,
         request: FilterRequestModel,
+        use_union: bool = False,
+        max_execution_ms: Optional[int] = None,
+        connection_timeout: Optional[int] = None,
     ) -> None:
         self.request = request
+        self.use_union = use_union
+        # server side time limit of the filter query, from the request deadline
+        self.max_execution_ms = max_execution_ms
+        # seconds to connect before giving up on an unreachable server
+        self.connection_timeout = connection_timeout
 
         self.mysql_host = mysql_host
         self.mysql_user = mysql_user
         self.mysql_password = mysql_password
         self.mysql_db_name = mysql_db_name
 
-        self.conn, self.cursor = self.__get_sql_connection_cursor()
+        self.conn, self.prepared_cursors = self.__get_sql_connection()
 
-    def __get_sql_connection_cursor(self):
+    @staticmethod
+    def ping(
+        mysql_host: str,
+        mysql_user: str,
+        mysql_password: str,
+        mysql_db_name: str,
+        connection_timeout: Optional[int] = None,
+    ) -> None:
         """
-        Get MySQL cursor
+        Health probe of the MySQL server, on a connection of its own so the
+        connections of the request threads are left alone
         """
+        connect_options = {}
+        if connection_timeout is not None:
+            connect_options["connection_timeout"] = connection_timeout
         try:
-            app_logger.info("Establishing a connection with MySQL")
             conn = mysql.connector.connect(
-                host=self.mysql_host,
-                user=self.mysql_user,
-                password=self.mysql_password,
-                database=self.mysql_db_name,
+                host=mysql_host,
+                user=mysql_user,
+                password=mysql_password,
+                database=mysql_db_name,
+                **connect_options,
             )
-            cursor = conn.cursor(dictionary=True)
+            try:
+                conn.ping()
+            finally:
+                conn.close()
+        except mysql.connector.Error as exc:
+            raise SQLConnectionError(message="MySQL server is not answering") from exc
+
+    def __get_sql_connection(self):
+        """
+        Get the MySQL connection of the current thread, connecting if required
+        """
+        connection_key = (
+            self.mysql_host,
+            self.mysql_user,
+            self.mysql_password,
+            self.mysql_db_name,
+        )
+        conn = getattr(_thread_connections, "conn", None)
+
+        try:
+            if (
+                conn is not None
+                and _thread_connections.connection_key == connection_key
+                and conn.is_connected()
+            ):
+                return conn, _thread_connections.prepared_cursors
+
+            close_thread_connection()
+
+            app_logger.info("Establishing a connection with MySQL")
+            connect_options = {}
+            if self.connection_timeout is not None:
+                connect_options["connection_timeout"] = self.connection_timeout
+            with stage_timer("sql", "connect"):
+                conn = mysql.connector.connect(
+                    host=self.mysql_host,
+                    user=self.mysql_user,
+                    password=self.mysql_password,
+                    database=self.mysql_db_name,
+                    autocommit=True,
+                    **connect_options,
+                )
+            MYSQL_THREAD_CONNECTIONS.inc()
             app_logger.info("Successful connection established with MySQL")
 
-            return conn, cursor
+            _thread_connections.conn = conn
+            _thread_connections.connection_key = connection_key
+            _thread_connections.prepared_cursors = {}
+
+            return conn, _thread_connections.prepared_cursors
         except mysql.connector.Error as exc:
             app_logger.error("Error occurred while connecting to MySQL: %s", exc)
             raise SQLConnectionError(message="MySQL connection error") from exc
 
-    def sql_query_builder(self) -> str:
+    def execute_prepared(self, query: str, params: tuple):
+        """
+        Execute the query through the prepared cursor cached for its shape.
+        The driver only re-prepares when it is handed a different query object,
+        so the query string cached with the cursor is passed back as is.
+        """
+        if query not in self.prepared_cursors:
+            self.prepared_cursors[query] = (
+                self.conn.cursor(prepared=True, dictionary=True),
+                query,
+            )
+            MYSQL_PREPARED_STATEMENTS.inc()
+
+        cursor, prepared_query = self.prepared_cursors[query]
+        cursor.execute(prepared_query, params)
+
+        return cursor
+
+    def sql_query_builder(self) -> Tuple[str, tuple]:
         """
-        Build MySQL query
+        Build MySQL query along with its parameters.
+        With use_union enabled, the OR across filter fields is rewritten into
+        UNION branches so each branch can use its own (field, originationTime)
+        index instead of falling back to a range scan on the date alone.
         """
         start_date = datetime.strptime(
             self.request.date_range.split("to")[0].strip(), "%Y-%m-%d"
-        ).strftime("%Y-%m-%d %H:%M:%S")
+        )
         end_date = datetime.strptime(
             self.request.date_range.split("to")[1].strip(), "%Y-%m-%d"
-        ).strftime("%Y-%m-%d %H:%M:%S")
-
-        query = (
-            f"""SELECT * FROM {SQL_RECORDS_TABLE} WHERE """  # nosec
-            f"""originationTime BETWEEN '{start_date}' AND '{end_date}'"""  # nosec
         )
 
-        if any(
-            [
-                self.request.user_id,
-                self.request.cluster,
-                self.request.phone_number,
-                self.request.voice_mail,
-            ]
-        ):
-            extra_query_params = []
+        date_condition = "originationTime BETWEEN %s AND %s"
+        date_params = (start_date, end_date)
 
-            if self.request.user_id:
-                extra_query_params.append(f"userId = '{self.request.user_id}'")
+        query = f"SELECT * FROM {SQL_RECORDS_TABLE} WHERE {date_condition}"  # nosec
+        params = date_params
 
-            if self.request.cluster:
-                extra_query_params.append(f"clusterId = '{self.request.cluster}'")
+        extra_query_params = []
 
-            if self.request.phone_number or self.request.voice_mail:
-                app_logger.info(
-                    "Fetching device ids for phone number or voicemail"
-                    " as required by requested filters"
-                )
-                device_ids_query = (
-                    f"""SELECT _id FROM {SQL_DEVICES_TABLE} WHERE """  # nosec
-                    f"""phone = '{self.request.phone_number}' OR """  # nosec
-                    f"""voicemail = '{self.request.voice_mail}'"""  # nosec
-                )
-                self.cursor.execute(device_ids_query)
-                device_ids = self.cursor.fetchall()
-                app_logger.info(
-                    "Device ids fetched successfully with requested filters"
-                )
+        if self.request.user_id:
+            extra_query_params.append(("userId = %s", (self.request.user_id,)))
+
+        if self.request.cluster:
+            extra_query_params.append(("clusterId = %s", (self.request.cluster,)))
+
+        device_conditions = []
+        device_params = ()
+
+        if self.request.phone_number:
+            device_conditions.append("phone = %s")
+            device_params += (self.request.phone_number,)
 
-                device_ids = [str(device["_id"]) for device in device_ids]
-                if device_ids:
-                    extra_query_params.append(f"deviceId IN ({','.join(device_ids)})")
+        if self.request.voice_mail:
+            device_conditions.append("voicemail = %s")
+            device_params += (self.request.voice_mail,)
 
-            query += " AND " + f"({' OR '.join(extra_query_params)})"
+        if device_conditions:
+            extra_query_params.append(
+                (
+                    f"deviceId IN (SELECT _id FROM {SQL_DEVICES_TABLE} "  # nosec
+                    f"WHERE {' OR '.join(device_conditions)})",
+                    device_params,
+                )
+            )
+
+        if self.use_union and len(extra_query_params) > 1:
+            query = " UNION ".join(
+                f"SELECT * FROM {SQL_RECORDS_TABLE} "  # nosec
+                f"WHERE {query_param} AND {date_condition}"
+                for query_param, _ in extra_query_params
+            )
+            params = tuple(
+                param
+                for _, query_param_values in extra_query_params
+                for param in query_param_values + date_params
+            )
+        elif extra_query_params:
+            query += (
+                " AND "
+                f"({' OR '.join(query_param for query_param, _ in extra_query_params)})"
+            )
+            params += tuple(
+                param
+                for _, query_param_values in extra_query_params
+                for param in query_param_values
+            )
 
         app_logger.debug("query built for filtering records from MySQL: %s", query)
 
-        return query
+        return query, params
+
+    def with_max_execution_time(self, query: str) -> str:
+        """
+        Add the MAX_EXECUTION_TIME hint of the time limit to the query, rounded
+        down to a bucket so the query is prepared for a few limits only. The
+        hint goes after the first SELECT and covers the whole statement, UNION
+        branches and subqueries included.
+        """
+        if self.max_execution_ms is None:
+            return query
+
+        bucket = bisect_right(SQL_MAX_EXECUTION_TIME_BUCKETS_MS, self.max_execution_ms)
+        max_execution_ms = (
+            SQL_MAX_EXECUTION_TIME_BUCKETS_MS[bucket - 1]
+            if bucket
+            else self.max_execution_ms
+        )
+        return query.replace(
+            "SELECT ", f"SELECT /*+ MAX_EXECUTION_TIME({max_execution_ms}) */ ", 1
+        )
+
+    def query_error(self, err: mysql.connector.Error) -> Exception:
+        """
+        Error to raise for a failed query: a DeadlineExceededError once the
+        query ran out of its time limit, a SQLOperationError otherwise
+        """
+        if err.errno == SQL_QUERY_TIMEOUT_ERRNO:
+            app_logger.error(
+                "MySQL query exceeded its %sms time limit", self.max_execution_ms
+            )
+            return DeadlineExceededError(
+                message="MySQL query exceeded its "
+                f"{self.max_execution_ms}ms time limit",
+                reason=DEADLINE_REASON_TIMEOUT,
+            )
+        app_logger.error("Error occurred while querying MySQL: %s", err)
+        close_thread_connection()
+        return SQLOperationError(message="MySQL operation error")
 
     def process_records(self, records: List[dict]) -> List[RecordModel]:
         """
@@ -124,24 +306,32 @@ class FilterRecordFromSQL:
         app_logger.info("Processing records fetched from MySQL")
         processed_records = []
 
-        for record in records:
-            record["originationTime"] = record["originationTime"].strftime(
-                "%Y-%m-%d %H:%M:%S"
-            )
+        with stage_timer("sql", "device_lookup"):
+            for record in records:
+                check_deadline()
+                record["originationTime"] = record["originationTime"].strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
 
-            app_logger.info("Fetching device details from MySQL for response model")
-            _ = self.cursor.execute(
-                f"SELECT phone,voicemail FROM {SQL_DEVICES_TABLE} "  # nosec
-                f"WHERE _id = {record['deviceId']}"  # nosec
-            )
-            device_details = self.cursor.fetchone()
-            app_logger.info("Device details fetched successfully for response model")
+                sampled_logger.info(
+                    "Fetching device details from MySQL for response model"
+                )
+                cursor = self.execute_prepared(
+                    f"SELECT phone,voicemail FROM {SQL_DEVICES_TABLE} "  # nosec
+                    "WHERE _id = %s",
+                    (record["deviceId"],),
+                )
+                device_details = cursor.fetchall()[0]
+                sampled_logger.info(
+                    "Device details fetched successfully for response model"
+                )
 
-            record["devices"] = device_details
+                record["devices"] = device_details
 
-            processed_records.append(record)
+                processed_records.append(record)
 
-        return [RecordModel(**record) for record in processed_records]
+        with stage_timer("sql", "model_build"):
+            return [RecordModel(**record) for record in processed_records]
 
     def filter_records_from_sql(self) -> List[RecordModel]:
         """
@@ -149,14 +339,16 @@ class FilterRecordFromSQL:
         """
         try:
             app_logger.info("Building Query for filtering records from MySQL")
-            query = self.sql_query_builder()
+            with stage_timer("sql", "query_build"):
+                query, params = self.sql_query_builder()
+                query = self.with_max_execution_time(query)
             app_logger.info("Query built successfully for filtering records from MySQL")
 
             app_logger.info(
                 "Executing query for filtering records from MySQL: %s", query
             )
-            self.cursor.execute(query)
-            records = self.cursor.fetchall()
+            with stage_timer("sql", "db_round_trip"):
+                records = self.execute_prepared(query, params).fetchall()
             app_logger.info(
                 "Query executed successfully for filtering "
                 "records from MySQL: %d records found",
@@ -167,12 +359,113 @@ class FilterRecordFromSQL:
             records = self.process_records(records)
             app_logger.info("Records processed successfully for final response")
 
-            return FilterResponseModel(result=records)
+            with stage_timer("sql", "response_build"):
+                response = FilterResponseModel(result=records)
+            count_rows("sql", scanned=len(records), returned=len(response.result))
+
+            return response
 
         except mysql.connector.Error as err:
-            app_logger.error("Error occurred while querying MySQL: %s", err)
-            raise SQLOperationError(message="MySQL operation error") from err
+            raise self.query_error(err) from err
 
-        finally:
-            self.cursor.close()
-            self.conn.close()
+    @staticmethod
+    def sql_batch_query_builder(
+        requests: List[FilterRequestModel],
+    ) -> Tuple[str, tuple]:
+        """
+        Build the MySQL query of a batch of requests along with its parameters:
+        the union of their date ranges, and the values of each filter field
+        matched with IN
+        """
+        date_bounds = [
+            [
+                datetime.strptime(date.strip(), "%Y-%m-%d")
+                for date in request.date_range.split(" to ")
+            ]
+            for request in requests
+        ]
+        query = (
+            f"SELECT * FROM {SQL_RECORDS_TABLE} "  # nosec
+            "WHERE originationTime BETWEEN %s AND %s"
+        )
+        params = (
+            min(start_date for start_date, _ in date_bounds),
+            max(end_date for _, end_date in date_bounds),
+        )
+
+        field_values = batch_field_values(requests)
+        conditions = []
+        for field, column in (("user_id", "userId"), ("cluster", "clusterId")):
+            if field in field_values:
+                conditions.append(
+                    f"{column} IN ({', '.join(['%s'] * len(field_values[field]))})"
+                )
+                params += tuple(field_values[field])
+
+        device_conditions = []
+        for field, column in (("phone_number", "phone"), ("voice_mail", "voicemail")):
+            if field in field_values:
+                device_conditions.append(
+                    f"{column} IN ({', '.join(['%s'] * len(field_values[field]))})"
+                )
+                params += tuple(field_values[field])
+        if device_conditions:
+            conditions.append(
+                f"deviceId IN (SELECT _id FROM {SQL_DEVICES_TABLE} "  # nosec
+                f"WHERE {' OR '.join(device_conditions)})"
+            )
+
+        if conditions:
+            query += f" AND ({' OR '.join(conditions)})"
+
+        app_logger.debug(
+            "batch query built for filtering records from MySQL: %s", query
+        )
+
+        return query, params
+
+    def filter_records_batch_from_sql(
+        self, requests: List[FilterRequestModel]
+    ) -> List[FilterResponseModel]:
+        """
+        Get filtered records from MySQL for a batch of requests with one query.
+        The number of IN values changes from batch to batch, so the query is not
+        prepared.
+        """
+        try:
+            with stage_timer("sql", "query_build"):
+                query, params = self.sql_batch_query_builder(requests)
+                query = self.with_max_execution_time(query)
+
+            with stage_timer("sql", "db_round_trip"):
+                cursor = self.conn.cursor(dictionary=True)
+                try:
+                    cursor.execute(query, params)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+
+            records = self.process_records(rows)
+            with stage_timer("sql", "batch_demultiplex"):
+                request_records = demultiplex(records, requests, end_at_midnight=True)
+            app_logger.info(
+                "Filtered %d records from MySQL for a batch of %d requests",
+                len(records),
+                len(requests),
+            )
+
+            with stage_timer("sql", "response_build"):
+                responses = [
+                    FilterResponseModel(result=matched_records)
+                    for matched_records in request_records
+                ]
+            count_rows(
+                "sql",
+                scanned=len(records),
+                returned=sum(len(response.result) for response in responses),
+            )
+
+            return responses
+
+        except mysql.connector.Error as err:
+            raise self.query_error(err) from err
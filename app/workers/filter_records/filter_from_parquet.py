@@ -0,0 +1,257 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app.api.filter_records.models import (
+    FilterRequestModel,
+    FilterResponseModel,
+    RecordModel,
+)
+from app.core.constants import PARQUET_DICTIONARY_COLUMNS
+from app.custom_exceptions.filter_from_parquet_exception import (
+    ParquetFileNotFoundError,
+    ParquetOperationError,
+)
+from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import count_rows, stage_timer
+
+RECORD_COLUMNS = ["_id", "originationTime", "clusterId", "userId", "phone", "voicemail"]
+
+# the footer of the published file is parsed once per generation and shared by
+# every request; a new generation is a new file at the same path
+_metadata_cache: Dict[Tuple[str, int, int], pq.FileMetaData] = {}
+_metadata_cache_lock = threading.Lock()
+
+
+def equal_mask(column: pa.ChunkedArray, value: str) -> pa.ChunkedArray:
+    """
+    Rows of the column equal to the value. Dictionary encoded chunks look the
+    value up once in their dictionary and then only compare the indices; a
+    value missing from the dictionary matches no row of the chunk.
+    """
+    masks = []
+    for chunk in column.chunks:
+        if pa.types.is_dictionary(chunk.type):
+            index = pc.index(chunk.dictionary, value)
+            masks.append(
+                pc.equal(chunk.indices, pa.scalar(index.as_py(), chunk.indices.type))
+            )
+        else:
+            masks.append(pc.equal(chunk, value))
+    return pa.chunked_array(masks, pa.bool_())
+
+
+class FilterRecordFromParquet:
+    """
+    Class for all the services related to filtering records from Parquet
+    """
+
+    def __init__(self, parquet_path: str, request: FilterRequestModel) -> None:
+        self.request = request
+        self.parquet_path = parquet_path
+        # generation of the file read, reported in the responses
+        self.version: Optional[str] = None
+
+    def open_parquet_file(self) -> pa.MemoryMappedFile:
+        """
+        Map the Parquet file; the footer and the row groups are all read from
+        this one handle, so they come from the same generation of the file
+        """
+        try:
+            return pa.memory_map(self.parquet_path)
+        except FileNotFoundError as exc:
+            app_logger.error("Parquet file not found at location %s", self.parquet_path)
+            raise ParquetFileNotFoundError(
+                message="No Parquet file found to filter the records"
+            ) from exc
+
+    def load_metadata(self, parquet_source: pa.MemoryMappedFile) -> pq.FileMetaData:
+        """
+        Metadata of the opened Parquet file: row groups, their statistics and
+        sizes
+        """
+        file_stat = os.fstat(parquet_source.fileno())
+        self.version = datetime.fromtimestamp(file_stat.st_mtime).strftime(
+            "%Y%m%dT%H%M%S"
+        )
+
+        metadata_key = (self.parquet_path, file_stat.st_ino, file_stat.st_mtime_ns)
+        with _metadata_cache_lock:
+            metadata = _metadata_cache.get(metadata_key)
+            if metadata is None:
+                _metadata_cache.clear()
+                metadata = pq.read_metadata(parquet_source)
+                _metadata_cache[metadata_key] = metadata
+
+        return metadata
+
+    def date_bounds(self) -> Tuple[int, int]:
+        """
+        The date range as inclusive originationTime bounds
+        """
+        start_date, end_date = [
+            int(datetime.strptime(date.strip(), "%Y-%m-%d").timestamp())
+            for date in self.request.date_range.split(" to ")
+        ]
+        return start_date, end_date
+
+    def field_filters(self) -> List[Tuple[str, str]]:
+        """
+        Columns and values of the fields given in the request
+        """
+        return [
+            (column, value)
+            for column, value in (
+                ("userId", self.request.user_id),
+                ("clusterId", self.request.cluster),
+                ("phone", self.request.phone_number),
+                ("voicemail", self.request.voice_mail),
+            )
+            if value
+        ]
+
+    @staticmethod
+    def prune_row_groups(
+        metadata: pq.FileMetaData, start_date: int, end_date: int
+    ) -> List[int]:
+        """
+        Row groups whose originationTime statistics overlap the date range
+        """
+        time_column = metadata.schema.names.index("originationTime")
+        row_groups = []
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(time_column).statistics
+            if (
+                statistics is None
+                or not statistics.has_min_max
+                or (statistics.min <= end_date and statistics.max >= start_date)
+            ):
+                row_groups.append(row_group)
+        return row_groups
+
+    def filter_row_group(
+        self,
+        parquet_file: pq.ParquetFile,
+        row_group: int,
+        start_date: int,
+        end_date: int,
+    ) -> Optional[pa.Table]:
+        """
+        Read the filter columns of the row group, and the other columns of the
+        record only when some rows match
+        """
+        field_filters = self.field_filters()
+        filter_columns = ["originationTime"] + [column for column, _ in field_filters]
+        filter_table = parquet_file.read_row_group(
+            row_group, columns=filter_columns, use_threads=False
+        )
+
+        origination_time = filter_table.column("originationTime")
+        mask = pc.and_(
+            pc.greater_equal(origination_time, start_date),
+            pc.less_equal(origination_time, end_date),
+        )
+        if field_filters:
+            field_masks = [
+                equal_mask(filter_table.column(column), value)
+                for column, value in field_filters
+            ]
+            field_mask = field_masks[0]
+            for other_field_mask in field_masks[1:]:
+                field_mask = pc.or_(field_mask, other_field_mask)
+            mask = pc.and_(mask, field_mask)
+
+        row_indices = pc.indices_nonzero(mask.combine_chunks().fill_null(False))
+        if not row_indices:
+            return None
+
+        return parquet_file.read_row_group(
+            row_group, columns=RECORD_COLUMNS, use_threads=False
+        ).take(row_indices)
+
+    @staticmethod
+    def process_records(records_table: pa.Table) -> List[RecordModel]:
+        """
+        Build the record models from the matched rows
+        """
+        columns = [
+            records_table.column(column).to_pylist() for column in RECORD_COLUMNS
+        ]
+        return [
+            RecordModel(
+                **{
+                    "_id": row[0],
+                    "originationTime": row[1],
+                    "clusterId": row[2],
+                    "userId": row[3],
+                    "devices": {"phone": row[4], "voicemail": row[5]},
+                }
+            )
+            for row in zip(*columns)
+        ]
+
+    def filter_records_from_parquet(self) -> FilterResponseModel:
+        """
+        Get filtered records from Parquet
+        """
+        parquet_source = self.open_parquet_file()
+        try:
+            with stage_timer("parquet", "metadata"):
+                metadata = self.load_metadata(parquet_source)
+
+            start_date, end_date = self.date_bounds()
+            with stage_timer("parquet", "row_group_pruning"):
+                row_groups = self.prune_row_groups(metadata, start_date, end_date)
+            app_logger.info(
+                "Reading %d of %d Parquet row groups for the date range",
+                len(row_groups),
+                metadata.num_row_groups,
+            )
+
+            with stage_timer("parquet", "scan"):
+                parquet_file = pq.ParquetFile(
+                    parquet_source,
+                    metadata=metadata,
+                    read_dictionary=PARQUET_DICTIONARY_COLUMNS,
+                )
+                matched_tables = [
+                    matched_table
+                    for matched_table in (
+                        self.filter_row_group(
+                            parquet_file, row_group, start_date, end_date
+                        )
+                        for row_group in row_groups
+                    )
+                    if matched_table is not None
+                ]
+        except (pa.ArrowException, OSError) as exc:
+            app_logger.error("Error occurred while reading Parquet file: %s", exc)
+            raise ParquetOperationError(message="Parquet operation error") from exc
+        finally:
+            parquet_source.close()
+
+        with stage_timer("parquet", "model_build"):
+            records = [
+                record
+                for matched_table in matched_tables
+                for record in self.process_records(matched_table)
+            ]
+
+        with stage_timer("parquet", "response_build"):
+            response = FilterResponseModel(
+                result=records, datasetVersion=f"parquet@{self.version}"
+            )
+        count_rows(
+            "parquet",
+            scanned=sum(
+                metadata.row_group(row_group).num_rows for row_group in row_groups
+            ),
+            returned=len(response.result),
+        )
+
+        return response
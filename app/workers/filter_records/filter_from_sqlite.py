@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+from app.api.filter_records.models import (
+    FilterRequestModel,
+    FilterResponseModel,
+    RecordModel,
+)
+from app.core.constants import (
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_RECORDS_TABLE,
+)
+from app.custom_exceptions.filter_from_sqlite_exception import (
+    SQLiteConnectionError,
+    SQLiteOperationError,
+)
+from app.utils.logger_helper import app_logger
+from app.utils.metrics_helper import SQLITE_THREAD_CONNECTIONS, count_rows, stage_timer
+
+# SQLite connections can only be used by the thread that opened them, so every
+# request thread keeps its own read-only connection to the published file
+_thread_connections = threading.local()
+
+
+def close_thread_connection() -> None:
+    """
+    Close the SQLite connection cached for the current thread; the next worker
+    on this thread reconnects
+    """
+    conn = getattr(_thread_connections, "conn", None)
+
+    try:
+        if conn is not None:
+            conn.close()
+    except sqlite3.Error as exc:
+        app_logger.warning("Error occurred while closing SQLite connection: %s", exc)
+    finally:
+        if conn is not None:
+            SQLITE_THREAD_CONNECTIONS.dec()
+        _thread_connections.conn = None
+        _thread_connections.connection_key = None
+        _thread_connections.version = None
+
+
+class FilterRecordFromSQLite:
+    """
+    Class for all the services related to filtering records from SQLite
+    """
+
+    def __init__(self, sqlite_path: str, request: FilterRequestModel) -> None:
+        self.request = request
+        self.sqlite_path = sqlite_path
+
+        self.conn = self.__get_sqlite_connection()
+        # generation of the file the connection reads, reported in the responses
+        self.version = getattr(_thread_connections, "version", None)
+
+    def __get_sqlite_connection(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread, connecting if required.
+        The record generator publishes a new generation as a new file, so the
+        connection is reopened whenever the file at the path is not the same.
+        """
+        try:
+            file_stat = os.stat(self.sqlite_path)
+        except FileNotFoundError as exc:
+            app_logger.error("SQLite file not found at location %s", self.sqlite_path)
+            raise SQLiteConnectionError(
+                message="No SQLite file found to filter the records"
+            ) from exc
+
+        connection_key = (self.sqlite_path, file_stat.st_ino, file_stat.st_mtime_ns)
+        conn = getattr(_thread_connections, "conn", None)
+        if conn is not None and _thread_connections.connection_key == connection_key:
+            return conn
+
+        close_thread_connection()
+
+        try:
+            app_logger.info("Opening the SQLite file %s", self.sqlite_path)
+            with stage_timer("sqlite", "connect"):
+                # published files are never written again, so they are opened
+                # immutable: no locking and no -shm file on the read path
+                conn = sqlite3.connect(
+                    f"{Path(self.sqlite_path).resolve().as_uri()}?mode=ro&immutable=1",
+                    uri=True,
+                )
+                conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+                conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+                conn.execute("PRAGMA query_only = 1")
+            SQLITE_THREAD_CONNECTIONS.inc()
+            app_logger.info("SQLite file opened successfully")
+        except sqlite3.Error as exc:
+            app_logger.error("Error occurred while opening SQLite file: %s", exc)
+            raise SQLiteConnectionError(message="SQLite connection error") from exc
+
+        _thread_connections.conn = conn
+        _thread_connections.connection_key = connection_key
+        _thread_connections.version = datetime.fromtimestamp(
+            file_stat.st_mtime
+        ).strftime("%Y%m%dT%H%M%S")
+
+        return conn
+
+    def sqlite_query_builder(self) -> Tuple[str, tuple]:
+        """
+        Build SQLite query along with its parameters.
+        The date range is repeated in every OR term so SQLite serves each term
+        with a range scan of its (field, originationTime) index.
+        """
+        start_date, end_date = [
+            datetime.strptime(date.strip(), "%Y-%m-%d").timestamp()
+            for date in self.request.date_range.split(" to ")
+        ]
+
+        date_condition = "originationTime BETWEEN ? AND ?"
+        date_params = (int(start_date), int(end_date))
+
+        field_conditions = [
+            (column, value)
+            for column, value in (
+                ("userId", self.request.user_id),
+                ("clusterId", self.request.cluster),
+                ("phone", self.request.phone_number),
+                ("voicemail", self.request.voice_mail),
+            )
+            if value
+        ]
+
+        query = (
+            "SELECT _id, originationTime, clusterId, userId, phone, voicemail "
+            f"FROM {SQLITE_RECORDS_TABLE} WHERE "  # nosec
+        )
+        if field_conditions:
+            query += " OR ".join(
+                f"({column} = ? AND {date_condition})" for column, _ in field_conditions
+            )
+            params = tuple(
+                param
+                for _, value in field_conditions
+                for param in (value,) + date_params
+            )
+        else:
+            query += date_condition
+            params = date_params
+
+        app_logger.debug("query built for filtering records from SQLite: %s", query)
+
+        return query, params
+
+    @staticmethod
+    def process_records(rows: List[tuple]) -> List[RecordModel]:
+        """
+        Build the record models from the SQLite rows
+        """
+        return [
+            RecordModel(
+                **{
+                    "_id": row[0],
+                    "originationTime": row[1],
+                    "clusterId": row[2],
+                    "userId": row[3],
+                    "devices": {"phone": row[4], "voicemail": row[5]},
+                }
+            )
+            for row in rows
+        ]
+
+    def filter_records_from_sqlite(self) -> FilterResponseModel:
+        """
+        Get filtered records from SQLite
+        """
+        try:
+            with stage_timer("sqlite", "query_build"):
+                query, params = self.sqlite_query_builder()
+
+            app_logger.info(
+                "Executing query for filtering records from SQLite: %s", query
+            )
+            with stage_timer("sqlite", "db_round_trip"):
+                rows = self.conn.execute(query, params).fetchall()
+            app_logger.info(
+                "Query executed successfully for filtering "
+                "records from SQLite: %d records found",
+                len(rows),
+            )
+
+            with stage_timer("sqlite", "model_build"):
+                records = self.process_records(rows)
+
+            with stage_timer("sqlite", "response_build"):
+                response = FilterResponseModel(
+                    result=records, datasetVersion=f"sqlite@{self.version}"
+                )
+            count_rows("sqlite", scanned=len(rows), returned=len(response.result))
+
+            return response
+
+        except sqlite3.Error as err:
+            app_logger.error("Error occurred while querying SQLite: %s", err)
+            close_thread_connection()
+            raise SQLiteOperationError(message="SQLite operation error") from err
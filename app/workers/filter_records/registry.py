@@ -0,0 +1,31 @@
+import importlib
+from typing import List
+
+from app.core.config import settings
+from app.core.constants import FILTER_BACKEND_WORKERS
+from app.custom_exceptions.backend_registry_exceptions import BackendNotEnabledError
+
+
+def enabled_backends() -> List[str]:
+    """
+    Known filter backends enabled on this host
+    """
+    return [
+        backend
+        for backend in settings.enabled_backends
+        if backend in FILTER_BACKEND_WORKERS
+    ]
+
+
+def get_worker_class(backend: str) -> type:
+    """
+    Worker class of an enabled filter backend, importing its module, and with it
+    the backend driver, on first use
+    """
+    if backend not in enabled_backends():
+        raise BackendNotEnabledError(
+            message=f"Filter backend {backend} is not enabled on this host"
+        )
+
+    module_name, class_name = FILTER_BACKEND_WORKERS[backend].split(":")
+    return getattr(importlib.import_module(module_name), class_name)